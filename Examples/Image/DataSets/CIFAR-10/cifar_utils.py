@@ -1,13 +1,12 @@
 ﻿from __future__ import print_function
-try: 
-    from urllib.request import urlretrieve 
-except ImportError: 
-    from urllib import urlretrieve
 import sys
 import tarfile
 import shutil
 import os
 import struct
+import time
+import tempfile
+import multiprocessing
 import numpy as np
 import pickle as cp
 from PIL import Image
@@ -15,72 +14,113 @@ import xml.etree.cElementTree as et
 import xml.dom.minidom
 import getopt
 
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from dataset_cache import DatasetCache
+
 ImgSize = 32
 NumFeat = ImgSize * ImgSize * 3
 
+def unpickle(f):
+    if sys.version_info[0] < 3: 
+        return cp.load(f) 
+    else:
+        return cp.load(f, encoding='latin1')
+
 def readBatch(src):
     with open(src, 'rb') as f:
-        if sys.version_info[0] < 3: 
-            d = cp.load(f) 
-        else:
-            d = cp.load(f, encoding='latin1')
+        d = unpickle(f)
         data = d['data']
         feat = data
     res = np.hstack((feat, np.reshape(d['labels'], (len(d['labels']), 1))))
     return res.astype(np.int)
 
-def loadData(src):
-    print ('Downloading ' + src)
-    fname, h = urlretrieve(src, './delete.me')
-    print ('Done.')
-    try:
+def loadData(src, cache=None):
+    # Returns the train and test sets as memory-mapped uint8 arrays with the
+    # label in the last column, and extracts the batches to ./cifar-10-batches-py
+    # for the conversion to png images.
+    cache = cache or DatasetCache()
+
+    def build(fname, paths):
+        print ('Preparing train and test sets...')
+        trn = np.lib.format.open_memmap(paths['train'], mode='w+', dtype=np.uint8, shape=(50000, NumFeat + 1))
+        tst = np.lib.format.open_memmap(paths['test'], mode='w+', dtype=np.uint8, shape=(10000, NumFeat + 1))
+        # stream through the archive, one batch at a time
+        with tarfile.open(fname, 'r|gz') as tar:
+            for member in tar:
+                name = os.path.basename(member.name)
+                if name == 'test_batch':
+                    rows = tst[:]
+                elif name.startswith('data_batch_'):
+                    start = (int(name[len('data_batch_'):]) - 1) * 10000
+                    rows = trn[start:start + 10000]
+                else:
+                    continue
+                d = unpickle(tar.extractfile(member))
+                rows[:, :-1] = d['data']
+                rows[:, -1] = d['labels']
+        trn.flush()
+        tst.flush()
+        print ('Done.')
+
+    trn, tst = cache.prepare(src, ['train', 'test'], build)
+    if not os.path.isdir('./cifar-10-batches-py'):
         print ('Extracting files...')
-        with tarfile.open(fname) as tar:
+        with tarfile.open(cache.fetch(src)) as tar:
             tar.extractall()
         print ('Done.')
-        print ('Preparing train set...')
-        trn = np.empty((0, NumFeat + 1), dtype=np.int)
-        for i in range(5):
-            batchName = './cifar-10-batches-py/data_batch_{0}'.format(i + 1)
-            trn = np.vstack((trn, readBatch(batchName)))
-        print ('Done.')
-        print ('Preparing test set...')
-        tst = readBatch('./cifar-10-batches-py/test_batch')
-        print ('Done.')
-    finally:
-        os.remove(fname)
     return (trn, tst)
 
-def saveTxt(filename, ndarray):
+def saveTxt(filename, ndarray, rowsPerBlock=4096):
+    labels = list(map(' '.join, np.eye(10, dtype=np.uint).astype(str)))
+    # one format string for a whole row: the label string, then the features
+    rowFormat = '|labels %s |features ' + ' '.join(['%d'] * (ndarray.shape[1] - 1)) + '\n'
     with open(filename, 'w') as f:
-        labels = list(map(' '.join, np.eye(10, dtype=np.uint).astype(str)))
-        for row in ndarray:
-            row_str = row.astype(str)
-            label_str = labels[row[-1]]
-            feature_str = ' '.join(row_str[:-1])
-            f.write('|labels {} |features {}\n'.format(label_str, feature_str))
+        for start in range(0, len(ndarray), rowsPerBlock):
+            block = ndarray[start:start + rowsPerBlock].tolist()
+            f.write(''.join([rowFormat % tuple([labels[row[-1]]] + row[:-1]) for row in block]))
+
+def toPixels(data, pad):
+    # data in CIFAR-10 dataset is in CHW format, with one image per row.
+    pixData = np.asarray(data, dtype=np.uint8).reshape((-1, 3, ImgSize, ImgSize))
+    if pad > 0:
+        pixData = np.pad(pixData, ((0, 0), (0, 0), (pad, pad), (pad, pad)), mode='constant', constant_values=128) # can also use mode='edge'
+    return pixData
+
+def writeImage(args):
+    # PIL expects the pixels in HWC format
+    fname, pixData = args
+    Image.fromarray(np.ascontiguousarray(pixData.transpose(1, 2, 0)), 'RGB').save(fname)
 
 def saveImage(fname, data, label, mapFile, regrFile, pad, **key_parms):
-    # data in CIFAR-10 dataset is in CHW format.
-    pixData = data.reshape((3, ImgSize, ImgSize))
     if ('mean' in key_parms):
-        key_parms['mean'] += pixData
+        key_parms['mean'] += data.reshape((3, ImgSize, ImgSize))
 
-    if pad > 0:
-        pixData = np.pad(pixData, ((0, 0), (pad, pad), (pad, pad)), mode='constant', constant_values=128) # can also use mode='edge'
-
-    img = Image.new('RGB', (ImgSize + 2 * pad, ImgSize + 2 * pad))
-    pixels = img.load()
-    for x in range(img.size[0]):
-        for y in range(img.size[1]):
-            pixels[x, y] = (pixData[0][y][x], pixData[1][y][x], pixData[2][y][x])
-    img.save(fname)
+    pixData = toPixels(data, pad)[0]
+    writeImage((fname, pixData))
     mapFile.write("%s\t%d\n" % (fname, label))
     
     # compute per channel mean and store for regression example
     channelMean = np.mean(pixData, axis=(1,2))
     regrFile.write("|regrLabels\t%f\t%f\t%f\n" % (channelMean[0]/255.0, channelMean[1]/255.0, channelMean[2]/255.0))
-    
+
+def saveImages(fnames, data, labels, mapFile, regrFile, pad, pool=None, **key_parms):
+    # Batch version of saveImage: the PNG files are written by the given process pool.
+    if ('mean' in key_parms):
+        key_parms['mean'] += np.asarray(data).reshape((-1, 3, ImgSize, ImgSize)).sum(axis=0)
+
+    pixData = toPixels(data, pad)
+    images = zip(fnames, pixData)
+    if pool is None:
+        for image in images:
+            writeImage(image)
+    else:
+        pool.map(writeImage, images, chunksize=256)
+    mapFile.write(''.join(["%s\t%d\n" % (fname, label) for fname, label in zip(fnames, labels)]))
+
+    # compute per channel mean and store for regression example
+    channelMeans = np.mean(pixData, axis=(2,3)) / 255.0
+    regrFile.write(''.join(["|regrLabels\t%f\t%f\t%f\n" % tuple(m) for m in channelMeans.tolist()]))
+
 def saveMean(fname, data):
     root = et.Element('opencv_storage')
     et.SubElement(root, 'Channel').text = '3'
@@ -98,35 +138,80 @@ def saveMean(fname, data):
     with open(fname, 'w') as f:
         f.write(x.toprettyxml(indent = '  '))
 
-def saveTrainImages(filename, foldername):
+def loadBatch(fname):
+    with open(fname, 'rb') as f:
+        return unpickle(f)
+
+def saveTrainImages(filename, foldername, processes=None):
     if not os.path.exists(foldername):
         os.makedirs(foldername)
-    data = {}
     dataMean = np.zeros((3, ImgSize, ImgSize)) # mean is in CHW format.
-    with open('train_map.txt', 'w') as mapFile:
-        with open('train_regrLabels.txt', 'w') as regrFile:
-            for ifile in range(1, 6):
-                with open(os.path.join('./cifar-10-batches-py', 'data_batch_' + str(ifile)), 'rb') as f:
-                    if sys.version_info[0] < 3: 
-                        data = cp.load(f)
-                    else: 
-                        data = cp.load(f, encoding='latin1')
-                    for i in range(10000):
-                        fname = os.path.join(os.path.abspath(foldername), ('%05d.png' % (i + (ifile - 1) * 10000)))
-                        saveImage(fname, data['data'][i, :], data['labels'][i], mapFile, regrFile, 4, mean=dataMean)
+    start = time.time()
+    pool = multiprocessing.Pool(processes)
+    try:
+        with open('train_map.txt', 'w') as mapFile:
+            with open('train_regrLabels.txt', 'w') as regrFile:
+                for ifile in range(1, 6):
+                    data = loadBatch(os.path.join('./cifar-10-batches-py', 'data_batch_' + str(ifile)))
+                    fnames = [os.path.join(os.path.abspath(foldername), ('%05d.png' % (i + (ifile - 1) * 10000))) for i in range(10000)]
+                    saveImages(fnames, data['data'], data['labels'], mapFile, regrFile, 4, pool, mean=dataMean)
+    finally:
+        pool.close()
+        pool.join()
+    print ('Converted 50000 images in {0:.1f}s.'.format(time.time() - start))
     dataMean = dataMean / (50 * 1000)
     saveMean('CIFAR-10_mean.xml', dataMean)
 
-def saveTestImages(filename, foldername):
+def saveTestImages(filename, foldername, processes=None):
     if not os.path.exists(foldername):
       os.makedirs(foldername)
-    with open('test_map.txt', 'w') as mapFile:
-        with open('test_regrLabels.txt', 'w') as regrFile:
-            with open(os.path.join('./cifar-10-batches-py', 'test_batch'), 'rb') as f:
-                if sys.version_info[0] < 3: 
-                    data = cp.load(f)
-                else: 
-                    data = cp.load(f, encoding='latin1')
-                for i in range(10000):
-                    fname = os.path.join(os.path.abspath(foldername), ('%05d.png' % i))
-                    saveImage(fname, data['data'][i, :], data['labels'][i], mapFile, regrFile, 0)
+    start = time.time()
+    pool = multiprocessing.Pool(processes)
+    try:
+        with open('test_map.txt', 'w') as mapFile:
+            with open('test_regrLabels.txt', 'w') as regrFile:
+                data = loadBatch(os.path.join('./cifar-10-batches-py', 'test_batch'))
+                fnames = [os.path.join(os.path.abspath(foldername), ('%05d.png' % i)) for i in range(10000)]
+                saveImages(fnames, data['data'], data['labels'], mapFile, regrFile, 0, pool)
+    finally:
+        pool.close()
+        pool.join()
+    print ('Converted 10000 images in {0:.1f}s.'.format(time.time() - start))
+
+def benchmark(numImages=10000, processes=None):
+    # Times the conversion of random CIFAR-10 sized images to png files, with
+    # the pixel by pixel loop, vectorized, and vectorized in parallel.
+    data = np.random.randint(0, 256, (numImages, NumFeat)).astype(np.uint8)
+    labels = np.random.randint(0, 10, numImages).tolist()
+    folder = tempfile.mkdtemp()
+    fnames = [os.path.join(folder, '%05d.png' % i) for i in range(numImages)]
+
+    def timeIt(name, convert):
+        with open(os.devnull, 'w') as mapFile, open(os.devnull, 'w') as regrFile:
+            start = time.time()
+            convert(mapFile, regrFile)
+            elapsed = time.time() - start
+        print ('{0}: {1} images in {2:.2f}s ({3:.0f} images/s)'.format(name, numImages, elapsed, numImages / elapsed))
+
+    def pixelLoop(mapFile, regrFile):
+        for fname, pixData in zip(fnames, toPixels(data, 4)):
+            img = Image.new('RGB', (pixData.shape[2], pixData.shape[1]))
+            pixels = img.load()
+            for x in range(img.size[0]):
+                for y in range(img.size[1]):
+                    pixels[x, y] = (pixData[0][y][x], pixData[1][y][x], pixData[2][y][x])
+            img.save(fname)
+
+    try:
+        timeIt('pixel loop', pixelLoop)
+        timeIt('vectorized', lambda mapFile, regrFile: saveImages(fnames, data, labels, mapFile, regrFile, 4))
+        processes = processes or multiprocessing.cpu_count()
+        pool = multiprocessing.Pool(processes)
+        try:
+            timeIt('vectorized, {0} processes'.format(processes),
+                   lambda mapFile, regrFile: saveImages(fnames, data, labels, mapFile, regrFile, 4, pool))
+        finally:
+            pool.close()
+            pool.join()
+    finally:
+        shutil.rmtree(folder)
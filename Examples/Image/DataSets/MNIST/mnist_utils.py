@@ -1,20 +1,15 @@
 from __future__ import print_function
-try: 
-    from urllib.request import urlretrieve 
-except ImportError: 
-    from urllib import urlretrieve
 import sys
 import gzip
-import shutil
 import os
 import struct
 import numpy as np
 
-def loadData(src, cimg):
-    print ('Downloading ' + src)
-    gzfname, h = urlretrieve(src, './delete.me')
-    print ('Done.')
-    try:
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from dataset_cache import DatasetCache, readInto
+
+def loadData(src, cimg, cache=None):
+    def build(gzfname, paths):
         with gzip.open(gzfname) as gz:
             n = struct.unpack('I', gz.read(4))
             # Read magic number.
@@ -29,16 +24,14 @@ def loadData(src, cimg):
             if crow != 28 or ccol != 28:
                 raise Exception('Invalid file: expected 28 rows/cols per image.')
             # Read data.
-            res = np.fromstring(gz.read(cimg * crow * ccol), dtype = np.uint8)
-    finally:
-        os.remove(gzfname)
-    return res.reshape((cimg, crow * ccol))
+            res = np.lib.format.open_memmap(paths['data'], mode='w+', dtype=np.uint8, shape=(cimg, crow * ccol))
+            readInto(gz, res)
+            res.flush()
+
+    return (cache or DatasetCache()).prepare(src, ['data'], build)[0]
 
-def loadLabels(src, cimg):
-    print ('Downloading ' + src)
-    gzfname, h = urlretrieve(src, './delete.me')
-    print ('Done.')
-    try:
+def loadLabels(src, cimg, cache=None):
+    def build(gzfname, paths):
         with gzip.open(gzfname) as gz:
             n = struct.unpack('I', gz.read(4))
             # Read magic number.
@@ -49,21 +42,22 @@ def loadLabels(src, cimg):
             if n[0] != cimg:
                 raise Exception('Invalid file: expected {0} rows.'.format(cimg))
             # Read labels.
-            res = np.fromstring(gz.read(cimg), dtype = np.uint8)
-    finally:
-        os.remove(gzfname)
-    return res.reshape((cimg, 1))
+            res = np.lib.format.open_memmap(paths['labels'], mode='w+', dtype=np.uint8, shape=(cimg, 1))
+            readInto(gz, res)
+            res.flush()
+
+    return (cache or DatasetCache()).prepare(src, ['labels'], build)[0]
 
-def load(dataSrc, labelsSrc, cimg):
-    data = loadData(dataSrc, cimg)
-    labels = loadLabels(labelsSrc, cimg)
+def load(dataSrc, labelsSrc, cimg, cache=None):
+    data = loadData(dataSrc, cimg, cache)
+    labels = loadLabels(labelsSrc, cimg, cache)
     return np.hstack((data, labels))
 
-def savetxt(filename, ndarray):
+def savetxt(filename, ndarray, rowsPerBlock=4096):
+    labels = list(map(' '.join, np.eye(10, dtype=np.uint).astype(str)))
+    # one format string for a whole row: the label string, then the features
+    rowFormat = '|labels %s |features ' + ' '.join(['%d'] * (ndarray.shape[1] - 1)) + '\n'
     with open(filename, 'w') as f:
-        labels = list(map(' '.join, np.eye(10, dtype=np.uint).astype(str)))
-        for row in ndarray:
-            row_str = row.astype(str)
-            label_str = labels[row[-1]]
-            feature_str = ' '.join(row_str[:-1])
-            f.write('|labels {} |features {}\n'.format(label_str, feature_str))
+        for start in range(0, len(ndarray), rowsPerBlock):
+            block = ndarray[start:start + rowsPerBlock].tolist()
+            f.write(''.join([rowFormat % tuple([labels[row[-1]]] + row[:-1]) for row in block]))
@@ -0,0 +1,160 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+# Licensed under the MIT license. See LICENSE.md file in the project root
+# for full license information.
+# ==============================================================================
+
+# Download-and-prepare cache shared by the dataset install scripts.
+#
+# Downloaded archives are stored content-addressed, i.e. under their SHA-256
+# digest, in <cache>/blobs. Downloads are written in chunks to a partial file
+# and resumed (via HTTP range requests) if they were interrupted. Arrays
+# prepared from an archive are stored as .npy files in <cache>/prepared,
+# together with a manifest; as long as the manifest matches the files, the
+# preparation is skipped and the arrays are returned memory-mapped.
+#
+# The cache directory defaults to $CNTK_DATASET_CACHE or DataSets/.cache. If
+# $CNTK_DATASET_MIRROR (or the mirror argument) is set, archives are fetched
+# from <mirror>/<file name> instead of their original location, e.g. from a
+# local file:// mirror when working offline.
+
+from __future__ import print_function
+try:
+    from urllib.request import urlopen, Request
+    from urllib.parse import urlsplit
+except ImportError:
+    from urllib2 import urlopen, Request
+    from urlparse import urlsplit
+import os
+import json
+import hashlib
+import tempfile
+import numpy as np
+
+ChunkSize = 1 << 20
+
+def _replace(src, dst):
+    try:
+        os.replace(src, dst)
+    except AttributeError:
+        # Python 2
+        if os.path.exists(dst):
+            os.remove(dst)
+        os.rename(src, dst)
+
+def _hashFile(fname):
+    sha = hashlib.sha256()
+    with open(fname, 'rb') as f:
+        for chunk in iter(lambda: f.read(ChunkSize), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+class DatasetCache(object):
+    def __init__(self, cacheDir=None, mirror=None):
+        if cacheDir is None:
+            cacheDir = os.environ.get('CNTK_DATASET_CACHE',
+                os.path.join(os.path.dirname(os.path.abspath(__file__)), '.cache'))
+        self.cacheDir = cacheDir
+        self.mirror = mirror if mirror is not None else os.environ.get('CNTK_DATASET_MIRROR')
+        for sub in ('blobs', 'partial', 'urls', 'prepared'):
+            path = os.path.join(cacheDir, sub)
+            if not os.path.isdir(path):
+                os.makedirs(path)
+
+    def _path(self, *parts):
+        return os.path.join(self.cacheDir, *parts)
+
+    def _sourceUrl(self, url):
+        if not self.mirror:
+            return url
+        return self.mirror.rstrip('/') + '/' + os.path.basename(urlsplit(url).path)
+
+    def blobPath(self, digest):
+        return self._path('blobs', digest)
+
+    def fetch(self, url, sha256=None):
+        # Returns the path of the cached archive for url, downloading it if needed.
+        key = hashlib.sha256(url.encode('utf-8')).hexdigest()
+        urlFile = self._path('urls', key)
+        if sha256 is None and os.path.isfile(urlFile):
+            with open(urlFile) as f:
+                sha256 = f.read().strip()
+        if sha256 is not None and os.path.isfile(self.blobPath(sha256)):
+            return self.blobPath(sha256)
+
+        source = self._sourceUrl(url)
+        partial = self._path('partial', key)
+        offset = os.path.getsize(partial) if os.path.isfile(partial) else 0
+        request = Request(source)
+        if offset > 0:
+            request.add_header('Range', 'bytes=%d-' % offset)
+
+        print ('Downloading ' + source)
+        response = urlopen(request)
+        try:
+            resumed = offset > 0 and getattr(response, 'getcode', lambda: None)() == 206
+            with open(partial, 'ab' if resumed else 'wb') as f:
+                for chunk in iter(lambda: response.read(ChunkSize), b''):
+                    f.write(chunk)
+        finally:
+            response.close()
+        print ('Done.')
+
+        digest = _hashFile(partial)
+        if sha256 is not None and digest != sha256:
+            os.remove(partial)
+            raise Exception('Invalid download of {0}: expected SHA-256 {1}, got {2}.'.format(source, sha256, digest))
+        _replace(partial, self.blobPath(digest))
+
+        fd, tmp = tempfile.mkstemp(dir=self._path('urls'))
+        with os.fdopen(fd, 'w') as f:
+            f.write(digest)
+        _replace(tmp, urlFile)
+        return self.blobPath(digest)
+
+    def _manifestPath(self, digest, name):
+        return self._path('prepared', '{0}-{1}.json'.format(digest[:16], name))
+
+    def _arrayPath(self, digest, name):
+        return self._path('prepared', '{0}-{1}.npy'.format(digest[:16], name))
+
+    def _isValid(self, digest, name):
+        try:
+            with open(self._manifestPath(digest, name)) as f:
+                manifest = json.load(f)
+            return manifest['source'] == digest and \
+                os.path.getsize(self._arrayPath(digest, name)) == manifest['size']
+        except (IOError, OSError, ValueError, KeyError):
+            return False
+
+    def prepare(self, url, names, build, sha256=None):
+        # Returns the arrays with the given names prepared from the archive at
+        # url, memory-mapped. If they are not cached yet, build(archivePath,
+        # paths) is called to write each of them as a .npy file to paths[name]
+        # (numpy.lib.format.open_memmap allows to fill them in a streaming way).
+        blob = self.fetch(url, sha256)
+        digest = os.path.basename(blob)
+        if not all(self._isValid(digest, name) for name in names):
+            paths = dict((name, self._arrayPath(digest, name)[:-len('.npy')] + '.tmp.npy') for name in names)
+            build(blob, paths)
+            for name in names:
+                if os.path.exists(self._manifestPath(digest, name)):
+                    os.remove(self._manifestPath(digest, name))
+                _replace(paths[name], self._arrayPath(digest, name))
+                manifest = { 'source': digest, 'url': url, 'size': os.path.getsize(self._arrayPath(digest, name)) }
+                with open(self._manifestPath(digest, name), 'w') as f:
+                    json.dump(manifest, f)
+        else:
+            print ('Using prepared data of ' + url)
+        return [np.load(self._arrayPath(digest, name), mmap_mode='r') for name in names]
+
+def readInto(f, array):
+    # Fills array (e.g. a memmap) with the bytes read from the stream f, chunk by chunk.
+    flat = array.reshape(-1).view(np.uint8)
+    pos = 0
+    while pos < len(flat):
+        chunk = f.read(min(ChunkSize, len(flat) - pos))
+        if not chunk:
+            raise Exception('Invalid file: unexpected end of data.')
+        flat[pos:pos + len(chunk)] = np.frombuffer(chunk, dtype=np.uint8)
+        pos += len(chunk)
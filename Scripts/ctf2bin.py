@@ -13,6 +13,18 @@
 #   <matrix type> is the matrix type, i.e., dense or sparse
 #   <sample dimension> is the dimensino of each sample for the input
 #
+# The input is converted in a streaming fashion: only the chunk that is
+# currently being built is kept in memory (as packed arrays), and the data is
+# written through a buffer of --bufferSize bytes. The file starts with the
+# header followed by the chunk offsets table (the index of the chunks), which
+# the BinaryReader class below uses to random-access chunks and sequences of a
+# converted file through numpy.memmap without loading it, e.g.
+#
+#    reader = BinaryReader('train.bin')
+#    reader.numChunks, reader.numSequences
+#    chunk = reader.getChunk(5)        # { stream name: data of the chunk }
+#    sequence = reader.getSequence(42) # { stream name: data of the sequence }
+#
 
 import sys
 import argparse
@@ -21,13 +33,27 @@ import struct
 import tempfile
 import shutil
 import os
+from array import array
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# The version of the binary format, see CNTKBinaryReader
+FORMAT_VERSION = 1
+
+DEFAULT_BUFFER_SIZE = 16 * 1024 * 1024
+
+def _toBytes(values):
+    return values.tobytes() if hasattr(values, 'tobytes') else values.tostring()
 
 # This will convert data in the ctf format into binary format
 class Converter(object):
     def __init__(self, name, sampleDim):
         self.name = name
         self.sampleDim = sampleDim
-        self.vals = list()
+        self.clear()
 
     def getName(self):
         return self.name
@@ -36,56 +62,45 @@ class Converter(object):
         return self.sampleDim
 
     def clear(self):
-        self.vals = list()
+        self.values = array('f')
+        self.numSequences = 0
+        self.sequenceSamples = 0
 
     def addSequence(self):
-        self.vals.append(list())
-
-    def appendSample(self, sample):
-        if( len(sample) != self.sampleDim ):
-            print( "Invalid sample dimension for input {0}" ).format( self.name )
-            sys.exit()
-        if( len(self.vals) == 0 ):
-            self.vals.append( list() )
-
-        self.vals[-1].append( sample )
-
-    def toString(self):
-        output = ""
-        for seq in self.vals:
-            for samp in seq:
-                output += "\t" + " ".join(samp )
-            output += "\n"
-        return output
+        self.numSequences += 1
+        self.sequenceSamples = 0
 
 
 # Specilization for dense inputs
 class DenseConverter(Converter):
     def __init__(self, name, sampleDim):
         Converter.__init__(self, name, sampleDim)
-    
+
+    def appendSample(self, sample):
+        if( len(sample) != self.sampleDim ):
+            raise Exception( "Invalid sample dimension for input {0}".format( self.name ) )
+        if( self.sequenceSamples > 0 ):
+            raise Exception( "Converter does not support dense sequences." )
+        if( self.numSequences == 0 ):
+            self.addSequence()
+
+        self.values.extend( float(v) for v in sample )
+        self.sequenceSamples += 1
+
     def headerBytes(self):
-        output = ""
         # First is the matrix type. Dense is type 0
-        output += struct.pack( "i", 0 )
+        output = struct.pack( "i", 0 )
         # Next is the elem type, currently float only
         output += struct.pack( "i", 0 )
-        # Finally is whether or not this is a sequence
+        # Finally is the sample dimension
         output += struct.pack( "i", self.sampleDim )
 
         return output
 
-    
-    def toBytes(self):
-        output = ""
-        for sequence in self.vals:
-            if( len(sequence) != 1 ):
-                print( "Converter does not support dense sequences." )
-                sys.exit()
-            for sample in sequence[0]:
-                output += struct.pack( "f", float(sample) )
-
-        return output
+    def write(self, output):
+        if( len(self.values) != self.numSequences * self.sampleDim ):
+            raise Exception( "Every sequence of dense input {0} needs exactly one sample.".format( self.name ) )
+        output.write( _toBytes( self.values ) )
 
 
 # Specialization for sparse inputs
@@ -93,20 +108,38 @@ class SparseConverter(Converter):
     def __init__(self, name, sampleDim):
         Converter.__init__(self, name, sampleDim)
 
-    def appendSample(self, sample):
-        for samp in sample:
-            if( int(samp.split(":")[0]) >= self.sampleDim ):
-                print( "Invalid sample dimension for input {0}. Max {1}, given {2}" ).format( self.name, self.sampleDim, sample.split( ":" )[0] )
-                sys.exit()
-        if( len(self.vals) == 0 ):
-            self.vals.append( list() )
+    def clear(self):
+        Converter.clear(self)
+        self.rowInd = array('i')
+        self.colInd = array('i', [0])
+
+    def addSequence(self):
+        if( self.numSequences > 0 ):
+            self.colInd.append( len(self.values) )
+        Converter.addSequence(self)
 
-        self.vals[-1].append( sample )
+    def appendSample(self, sample):
+        if( self.numSequences == 0 ):
+            self.addSequence()
+
+        entries = []
+        for ele in sample:
+            ind, val = ele.split(":")
+            ind = int(ind)
+            if( ind >= self.sampleDim ):
+                raise Exception( "Invalid sample dimension for input {0}. Max {1}, given {2}".format( self.name, self.sampleDim, ind ) )
+            entries.append( (ind, float(val)) )
+
+        # sort the indices least to greatest
+        entries.sort()
+        offset = self.sequenceSamples * self.sampleDim
+        self.rowInd.extend( ind + offset for ind, _ in entries )
+        self.values.extend( val for _, val in entries )
+        self.sequenceSamples += 1
 
     def headerBytes(self):
-        output = ""
         # First is the matrix type. Sparse is type 1
-        output += struct.pack( "i", 1 )
+        output = struct.pack( "i", 1 )
         # Next is the storage type, currently sparse csc only
         output += struct.pack( "i", 0 )
         # Next is the elem type, currently float only
@@ -119,31 +152,15 @@ class SparseConverter(Converter):
 
         return output
 
-    def toBytes(self):
-        output = ""
-        values = list()
-        rowInd = list()
-        colInd = [0]
-        nnz = 0
-        for sequence in self.vals:
-            i = 0
-            for sample in sequence:
-                # sort the indices least to greatest
-                sample.sort(key=lambda x: int(x.split(":")[0]))
-                for ele in sample:
-                    nnz += 1
-                    ind, val = ele.split(":")
-                    rowInd.append( int(ind) + i * self.sampleDim )
-                    values.append( val ) 
-                i += 1
-            colInd.append( nnz )
-
-        output += struct.pack( "i", nnz )
-        output += "".join( [ struct.pack( "f", float(val) ) for val in values ] )
-        output += "".join( [ struct.pack( "i", int(ind) ) for ind in rowInd ] )
-        output += "".join( [ struct.pack( "i", int(ind) ) for ind in colInd ] )
+    def write(self, output):
+        colInd = array('i', self.colInd)
+        if( self.numSequences > 0 ):
+            colInd.append( len(self.values) )
 
-        return output
+        output.write( struct.pack( "i", len(self.values) ) )
+        output.write( _toBytes( self.values ) )
+        output.write( _toBytes( self.rowInd ) )
+        output.write( _toBytes( colInd ) )
 
 
 # Parse an entire sequence given an aliasToId map, and the converters
@@ -154,15 +171,15 @@ def ParseSequence( aliasToId, curSequence, converters ):
         for input in line.split( "|" )[1:]:
             vals = input.split()
             # We need to ignore comments
-            if( vals[0] != "#" ):
+            if( vals and vals[0] != "#" ):
                 converters[aliasToId[vals[0]]].appendSample( vals[1:] )
-    return max( [ len(des.vals[ -1 ]) for des in converters ] )
+    return max( [ des.sequenceSamples for des in converters ] )
 
 # Output a binary chunk
 def OutputChunk( binfile, converters ):
     startPos = binfile.tell()
     for des in converters:
-        binfile.write( des.toBytes() )
+        des.write( binfile )
         des.clear()
     return startPos
 
@@ -174,15 +191,27 @@ def GetConverter( inputtype, name, sampleDim ):
     elif( inputtype.lower() == 'sparse' ):
         converter = SparseConverter( name, sampleDim )
     else:
-        print( 'Invalid input format {0}' ).format( inputtype )
-        sys.exit()
+        raise Exception( 'Invalid input format {0}'.format( inputtype ) )
 
-    return converter 
+    return converter
+
+# Parse the header file describing the streams
+# <name>    <alias>  <input format>  <sample size>
+def ParseHeader( headerfile ):
+    converters = []
+    aliasToId = dict()
+    for line in headerfile:
+        if not line.strip():
+            continue
+        split = re.split(r'\t+', line.strip())
+        aliasToId[ split[ 1 ] ] = len(converters)
+        converters.append( GetConverter( split[ 2 ], split[ 0 ], int(split[3]) ) )
+    return converters, aliasToId
 
 # Output the binary format header.
 def OutputHeader( headerFile, converters ):
     # First the version number
-    headerFile.write( struct.pack( "q", 1 ) )
+    headerFile.write( struct.pack( "q", FORMAT_VERSION ) )
     # Next is the number of chunks, but we don't know what this is, so write a
     # placeholder
     headerFile.write( struct.pack( "q", 0 ) )
@@ -193,8 +222,8 @@ def OutputHeader( headerFile, converters ):
         headerFile.write( struct.pack( "i", len( conv.getName() ) ) )
         headerFile.write( conv.getName().encode('ascii') )
         headerFile.write( conv.headerBytes() )
-        
-        
+
+
 # At the end we know how many chunks there are. Update the header as needed.
 def UpdateHeader( headerFile, numChunks ):
     # seek after the first Int64
@@ -211,42 +240,28 @@ def OutputOffset( headerFile, numBytes, numSeqs, numSamples ):
     # Int32 Num samples in the chunk
     headerFile.write( struct.pack( "i", numSamples ) )
 
-if __name__ == '__main__':
-    parser = argparse.ArgumentParser(description="Transforms a CNTK Text Format file into CNTK binary format given a header.")
-    parser.add_argument('--input', help="CNTK Text Format file to convert to binary.", default="", required=True)
-    parser.add_argument('--header',  help="Header file describing each stream in the input.", default="", required=True)
-    parser.add_argument('--seqsPerChunk', type=int, help='Number of sequences in each chunk.', default="", required=True)
-    parser.add_argument('--output', help='Name of the output file, stdout if not given', default="", required=True)
-    args = parser.parse_args()
-
-    # Since we don't know how many chunks we're going to write until we're done,
-    # grow the header/offsets table and the data portion separately. then at the
-    # end concatenate the data portion onto the end of the header/offsets
-    # portion.
-    binaryHeaderFile = open( args.output, "wb+" )
-    binaryDataFile = tempfile.NamedTemporaryFile(mode="rb+", delete=False)
-    dataPath = binaryDataFile.name
-
-    # parse the header to get the converters for this file
-    # <name>    <alias>  <input format>  <sample size>
-    converters = []
-    aliasToId = dict()
-    with open( args.header, "r" ) as headerfile:
-        id = 0
-        for line in headerfile:
-            split = re.split(r'\t+', line.strip())
-            converters.append( GetConverter( split[ 2 ], split[ 0 ], int(split[3]) ) )
-            aliasToId[ split[ 1 ] ] = id
-            id += 1
-
-    OutputHeader( binaryHeaderFile, converters )
-
+# Convert the CTF input stream into the binary file at outputPath. Chunks are
+# written as soon as they are complete, so that only one chunk is kept in
+# memory. Since the number of chunks is only known at the end, the data is
+# written to a temporary file next to the output and appended to the
+# header/offsets table at the end.
+def Convert( inputFile, converters, aliasToId, seqsPerChunk, outputPath, bufferSize=DEFAULT_BUFFER_SIZE ):
     numChunks = 0
-    with open( args.input, "r" ) as inputFile:
+    binaryHeaderFile = open( outputPath, "wb+" )
+    fd, dataPath = tempfile.mkstemp( dir=os.path.dirname( os.path.abspath( outputPath ) ) )
+    binaryDataFile = os.fdopen( fd, "wb+", bufferSize )
+    try:
+        OutputHeader( binaryHeaderFile, converters )
+
         curSequence = list()
         numSeqs = 0
         numSamps = 0
         prevId = None
+
+        def outputChunk():
+            numBytes = OutputChunk( binaryDataFile, converters )
+            OutputOffset( binaryHeaderFile, numBytes, numSeqs, numSamps )
+
         for line in inputFile:
             split = line.rstrip().split('|')
             # if the sequence id is empty or not equal to the previous sequence id,
@@ -256,10 +271,9 @@ if __name__ == '__main__':
                     numSamps += ParseSequence( aliasToId, curSequence, converters )
                     curSequence = list()
                     numSeqs += 1
-                    if( numSeqs % int( args.seqsPerChunk ) == 0 ):
-                        numBytes = OutputChunk( binaryDataFile, converters )
+                    if( numSeqs % seqsPerChunk == 0 ):
+                        outputChunk()
                         numChunks += 1
-                        OutputOffset( binaryHeaderFile, numBytes, numSeqs, numSamps )
                         numSeqs = 0
                         numSamps = 0
                 prevId = split[ 0 ]
@@ -269,21 +283,201 @@ if __name__ == '__main__':
         if( len(curSequence) > 0 ):
             numSamps += ParseSequence( aliasToId, curSequence, converters )
             numSeqs += 1
+        if( numSeqs > 0 ):
+            outputChunk()
             numChunks += 1
 
-        numBytes = OutputChunk( binaryDataFile, converters )
-        OutputOffset( binaryHeaderFile, numBytes, numSeqs, numSamps )
-
         UpdateHeader( binaryHeaderFile, numChunks )
-        binaryHeaderFile.flush()
-        binaryDataFile.flush()
+        binaryHeaderFile.seek( 0, os.SEEK_END )
+        binaryDataFile.seek( 0 )
+        shutil.copyfileobj( binaryDataFile, binaryHeaderFile, bufferSize )
+    finally:
         binaryHeaderFile.close()
         binaryDataFile.close()
+        os.unlink( dataPath )
+
+    return numChunks
+
+
+# Random access to the chunks and sequences of a CNTK binary format file. The
+# file is mapped into memory with numpy.memmap; the returned arrays are views
+# into the mapping, so only the pages that are accessed are read.
+class BinaryReader(object):
+    OFFSETS_DTYPE = [ ('offset', '<i8'), ('numSequences', '<i4'), ('numSamples', '<i4') ]
+
+    def __init__(self, path):
+        if np is None:
+            raise ImportError( "BinaryReader requires numpy" )
+
+        self.data = np.memmap( path, dtype=np.uint8, mode='r' )
+
+        version, self.numChunks, numInputs = struct.unpack_from( "<qqi", self.data, 0 )
+        if( version != FORMAT_VERSION ):
+            raise Exception( "Unsupported binary format version {0}".format( version ) )
+
+        pos = 20
+        self.streams = []
+        for _ in range( numInputs ):
+            nameLength, = struct.unpack_from( "<i", self.data, pos )
+            pos += 4
+            name = self.data[ pos:pos+nameLength ].tobytes().decode( 'ascii' )
+            pos += nameLength
+            matrixType, = struct.unpack_from( "<i", self.data, pos )
+            if( matrixType == 0 ):
+                elemType, sampleDim = struct.unpack_from( "<ii", self.data, pos + 4 )
+                pos += 12
+            elif( matrixType == 1 ):
+                storageType, elemType, isSequence, sampleDim = struct.unpack_from( "<iiii", self.data, pos + 4 )
+                pos += 20
+            else:
+                raise Exception( "Unknown matrix type {0} of input {1}".format( matrixType, name ) )
+            self.streams.append( ( name, matrixType == 1, sampleDim ) )
+
+        self.offsets = np.frombuffer( self.data, dtype=self.OFFSETS_DTYPE, count=self.numChunks, offset=pos )
+        self.dataStart = pos + self.offsets.nbytes
+        self.firstSequence = np.concatenate( ( [0], np.cumsum( self.offsets['numSequences'] ) ) )
+        self.numSequences = int( self.firstSequence[-1] )
+
+    def getStreamNames(self):
+        return [ name for name, _, _ in self.streams ]
+
+    # Returns a dict mapping stream names to the data of the chunk: dense
+    # streams are arrays of shape (#sequences, sample dimension), sparse ones
+    # tuples (values, row indices, column offsets) in the CSC layout of the
+    # file, i.e. the data of sequence i is at column offsets [i, i+1], and the
+    # row index of an entry is sample index * sample dimension + feature index.
+    def getChunk(self, chunkId):
+        if not 0 <= chunkId < self.numChunks:
+            raise IndexError( "Chunk {0} is out of range [0, {1})".format( chunkId, self.numChunks ) )
+
+        numSeqs = int( self.offsets[ chunkId ]['numSequences'] )
+        pos = self.dataStart + int( self.offsets[ chunkId ]['offset'] )
+        chunk = {}
+        for name, isSparse, sampleDim in self.streams:
+            if isSparse:
+                nnz, = struct.unpack_from( "<i", self.data, pos )
+                pos += 4
+                values = np.frombuffer( self.data, dtype='<f4', count=nnz, offset=pos )
+                pos += 4 * nnz
+                rowInd = np.frombuffer( self.data, dtype='<i4', count=nnz, offset=pos )
+                pos += 4 * nnz
+                colInd = np.frombuffer( self.data, dtype='<i4', count=numSeqs + 1, offset=pos )
+                pos += 4 * ( numSeqs + 1 )
+                chunk[ name ] = ( values, rowInd, colInd )
+            else:
+                values = np.frombuffer( self.data, dtype='<f4', count=numSeqs * sampleDim, offset=pos )
+                pos += values.nbytes
+                chunk[ name ] = values.reshape( numSeqs, sampleDim )
+        return chunk
+
+    # Returns a dict mapping stream names to the data of the sequence with the
+    # given (zero based, file global) index: dense streams are arrays of shape
+    # (sample dimension,), sparse ones tuples (values, sample indices, feature
+    # indices).
+    def getSequence(self, sequenceId):
+        if not 0 <= sequenceId < self.numSequences:
+            raise IndexError( "Sequence {0} is out of range [0, {1})".format( sequenceId, self.numSequences ) )
+
+        chunkId = int( np.searchsorted( self.firstSequence, sequenceId, side='right' ) ) - 1
+        index = sequenceId - int( self.firstSequence[ chunkId ] )
+        sequence = {}
+        for ( name, isSparse, sampleDim ), data in zip( self.streams, self._chunkData( chunkId ) ):
+            if isSparse:
+                values, rowInd, colInd = data
+                rows = rowInd[ colInd[ index ]:colInd[ index + 1 ] ]
+                sequence[ name ] = ( values[ colInd[ index ]:colInd[ index + 1 ] ], rows // sampleDim, rows % sampleDim )
+            else:
+                sequence[ name ] = data[ index ]
+        return sequence
+
+    def _chunkData(self, chunkId):
+        chunk = self.getChunk( chunkId )
+        return [ chunk[ name ] for name, _, _ in self.streams ]
+
 
-        destination = open( args.output, 'awb+' )
-        shutil.copyfileobj( open( dataPath, "rb" ), destination )
-        
-        destination.flush()
-        destination.close()
-        os.unlink(dataPath)
-        assert not os.path.exists(dataPath)
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Transforms a CNTK Text Format file into CNTK binary format given a header.")
+    parser.add_argument('--input', help="CNTK Text Format file to convert to binary.", default="", required=True)
+    parser.add_argument('--header',  help="Header file describing each stream in the input.", default="", required=True)
+    parser.add_argument('--seqsPerChunk', type=int, help='Number of sequences in each chunk.', default="", required=True)
+    parser.add_argument('--output', help='Name of the output file, stdout if not given', default="", required=True)
+    parser.add_argument('--bufferSize', type=int, help='Size in bytes of the output buffer. Default is 16MB', default=DEFAULT_BUFFER_SIZE, required=False)
+    args = parser.parse_args()
+
+    with open( args.header, "r" ) as headerfile:
+        converters, aliasToId = ParseHeader( headerfile )
+
+    with open( args.input, "r" ) as inputFile:
+        Convert( inputFile, converters, aliasToId, args.seqsPerChunk, args.output, args.bufferSize )
+
+
+#####################################################################################################
+# Tests
+#####################################################################################################
+try:
+    import StringIO
+    stringio = StringIO.StringIO
+except ImportError:
+    from io import StringIO
+    stringio = StringIO
+try:
+    import pytest
+except ImportError:
+    pass
+
+def _convertForTest(tmpdir, seqsPerChunk):
+    header = stringio("features\tx\tdense\t3\nlabels\ty\tsparse\t4\n")
+    input = stringio("0\t|x 1 2 3\t|y 1:1\n"
+                     "0\t|y 3:2 0:1\n"
+                     "1\t|x 4 5 6\t|y 2:1\n"
+                     "2\t|x 7 8 9\t|# comment\n")
+    output = str(tmpdir.join("out.bin"))
+    converters, aliasToId = ParseHeader( header )
+    numChunks = Convert( input, converters, aliasToId, seqsPerChunk, output, bufferSize=16 )
+    return output, numChunks
+
+def test_convertAndRead(tmpdir):
+    pytest.importorskip("numpy")
+    output, numChunks = _convertForTest( tmpdir, 2 )
+    assert numChunks == 2
+
+    reader = BinaryReader( output )
+    assert reader.getStreamNames() == [ "features", "labels" ]
+    assert reader.numChunks == 2
+    assert reader.numSequences == 3
+    assert reader.offsets['numSamples'].tolist() == [ 3, 1 ]
+
+    chunk = reader.getChunk( 0 )
+    assert chunk[ "features" ].tolist() == [ [ 1, 2, 3 ], [ 4, 5, 6 ] ]
+    values, rowInd, colInd = chunk[ "labels" ]
+    assert values.tolist() == [ 1, 1, 2, 1 ]
+    assert rowInd.tolist() == [ 1, 4, 7, 2 ]
+    assert colInd.tolist() == [ 0, 3, 4 ]
+
+    sequence = reader.getSequence( 0 )
+    assert sequence[ "features" ].tolist() == [ 1, 2, 3 ]
+    values, samples, features = sequence[ "labels" ]
+    assert samples.tolist() == [ 0, 1, 1 ]
+    assert features.tolist() == [ 1, 0, 3 ]
+
+    sequence = reader.getSequence( 2 )
+    assert sequence[ "features" ].tolist() == [ 7, 8, 9 ]
+    assert len( sequence[ "labels" ][ 0 ] ) == 0
+
+    with pytest.raises( IndexError ):
+        reader.getSequence( 3 )
+
+def test_chunkBoundaries(tmpdir):
+    output, numChunks = _convertForTest( tmpdir, 3 )
+    assert numChunks == 1
+
+    output, numChunks = _convertForTest( tmpdir, 1 )
+    assert numChunks == 3
+    with open( output, "rb" ) as f:
+        assert struct.unpack( "<qq", f.read( 16 ) ) == ( FORMAT_VERSION, 3 )
+
+def test_invalidSparseIndex():
+    converter = SparseConverter( "labels", 4 )
+    with pytest.raises( Exception ) as info:
+        converter.appendSample( [ "4:1" ] )
+    assert str( info.value ) == "Invalid sample dimension for input labels. Max 4, given 4"
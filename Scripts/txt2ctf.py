@@ -28,33 +28,49 @@
 import sys
 import argparse
 import re
+import io
+import os
+import time
+import shutil
+import tempfile
+import multiprocessing
+
+DEFAULT_BUFFER_SIZE = 4 * 1024 * 1024
+
+def _loadDictionaries(dictionaryStreams):
+    return [{ line.rstrip('\r\n').strip():index for index, line in enumerate(dic) } for dic in dictionaryStreams]
 
 def convert(dictionaryStreams, inputs, output, unk, annotated):
     # create in memory dictionaries
-    dictionaries = [{ line.rstrip('\r\n').strip():index for index, line in enumerate(dic) } for dic in dictionaryStreams]
+    dictionaries = _loadDictionaries(dictionaryStreams)
 
     # convert inputs
     for input in inputs:
-        sequenceId = 0
-        for index, line in enumerate(input):
-            line = line.rstrip('\r\n')
-            columns = line.split("\t")
-            if len(columns) != len(dictionaries):
-                raise Exception("Number of dictionaries {0} does not correspond to the number of streams in line {1}:'{2}'"
-                    .format(len(dictionaries), index, line))
-            _convertSequence(dictionaries, columns, sequenceId, output, unk, annotated)
-            sequenceId += 1
+        _convertLines(dictionaries, input, 0, output, unk, annotated)
+
+def _convertLines(dictionaries, lines, firstSequenceId, output, unk, annotated):
+    sequenceId = firstSequenceId
+    for line in lines:
+        line = line.rstrip('\r\n')
+        columns = line.split("\t")
+        if len(columns) != len(dictionaries):
+            raise Exception("Number of dictionaries {0} does not correspond to the number of streams in line {1}:'{2}'"
+                .format(len(dictionaries), sequenceId, line))
+        _convertSequence(dictionaries, columns, sequenceId, output, unk, annotated)
+        sequenceId += 1
+    return sequenceId - firstSequenceId
 
 def _convertSequence(dictionaries, streams, sequenceId, output, unk, annotated):
     tokensPerStream = [[t for t in s.strip(' ').split(' ') if t != ""] for s in streams]
     maxLen = max(len(tokens) for tokens in tokensPerStream)
 
-    # writing to the output file
+    # the sequence is written with a single call
+    sequence = []
     for sampleIndex in range(maxLen):
-        output.write(str(sequenceId))
+        sequence.append(str(sequenceId))
         for streamIndex in range(len(tokensPerStream)):
             if len(tokensPerStream[streamIndex]) <= sampleIndex:
-                output.write("\t")
+                sequence.append("\t")
                 continue
             token = tokensPerStream[streamIndex][sampleIndex]
             if unk is not None and token not in dictionaries[streamIndex]: # try unk symbol if specified
@@ -62,10 +78,119 @@ def _convertSequence(dictionaries, streams, sequenceId, output, unk, annotated):
             if token not in dictionaries[streamIndex]:
                 raise Exception("Token '{0}' cannot be found in the dictionary for stream {1}".format(token, streamIndex))
             value = dictionaries[streamIndex][token]
-            output.write("\t|S" + str(streamIndex) + " "+ str(value) + ":1")
+            sequence.append("\t|S" + str(streamIndex) + " "+ str(value) + ":1")
             if annotated:
-                output.write(" |# " + re.sub(r'(\|(?!#))|(\|$)', r'|#', token))
-        output.write("\n")
+                sequence.append(" |# " + re.sub(r'(\|(?!#))|(\|$)', r'|#', token))
+        sequence.append("\n")
+    output.write("".join(sequence))
+
+# Splits the file into (about) numRanges byte ranges that start and end at line boundaries
+def _splitRanges(path, numRanges):
+    size = os.path.getsize(path)
+    boundaries = [0]
+    with open(path, "rb") as f:
+        for i in range(1, numRanges):
+            position = size * i // numRanges
+            if position <= boundaries[-1]:
+                continue
+            # move to the end of the line containing the byte before position
+            f.seek(position - 1)
+            f.readline()
+            boundaries.append(f.tell())
+    boundaries.append(size)
+    return [(start, end) for start, end in zip(boundaries[:-1], boundaries[1:]) if start < end]
+
+def _readRange(path, start, end, blockSize=DEFAULT_BUFFER_SIZE):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while start < end:
+            block = f.read(min(blockSize, end - start))
+            if not block:
+                break
+            start += len(block)
+            yield block
+
+def _countLines(args):
+    path, start, end = args
+    count = 0
+    last = b"\n"
+    for block in _readRange(path, start, end):
+        count += block.count(b"\n")
+        last = block[-1:]
+    # the last line of the file might not be terminated
+    return count + (1 if last != b"\n" else 0)
+
+# The dictionaries of the worker processes. They are set up once per worker
+# (and shared copy-on-write with the parent where processes are forked).
+_workerDictionaries = None
+
+def _initWorker(dictionaries):
+    global _workerDictionaries
+    _workerDictionaries = dictionaries
+
+def _convertRange(args):
+    path, start, end, firstSequenceId, outputDir, unk, annotated, bufferSize = args
+    fd, outputPath = tempfile.mkstemp(suffix=".ctf", dir=outputDir)
+    with io.open(fd, "w", encoding="utf-8", newline="\n", buffering=bufferSize) as output:
+        with open(path, "rb") as f:
+            f.seek(start)
+            numLines = _convertLines(_workerDictionaries, _takeRange(f, end), firstSequenceId, output, unk, annotated)
+    return outputPath, numLines, end - start
+
+def _takeRange(f, end):
+    while f.tell() < end:
+        line = f.readline()
+        if not line:
+            break
+        yield line.decode("utf-8")
+
+# Converts the input file with numWorkers processes. The input is split into
+# byte ranges aligned to line boundaries; the number of lines of every range
+# is counted first, so that each worker can write globally consistent sequence
+# ids. The outputs of the ranges are appended to the output in order, and the
+# throughput is reported to progress (stderr by default).
+def convertParallel(dictionaryStreams, inputPaths, output, unk, annotated, numWorkers=None,
+                    numRanges=None, bufferSize=DEFAULT_BUFFER_SIZE, progress=sys.stderr):
+    if numWorkers is None:
+        numWorkers = multiprocessing.cpu_count()
+    if numRanges is None:
+        numRanges = 4 * numWorkers
+
+    dictionaries = _loadDictionaries(dictionaryStreams)
+
+    # the outputs of the ranges are written next to the output file if there is one
+    outputName = getattr(output, "name", None)
+    outputDir = tempfile.mkdtemp(dir=os.path.dirname(os.path.abspath(outputName))
+        if isinstance(outputName, str) and os.path.exists(outputName) else None)
+
+    pool = multiprocessing.Pool(numWorkers, initializer=_initWorker, initargs=(dictionaries,))
+    try:
+        for inputPath in inputPaths:
+            startTime = time.time()
+            ranges = _splitRanges(inputPath, numRanges)
+            lineCounts = pool.map(_countLines, [(inputPath, start, end) for start, end in ranges])
+
+            tasks = []
+            firstSequenceId = 0
+            for (start, end), numLines in zip(ranges, lineCounts):
+                tasks.append((inputPath, start, end, firstSequenceId, outputDir, unk, annotated, bufferSize))
+                firstSequenceId += numLines
+
+            totalLines = 0
+            totalBytes = 0
+            for outputPath, numLines, numBytes in pool.imap(_convertRange, tasks):
+                with io.open(outputPath, "r", encoding="utf-8", newline="") as part:
+                    shutil.copyfileobj(part, output, bufferSize)
+                os.unlink(outputPath)
+                totalLines += numLines
+                totalBytes += numBytes
+                if progress is not None:
+                    elapsed = max(time.time() - startTime, 1e-6)
+                    progress.write("{0}: {1} lines, {2:.1f} MB converted, {3:.0f} lines/s, {4:.2f} MB/s\n"
+                        .format(inputPath, totalLines, totalBytes / 1e6, totalLines / elapsed, totalBytes / 1e6 / elapsed))
+    finally:
+        pool.terminate()
+        shutil.rmtree(outputDir, ignore_errors=True)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Transforms text file given dictionaries into CNTK text format.")
@@ -76,19 +201,30 @@ if __name__ == "__main__":
     parser.add_argument('--output', help='Name of the output file, stdout if not given', default="", required=False)
     parser.add_argument('--input', help='Name of the inputs files, stdin if not given', default="", nargs="*", required=False)
     parser.add_argument('--unk', help='Name fallback symbol for tokens not in dictionary (same for all columns)', default=None, required=False)
+    parser.add_argument('--workers', help='Number of worker processes converting the input files in parallel. Default is 1, 0 uses one per CPU',
+        type=int, default=1, required=False)
+    parser.add_argument('--bufferSize', help='Size in bytes of the write buffers. Default is 4MB',
+        type=int, default=DEFAULT_BUFFER_SIZE, required=False)
     args = parser.parse_args()
 
-    # creating inputs
-    inputs = [sys.stdin]
-    if len(args.input) != 0:
-        inputs = [open(i, encoding="utf-8") for i in args.input]
-
     # creating output
     output = sys.stdout
     if args.output != "":
-        output = open(args.output, "w")
+        output = io.open(args.output, "w", encoding="utf-8", buffering=args.bufferSize)
 
-    convert([open(d, encoding="utf-8") for d in args.map], inputs, output, args.unk, args.annotated == "True")
+    dictionaries = [io.open(d, encoding="utf-8") for d in args.map]
+    if args.workers != 1:
+        if len(args.input) == 0:
+            parser.error("--workers requires --input files")
+        convertParallel(dictionaries, args.input, output, args.unk, args.annotated == "True",
+            numWorkers=args.workers or None, bufferSize=args.bufferSize)
+    else:
+        # creating inputs
+        inputs = [sys.stdin]
+        if len(args.input) != 0:
+            inputs = [io.open(i, encoding="utf-8") for i in args.input]
+        convert(dictionaries, inputs, output, args.unk, args.annotated == "True")
+    output.flush()
 
 
 #####################################################################################################
@@ -147,3 +283,35 @@ def test_nonExistingWord():
     with pytest.raises(Exception) as info:
         convert([dictionary1], [input], output, None, False)
     assert str(info.value) == "Token 'nonexistent' cannot be found in the dictionary for stream 0"
+
+def test_parallelConversionMatchesSerial(tmpdir):
+    words = ["w%d" % i for i in range(20)]
+    dictionary = "\n".join(words) + "\n"
+    lines = ["%s %s\t%s" % (words[i % 20], words[(3 * i) % 20], words[(7 * i) % 20]) for i in range(101)]
+    inputPath = str(tmpdir.join("input.txt"))
+    with open(inputPath, "w") as f:
+        # the last line is not terminated
+        f.write("\n".join(lines))
+
+    expectedOutput = stringio()
+    convert([stringio(dictionary), stringio(dictionary)], [stringio("\n".join(lines))], expectedOutput, None, True)
+
+    output = stringio()
+    progress = stringio()
+    convertParallel([stringio(dictionary), stringio(dictionary)], [inputPath], output, None, True,
+        numWorkers=2, numRanges=7, progress=progress)
+
+    assert expectedOutput.getvalue() == output.getvalue()
+    assert "101 lines" in progress.getvalue().splitlines()[-1]
+
+def test_splitRangesAlignsToLines(tmpdir):
+    inputPath = str(tmpdir.join("input.txt"))
+    with open(inputPath, "wb") as f:
+        f.write(b"a\nbb\nccc\n\ndddd\n")
+    ranges = _splitRanges(inputPath, 4)
+    assert ranges[0][0] == 0 and ranges[-1][1] == 15
+    assert all(prev[1] == next[0] for prev, next in zip(ranges[:-1], ranges[1:]))
+    with open(inputPath, "rb") as f:
+        data = f.read()
+    assert all(data[end - 1:end] == b"\n" for _, end in ranges)
+    assert sum(_countLines((inputPath, start, end)) for start, end in ranges) == 5
@@ -21,6 +21,7 @@
 #include <algorithm>
 #include <mutex>
 #include <future>
+#include <functional>
 #include <cstddef>
 
 #ifdef SWIG
@@ -408,6 +409,7 @@ namespace CNTK
         friend class MPICommunicatorImpl;
         friend class BlockMomentumDistributedLearner;
         friend class Internal::VariableResolver;
+        friend class Serializer;
 
         template <typename T, typename ...CtorArgTypes>
         friend inline std::shared_ptr<T> MakeSharedObject(CtorArgTypes&& ...ctorArgs);
@@ -680,6 +682,9 @@ namespace CNTK
         bool m_isReadOnly;
 
         std::shared_ptr<void> m_tensorView; // Microsoft::MSR::CNTK::TensorView<ElemType>*
+
+        // Keeps external backing storage alive (e.g. the mapping of a model file), shared by all aliases of the view.
+        std::shared_ptr<void> m_backingStore;
     };
 
     enum class MaskKind : char
@@ -2861,8 +2866,12 @@ namespace CNTK
 
         ///
         /// Save this Function graph into a model file.
+        /// If 'mappable' is true, the values of the parameters and constants are stored as raw, aligned blobs
+        /// next to the graph. LoadModel maps such a file into memory and uses the values in place on the CPU,
+        /// so that processes loading the same model share one copy of its weights. The file is replaced, not
+        /// overwritten, so that processes that have mapped the previous model keep using it.
         ///
-        CNTK_API void SaveModel(const std::wstring& modelFile);
+        CNTK_API void SaveModel(const std::wstring& modelFile, bool mappable = false);
 
         ///
         /// Restore the models parameters (in-place) from a model file
@@ -2870,9 +2879,13 @@ namespace CNTK
         CNTK_API void RestoreModel(const std::wstring& modelFilePath);
 
         ///
-        /// Load a Function from a model file
+        /// Load a Function from a model file.
+        /// If 'forInference' is true and the model has been saved as mappable (see SaveModel), the file is mapped read-only
+        /// and the values of the parameters and constants are read-only: on the CPU they are used in place, and are only read
+        /// from the file (or the page cache) when first accessed. All processes loading the model this way share one copy of
+        /// its weights; clone the Function with ParameterCloningMethod::Clone to obtain a private, trainable copy.
         ///
-        CNTK_API static FunctionPtr LoadModel(const std::wstring& modelFile, const DeviceDescriptor& computeDevice = DeviceDescriptor::UseDefaultDevice());
+        CNTK_API static FunctionPtr LoadModel(const std::wstring& modelFile, const DeviceDescriptor& computeDevice = DeviceDescriptor::UseDefaultDevice(), bool forInference = false);
 
         ///
         /// Prints the entire graph underlying this Function to stderr
@@ -3575,6 +3588,30 @@ namespace CNTK
         ///
         static const size_t FullDataSweep = 0;
 
+        ///
+        /// Indicates how the values of the schedule are obtained. The values of a 'Piecewise'
+        /// schedule are looked up in the specified list. The values of all other forms are
+        /// computed from the number t of scheduling units (epochs of 'epochSize' samples, or
+        /// sweeps) seen after the optional linear warmup:
+        ///   Constant:    initialValue
+        ///   Cosine:      finalValue + (initialValue - finalValue) * (1 + cos(pi * min(t / duration, 1))) / 2
+        ///   Exponential: initialValue * rate ^ (t / duration), not going past finalValue (unless it is NaN)
+        ///   Step:        initialValue * rate ^ floor(t / duration), not going past finalValue (unless it is NaN)
+        ///   Polynomial:  finalValue + (initialValue - finalValue) * (1 - min(t / duration, 1)) ^ rate
+        ///   Cyclic:      triangular cycles from initialValue to finalValue and back, 'duration' units each way
+        /// During the warmup (the first 'warmup' units), the value increases linearly up to initialValue.
+        ///
+        enum class Form : unsigned int
+        {
+            Piecewise = 0,
+            Constant = 1,
+            Cosine = 2,
+            Exponential = 3,
+            Step = 4,
+            Polynomial = 5,
+            Cyclic = 6,
+        };
+
         ///
         /// Create a schedule with a constant parameter value.
         ///
@@ -3598,11 +3635,18 @@ namespace CNTK
         ///
         CNTK_API TrainingParameterSchedule(const std::vector<std::pair<size_t, T>>& schedule, UnitType unit, size_t epochSize = FullDataSweep);
 
+        ///
+        /// Create a parametric schedule of the specified form (see 'Form' above), whose value is
+        /// computed for every count in constant time and memory. 'duration' and 'warmup' are
+        /// specified in scheduling units of 'epochSize' samples, by default in samples.
+        ///
+        CNTK_API TrainingParameterSchedule(Form form, double initialValue, double finalValue, size_t duration, double rate, size_t warmup, UnitType unit, size_t epochSize = 1);
+
         ///
         /// Returns a value corresponding to the absolute sample (or sweep) 
         /// count from the beginning of training.
         ///
-        CNTK_API const T& operator[](size_t count) const;
+        CNTK_API T operator[](size_t count) const;
 
         ///
         /// Returns the unit type for 'this' training parameter schedule. 
@@ -3613,6 +3657,14 @@ namespace CNTK
 
         bool IsSweepBased() const { return m_epochSize == FullDataSweep; }
 
+        ///
+        /// Returns a schedule of the same shape whose values are multiplied by 'factor',
+        /// with the specified unit, e.g. to convert values per minibatch into values per sample.
+        ///
+        CNTK_API TrainingParameterSchedule<T> Rescaled(double factor, UnitType unit) const;
+
+        Form GetForm() const { return m_form; }
+
         CNTK_API virtual ~TrainingParameterSchedule();
 
         CNTK_API TrainingParameterSchedule(const TrainingParameterSchedule<T>&); 
@@ -3631,12 +3683,22 @@ namespace CNTK
 
         CNTK_API TrainingParameterSchedule(const Dictionary& dictionary);
 
-        static const size_t s_serializationVersion = 1;
+        CNTK_API double ParametricValue(size_t count) const;
+
+        static const size_t s_serializationVersion = 2;
 
     protected:           
         std::map<size_t, T> m_schedule;
         UnitType m_unit;
         size_t m_epochSize;
+
+        // Form and parameters of a parametric schedule.
+        Form m_form;
+        double m_initialValue;
+        double m_finalValue;
+        size_t m_duration;
+        double m_rate;
+        size_t m_warmup;
     };
 
     template <typename T, typename TrainingParameterSchedule<T>::UnitType U>
@@ -3658,6 +3720,11 @@ namespace CNTK
             : TrainingParameterSchedule<T>::TrainingParameterSchedule(schedule, U, epochSize)
         { }
 
+        TrainingParameterPerUnitSchedule(typename TrainingParameterSchedule<T>::Form form, double initialValue, double finalValue,
+                                         size_t duration, double rate, size_t warmup, size_t epochSize = 1)
+            : TrainingParameterSchedule<T>::TrainingParameterSchedule(form, initialValue, finalValue, duration, rate, warmup, U, epochSize)
+        { }
+
 #ifdef SWIG // for Python interop (adds indexer)
         const T __getitem__(size_t count) const
         {
@@ -3802,6 +3869,20 @@ namespace CNTK
             m_learningRateSchedule = learningRateSchedule;
         }
 
+        ///
+        /// Converts a learning rate schedule per minibatch into the schedule per sample of the same shape
+        /// that yields the same updates for minibatches of 'minibatchSize' samples.
+        /// A learning rate schedule per sample is left unchanged.
+        ///
+        virtual void ConvertLearningRateToPerSample(size_t minibatchSize)
+        {
+            if (minibatchSize == 0)
+                InvalidArgument("Learner::ConvertLearningRateToPerSample: The minibatch size must be positive.");
+
+            if (m_learningRateSchedule.Unit() == LearningRateSchedule::UnitType::Minibatch)
+                m_learningRateSchedule = m_learningRateSchedule.Rescaled(1.0 / minibatchSize, LearningRateSchedule::UnitType::Sample);
+        }
+
         ///
         /// Resets smoothed gradients.
         ///
@@ -3936,6 +4017,11 @@ namespace CNTK
             m_learner->ResetLearningRate(learningRateSchedule);
         }
 
+        void ConvertLearningRateToPerSample(size_t minibatchSize) override
+        {
+            m_learner->ConvertLearningRateToPerSample(minibatchSize);
+        }
+
         virtual double LearningRate() const
         {
             return m_learner->LearningRate();
@@ -4074,9 +4160,27 @@ namespace CNTK
         CNTK_API double TestMinibatch(const std::unordered_map<Variable, ValuePtr>& arguments, const DeviceDescriptor& computeDevice = DeviceDescriptor::UseDefaultDevice());
 
         ///
-        /// Checkpoint the model and other Trainer state at the specified file location
+        /// Checkpoint the model and other Trainer state at the specified file location.
+        /// If 'asynchronous' is true, the call only blocks for copying the state into host memory; the copy is written,
+        /// flushed to disk and renamed into place on a background thread while training continues.
+        /// If 'numCheckpointsToKeep' is larger than 1, the previous checkpoints are kept as filePath.1, filePath.2, ...
+        /// (most recent first).
         ///
-        CNTK_API void SaveCheckpoint(const std::wstring& filePath, Dictionary externalState = Dictionary());
+        CNTK_API void SaveCheckpoint(const std::wstring& filePath, Dictionary externalState = Dictionary(), bool asynchronous = false, size_t numCheckpointsToKeep = 1);
+
+        ///
+        /// Checkpoint the model and other Trainer state incrementally. Every 'fullCheckpointFrequency'-th call writes a full
+        /// checkpoint (the base) to the specified file location, the other calls only write the blocks of rows of the parameter values
+        /// and learner state that changed since the previous call, to filePath.delta1, filePath.delta2, ...
+        /// RestoreFromCheckpoint(filePath) restores the base and replays its deltas.
+        ///
+        CNTK_API void SaveDeltaCheckpoint(const std::wstring& filePath, Dictionary externalState = Dictionary(), size_t fullCheckpointFrequency = 10, bool asynchronous = false);
+
+        ///
+        /// Blocks until the checkpoint that is being written in the background (if any) is on disk.
+        /// Rethrows the error that occurred while writing it, if any.
+        ///
+        CNTK_API void WaitForPendingCheckpoint();
 
         ///
         /// Restore the model and trainer state from a previously saved model and checkpoint from the specified file location
@@ -4123,6 +4227,25 @@ namespace CNTK
         ///
         CNTK_API size_t TotalNumberOfSamplesSeen() const;
 
+        ///
+        /// Sets the number of minibatches whose gradients are summed up before the learners update the
+        /// parameters once, with the sum of the gradients and the total number of samples in these minibatches.
+        /// This trains with an effective minibatch of 'numMinibatches' times the size of the minibatches passed
+        /// to TrainMinibatch. The accumulated gradients are also applied at the end of a sweep, when training
+        /// with an empty minibatch (end of data) and before a checkpoint is saved, so that checkpoints never
+        /// miss pending gradients; RestoreFromCheckpoint discards them. 1, the default, updates the parameters
+        /// after every minibatch.
+        /// PreviousMinibatchSampleCount and the previous minibatch averages keep referring to the last minibatch.
+        ///
+        CNTK_API void SetGradientAccumulationSteps(size_t numMinibatches);
+
+        ///
+        /// Number of minibatches whose gradients are accumulated before the parameters are updated.
+        ///
+        size_t GradientAccumulationSteps() const { return m_gradientAccumulationSteps; }
+
+        CNTK_API ~Trainer();
+
     private:
         template <typename T1, typename ...CtorArgTypes>
         friend std::shared_ptr<T1> MakeSharedObject(CtorArgTypes&& ...ctorArgs);
@@ -4138,8 +4261,16 @@ namespace CNTK
 
         bool TrainLocalMinibatch(const std::unordered_map<Variable, ValuePtr>& arguments, std::unordered_map<Variable, ValuePtr>& outputsToFetch, bool sweepEnd, const DeviceDescriptor& computeDevice);
         bool TrainDistributedMinibatch(const std::unordered_map<Variable, ValuePtr>& arguments, std::unordered_map<Variable, ValuePtr>& outputsToFetch, bool sweepEnd, const DeviceDescriptor& computeDevice);
+        bool AccumulateGradients(const std::unordered_map<Parameter, NDArrayViewPtr>& gradients, bool sweepEnd);
+        bool UpdateWithAccumulatedGradients(bool sweepEnd);
+
+        struct DeltaCheckpointState;
 
-        void Save(const std::wstring& modelFilePath, const std::vector<DictionaryValue>& learnerState, const Dictionary& externalState);
+        void Checkpoint(const std::wstring& modelFilePath, const Dictionary& externalState, bool asynchronous, size_t numCheckpointsToKeep, size_t fullCheckpointFrequency);
+        void Save(const std::wstring& modelFilePath, const std::vector<DictionaryValue>& learnerState, const Dictionary& externalState, bool asynchronous, size_t numCheckpointsToKeep, size_t fullCheckpointFrequency);
+        std::function<void()> PrepareDeltaCheckpoint(const std::wstring& modelFilePath, const std::vector<DictionaryValue>& learnerState, const Dictionary& externalState, size_t fullCheckpointFrequency);
+        void ReplayDeltaCheckpoints(const std::wstring& modelFilePath, const std::wstring& baseId, std::vector<DictionaryValue>& learnerState, Dictionary& externalState);
+        static void WriteCheckpoint(const std::wstring& modelFilePath, Dictionary& model, Dictionary& state, size_t numCheckpointsToKeep);
 
         FunctionPtr m_combinedTrainingFunction;
         FunctionPtr m_model;
@@ -4158,6 +4289,15 @@ namespace CNTK
         size_t   m_prevMinibatchNumSamples;
         ValuePtr m_prevMinibatchAggregateTrainingLossValue;
         ValuePtr m_prevMinibatchAggregateEvalCriterionValue;
+
+        size_t m_gradientAccumulationSteps;
+        size_t m_numAccumulatedMinibatches;
+        size_t m_accumulatedNumSamples;
+        std::unordered_map<Parameter, NDArrayViewPtr> m_accumulatedGradients;
+
+        std::future<void> m_pendingCheckpoint;
+        bool m_asyncCheckpoints;
+        std::shared_ptr<DeltaCheckpointState> m_deltaCheckpointState;
     };
 
     ///
@@ -4274,6 +4414,15 @@ namespace CNTK
         ///
         virtual void RestoreFromCheckpoint(const Dictionary& /*checkpoint*/) {}
 
+        ///
+        /// Optionally overridable method to report statistics of the MinibatchSource,
+        /// such as the hits and misses of its chunk cache.
+        ///
+        virtual Dictionary GetStatistics() const
+        {
+            return Dictionary();
+        }
+
     public:
         ///
         /// Gets the description of the stream with given name. 
@@ -4495,7 +4644,9 @@ namespace CNTK
             const std::unordered_map<Variable, StreamInformation>& modelInputToMinibatchSourceStream,
             const TrainingParameterPerUnitSchedule<size_t, TrainingParameterSchedule<size_t>::UnitType::Sample>& minibatchSizeSchedule,
             size_t checkpointFrequencyInSamples,
-            const std::wstring& checkPointFileName);
+            const std::wstring& checkPointFileName,
+            bool asyncCheckpoints = false,
+            size_t numCheckpointsToKeep = 1);
 
         ///
         /// Runs the session.
@@ -4509,6 +4660,15 @@ namespace CNTK
 
         CNTK_API virtual ~TrainingSession() {}
 
+        ///
+        /// Replaces the minibatch size schedule, e.g. by a derived session that adapts the minibatch size
+        /// while training. It is evaluated by GetMinibatchSize for the next minibatch.
+        ///
+        void SetMinibatchSizeSchedule(const MinibatchSizeSchedule& schedule)
+        {
+            m_minibatchSizeSchedule = schedule;
+        }
+
     public:
         ///
         /// Optionally overridable, called each time before a new minibatch is requested from the minibatch source
@@ -4536,6 +4696,7 @@ namespace CNTK
 
         ///
         /// Optionally overridable callback that is invoked after each checkpoint.
+        /// With asynchronous checkpoints, the checkpoint might still be being written at this point.
         ///
         CNTK_API virtual void OnCheckpointEnd() {};
 
@@ -4558,6 +4719,8 @@ namespace CNTK
 
         const size_t m_checkpointFrequencyinSamples;
         const std::wstring m_checkPointFileName;
+        const bool m_asyncCheckpoints;
+        const size_t m_numCheckpointsToKeep;
         size_t m_currentCheckpointIndex;
 
         MinibatchSourcePtr m_trainingSource;
@@ -4566,7 +4729,7 @@ namespace CNTK
         size_t m_parallelAfterSamples;
         size_t m_workerRank;
         size_t m_numberOfWorkers;
-        const MinibatchSizeSchedule m_minibatchSizeSchedule;
+        MinibatchSizeSchedule m_minibatchSizeSchedule;
     };
 
     CNTK_API TrainingSessionPtr CreateBasicTrainingSession(
@@ -4575,7 +4738,9 @@ namespace CNTK
         const std::unordered_map<Variable, StreamInformation>& modelInputToMinibatchSourceStream,
         const TrainingParameterPerUnitSchedule<size_t, TrainingParameterSchedule<size_t>::UnitType::Sample>& minibatchSizeSchedule,
         size_t checkpointFrequencyinSamples,
-        const std::wstring& checkPointFileName);
+        const std::wstring& checkPointFileName,
+        bool asyncCheckpoints = false,
+        size_t numCheckpointsToKeep = 1);
 }
 
 
@@ -8,6 +8,7 @@
 #include "PrimitiveFunction.h"
 #include "CompositeFunction.h"
 #include "BlockFunction.h"
+#include "Serialization.h"
 
 using namespace Microsoft::MSR::CNTK;
 
@@ -339,18 +340,29 @@ namespace CNTK
         Forward(arguments, outputs, computeDevice, {});
     }
 
-    void Function::SaveModel(const std::wstring& modelFilePath)
+    void Function::SaveModel(const std::wstring& modelFilePath, bool mappable/* = false*/)
     {
         Dictionary model = Serialize();
+        if (mappable)
+        {
+            SaveMappableModel(model, modelFilePath);
+            return;
+        }
+
         auto stream = GetFstream(modelFilePath, false);
         *stream << model;
         stream->flush();
     }
 
-    /*static*/ FunctionPtr Function::LoadModel(const std::wstring& modelFile, const DeviceDescriptor& computeDevice)
+    /*static*/ FunctionPtr Function::LoadModel(const std::wstring& modelFile, const DeviceDescriptor& computeDevice, bool forInference/* = false*/)
     {
         auto stream = GetFstream(modelFile, true);
-        if (!Internal::IsLegacyModel(*stream))
+        if (IsMappableModel(*stream))
+        {
+            stream.reset();
+            return Function::Deserialize(LoadMappableModel(modelFile, /*readOnly =*/ forInference), computeDevice);
+        }
+        else if (!Internal::IsLegacyModel(*stream))
         {
             Dictionary model;
             *stream >> model;
@@ -365,7 +377,13 @@ namespace CNTK
     void Function::RestoreModel(const std::wstring& modelFilePath)
     {
         auto stream = GetFstream(modelFilePath, true);
-        if (!Internal::IsLegacyModel(*stream))
+        if (IsMappableModel(*stream))
+        {
+            stream.reset();
+            RestoreFromCheckpoint(LoadMappableModel(modelFilePath));
+            return;
+        }
+        else if (!Internal::IsLegacyModel(*stream))
         {
             Dictionary model;
             *stream >> model;
@@ -328,4 +328,12 @@ namespace CNTK
         auto checkpointedMinibatchSourcePosition = checkpoint[PositionAttributeName].Value<size_t>();
         m_shim->SetCurrentSamplePosition(checkpointedMinibatchSourcePosition);
     }
+
+    /*virtual*/ Dictionary CompositeMinibatchSource::GetStatistics() const /*override*/
+    {
+        Dictionary statistics;
+        for (const auto& statistic : m_shim->GetStatistics())
+            statistics[statistic.first] = statistic.second;
+        return statistics;
+    }
 }
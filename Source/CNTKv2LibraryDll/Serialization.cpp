@@ -6,6 +6,8 @@
 #include "stdafx.h"
 #include "CNTKLibrary.h"
 #include "Utils.h"
+#include "Serialization.h"
+#include "fileutil.h"
 #include <istream>
 #include <ostream>
 #include <string>
@@ -14,6 +16,14 @@
 
 #ifdef _MSC_VER
 #include <io.h>
+#ifndef NOMINMAX
+#define NOMINMAX
+#endif
+#include "Windows.h"
+#else
+#include <sys/mman.h>
+#include <sys/stat.h>
+#include <unistd.h>
 #endif
 
 #pragma warning(push)
@@ -28,32 +38,151 @@ namespace CNTK
 
     using namespace ::google::protobuf;
 
+    // Layout of a mappable model file: a MappableModelHeader, followed by the blob section with the
+    // raw values of the (dense) NDArrayViews of the model, each aligned to MappableModelBlobAlignment
+    // bytes, followed by the model dictionary as protobuf. The NDArrayViews in the dictionary refer
+    // to their values through offsets from the beginning of the file.
+    struct MappableModelHeader
+    {
+        char marker[sizeof(MappableModelMarker)];
+        uint32_t version;
+        uint32_t blobAlignment;
+        uint64_t graphOffset;
+        uint64_t graphSize;
+    };
+
+    static_assert(sizeof(MappableModelHeader) == 32, "Unexpected size of MappableModelHeader");
+
+    static const uint32_t MappableModelVersion = 1;
+    static const uint32_t MappableModelBlobAlignment = 64;
+
+    // Writes the blob section of a mappable model file.
+    class BlobWriter
+    {
+    public:
+        BlobWriter(std::ostream& stream, uint64_t offset)
+            : m_stream(stream), m_offset(offset)
+        {}
+
+        // Writes the data at the next aligned offset and returns that offset.
+        uint64_t Write(const void* data, size_t size)
+        {
+            static const char padding[MappableModelBlobAlignment] = {};
+            auto paddingSize = (MappableModelBlobAlignment - m_offset % MappableModelBlobAlignment) % MappableModelBlobAlignment;
+            m_stream.write(padding, paddingSize);
+            auto offset = m_offset + paddingSize;
+            m_stream.write(static_cast<const char*>(data), size);
+            m_offset = offset + size;
+            return offset;
+        }
+
+        uint64_t Offset() const { return m_offset; }
+
+    private:
+        std::ostream& m_stream;
+        uint64_t m_offset;
+    };
+
+    // A model file mapped into memory. Pages are shared with the page cache, and thereby with other
+    // processes mapping the same file, and are only read from the file when they are first accessed.
+    // A writable mapping is private (copy-on-write), i.e. pages that are written, e.g. when the values
+    // of parameters are updated, become private copies; a read-only mapping is never copied.
+    class MappedFile
+    {
+    public:
+        MappedFile(const std::wstring& filename, bool readOnly)
+            : m_readOnly(readOnly)
+        {
+            auto fd = GetFileDescriptor(filename, true);
+#ifdef _MSC_VER
+            struct _stat64 status;
+            if (_fstat64(fd, &status) != 0)
+            {
+                _close(fd);
+                RuntimeError("Cannot determine the size of file '%S'.", filename.c_str());
+            }
+            m_size = (size_t)status.st_size;
+            m_mapping = CreateFileMappingW((HANDLE)_get_osfhandle(fd), nullptr, readOnly ? PAGE_READONLY : PAGE_WRITECOPY, 0, 0, nullptr);
+            m_data = (m_mapping != nullptr) ? (char*)MapViewOfFile(m_mapping, readOnly ? FILE_MAP_READ : FILE_MAP_COPY, 0, 0, 0) : nullptr;
+            _close(fd);
+            if (m_data == nullptr)
+            {
+                if (m_mapping != nullptr)
+                    CloseHandle(m_mapping);
+                RuntimeError("Cannot map file '%S' into memory.", filename.c_str());
+            }
+#else
+            struct stat status;
+            if (fstat(fd, &status) != 0)
+            {
+                close(fd);
+                RuntimeError("Cannot determine the size of file '%S'.", filename.c_str());
+            }
+            m_size = (size_t)status.st_size;
+            auto data = readOnly ? mmap(nullptr, m_size, PROT_READ, MAP_SHARED, fd, 0) :
+                                   mmap(nullptr, m_size, PROT_READ | PROT_WRITE, MAP_PRIVATE, fd, 0);
+            close(fd);
+            if (data == MAP_FAILED)
+                RuntimeError("Cannot map file '%S' into memory.", filename.c_str());
+            m_data = (char*)data;
+#endif
+        }
+
+        ~MappedFile()
+        {
+#ifdef _MSC_VER
+            UnmapViewOfFile(m_data);
+            CloseHandle(m_mapping);
+#else
+            munmap(m_data, m_size);
+#endif
+        }
+
+        char* Data() const { return m_data; }
+        size_t Size() const { return m_size; }
+        bool IsReadOnly() const { return m_readOnly; }
+
+    private:
+        MappedFile(const MappedFile&) = delete; MappedFile& operator=(const MappedFile&) = delete;
+
+        char* m_data;
+        size_t m_size;
+        bool m_readOnly;
+#ifdef _MSC_VER
+        HANDLE m_mapping;
+#endif
+    };
+
     class Serializer
     {
         friend std::ostream& operator<<(std::ostream&, const Dictionary&);
         friend std::istream& operator>>(std::istream&, Dictionary&);
         friend std::ostream& operator<<(std::ostream&, const DictionaryValue&);
         friend std::istream& operator>>(std::istream&, DictionaryValue&);
+        friend void SaveMappableModel(const Dictionary&, const std::wstring&);
+        friend Dictionary LoadMappableModel(const std::wstring&, bool);
 
         friend class Dictionary;
         friend class DictionaryValue;
 
     private:
-        static proto::DictionaryValue* CreateProto(const DictionaryValue& src, Arena* arena = nullptr);
-        static proto::Dictionary* CreateProto(const Dictionary& src, Arena* arena = nullptr);
-        static proto::Vector* CreateProto(const std::vector<DictionaryValue>& src, Arena* arena = nullptr);
-        static proto::NDArrayView* CreateProto(const NDArrayView& src, Arena* arena = nullptr);
+        // If 'blobs' is given, the values of dense NDArrayViews are written to the blob section of a mappable model file.
+        static proto::DictionaryValue* CreateProto(const DictionaryValue& src, Arena* arena = nullptr, BlobWriter* blobs = nullptr);
+        static proto::Dictionary* CreateProto(const Dictionary& src, Arena* arena = nullptr, BlobWriter* blobs = nullptr);
+        static proto::Vector* CreateProto(const std::vector<DictionaryValue>& src, Arena* arena = nullptr, BlobWriter* blobs = nullptr);
+        static proto::NDArrayView* CreateProto(const NDArrayView& src, Arena* arena = nullptr, BlobWriter* blobs = nullptr);
         static proto::Axis* CreateProto(const Axis& src, Arena* arena = nullptr);
         static proto::NDShape* CreateProto(const NDShape& src, Arena* arena = nullptr);
 
-        static Dictionary* CreateFromProto(const proto::Dictionary& src);
-        static std::vector<DictionaryValue>* CreateFromProto(const proto::Vector& src);
-        static NDArrayView* CreateFromProto(const proto::NDArrayView& src);
+        // NDArrayViews whose values are stored in the blob section of a mappable model file use the mapped memory of 'file'.
+        static Dictionary* CreateFromProto(const proto::Dictionary& src, const std::shared_ptr<MappedFile>& file = nullptr);
+        static std::vector<DictionaryValue>* CreateFromProto(const proto::Vector& src, const std::shared_ptr<MappedFile>& file = nullptr);
+        static NDArrayView* CreateFromProto(const proto::NDArrayView& src, const std::shared_ptr<MappedFile>& file = nullptr);
         static Axis* CreateFromProto(const proto::Axis& src);
         static NDShape* CreateFromProto(const proto::NDShape& src);
 
-        static void Copy(const DictionaryValue& src, proto::DictionaryValue& dst, Arena* arena = nullptr);
-        static void Copy(const proto::DictionaryValue& src, DictionaryValue& dst);
+        static void Copy(const DictionaryValue& src, proto::DictionaryValue& dst, Arena* arena = nullptr, BlobWriter* blobs = nullptr);
+        static void Copy(const proto::DictionaryValue& src, DictionaryValue& dst, const std::shared_ptr<MappedFile>& file = nullptr);
 
         static proto::NDArrayView::DataType ToProtoType(DataType type)
         {
@@ -179,14 +308,23 @@ namespace CNTK
         }
     }
 
-    /*static*/ proto::NDArrayView* Serializer::CreateProto(const NDArrayView& src, Arena* arena)
+    /*static*/ proto::NDArrayView* Serializer::CreateProto(const NDArrayView& src, Arena* arena, BlobWriter* blobs)
     {
         proto::NDArrayView* dst = (arena != nullptr) ? 
             Arena::CreateMessage<proto::NDArrayView>(arena) : new proto::NDArrayView();
         dst->set_data_type(ToProtoType(src.GetDataType()));
         dst->set_allocated_shape(CreateProto(src.Shape(), arena));
         dst->set_storage_format(ToProtoType(src.GetStorageFormat()));
-        if (src.GetDataType() == DataType::Float)
+        if (blobs != nullptr && src.GetStorageFormat() == StorageFormat::Dense)
+        {
+            auto size = src.Shape().TotalSize() * DataTypeSize(src.GetDataType());
+            const void* buffer = (src.GetDataType() == DataType::Float) ?
+                (const void*)src.DataBuffer<float>() : (const void*)src.DataBuffer<double>();
+            auto values = dst->mutable_external_values();
+            values->set_offset(blobs->Write(buffer, size));
+            values->set_size(size);
+        }
+        else if (src.GetDataType() == DataType::Float)
         {
             CopyData<float>(src, dst->mutable_float_values()->mutable_value());
         }
@@ -197,7 +335,7 @@ namespace CNTK
         return dst;
     }
 
-    /*static*/ NDArrayView* Serializer::CreateFromProto(const proto::NDArrayView& src)
+    /*static*/ NDArrayView* Serializer::CreateFromProto(const proto::NDArrayView& src, const std::shared_ptr<MappedFile>& file)
     {
         if (!proto::NDArrayView::DataType_IsValid(src.data_type()) ||
             !proto::NDArrayView::StorageFormat_IsValid(src.storage_format()))
@@ -208,6 +346,26 @@ namespace CNTK
         std::unique_ptr<NDShape> shape(CreateFromProto(src.shape()));
         auto dataType = FromProtoType(src.data_type());
         auto storageFormat = FromProtoType(src.storage_format());
+
+        if (src.values_case() == proto::NDArrayView::kExternalValues)
+        {
+            if (file == nullptr)
+                RuntimeError("NDArrayView values stored in a blob can only be loaded from a mappable model file.");
+
+            const auto& values = src.external_values();
+            auto size = shape->TotalSize() * DataTypeSize(dataType);
+            if (storageFormat != StorageFormat::Dense || values.size() != size ||
+                values.offset() > file->Size() || size > file->Size() - values.offset())
+            {
+                RuntimeError("Invalid blob of an NDArrayView in the mappable model file.");
+            }
+
+            // The view uses the mapped memory in place
+            NDArrayView* dst = new NDArrayView(dataType, *shape, file->Data() + values.offset(), size, DeviceDescriptor::CPUDevice(), file->IsReadOnly());
+            dst->m_backingStore = file;
+            return dst;
+        }
+
         NDArrayView* dst = new NDArrayView(dataType, storageFormat, *shape, DeviceDescriptor::CPUDevice());
 
         if (dataType == DataType::Float)
@@ -221,60 +379,60 @@ namespace CNTK
         return dst;
     }
 
-    /*static*/ proto::Vector* Serializer::CreateProto(const std::vector<DictionaryValue>& src, Arena* arena)
+    /*static*/ proto::Vector* Serializer::CreateProto(const std::vector<DictionaryValue>& src, Arena* arena, BlobWriter* blobs)
     {
         proto::Vector* dst = (arena != nullptr) ? 
             Arena::CreateMessage<proto::Vector>(arena) : new proto::Vector();
         dst->mutable_value()->Reserve((int)src.size());
         for (const auto& value : src)
         {
-            dst->mutable_value()->AddAllocated(CreateProto(value, arena));
+            dst->mutable_value()->AddAllocated(CreateProto(value, arena, blobs));
         }
         return dst;
     }
 
-    /*static*/ std::vector<DictionaryValue>* Serializer::CreateFromProto(const proto::Vector& src)
+    /*static*/ std::vector<DictionaryValue>* Serializer::CreateFromProto(const proto::Vector& src, const std::shared_ptr<MappedFile>& file)
     {
         std::vector<DictionaryValue>* dst = new std::vector<DictionaryValue>(src.value_size());
         for (auto i = 0; i < src.value_size(); ++i)
         {
-            Copy(src.value()[i], dst->at(i));
+            Copy(src.value()[i], dst->at(i), file);
         }
         return dst;
     }
 
-    /*static*/ proto::Dictionary* Serializer::CreateProto(const Dictionary& src, Arena* arena)
+    /*static*/ proto::Dictionary* Serializer::CreateProto(const Dictionary& src, Arena* arena, BlobWriter* blobs)
     {
         proto::Dictionary* dst = (arena != nullptr) ? 
             Arena::CreateMessage<proto::Dictionary>(arena) : new proto::Dictionary();
         dst->set_version(src.s_version);
         for (const auto& kv : src)
         {
-            Copy(kv.second, dst->mutable_data()->operator[](ToString(kv.first)), arena);
+            Copy(kv.second, dst->mutable_data()->operator[](ToString(kv.first)), arena, blobs);
         }
         return dst;
     }
 
-    /*static*/ Dictionary* Serializer::CreateFromProto(const proto::Dictionary& src)
+    /*static*/ Dictionary* Serializer::CreateFromProto(const proto::Dictionary& src, const std::shared_ptr<MappedFile>& file)
     {
         Dictionary* dst = new Dictionary();
         for (const auto& kv : src.data())
         {
-            Copy(kv.second, dst->operator[](ToWString(kv.first)));
+            Copy(kv.second, dst->operator[](ToWString(kv.first)), file);
         }
         return dst;
     }
 
-    /*static*/ proto::DictionaryValue* Serializer::CreateProto(const DictionaryValue& src, Arena* arena)
+    /*static*/ proto::DictionaryValue* Serializer::CreateProto(const DictionaryValue& src, Arena* arena, BlobWriter* blobs)
     {
         proto::DictionaryValue* dst = (arena != nullptr) ? 
             Arena::CreateMessage<proto::DictionaryValue>(arena) : new proto::DictionaryValue();
         dst->set_version(src.s_version);
-        Copy(src, *dst, arena);
+        Copy(src, *dst, arena, blobs);
         return dst;
     }
 
-    /*static*/ void Serializer::Copy(const DictionaryValue& src, proto::DictionaryValue& dst, Arena* arena)
+    /*static*/ void Serializer::Copy(const DictionaryValue& src, proto::DictionaryValue& dst, Arena* arena, BlobWriter* blobs)
     {
         auto valueType = src.ValueType();
         dst.set_value_type(ToProtoType(valueType));
@@ -308,20 +466,20 @@ namespace CNTK
             dst.set_allocated_axis_value(CreateProto(src.Value<Axis>(), arena));
             break;
         case DictionaryValue::Type::Vector:
-            dst.set_allocated_vector_value(CreateProto(src.Value<std::vector<DictionaryValue>>(), arena));
+            dst.set_allocated_vector_value(CreateProto(src.Value<std::vector<DictionaryValue>>(), arena, blobs));
             break;
         case DictionaryValue::Type::Dictionary:
-            dst.set_allocated_dictionary_value(CreateProto(src.Value<Dictionary>(), arena));
+            dst.set_allocated_dictionary_value(CreateProto(src.Value<Dictionary>(), arena, blobs));
             break;
         case DictionaryValue::Type::NDArrayView:
-            dst.set_allocated_nd_array_view_value(CreateProto(src.Value<NDArrayView>(), arena));
+            dst.set_allocated_nd_array_view_value(CreateProto(src.Value<NDArrayView>(), arena, blobs));
             break;
         default:
             NOT_IMPLEMENTED
         }
     }
 
-    /*static*/ void Serializer::Copy(const proto::DictionaryValue& src, DictionaryValue& dst)
+    /*static*/ void Serializer::Copy(const proto::DictionaryValue& src, DictionaryValue& dst, const std::shared_ptr<MappedFile>& file)
     {
         auto valueType = src.value_type();
 
@@ -360,13 +518,13 @@ namespace CNTK
             dst.m_data.m_ptr = CreateFromProto(src.axis_value());
             break;
         case proto::DictionaryValue::Vector:
-            dst.m_data.m_ptr = CreateFromProto(src.vector_value());
+            dst.m_data.m_ptr = CreateFromProto(src.vector_value(), file);
             break;
         case proto::DictionaryValue::Dictionary:
-            dst.m_data.m_ptr = CreateFromProto(src.dictionary_value());
+            dst.m_data.m_ptr = CreateFromProto(src.dictionary_value(), file);
             break;
         case proto::DictionaryValue::NDArrayView:
-            dst.m_data.m_ptr = CreateFromProto(src.nd_array_view_value());
+            dst.m_data.m_ptr = CreateFromProto(src.nd_array_view_value(), file);
             break;
         }
     }
@@ -529,4 +687,69 @@ namespace CNTK
 
         return dictionaryValue;
     }
+
+    void SaveMappableModel(const Dictionary& model, const std::wstring& filename)
+    {
+        // Other processes may have the file mapped (see LoadMappableModel): overwriting it in place would
+        // change or truncate their mappings. The model is written to a new file that replaces the old one.
+        UsingUTF8 locale;
+        std::wstring tempFilename = filename + L".tmp";
+        auto stream = GetFstream(tempFilename, false);
+
+        MappableModelHeader header = {};
+        memcpy(header.marker, MappableModelMarker, sizeof(header.marker));
+        header.version = MappableModelVersion;
+        header.blobAlignment = MappableModelBlobAlignment;
+        stream->write((const char*)&header, sizeof(header));
+
+        BlobWriter blobs(*stream, sizeof(header));
+        Arena arena;
+        proto::Dictionary* proto(Serializer::CreateProto(model, &arena, &blobs));
+        header.graphOffset = blobs.Offset();
+        if (!proto->SerializeToOstream(stream.get()))
+            RuntimeError("Failed to write the model to file '%S'.", filename.c_str());
+        header.graphSize = (uint64_t)stream->tellp() - header.graphOffset;
+
+        stream->seekp(0);
+        stream->write((const char*)&header, sizeof(header));
+        stream->close();
+        if (stream->fail())
+            RuntimeError("Failed to write the model to file '%S'.", filename.c_str());
+
+        replaceFileOrDie(tempFilename, filename);
+    }
+
+    Dictionary LoadMappableModel(const std::wstring& filename, bool readOnly)
+    {
+        UsingUTF8 locale;
+        auto file = std::make_shared<MappedFile>(filename, readOnly);
+
+        MappableModelHeader header;
+        if (file->Size() < sizeof(header))
+            RuntimeError("File '%S' is not a mappable model file.", filename.c_str());
+        memcpy(&header, file->Data(), sizeof(header));
+        if (memcmp(header.marker, MappableModelMarker, sizeof(header.marker)) != 0 || header.version != MappableModelVersion)
+            RuntimeError("File '%S' is not a mappable model file of version %d.", filename.c_str(), (int)MappableModelVersion);
+        if (header.graphOffset > file->Size() || header.graphSize > file->Size() - header.graphOffset ||
+            header.graphSize > (uint64_t)std::numeric_limits<int>::max())
+        {
+            RuntimeError("The mappable model file '%S' is truncated or corrupt.", filename.c_str());
+        }
+
+        // Only the graph is parsed, directly from the mapped memory
+        Arena arena;
+        proto::Dictionary* proto = Arena::CreateMessage<proto::Dictionary>(&arena);
+        io::ArrayInputStream raw_input(file->Data() + header.graphOffset, (int)header.graphSize);
+        io::CodedInputStream coded_input(&raw_input);
+        if (!ParseMessage(coded_input, *proto))
+            RuntimeError("Failed to parse protobuf %s from file %ls.", proto->GetTypeName().c_str(), filename.c_str());
+
+        Dictionary dictionary;
+        for (const auto& kv : proto->data())
+        {
+            Serializer::Copy(kv.second, dictionary[ToWString(kv.first)], file);
+        }
+
+        return dictionary;
+    }
 }
@@ -8,6 +8,7 @@
 #include "stdafx.h"
 #include "CNTKLibrary.h"
 #include "Utils.h"
+#include <fstream>
 
 namespace CNTK
 {
@@ -32,6 +33,8 @@ namespace CNTK
     const std::wstring unitKey = L"unit";
     const std::wstring epochSizeKey = L"epoch_size";
     const std::wstring scheduleKey = L"schedule";
+    const std::wstring scheduleFormKey = L"schedule_form";
+    const std::wstring scheduleParametersKey = L"schedule_parameters";
     const std::wstring learningRateScheduleKey = L"learnig_rate_schedule";
     const std::wstring stateKey = L"state";
     const std::wstring rngSeedKey = L"rng_seed";
@@ -41,6 +44,29 @@ namespace CNTK
     const std::wstring blockFunctionCompositeArgumentsMapKeysKey = L"block_function_composite_arguments_map_keys";
     const std::wstring blockFunctionCompositeArgumentsMapValuesKey = L"block_function_composite_arguments_map_values";
 
+    // Marker at the beginning of a mappable model file (see Function::SaveModel).
+    static const char MappableModelMarker[] = { 'C', 'N', 'T', 'K', 'M', 'A', 'P', 0x01 };
+
+    inline bool IsMappableModel(std::fstream& stream)
+    {
+        static const auto size = sizeof(MappableModelMarker);
+        char buffer[size];
+        const auto position = stream.tellg();
+        stream.read(buffer, size);
+        const bool isMappable = ((size_t)stream.gcount() == size) && (memcmp(MappableModelMarker, buffer, size) == 0);
+        stream.clear();
+        stream.seekg(position);
+        return isMappable;
+    }
+
+    // Saves the model dictionary as a mappable model file, with the values of its NDArrayViews as raw blobs.
+    void SaveMappableModel(const Dictionary& model, const std::wstring& filename);
+
+    // Loads the model dictionary from a mappable model file. The file is mapped into memory and the NDArrayViews
+    // of the dictionary are CPU views of the mapped blobs; the mapping is released with the last of these views.
+    // If 'readOnly' is true, the file is mapped read-only and so are the views.
+    Dictionary LoadMappableModel(const std::wstring& filename, bool readOnly = false);
+
     template <typename T> 
     inline std::string GetVersionsString(size_t currentVersion, size_t dictVersion)
     {
@@ -7,10 +7,30 @@
 #include "CNTKLibrary.h"
 #include "Utils.h"
 #include "Learner.h"
+#include "fileutil.h"
+#include <chrono>
+#include <cstring>
+
 namespace
 {
     const std::wstring learnersPropertyName = L"Learners";
     const std::wstring externalStatePropertyName = L"ExternalState";
+
+    const std::wstring deltaBaseIdPropertyName = L"DeltaBaseId";
+    const std::wstring deltaIndexPropertyName = L"DeltaIndex";
+    const std::wstring deltaValuesPropertyName = L"DeltaValues";
+    const std::wstring parameterValuesPropertyName = L"ParameterValues";
+
+    const std::wstring deltaKindKey = L"kind";
+    const std::wstring deltaValueKey = L"value";
+    const std::wstring deltaBlockSizeKey = L"blockSize";
+    const std::wstring deltaBlocksKey = L"blocks";
+    const std::wstring deltaValueKind = L"value";
+    const std::wstring deltaDictionaryKind = L"dictionary";
+    const std::wstring deltaBlocksKind = L"blocks";
+
+    // Approximate size of the blocks of rows that are compared between delta checkpoints.
+    const size_t deltaBlockSizeInBytes = 4096;
 }
 
 namespace CNTK
@@ -25,7 +45,11 @@ namespace CNTK
           m_evaluationFunction(evaluationFunction),
           m_parameterLearners(std::make_shared<Learners>(parameterLearners)),
           m_prevMinibatchNumSamples(1),
-          m_distributed(false)
+          m_gradientAccumulationSteps(1),
+          m_numAccumulatedMinibatches(0),
+          m_accumulatedNumSamples(0),
+          m_distributed(false),
+          m_asyncCheckpoints(false)
     {
         // By default we set the number of threads to hardware concurrency.
         if (!Internal::MaxNumCPUThreadsSet())
@@ -199,7 +223,12 @@ namespace CNTK
     {
         bool emptyMinibatch = arguments.empty() || (arguments.begin()->second == nullptr);
         if (emptyMinibatch) // Nothing to train with.
+        {
+            // Apply what is left of the accumulated gradients at the end of the data.
+            if (m_numAccumulatedMinibatches > 0)
+                UpdateWithAccumulatedGradients(sweepEnd);
             return false;
+        }
 
         std::unordered_map<Variable, ValuePtr> parameterGradients;
         ExecuteForwardBackward(arguments, outputsToFetch, computeDevice, parameterGradients);
@@ -207,9 +236,66 @@ namespace CNTK
         std::unordered_map<Parameter, NDArrayViewPtr> gradients;
         for (const auto& parameter : m_learnerParameters)
             gradients[parameter] = parameterGradients[parameter]->Data();
+
+        if (m_gradientAccumulationSteps > 1)
+            return AccumulateGradients(gradients, sweepEnd);
         return m_parameterLearners->Update(gradients, m_prevMinibatchNumSamples, sweepEnd);
     }
 
+    void Trainer::SetGradientAccumulationSteps(size_t numMinibatches)
+    {
+        if (numMinibatches == 0)
+            InvalidArgument("Trainer::SetGradientAccumulationSteps: The number of minibatches must be positive.");
+
+        if (m_distributed && numMinibatches > 1)
+            InvalidArgument("Trainer::SetGradientAccumulationSteps: Gradient accumulation is not supported with distributed learners.");
+
+        // Gradients accumulated so far are applied with the previous setting.
+        if (m_numAccumulatedMinibatches > 0)
+            UpdateWithAccumulatedGradients(false);
+
+        m_gradientAccumulationSteps = numMinibatches;
+        if (numMinibatches == 1)
+            m_accumulatedGradients.clear();
+    }
+
+    // Adds the gradients of the last minibatch to the accumulated ones, and updates the parameters
+    // once the gradients of m_gradientAccumulationSteps minibatches (or the rest of a sweep) are summed up.
+    bool Trainer::AccumulateGradients(const std::unordered_map<Parameter, NDArrayViewPtr>& gradients, bool sweepEnd)
+    {
+        for (const auto& gradient : gradients)
+        {
+            auto& accumulator = m_accumulatedGradients[gradient.first];
+            if (!accumulator || accumulator->Device() != gradient.second->Device())
+                accumulator = MakeSharedObject<NDArrayView>(gradient.second->GetDataType(), gradient.second->Shape(), gradient.second->Device());
+
+            if (m_numAccumulatedMinibatches == 0)
+            {
+                if (accumulator->GetDataType() == DataType::Float)
+                    accumulator->SetValue(0.0f);
+                else
+                    accumulator->SetValue(0.0);
+            }
+
+            Utils::Accumulate(gradient.second, accumulator);
+        }
+
+        m_accumulatedNumSamples += m_prevMinibatchNumSamples;
+        if (++m_numAccumulatedMinibatches < m_gradientAccumulationSteps && !sweepEnd)
+            return true;
+
+        return UpdateWithAccumulatedGradients(sweepEnd);
+    }
+
+    bool Trainer::UpdateWithAccumulatedGradients(bool sweepEnd)
+    {
+        // The learners scale per-minibatch learning rates by, and count, all samples of the accumulated minibatches.
+        size_t numSamples = m_accumulatedNumSamples;
+        m_numAccumulatedMinibatches = 0;
+        m_accumulatedNumSamples = 0;
+        return m_parameterLearners->Update(m_accumulatedGradients, numSamples, sweepEnd);
+    }
+
     bool Trainer::TrainDistributedMinibatch(const std::unordered_map<Variable, ValuePtr>& arguments, std::unordered_map<Variable, ValuePtr>& outputsToFetch, bool sweepEnd, const DeviceDescriptor& computeDevice /*= DeviceDescriptor::UseDefaultDevice()*/)
     {
         std::unordered_map<Parameter, NDArrayViewPtr> gradients;
@@ -297,11 +383,45 @@ namespace CNTK
         return modelFilePath + checkpointExt;
     }
 
-    void Trainer::SaveCheckpoint(const std::wstring& modelFilePath, Dictionary externalState)
+    Trainer::~Trainer()
     {
+        // Make sure that a checkpoint that is being written in the background is complete.
+        try
+        {
+            WaitForPendingCheckpoint();
+        }
+        catch (const std::exception& e)
+        {
+            fprintf(stderr, "Trainer: writing the checkpoint failed: %s\n", e.what());
+        }
+    }
+
+    void Trainer::SaveCheckpoint(const std::wstring& modelFilePath, Dictionary externalState, bool asynchronous, size_t numCheckpointsToKeep)
+    {
+        if (numCheckpointsToKeep == 0)
+            InvalidArgument("Trainer::SaveCheckpoint: The number of checkpoints to keep must be positive.");
+
+        Checkpoint(modelFilePath, externalState, asynchronous, numCheckpointsToKeep, /*fullCheckpointFrequency =*/ 0);
+    }
+
+    void Trainer::SaveDeltaCheckpoint(const std::wstring& modelFilePath, Dictionary externalState, size_t fullCheckpointFrequency, bool asynchronous)
+    {
+        if (fullCheckpointFrequency == 0)
+            InvalidArgument("Trainer::SaveDeltaCheckpoint: The full checkpoint frequency must be positive.");
+
+        Checkpoint(modelFilePath, externalState, asynchronous, /*numCheckpointsToKeep =*/ 1, fullCheckpointFrequency);
+    }
+
+    void Trainer::Checkpoint(const std::wstring& modelFilePath, const Dictionary& externalState, bool asynchronous, size_t numCheckpointsToKeep, size_t fullCheckpointFrequency)
+    {
+        // The checkpoint does not store accumulated gradients, so they are applied before it is taken.
+        if (m_numAccumulatedMinibatches > 0)
+            UpdateWithAccumulatedGradients(false);
+
+        m_asyncCheckpoints = m_asyncCheckpoints || asynchronous;
         auto learnersState = m_parameterLearners->CreateCheckpoint();
         if (!m_distributed)
-            return Save(modelFilePath, learnersState, externalState);
+            return Save(modelFilePath, learnersState, externalState, asynchronous, numCheckpointsToKeep, fullCheckpointFrequency);
 
         // Collect distrbuted external state.
         DistributedCommunicatorPtr communicator = MPICommunicator();
@@ -317,44 +437,417 @@ namespace CNTK
         }
 
         if (communicator->CurrentWorker().IsMain())
-            Save(modelFilePath, learnersState, aggregatedState);
+            Save(modelFilePath, learnersState, aggregatedState, asynchronous, numCheckpointsToKeep, fullCheckpointFrequency);
 
         // all workers need to sync up after saving model to avoid read-after-write hazard
         // i.e. one worker is in the middle of write while another tries to read
+        // (for asynchronous checkpoints this is taken care of in RestoreFromCheckpoint)
         communicator->Barrier();
     }
 
-    void Trainer::Save(const std::wstring& modelFilePath, const std::vector<DictionaryValue>& learnerState, const Dictionary& externalState)
+    void Trainer::Save(const std::wstring& modelFilePath, const std::vector<DictionaryValue>& learnerState, const Dictionary& externalState, bool asynchronous, size_t numCheckpointsToKeep, size_t fullCheckpointFrequency)
     {
-        std::wstring tempModelFile = modelFilePath + L".tmp";
-        Dictionary state;
-        state[learnersPropertyName] = learnerState;
-        state[externalStatePropertyName] = externalState;
+        // Only a single checkpoint is written at a time, which also bounds the memory used by the snapshots.
+        WaitForPendingCheckpoint();
+
+        std::function<void()> write;
+        if (fullCheckpointFrequency > 0)
+            write = PrepareDeltaCheckpoint(modelFilePath, learnerState, externalState, fullCheckpointFrequency);
+        else
+        {
+            m_deltaCheckpointState = nullptr;
+
+            // Serializing copies the parameter values (as well as the learner state above) into host memory,
+            // so the snapshot is not affected by the training that continues while it is being written.
+            auto model = std::make_shared<Dictionary>(m_combinedTrainingFunction->Serialize());
+            auto state = std::make_shared<Dictionary>();
+            (*state)[learnersPropertyName] = learnerState;
+            (*state)[externalStatePropertyName] = externalState;
+
+            write = [modelFilePath, model, state, numCheckpointsToKeep]()
+            {
+                WriteCheckpoint(modelFilePath, *model, *state, numCheckpointsToKeep);
+            };
+        }
 
-        m_combinedTrainingFunction->SaveModel(tempModelFile);
+        if (!asynchronous)
+            return write();
+
+        m_pendingCheckpoint = std::async(std::launch::async, write);
+    }
+
+    static void SaveAndSync(Dictionary& dictionary, const std::wstring& filePath)
+    {
+        dictionary.Save(filePath);
+
+        FILE* f = fopenOrDie(filePath, L"r+b");
+        fsyncOrDie(f);
+        fcloseOrDie(f);
+    }
+
+    /*static*/ void Trainer::WriteCheckpoint(const std::wstring& modelFilePath, Dictionary& model, Dictionary& state, size_t numCheckpointsToKeep)
+    {
         std::wstring trainerStateCheckpointFilePath = GetTrainerStateCheckpointFilePath(modelFilePath);
+        std::wstring tempModelFile = modelFilePath + L".tmp";
         std::wstring tempCheckpointFile = trainerStateCheckpointFilePath + L".tmp";
 
-        state.Save(tempCheckpointFile);
+        SaveAndSync(model, tempModelFile);
+        SaveAndSync(state, tempCheckpointFile);
 
-        // The return value is ignored here.
-        _wunlink(modelFilePath.c_str());
-        _wunlink(trainerStateCheckpointFilePath.c_str());
+        // Shift the checkpoints that are kept: filePath -> filePath.1 -> filePath.2 ...
+        // The files are renamed over the existing ones, which drops the oldest checkpoint.
+        auto keptFilePath = [&modelFilePath](size_t index)
+        {
+            return index == 0 ? modelFilePath : modelFilePath + L"." + std::to_wstring(index);
+        };
+
+        for (size_t i = numCheckpointsToKeep; i-- > 1;)
+        {
+            auto from = keptFilePath(i - 1);
+            if (!fexists(from))
+                continue;
+
+            auto to = keptFilePath(i);
+            if (fexists(GetTrainerStateCheckpointFilePath(from)))
+                replaceFileOrDie(GetTrainerStateCheckpointFilePath(from), GetTrainerStateCheckpointFilePath(to));
+            else
+                _wunlink(GetTrainerStateCheckpointFilePath(to).c_str()); // The return value is ignored here.
+            replaceFileOrDie(from, to);
+        }
 
-        renameOrDie(tempModelFile, modelFilePath);
-        renameOrDie(tempCheckpointFile, trainerStateCheckpointFilePath);
+        // Each file is replaced atomically, so there is no point in time at which it is missing (unless the
+        // previous checkpoint has just been shifted to filePath.1 above). The trainer state goes first,
+        // so that the model file is never newer than its trainer state.
+        replaceFileOrDie(tempCheckpointFile, trainerStateCheckpointFilePath);
+        replaceFileOrDie(tempModelFile, modelFilePath);
+    }
+
+    static std::wstring DeltaCheckpointFilePath(const std::wstring& modelFilePath, size_t index)
+    {
+        return modelFilePath + L".delta" + std::to_wstring(index);
+    }
+
+    static const char* ByteBuffer(const NDArrayView& view)
+    {
+        if (view.GetDataType() == DataType::Float)
+            return reinterpret_cast<const char*>(view.DataBuffer<float>());
+        else
+            return reinterpret_cast<const char*>(view.DataBuffer<double>());
+    }
+
+    static char* WritableByteBuffer(NDArrayView& view)
+    {
+        if (view.GetDataType() == DataType::Float)
+            return reinterpret_cast<char*>(view.WritableDataBuffer<float>());
+        else
+            return reinterpret_cast<char*>(view.WritableDataBuffer<double>());
+    }
+
+    // Host copies of the values of the parameters and constants of the function, keyed by their uids.
+    static Dictionary ParameterValues(const FunctionPtr& function)
+    {
+        Dictionary values;
+        for (const auto& parameter : function->Parameters())
+            values[parameter.Uid()] = *parameter.Value();
+        for (const auto& constant : function->Constants())
+            values[constant.Uid()] = *constant.Value();
+        return values;
+    }
+
+    static void RestoreParameterValues(const FunctionPtr& function, const Dictionary& values)
+    {
+        for (const auto& parameter : function->Parameters())
+        {
+            if (values.Contains(parameter.Uid()))
+                parameter.Value()->CopyFrom(values[parameter.Uid()].Value<NDArrayView>());
+        }
+        for (const auto& constant : function->Constants())
+        {
+            if (values.Contains(constant.Uid()))
+                constant.Value()->CopyFrom(values[constant.Uid()].Value<NDArrayView>());
+        }
+    }
+
+    // Compares two dense host arrays of the same shape in blocks of whole rows (i.e. of elements along the
+    // last axis, e.g. the entries of an embedding) and returns the indices of the blocks that differ.
+    // Returns false if the arrays cannot be compared.
+    static bool ChangedBlocks(const NDArrayView& previous, const NDArrayView& current, size_t& blockSize, std::vector<size_t>& blocks)
+    {
+        if (previous.IsSparse() || current.IsSparse() || previous.GetDataType() != current.GetDataType() || !(previous.Shape() == current.Shape()))
+            return false;
+
+        const auto& shape = current.Shape();
+        size_t elementSize = DataTypeSize(current.GetDataType());
+        size_t totalSize = shape.TotalSize();
+        size_t rowSize = (shape.Rank() > 0 && shape[shape.Rank() - 1] > 0) ? totalSize / shape[shape.Rank() - 1] : 1;
+        blockSize = std::max<size_t>(1, rowSize * std::max<size_t>(1, deltaBlockSizeInBytes / std::max<size_t>(1, rowSize * elementSize)));
+
+        auto previousData = ByteBuffer(previous);
+        auto currentData = ByteBuffer(current);
+        for (size_t start = 0, index = 0; start < totalSize; start += blockSize, ++index)
+        {
+            size_t size = std::min(blockSize, totalSize - start) * elementSize;
+            if (memcmp(previousData + start * elementSize, currentData + start * elementSize, size) != 0)
+                blocks.push_back(index);
+        }
+
+        return true;
+    }
+
+    // Creates the delta that turns 'previous' into 'current': arrays that did not change are left out,
+    // arrays of which at most half of the blocks changed only contain these blocks, nested dictionaries
+    // are compared recursively and all other values are stored as they are.
+    static Dictionary CreateDelta(const Dictionary& previous, const Dictionary& current)
+    {
+        Dictionary delta;
+        for (const auto& keyValue : current)
+        {
+            const auto& key = keyValue.first;
+            const auto& value = keyValue.second;
+            Dictionary entry;
+            entry[deltaKindKey] = deltaValueKind;
+            entry[deltaValueKey] = value;
+
+            if (previous.Contains(key) && previous[key].ValueType() == value.ValueType())
+            {
+                if (value.ValueType() == DictionaryValue::Type::Dictionary)
+                {
+                    entry[deltaKindKey] = deltaDictionaryKind;
+                    entry[deltaValueKey] = CreateDelta(previous[key].Value<Dictionary>(), value.Value<Dictionary>());
+                }
+                else if (value.ValueType() == DictionaryValue::Type::NDArrayView)
+                {
+                    const auto& array = value.Value<NDArrayView>();
+                    size_t blockSize;
+                    std::vector<size_t> blocks;
+                    if (ChangedBlocks(previous[key].Value<NDArrayView>(), array, blockSize, blocks))
+                    {
+                        if (blocks.empty())
+                            continue;
+
+                        size_t totalSize = array.Shape().TotalSize();
+                        size_t numBlocks = (totalSize + blockSize - 1) / blockSize;
+                        if (2 * blocks.size() <= numBlocks)
+                        {
+                            size_t elementSize = DataTypeSize(array.GetDataType());
+                            size_t changedSize = 0;
+                            for (auto block : blocks)
+                                changedSize += std::min(blockSize, totalSize - block * blockSize);
+
+                            NDArrayView changed(array.GetDataType(), NDShape({ changedSize }), DeviceDescriptor::CPUDevice());
+                            auto source = ByteBuffer(array);
+                            auto target = WritableByteBuffer(changed);
+                            std::vector<DictionaryValue> blockIndices;
+                            for (auto block : blocks)
+                            {
+                                size_t size = std::min(blockSize, totalSize - block * blockSize) * elementSize;
+                                memcpy(target, source + block * blockSize * elementSize, size);
+                                target += size;
+                                blockIndices.push_back(block);
+                            }
+
+                            entry[deltaKindKey] = deltaBlocksKind;
+                            entry[deltaBlockSizeKey] = blockSize;
+                            entry[deltaBlocksKey] = blockIndices;
+                            entry[deltaValueKey] = changed;
+                        }
+                    }
+                }
+            }
+
+            delta[key] = entry;
+        }
+
+        return delta;
+    }
+
+    static void ApplyDelta(Dictionary& values, const Dictionary& delta)
+    {
+        for (const auto& keyValue : delta)
+        {
+            const auto& key = keyValue.first;
+            const auto& entry = keyValue.second.Value<Dictionary>();
+            const auto& kind = entry[deltaKindKey].Value<std::wstring>();
+            if (kind == deltaValueKind)
+                values[key] = entry[deltaValueKey];
+            else if (kind == deltaDictionaryKind)
+            {
+                Dictionary nested = values.Contains(key) ? values[key].Value<Dictionary>() : Dictionary();
+                ApplyDelta(nested, entry[deltaValueKey].Value<Dictionary>());
+                values[key] = nested;
+            }
+            else if (kind == deltaBlocksKind)
+            {
+                if (!values.Contains(key) || values[key].ValueType() != DictionaryValue::Type::NDArrayView)
+                    RuntimeError("Delta checkpoint contains blocks of the unknown array '%S'.", key.c_str());
+
+                auto& array = values[key].Value<NDArrayView>();
+                const auto& changed = entry[deltaValueKey].Value<NDArrayView>();
+                if (changed.GetDataType() != array.GetDataType())
+                    RuntimeError("Delta checkpoint contains blocks of a different data type for the array '%S'.", key.c_str());
+
+                size_t blockSize = entry[deltaBlockSizeKey].Value<size_t>();
+                size_t totalSize = array.Shape().TotalSize();
+                size_t elementSize = DataTypeSize(array.GetDataType());
+                auto source = ByteBuffer(changed);
+                auto target = WritableByteBuffer(array);
+                for (const auto& block : entry[deltaBlocksKey].Value<std::vector<DictionaryValue>>())
+                {
+                    size_t start = block.Value<size_t>() * blockSize;
+                    if (start >= totalSize)
+                        RuntimeError("Delta checkpoint contains an invalid block of the array '%S'.", key.c_str());
+
+                    size_t size = std::min(blockSize, totalSize - start) * elementSize;
+                    memcpy(target + start * elementSize, source, size);
+                    source += size;
+                }
+            }
+            else
+                RuntimeError("Unknown kind '%S' of delta checkpoint entry '%S'.", kind.c_str(), key.c_str());
+        }
+    }
+
+    // The learner state is a vector, deltas are created between dictionaries.
+    static Dictionary LearnerStateAsDictionary(const std::vector<DictionaryValue>& learnerState)
+    {
+        Dictionary learners;
+        for (size_t i = 0; i < learnerState.size(); ++i)
+            learners[std::to_wstring(i)] = learnerState[i];
+        return learners;
+    }
+
+    static std::vector<DictionaryValue> LearnerStateFromDictionary(const Dictionary& learners, size_t numLearners)
+    {
+        std::vector<DictionaryValue> learnerState;
+        for (size_t i = 0; i < numLearners; ++i)
+            learnerState.push_back(learners[std::to_wstring(i)]);
+        return learnerState;
+    }
+
+    struct Trainer::DeltaCheckpointState
+    {
+        std::wstring m_modelFilePath;
+        std::wstring m_baseId;
+        size_t m_numDeltas;
+        // Host copies of the values stored by the previous checkpoint
+        Dictionary m_values;
+    };
+
+    std::function<void()> Trainer::PrepareDeltaCheckpoint(const std::wstring& modelFilePath, const std::vector<DictionaryValue>& learnerState, const Dictionary& externalState, size_t fullCheckpointFrequency)
+    {
+        Dictionary values;
+        values[parameterValuesPropertyName] = ParameterValues(m_combinedTrainingFunction);
+        values[learnersPropertyName] = LearnerStateAsDictionary(learnerState);
+
+        auto& state = m_deltaCheckpointState;
+        if (!state || state->m_modelFilePath != modelFilePath || state->m_numDeltas + 1 >= fullCheckpointFrequency)
+        {
+            // Write a full checkpoint as the new base. Deltas of the previous base that are left
+            // over (e.g. if writing is interrupted) are recognized by their base id.
+            state = std::make_shared<DeltaCheckpointState>();
+            state->m_modelFilePath = modelFilePath;
+            state->m_baseId = std::to_wstring(std::chrono::system_clock::now().time_since_epoch().count()) + L"-" + std::to_wstring(TotalNumberOfSamplesSeen());
+            state->m_numDeltas = 0;
+            state->m_values = std::move(values);
+
+            auto model = std::make_shared<Dictionary>(m_combinedTrainingFunction->Serialize());
+            auto trainerState = std::make_shared<Dictionary>();
+            (*trainerState)[learnersPropertyName] = learnerState;
+            (*trainerState)[externalStatePropertyName] = externalState;
+            (*trainerState)[deltaBaseIdPropertyName] = state->m_baseId;
+
+            return [modelFilePath, model, trainerState]()
+            {
+                WriteCheckpoint(modelFilePath, *model, *trainerState, 1);
+                for (size_t i = 1; fexists(DeltaCheckpointFilePath(modelFilePath, i)); ++i)
+                {
+                    // The return value is ignored here.
+                    _wunlink(DeltaCheckpointFilePath(modelFilePath, i).c_str());
+                }
+            };
+        }
+
+        auto delta = std::make_shared<Dictionary>();
+        (*delta)[deltaBaseIdPropertyName] = state->m_baseId;
+        (*delta)[deltaIndexPropertyName] = ++state->m_numDeltas;
+        (*delta)[deltaValuesPropertyName] = CreateDelta(state->m_values, values);
+        (*delta)[externalStatePropertyName] = externalState;
+        state->m_values = std::move(values);
+
+        auto deltaFilePath = DeltaCheckpointFilePath(modelFilePath, state->m_numDeltas);
+        return [deltaFilePath, delta]()
+        {
+            std::wstring tempDeltaFile = deltaFilePath + L".tmp";
+            SaveAndSync(*delta, tempDeltaFile);
+
+            // The return value is ignored here.
+            _wunlink(deltaFilePath.c_str());
+            renameOrDie(tempDeltaFile, deltaFilePath);
+        };
+    }
+
+    void Trainer::ReplayDeltaCheckpoints(const std::wstring& modelFilePath, const std::wstring& baseId, std::vector<DictionaryValue>& learnerState, Dictionary& externalState)
+    {
+        Dictionary values;
+        size_t numDeltas = 0;
+        for (size_t i = 1; fexists(DeltaCheckpointFilePath(modelFilePath, i)); ++i)
+        {
+            Dictionary delta = Dictionary::Load(DeltaCheckpointFilePath(modelFilePath, i));
+
+            // Stop at deltas that are left over from a previous base.
+            if (delta[deltaBaseIdPropertyName].Value<std::wstring>() != baseId || delta[deltaIndexPropertyName].Value<size_t>() != i)
+                break;
+
+            if (numDeltas++ == 0)
+            {
+                values[parameterValuesPropertyName] = ParameterValues(m_combinedTrainingFunction);
+                values[learnersPropertyName] = LearnerStateAsDictionary(learnerState);
+            }
+
+            ApplyDelta(values, delta[deltaValuesPropertyName].Value<Dictionary>());
+            externalState = delta[externalStatePropertyName].Value<Dictionary>();
+        }
+
+        if (numDeltas > 0)
+        {
+            RestoreParameterValues(m_combinedTrainingFunction, values[parameterValuesPropertyName].Value<Dictionary>());
+            learnerState = LearnerStateFromDictionary(values[learnersPropertyName].Value<Dictionary>(), learnerState.size());
+        }
+    }
+
+    void Trainer::WaitForPendingCheckpoint()
+    {
+        if (m_pendingCheckpoint.valid())
+            m_pendingCheckpoint.get();
     }
 
     Dictionary Trainer::RestoreFromCheckpoint(const std::wstring& modelFilePath)
     {
+        WaitForPendingCheckpoint();
+        if (m_distributed && m_asyncCheckpoints)
+        {
+            // The main worker might have still been writing the checkpoint.
+            MPICommunicator()->Barrier();
+        }
+
         // Restore the model's parameters
         m_combinedTrainingFunction->RestoreModel(modelFilePath);
 
+        // Gradients accumulated since the last update belong to the discarded state.
+        m_numAccumulatedMinibatches = 0;
+        m_accumulatedNumSamples = 0;
+        m_accumulatedGradients.clear();
+
         Dictionary checkpoint = Dictionary::Load(GetTrainerStateCheckpointFilePath(modelFilePath));
 
         auto learnerState = checkpoint[learnersPropertyName].Value<std::vector<DictionaryValue>>();
         auto externalState = checkpoint[externalStatePropertyName].Value<Dictionary>();
 
+        // The next delta checkpoint starts with a new base.
+        m_deltaCheckpointState = nullptr;
+        if (checkpoint.Contains(deltaBaseIdPropertyName))
+            ReplayDeltaCheckpoints(modelFilePath, checkpoint[deltaBaseIdPropertyName].Value<std::wstring>(), learnerState, externalState);
+
         if (!m_distributed)
         {
             m_parameterLearners->RestoreFromCheckpoint(learnerState);
@@ -18,14 +18,18 @@ namespace CNTK
         const std::unordered_map<Variable, StreamInformation>& modelInputToMinibatchSourceStream,
         const MinibatchSizeSchedule& minibatchSizeSchedule,
         size_t checkpointFrequencyinSamples,
-        const std::wstring& checkPointFileName)
+        const std::wstring& checkPointFileName,
+        bool asyncCheckpoints,
+        size_t numCheckpointsToKeep)
     {
         return MakeSharedObject<TrainingSession>(trainingSource,
             trainer,
             modelInputToMinibatchSourceStream,
             minibatchSizeSchedule,
             checkpointFrequencyinSamples,
-            checkPointFileName);
+            checkPointFileName,
+            asyncCheckpoints,
+            numCheckpointsToKeep);
     }
 
     TrainingSession::TrainingSession(
@@ -34,12 +38,16 @@ namespace CNTK
         const std::unordered_map<Variable, StreamInformation>& modelInputToMinibatchSourceStream,
         const MinibatchSizeSchedule& schedule,
         size_t checkpointFrequencyInSamples,
-        const std::wstring& checkPointFileName) :
+        const std::wstring& checkPointFileName,
+        bool asyncCheckpoints,
+        size_t numCheckpointsToKeep) :
         m_trainingSource(trainingSource),
         m_trainer(trainer),
         m_modelInputToMinibatchSourceStream(modelInputToMinibatchSourceStream),
         m_checkpointFrequencyinSamples(checkpointFrequencyInSamples),
         m_checkPointFileName(checkPointFileName),
+        m_asyncCheckpoints(asyncCheckpoints),
+        m_numCheckpointsToKeep(numCheckpointsToKeep),
         m_currentCheckpointIndex(0),
         m_parallelAfterSamples(0),
         m_workerRank(0),
@@ -54,6 +62,8 @@ namespace CNTK
             InvalidArgument("Input mapping is not allowed to be empty.");
         if (m_checkPointFileName.empty() && checkpointFrequencyInSamples != 0)
             InvalidArgument("Checkpoint file name is not allowed to be empty.");
+        if (numCheckpointsToKeep == 0)
+            InvalidArgument("The number of checkpoints to keep must be positive.");
 
         // Let's calculate the warm up period the distributed learners may need.
         // We will take the maximum warm up period required.
@@ -118,6 +128,9 @@ namespace CNTK
 
         if (m_checkpointFrequencyinSamples > 0)
             SaveCheckpoint();
+
+        // The last checkpoint needs to be on disk when the training is over.
+        m_trainer->WaitForPendingCheckpoint();
     }
 
     void TrainingSession::RestoreFromCheckpoint(const std::wstring& checkpointFileName)
@@ -133,7 +146,7 @@ namespace CNTK
         Dictionary externalState;
         externalState[s_checkpointIndex] = m_currentCheckpointIndex;
         externalState[s_trainingMinibatchSource] = m_trainingSource->GetCheckpointState();        
-        m_trainer->SaveCheckpoint(m_checkPointFileName, externalState);
+        m_trainer->SaveCheckpoint(m_checkPointFileName, externalState, m_asyncCheckpoints, m_numCheckpointsToKeep);
         OnCheckpointEnd();
     }
 }
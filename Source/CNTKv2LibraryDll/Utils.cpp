@@ -14,6 +14,8 @@
 #include "Utils.h"
 #include "Serialization.h"
 #include <fcntl.h>
+#include <cmath>
+#include <type_traits>
 #include "PrimitiveFunction.h"
 #include "RecurrentNodes.h"
 #include "Value.h"
@@ -243,13 +245,15 @@ namespace CNTK
 
     template <typename T>
     TrainingParameterSchedule<T>::TrainingParameterSchedule(T value, UnitType unit) 
-        : m_schedule({ make_pair(0, value) }), m_unit(unit), m_epochSize(FullDataSweep)
+        : m_schedule({ make_pair(0, value) }), m_unit(unit), m_epochSize(FullDataSweep),
+          m_form(Form::Piecewise), m_initialValue(0), m_finalValue(0), m_duration(0), m_rate(0), m_warmup(0)
     {
     }
 
     template <typename T>
     TrainingParameterSchedule<T>::TrainingParameterSchedule(const vector<T>& schedule, UnitType unit, size_t epochSize) 
-        : m_unit(unit), m_epochSize(epochSize)
+        : m_unit(unit), m_epochSize(epochSize),
+          m_form(Form::Piecewise), m_initialValue(0), m_finalValue(0), m_duration(0), m_rate(0), m_warmup(0)
     {
         std::vector<std::pair<size_t, T>> s(schedule.size());
         for (auto i = 0; i < schedule.size(); ++i)
@@ -262,11 +266,30 @@ namespace CNTK
 
     template <typename T>
     TrainingParameterSchedule<T>::TrainingParameterSchedule(const vector<std::pair<size_t, T>>& schedule, UnitType unit, size_t epochSize)
-        : m_unit(unit), m_epochSize(epochSize)
+        : m_unit(unit), m_epochSize(epochSize),
+          m_form(Form::Piecewise), m_initialValue(0), m_finalValue(0), m_duration(0), m_rate(0), m_warmup(0)
     {
         ConstructSchedule(schedule);
     }
 
+    template <typename T>
+    TrainingParameterSchedule<T>::TrainingParameterSchedule(Form form, double initialValue, double finalValue, size_t duration, double rate, size_t warmup, UnitType unit, size_t epochSize)
+        : m_unit(unit), m_epochSize(epochSize),
+          m_form(form), m_initialValue(initialValue), m_finalValue(finalValue), m_duration(duration), m_rate(rate), m_warmup(warmup)
+    {
+        if (form == Form::Piecewise || form > Form::Cyclic)
+            InvalidArgument("TrainingParameterSchedule: invalid form %u of a parametric schedule.", static_cast<unsigned int>(form));
+
+        if (duration == 0 && form != Form::Constant)
+            InvalidArgument("TrainingParameterSchedule: the duration of a parametric schedule cannot be 0.");
+
+        if ((form == Form::Exponential || form == Form::Step) && rate <= 0)
+            InvalidArgument("TrainingParameterSchedule: the rate of an exponential or step schedule must be positive.");
+
+        // Not used for the lookup, but keeps the serialized schedule readable as a piecewise one.
+        m_schedule[0] = static_cast<T>(initialValue);
+    }
+
     template <typename T>
     void TrainingParameterSchedule<T>::ConstructSchedule(const std::vector<std::pair<size_t, T>>& schedule)
     {
@@ -295,11 +318,37 @@ namespace CNTK
     {
     }
 
+    template <typename T>
+    TrainingParameterSchedule<T> TrainingParameterSchedule<T>::Rescaled(double factor, UnitType unit) const
+    {
+        TrainingParameterSchedule<T> schedule(*this);
+        schedule.m_unit = unit;
+        for (auto& entry : schedule.m_schedule)
+            entry.second = static_cast<T>(entry.second * factor);
+
+        // The values of all parametric forms are linear in the initial and final values
+        // (a NaN final value stays NaN, i.e. unbounded).
+        schedule.m_initialValue *= factor;
+        schedule.m_finalValue *= factor;
+        return schedule;
+    }
+
     // Returns the element whose key is greater than the required unit count 
     // or the last element if no such key exists.
     template <typename T>
-    /*virtual*/ const T& TrainingParameterSchedule<T>::operator[](size_t count) const
+    /*virtual*/ T TrainingParameterSchedule<T>::operator[](size_t count) const
     {
+        if (m_form != Form::Piecewise)
+        {
+            double value = ParametricValue(count);
+            if (std::is_integral<T>::value)
+            {
+                // Integral schedules are minibatch sizes, which have to be at least 1.
+                value = std::max(1.0, std::round(value));
+            }
+            return static_cast<T>(value);
+        }
+
         assert(m_schedule.size() > 0);
         auto it = m_schedule.upper_bound(count);
         if (it == m_schedule.end())
@@ -309,13 +358,57 @@ namespace CNTK
         return it->second;
     }
 
+    // Returns the value of a parametric schedule for the absolute sample (or sweep) count.
+    template <typename T>
+    double TrainingParameterSchedule<T>::ParametricValue(size_t count) const
+    {
+        // number of scheduling units seen so far
+        double t = IsSweepBased() ? static_cast<double>(count) : static_cast<double>(count) / m_epochSize;
+
+        if (t < m_warmup)
+            return m_initialValue * std::min(1.0, (t + 1) / m_warmup);
+
+        t -= m_warmup;
+        const double duration = static_cast<double>(m_duration);
+        const double pi = 3.14159265358979323846;
+        switch (m_form)
+        {
+        case Form::Constant:
+            return m_initialValue;
+        case Form::Cosine:
+            return m_finalValue + (m_initialValue - m_finalValue) * (1 + std::cos(pi * std::min(t / duration, 1.0))) / 2;
+        case Form::Exponential:
+        case Form::Step:
+        {
+            double exponent = (m_form == Form::Step) ? std::floor(t / duration) : t / duration;
+            double value = m_initialValue * std::pow(m_rate, exponent);
+            // the value does not go past the final one, unless there is none (NaN)
+            if (!std::isnan(m_finalValue) && ((m_rate < 1 && value < m_finalValue) || (m_rate > 1 && value > m_finalValue)))
+                value = m_finalValue;
+            return value;
+        }
+        case Form::Polynomial:
+            return m_finalValue + (m_initialValue - m_finalValue) * std::pow(1 - std::min(t / duration, 1.0), m_rate);
+        case Form::Cyclic:
+        {
+            // position in the current cycle, from 0 at initialValue to 1 at finalValue
+            double position = 1 - std::abs(std::fmod(t / duration, 2.0) - 1);
+            return m_initialValue + (m_finalValue - m_initialValue) * position;
+        }
+        default:
+            LogicError("TrainingParameterSchedule: unexpected form %u of a parametric schedule.", static_cast<unsigned int>(m_form));
+        }
+    }
+
     template <typename T>
     TrainingParameterSchedule<T>::TrainingParameterSchedule(const TrainingParameterSchedule<T>&) = default;
 
     // cannot be defaulted due to a bug in VS2013 (https://connect.microsoft.com/VisualStudio/feedback/details/1255564)
     template <typename T>
     TrainingParameterSchedule<T>::TrainingParameterSchedule(TrainingParameterSchedule<T>&& that)
-        :m_schedule(move(that.m_schedule)), m_unit(that.m_unit), m_epochSize(that.m_epochSize)
+        :m_schedule(move(that.m_schedule)), m_unit(that.m_unit), m_epochSize(that.m_epochSize),
+         m_form(that.m_form), m_initialValue(that.m_initialValue), m_finalValue(that.m_finalValue),
+         m_duration(that.m_duration), m_rate(that.m_rate), m_warmup(that.m_warmup)
     {
     }
 
@@ -329,6 +422,12 @@ namespace CNTK
         m_schedule = move(that.m_schedule);
         m_epochSize = that.m_epochSize;
         m_unit = that.m_unit;
+        m_form = that.m_form;
+        m_initialValue = that.m_initialValue;
+        m_finalValue = that.m_finalValue;
+        m_duration = that.m_duration;
+        m_rate = that.m_rate;
+        m_warmup = that.m_warmup;
         return *this;
     }
 
@@ -348,6 +447,11 @@ namespace CNTK
         dict[epochSizeKey] = m_epochSize;
         dict[unitKey] = static_cast<size_t>(m_unit);
         dict[scheduleKey] = schedule;
+        if (m_form != Form::Piecewise)
+        {
+            dict[scheduleFormKey] = static_cast<size_t>(m_form);
+            dict[scheduleParametersKey] = std::vector<DictionaryValue>({ m_initialValue, m_finalValue, m_duration, m_rate, m_warmup });
+        }
         return dict;
     }
 
@@ -363,6 +467,7 @@ namespace CNTK
 
     template <typename T>
     TrainingParameterSchedule<T>::TrainingParameterSchedule(const Dictionary& dictionary)
+        : m_form(Form::Piecewise), m_initialValue(0), m_finalValue(0), m_duration(0), m_rate(0), m_warmup(0)
     {
         m_unit = UnitType(dictionary[unitKey].Value<size_t>());
         m_epochSize = dictionary[epochSizeKey].Value<size_t>();
@@ -371,6 +476,17 @@ namespace CNTK
         {
             m_schedule[std::stoll(kv.first)] = kv.second.Value<T>();
         }
+
+        if (dictionary.Contains(scheduleFormKey))
+        {
+            m_form = Form(dictionary[scheduleFormKey].Value<size_t>());
+            const auto& parameters = dictionary[scheduleParametersKey].Value<std::vector<DictionaryValue>>();
+            m_initialValue = parameters[0].Value<double>();
+            m_finalValue = parameters[1].Value<double>();
+            m_duration = parameters[2].Value<size_t>();
+            m_rate = parameters[3].Value<double>();
+            m_warmup = parameters[4].Value<size_t>();
+        }
     }
 
     void MomentumAsTimeConstantSchedule::ConvertToPerSampleValues()
@@ -508,6 +624,21 @@ namespace CNTK
 
         return std::pair<size_t, size_t>(maxNumTimeSteps, numSequences);
     }
+    /*static*/ void Utils::Accumulate(const NDArrayViewPtr& value, const NDArrayViewPtr& accumulator)
+    {
+        if (value->GetDataType() != accumulator->GetDataType() || value->Shape() != accumulator->Shape())
+            LogicError("Utils::Accumulate: The DataType and Shape of the value (%s, %S) do not match those of the accumulator (%s, %S).",
+                       DataTypeName(value->GetDataType()), AsStringForErrorReporting(value->Shape()).c_str(),
+                       DataTypeName(accumulator->GetDataType()), AsStringForErrorReporting(accumulator->Shape()).c_str());
+
+        if (value->GetDataType() == DataType::Float)
+            Matrix<float>::ScaleAndAdd(1.0f, *value->GetMatrix<float>(), *accumulator->GetWritableMatrix<float>());
+        else if (value->GetDataType() == DataType::Double)
+            Matrix<double>::ScaleAndAdd(1.0, *value->GetMatrix<double>(), *accumulator->GetWritableMatrix<double>());
+        else
+            LogicError("Utils::Accumulate: Unsupported DataType %s.", DataTypeName(value->GetDataType()));
+    }
+
     /*static*/ void Utils::VerifyVariableValueCompatibility(const Variable& var, const ValuePtr& value)
     {
         if (var.GetDataType() != value->GetDataType())
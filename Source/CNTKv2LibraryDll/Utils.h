@@ -557,6 +557,9 @@ namespace CNTK
     public:
         static void VerifyVariableValueCompatibility(const Variable& var, const ValuePtr& value);
 
+        // Adds 'value' (dense or sparse) to the dense 'accumulator' of the same data type and shape.
+        static void Accumulate(const NDArrayViewPtr& value, const NDArrayViewPtr& accumulator);
+
         template <typename ElementType>
         static std::pair<std::shared_ptr<const Microsoft::MSR::CNTK::Matrix<ElementType>>, Microsoft::MSR::CNTK::MBLayoutPtr> GetCNTKImplMatrixAndMBLayoutFromValueObject(const Variable& var, const ValuePtr& value);
 
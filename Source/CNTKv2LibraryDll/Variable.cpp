@@ -459,7 +459,12 @@ namespace CNTK
 
             // TODO: this copying here is redundant, value should be moved from the dictionary to the variable.
             // Also, the correct device should be used upfront when deserializing NDArrayView.
-            Variable var(shape, kind, dataType, value.DeepClone(device, kind == VariableKind::Constant), needsGradient, dynamicAxis, isSparse, name, uid);
+            // Values mapped from a model file are used in place on the CPU (see Function::SaveModel).
+            // If they are read-only (see Function::LoadModel), so are the values of parameters.
+            bool readOnly = (kind == VariableKind::Constant) || value.IsReadOnly();
+            auto valueView = ((value.m_backingStore != nullptr) && (device.Type() == DeviceKind::CPU)) ?
+                value.Alias(readOnly) : value.DeepClone(device, readOnly);
+            Variable var(shape, kind, dataType, valueView, needsGradient, dynamicAxis, isSparse, name, uid);
             if (var.IsParameter())
                 return Parameter(var);
             else
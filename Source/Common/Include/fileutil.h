@@ -135,6 +135,12 @@ void fprintfOrDie(FILE* f, const char* format, ...);
 
 void fflushOrDie(FILE* f);
 
+// ----------------------------------------------------------------------------
+// fsyncOrDie(): like fsync() but terminate with err msg in case of error
+// ----------------------------------------------------------------------------
+
+void fsyncOrDie(FILE* f);
+
 // ----------------------------------------------------------------------------
 // filesize(): determine size of the file in bytes
 // ----------------------------------------------------------------------------
@@ -172,6 +178,13 @@ void unlinkOrDie(const std::wstring& pathname);
 void renameOrDie(const std::string& from, const std::string& to);
 void renameOrDie(const std::wstring& from, const std::wstring& to);
 
+// ----------------------------------------------------------------------------
+// replaceFileOrDie(): rename() over an existing file with error handling;
+// unlike renameOrDie(), the target is not deleted first, so it is replaced atomically
+// ----------------------------------------------------------------------------
+
+void replaceFileOrDie(const std::wstring& from, const std::wstring& to);
+
 // ----------------------------------------------------------------------------
 // fexists(): test if a file exists
 // ----------------------------------------------------------------------------
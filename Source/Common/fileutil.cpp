@@ -679,6 +679,17 @@ void renameOrDie(const std::wstring& from, const std::wstring& to)
 #endif
 }
 
+void replaceFileOrDie(const std::wstring& from, const std::wstring& to)
+{
+#ifdef _WIN32
+    if (!MoveFileExW(from.c_str(), to.c_str(), MOVEFILE_REPLACE_EXISTING | MOVEFILE_WRITE_THROUGH))
+        RuntimeError("error renaming file '%ls': %d", from.c_str(), GetLastError());
+#else
+    if (rename(wtocharpath(from.c_str()).c_str(), wtocharpath(to.c_str()).c_str()) != 0)
+        RuntimeError("error renaming file '%ls': %s", from.c_str(), strerror(errno));
+#endif
+}
+
 // ----------------------------------------------------------------------------
 // fputstring(): write a 0-terminated string
 // ----------------------------------------------------------------------------
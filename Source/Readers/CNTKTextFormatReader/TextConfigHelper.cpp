@@ -149,6 +149,8 @@ TextConfigHelper::TextConfigHelper(const ConfigParameters& config)
     m_chunkSizeBytes = config(L"chunkSizeInBytes", 32 * 1024 * 1024); // 32 MB by default
     m_keepDataInMemory = config(L"keepDataInMemory", false);
     m_frameMode = config(L"frameMode", false);
+    m_cacheIndex = config(L"cacheIndex", false);
+    m_compactIndex = config(L"compactIndex", false);
 }
 
 }}}
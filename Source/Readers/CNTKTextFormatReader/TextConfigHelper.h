@@ -37,6 +37,10 @@ public:
 
     bool ShouldKeepDataInMemory() const { return m_keepDataInMemory; }
 
+    bool ShouldCacheIndex() const { return m_cacheIndex; }
+
+    bool ShouldCompactIndex() const { return m_compactIndex; }
+
     bool IsInFrameMode() const { return m_frameMode; }
 
     ElementType GetElementType() const { return m_elementType; }
@@ -54,6 +58,8 @@ private:
     size_t m_chunkSizeBytes; // chunks size in bytes
     bool m_keepDataInMemory; // if true the whole dataset is kept in memory
     bool m_frameMode; // if true, the maximum expected sequence length in the dataset is one sample.
+    bool m_cacheIndex; // if true, the index of the input file is cached in a sidecar file.
+    bool m_compactIndex; // if true, only chunk metadata is kept in the index, sequences are rebuilt on demand.
 };
 
 } } }
@@ -42,6 +42,9 @@ public:
     // Gets sequences by id.
     void GetSequence(size_t sequenceId, std::vector<SequenceDataPtr>& result) override;
 
+    // Returns the size of the parsed values (and indices) of all sequences.
+    size_t SizeInBytes() const override;
+
     // A map from sequence ids to the sequence data.
     std::vector<SequenceBuffer> m_sequenceMap;
 
@@ -68,6 +71,8 @@ TextParser(corpus, helper.GetFilePath(), helper.GetStreams(), isPrimary)
     SetMaxAllowedErrors(helper.GetMaxAllowedErrors());
     SetChunkSize(helper.GetChunkSize());
     SetSkipSequenceIds(helper.ShouldSkipSequenceIds());
+    SetCacheIndex(helper.ShouldCacheIndex());
+    SetCompactIndex(helper.ShouldCompactIndex());
 
     Initialize();
 }
@@ -90,6 +95,9 @@ TextParser<ElemType>::TextParser(CorpusDescriptorPtr corpus, const std::wstring&
     m_hadWarnings(false),
     m_numAllowedErrors(0),
     m_skipSequenceIds(false),
+    m_cacheIndex(false),
+    m_compactIndex(false),
+    m_indexFile(nullptr),
     m_numRetries(5),
     m_corpus(corpus),
     m_isPrimary(isPrimary)
@@ -127,6 +135,11 @@ TextParser<ElemType>::~TextParser()
     {
         fclose(m_file);
     }
+
+    if (m_indexFile)
+    {
+        fclose(m_indexFile);
+    }
 }
 
 template <class ElemType>
@@ -169,6 +182,12 @@ void TextParser<ElemType>::Initialize()
         }
 
         m_indexer = make_unique<Indexer>(m_file, m_isPrimary, m_skipSequenceIds, NAME_PREFIX, m_chunkSizeBytes);
+        if (m_cacheIndex)
+        {
+            m_indexer->SetCacheFile(Indexer::GetDefaultCacheFile(m_filename));
+        }
+
+        m_indexer->SetCompact(m_compactIndex);
 
         m_indexer->Build(m_corpus);
     });
@@ -212,9 +231,29 @@ void TextParser<ElemType>::GetSequencesForChunk(ChunkIdType chunkId, std::vector
 {
     const auto& index = m_indexer->GetIndex();
     const auto& chunk = index.m_chunks[chunkId];
-    result.reserve(chunk.m_sequences.size());
+    result.reserve(chunk.m_numberOfSequences);
+
+    std::vector<SequenceDescriptor> sequences;
+    if (index.m_compact)
+    {
+        // This can be called while a chunk is loaded (e.g. prefetched by the randomizer),
+        // so the sequences are rebuilt using a separate handle of the input file.
+        std::lock_guard<std::mutex> lock(m_indexFileMutex);
+        attempt(m_numRetries, [this, &chunk, &sequences]()
+        {
+            if (m_indexFile == nullptr || ferror(m_indexFile) != 0)
+            {
+                if (m_indexFile != nullptr)
+                {
+                    fclose(m_indexFile);
+                }
+                m_indexFile = fopenOrDie(m_filename, L"rbS");
+            }
+            m_indexer->ReadSequences(m_indexFile, chunk, sequences);
+        });
+    }
 
-    for (auto const& s : chunk.m_sequences)
+    for (auto const& s : index.m_compact ? sequences : chunk.m_sequences)
     {
         result.push_back(
         {
@@ -243,6 +282,30 @@ void TextParser<ElemType>::TextDataChunk::GetSequence(size_t sequenceId, std::ve
     result.insert(result.end(), sequenceData.begin(), sequenceData.end());
 }
 
+template <class ElemType>
+size_t TextParser<ElemType>::TextDataChunk::SizeInBytes() const
+{
+    size_t size = 0;
+    for (const auto& sequenceData : m_sequenceMap)
+    {
+        for (size_t j = 0; j < sequenceData.size(); ++j)
+        {
+            if (m_parser->m_streamInfos[j].m_type == StorageType::dense)
+            {
+                const auto& data = static_cast<const DenseInputStreamBuffer&>(*sequenceData[j]);
+                size += data.m_buffer.size() * sizeof(ElemType);
+            }
+            else
+            {
+                const auto& data = static_cast<const SparseInputStreamBuffer&>(*sequenceData[j]);
+                size += data.m_buffer.size() * sizeof(ElemType) +
+                    (data.m_indicesBuffer.size() + data.m_nnzCounts.size()) * sizeof(IndexType);
+            }
+        }
+    }
+    return size;
+}
+
 template <class ElemType>
 ChunkPtr TextParser<ElemType>::GetChunk(ChunkIdType chunkId)
 {
@@ -265,8 +328,18 @@ ChunkPtr TextParser<ElemType>::GetChunk(ChunkIdType chunkId)
 template <class ElemType>
 void TextParser<ElemType>::LoadChunk(TextChunkPtr& chunk, const ChunkDescriptor& descriptor)
 {
-    chunk->m_sequenceMap.resize(descriptor.m_sequences.size());
-    for (const auto& sequenceDescriptor : descriptor.m_sequences)
+    std::vector<SequenceDescriptor> sequences;
+    bool compact = m_indexer->GetIndex().m_compact;
+    if (compact)
+    {
+        // Rebuild the sequences of the chunk, the file position is reset afterwards.
+        m_indexer->ReadSequences(m_file, descriptor, sequences);
+        SetFileOffset(descriptor.m_fileOffsetBytes);
+    }
+
+    const auto& descriptors = compact ? sequences : descriptor.m_sequences;
+    chunk->m_sequenceMap.resize(descriptors.size());
+    for (const auto& sequenceDescriptor : descriptors)
     {
         chunk->m_sequenceMap[sequenceDescriptor.m_id] = LoadSequence(sequenceDescriptor);
     }
@@ -1183,6 +1256,18 @@ void TextParser<ElemType>::SetChunkSize(size_t size)
     m_chunkSizeBytes = size;
 }
 
+template <class ElemType>
+void TextParser<ElemType>::SetCacheIndex(bool cacheIndex)
+{
+    m_cacheIndex = cacheIndex;
+}
+
+template <class ElemType>
+void TextParser<ElemType>::SetCompactIndex(bool compactIndex)
+{
+    m_compactIndex = compactIndex;
+}
+
 template <class ElemType>
 void TextParser<ElemType>::SetNumRetries(unsigned int numRetries)
 {
@@ -1203,14 +1288,13 @@ bool TextParser<ElemType>::GetSequenceDescriptionByKey(const KeyType& key, Seque
     if (m_isPrimary)
         LogicError("Matching by sequence key is not supported for primary deserilalizer.");
 
-    const auto& keys = m_indexer->GetIndex().m_keyToSequenceInChunk;
-    auto sequenceLocation = keys.find(key.m_sequence);
-    if (sequenceLocation == keys.end())
+    SequenceDescriptor sequence;
+    if (!m_indexer->GetIndex().TryGetSequenceByKey(key.m_sequence, sequence))
     {
         return false;
     }
 
-    result = m_indexer->GetIndex().m_chunks[sequenceLocation->second.first].m_sequences[sequenceLocation->second.second];
+    result = sequence;
     return true;
 }
 
@@ -10,6 +10,7 @@
 #include "TextConfigHelper.h"
 #include "Indexer.h"
 #include "CorpusDescriptor.h"
+#include <mutex>
 
 namespace Microsoft { namespace MSR { namespace CNTK {
 
@@ -120,6 +121,13 @@ private:
     bool m_hadWarnings;
     unsigned int m_numAllowedErrors;
     bool m_skipSequenceIds;
+    bool m_cacheIndex;
+    bool m_compactIndex;
+
+    // A separate handle of the input file, used to rebuild the sequences of chunks
+    // of a compact index in GetSequencesForChunk.
+    FILE* m_indexFile;
+    std::mutex m_indexFileMutex;
     unsigned int m_numRetries; // specifies the number of times an unsuccessful
     // file operation should be repeated (default value is 5).
 
@@ -193,6 +201,10 @@ private:
 
     void SetChunkSize(size_t size);
 
+    void SetCacheIndex(bool cacheIndex);
+
+    void SetCompactIndex(bool compactIndex);
+
     void SetNumRetries(unsigned int numRetries);
 
     friend class CNTKTextFormatReaderTestRunner<ElemType>;
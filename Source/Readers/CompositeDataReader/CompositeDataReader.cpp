@@ -13,6 +13,7 @@
 
 #include "CompositeDataReader.h"
 #include "Bundler.h"
+#include "ChunkCache.h"
 #include "BlockRandomizer.h"
 #include "NoRandomizer.h"
 #include "FramePacker.h"
@@ -91,6 +92,14 @@ CompositeDataReader::CompositeDataReader(const ConfigParameters& config) :
         deserializer = std::make_shared<Bundler>(config, deserializer, m_deserializers, cleanse);
     }
 
+    // Optionally caching chunks, up to the given number of bytes.
+    size_t chunkCacheSize = config(L"chunkCacheSizeInBytes", 0);
+    if (chunkCacheSize > 0)
+    {
+        m_chunkCache = std::make_shared<ChunkCache>(deserializer, chunkCacheSize);
+        deserializer = m_chunkCache;
+    }
+
     int verbosity = config(L"verbosity", 0);
 
     // Pick up the randomizer, always picking up no randomization for the write mode.
@@ -312,6 +321,11 @@ void CompositeDataReader::StartEpoch(const EpochConfiguration& cfg, const std::m
     ReaderBase::StartEpoch(config, inputDescriptions);
 }
 
+std::map<std::wstring, size_t> CompositeDataReader::GetStatistics()
+{
+    return m_chunkCache ? m_chunkCache->GetStatistics() : std::map<std::wstring, size_t>();
+}
+
 bool CompositeDataReader::ContainsDeserializer(const ConfigParameters& readerConfig, const wstring& type)
 {
     argvector<ConfigValue> deserializerConfigs =
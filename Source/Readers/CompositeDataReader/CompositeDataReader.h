@@ -30,6 +30,8 @@ typedef std::shared_ptr<MemoryProvider> MemoryProviderPtr;
 class CorpusDescriptor;
 typedef std::shared_ptr<CorpusDescriptor> CorpusDescriptorPtr;
 
+class ChunkCache;
+
 struct StreamDescription;
 typedef std::shared_ptr<StreamDescription> StreamDescriptionPtr;
 
@@ -63,6 +65,9 @@ public:
     // Starts a new epoch with the provided configuration
     void StartEpoch(const EpochConfiguration& config, const std::map<std::wstring, int>& inputDescriptions) override;
 
+    // Returns the statistics of the chunk cache, if any.
+    std::map<std::wstring, size_t> GetStatistics() override;
+
 private:
     void CreateDeserializers(const ConfigParameters& readerConfig);
     void CreateTransforms(const ConfigParameters& deserializerConfig);
@@ -94,6 +99,9 @@ private:
     // Corpus descriptor that is shared between deserializers.
     CorpusDescriptorPtr m_corpus;
 
+    // Chunk cache (on top of the deserializers), if enabled.
+    std::shared_ptr<ChunkCache> m_chunkCache;
+
     // Precision - "float" or "double".
     std::string m_precision;
 
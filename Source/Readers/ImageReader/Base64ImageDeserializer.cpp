@@ -198,15 +198,11 @@ namespace Microsoft { namespace MSR { namespace CNTK {
 
     bool Base64ImageDeserializer::GetSequenceDescriptionByKey(const KeyType& key, SequenceDescription& result)
     {
-        const auto& index = m_indexer->GetIndex();
-
-        const auto& keys = index.m_keyToSequenceInChunk;
-        auto sequenceLocation = keys.find(key.m_sequence);
-        if (sequenceLocation == keys.end())
+        SequenceDescriptor sequence;
+        if (!m_indexer->GetIndex().TryGetSequenceByKey(key.m_sequence, sequence))
             return false;
 
-        const auto& chunks = index.m_chunks;
-        result = chunks[sequenceLocation->second.first].m_sequences[sequenceLocation->second.second];
+        result = sequence;
         return true;
     }
 
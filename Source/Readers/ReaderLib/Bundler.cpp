@@ -290,6 +290,28 @@ public:
             m_innerChunks[currentIndex + i]->GetSequence(originalSequenceId, result);
         }
     }
+
+    // Sums up the sizes of the inner chunks (secondary chunks may be shared with other bundling chunks),
+    // or returns 0 if any of them does not know its size.
+    virtual size_t SizeInBytes() const override
+    {
+        std::set<Chunk*> innerChunks;
+        for (const auto& chunk : m_innerChunks)
+        {
+            if (chunk)
+                innerChunks.insert(chunk.get());
+        }
+
+        size_t size = 0;
+        for (auto chunk : innerChunks)
+        {
+            size_t chunkSize = chunk->SizeInBytes();
+            if (chunkSize == 0)
+                return 0;
+            size += chunkSize;
+        }
+        return size;
+    }
 };
 
 // Get chunk data by id.
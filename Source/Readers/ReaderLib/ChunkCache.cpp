@@ -9,18 +9,132 @@
 
 namespace Microsoft { namespace MSR { namespace CNTK {
 
+ChunkCache::ChunkCache(IDataDeserializerPtr deserializer, size_t maxSizeInBytes) :
+    m_deserializer(deserializer),
+    m_sampleSizeInBytes(0),
+    m_maxSizeInBytes(maxSizeInBytes),
+    m_sizeInBytes(0),
+    m_hits(0),
+    m_misses(0),
+    m_evictions(0)
+{
+    for (const auto& chunk : deserializer->GetChunkDescriptions())
+        m_chunkNumberOfSamples[chunk->m_id] = chunk->m_numberOfSamples;
+
+    // A sparse sample is assumed to have one non-zero value.
+    for (const auto& stream : deserializer->GetStreamDescriptions())
+    {
+        size_t elementSize = stream->m_elementType == ElementType::tdouble ? sizeof(double) :
+            stream->m_elementType == ElementType::tuchar ? sizeof(unsigned char) : sizeof(float);
+        if (stream->m_storageType == StorageType::dense)
+            m_sampleSizeInBytes += (stream->m_sampleLayout ? stream->m_sampleLayout->GetNumElements() : 1) * elementSize;
+        else
+            m_sampleSizeInBytes += elementSize + 2 * sizeof(IndexType);
+    }
+}
+
 ChunkPtr ChunkCache::GetChunk(ChunkIdType chunkId)
 {
-    auto it = m_chunkMap.find(chunkId);
-    if (it != m_chunkMap.end())
     {
-        return it->second;
+        std::lock_guard<std::mutex> lock(m_mutex);
+        auto chunk = FindChunk(chunkId);
+        if (chunk)
+        {
+            m_hits++;
+            return chunk;
+        }
+    }
+
+    // Cached chunks can be requested while a chunk is read.
+    std::lock_guard<std::mutex> readLock(m_readMutex);
+    {
+        // The chunk might have been read while this thread was waiting.
+        std::lock_guard<std::mutex> lock(m_mutex);
+        auto chunk = FindChunk(chunkId);
+        if (chunk)
+        {
+            m_hits++;
+            return chunk;
+        }
+        m_misses++;
     }
- 
+
     ChunkPtr chunk = m_deserializer->GetChunk(chunkId);
-    m_chunkMap[chunkId] = chunk;
- 
+    size_t size = GetSizeInBytes(chunkId, *chunk);
+
+    std::lock_guard<std::mutex> lock(m_mutex);
+    if (size > m_maxSizeInBytes)
+    {
+        // The chunk does not fit into the cache at all.
+        return chunk;
+    }
+
+    while (m_sizeInBytes + size > m_maxSizeInBytes)
+    {
+        EvictChunk();
+    }
+
+    m_usage.push_front(chunkId);
+    m_chunkMap[chunkId] = CachedChunk{ chunk, size, m_usage.begin() };
+    m_sizeInBytes += size;
+
     return chunk;
 }
 
+ChunkPtr ChunkCache::FindChunk(ChunkIdType chunkId)
+{
+    auto it = m_chunkMap.find(chunkId);
+    if (it == m_chunkMap.end())
+        return nullptr;
+
+    m_usage.splice(m_usage.begin(), m_usage, it->second.m_usage);
+    return it->second.m_chunk;
+}
+
+void ChunkCache::EvictChunk()
+{
+    assert(!m_usage.empty());
+
+    // Evict the least recently used chunk that is not in use anymore,
+    // or the least recently used chunk if all are in use.
+    auto victim = std::prev(m_usage.end());
+    for (auto it = m_usage.rbegin(); it != m_usage.rend(); ++it)
+    {
+        if (m_chunkMap.at(*it).m_chunk.use_count() == 1)
+        {
+            victim = std::prev(it.base());
+            break;
+        }
+    }
+
+    auto cached = m_chunkMap.find(*victim);
+    m_sizeInBytes -= cached->second.m_sizeInBytes;
+    m_chunkMap.erase(cached);
+    m_usage.erase(victim);
+    m_evictions++;
+}
+
+size_t ChunkCache::GetSizeInBytes(ChunkIdType chunkId, const Chunk& chunk) const
+{
+    size_t size = chunk.SizeInBytes();
+    if (size != 0)
+        return size;
+
+    auto it = m_chunkNumberOfSamples.find(chunkId);
+    return it != m_chunkNumberOfSamples.end() ? it->second * m_sampleSizeInBytes : 0;
+}
+
+std::map<std::wstring, size_t> ChunkCache::GetStatistics() const
+{
+    std::lock_guard<std::mutex> lock(m_mutex);
+    return
+    {
+        { L"chunkCacheHits", m_hits },
+        { L"chunkCacheMisses", m_misses },
+        { L"chunkCacheEvictions", m_evictions },
+        { L"chunkCacheChunks", m_chunkMap.size() },
+        { L"chunkCacheSizeInBytes", m_sizeInBytes },
+    };
+}
+
 } } }
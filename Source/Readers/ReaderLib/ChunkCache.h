@@ -5,22 +5,29 @@
 
 #pragma once
 
+#include <list>
 #include <map>
+#include <mutex>
+#include <unordered_map>
 #include "DataDeserializer.h"
 
 namespace Microsoft { namespace MSR { namespace CNTK {
 
-// A cache to store the complete dataset (all chunks) in memory. The caching can
-// be switched on/off by a boolean flag in the reader config section, independent 
-// of the randomization and chunking parameters. The caching should only be enabled 
-// when the whole dataset fits in memory.
+// A cache of chunks, independent of the randomization and chunking parameters.
 // Implemented as a wrapping proxy around a deserializer that stores pointers to
-// all chunks it sees in an internal map.
+// the chunks it sees in an internal map.
+// The cache is bounded by a budget in bytes. The size of a chunk is reported by the chunk
+// (Chunk::SizeInBytes), or estimated from the number of its samples and the sample layouts
+// of the streams, without loading its sequences. When a new chunk does not fit into the budget,
+// cached chunks are evicted in least recently used order, except that chunks which are
+// still in use (i.e. by the randomizer, for the sequences of its randomization window)
+// are evicted last: evicting them would not free their memory, and they will be requested again soon.
+// With an unlimited budget, the complete dataset is cached; this should only be used
+// when the whole dataset fits in memory.
 class ChunkCache : public IDataDeserializer
 {
 public:
-
-    ChunkCache(IDataDeserializerPtr deserializer) : m_deserializer(deserializer) { }
+    ChunkCache(IDataDeserializerPtr deserializer, size_t maxSizeInBytes = SIZE_MAX);
 
     virtual std::vector<StreamDescriptionPtr> GetStreamDescriptions() const override
     {
@@ -45,11 +52,53 @@ public:
     // Gets chunk data given its id.
     virtual ChunkPtr GetChunk(ChunkIdType chunkId);
 
+    // Returns the statistics of the cache (number of hits, misses and evictions,
+    // number and size of the cached chunks), by name.
+    std::map<std::wstring, size_t> GetStatistics() const;
+
 private:
-    // A map of currently loaded chunks
-    std::map<size_t, ChunkPtr> m_chunkMap;
+    struct CachedChunk
+    {
+        ChunkPtr m_chunk;
+        size_t m_sizeInBytes;
+        std::list<ChunkIdType>::iterator m_usage; // position in m_usage
+    };
+
+    // Returns the approximate size of the chunk data in bytes.
+    size_t GetSizeInBytes(ChunkIdType chunkId, const Chunk& chunk) const;
+
+    // Looks up a cached chunk and marks it as the most recently used one; requires m_mutex.
+    ChunkPtr FindChunk(ChunkIdType chunkId);
+
+    // Evicts a chunk to make room for a new one.
+    void EvictChunk();
+
     IDataDeserializerPtr m_deserializer;
 
+    // Number of samples of each chunk, and the estimated size of a sample of all streams,
+    // for chunks that do not report their size.
+    std::unordered_map<ChunkIdType, size_t> m_chunkNumberOfSamples;
+    size_t m_sampleSizeInBytes;
+
+    // A map of currently cached chunks
+    std::unordered_map<ChunkIdType, CachedChunk> m_chunkMap;
+
+    // Ids of the cached chunks, the most recently used first.
+    std::list<ChunkIdType> m_usage;
+
+    const size_t m_maxSizeInBytes;
+    size_t m_sizeInBytes;
+
+    size_t m_hits;
+    size_t m_misses;
+    size_t m_evictions;
+
+    // Chunks can be requested (prefetched) and statistics read on different threads.
+    // m_mutex guards the cache; it is not held while a chunk is read from the deserializer,
+    // which is serialized by m_readMutex instead.
+    mutable std::mutex m_mutex;
+    std::mutex m_readMutex;
+
     DISABLE_COPY_AND_MOVE(ChunkCache);
 };
 
@@ -120,6 +120,13 @@ public:
     // deallocated till all its sequences are released.
     virtual void GetSequence(size_t sequenceId, std::vector<SequenceDataPtr>& result) = 0;
 
+    // Returns the approximate size of the data of the chunk in memory, in bytes,
+    // or 0 if the chunk cannot tell without loading or decoding its sequences.
+    virtual size_t SizeInBytes() const
+    {
+        return 0;
+    }
+
     virtual ~Chunk() {};
 
 protected:
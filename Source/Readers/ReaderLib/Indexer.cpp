@@ -6,6 +6,7 @@
 #define __STDC_FORMAT_MACROS
 #define _CRT_SECURE_NO_WARNINGS
 #include <inttypes.h>
+#include <limits>
 #include "Indexer.h"
 
 using std::string;
@@ -14,6 +15,265 @@ const static char ROW_DELIMITER = '\n';
 
 namespace Microsoft { namespace MSR { namespace CNTK {
 
+// The index cache file consists of a header, followed by one record per sequence
+// of the input file (in file order). It stores the result of the scan of the input
+// file rather than the index itself, so that it does not depend on the corpus
+// descriptor or the chunk size: the index is rebuilt by replaying the records.
+static const char IndexCacheMarker[] = { 'C', 'N', 'T', 'K', 'I', 'D', 'X', 0x01 };
+static const uint32_t IndexCacheVersion = 1;
+
+// Number of bytes at the beginning and at the end of the input file that are
+// hashed to detect changes of the input file that leave its size and modification time intact.
+static const size_t IndexCacheHashedBytes = 1024 * 1024;
+
+enum IndexCacheFlags : uint32_t
+{
+    HasSequenceIds = 1,
+    SkipSequenceIds = 2,
+};
+
+struct IndexCacheHeader
+{
+    char m_marker[sizeof(IndexCacheMarker)];
+    uint32_t m_version;
+    uint32_t m_flags;
+    uint64_t m_fileSize;
+    int64_t m_fileModificationTime;
+    uint64_t m_contentHash;
+    int64_t m_firstSequenceOffset;   // file offset of the first sequence (i.e., after the BOM)
+    uint64_t m_numberOfSequences;
+    char m_streamPrefix;
+    char m_reserved[7];
+};
+
+static_assert(sizeof(IndexCacheHeader) == 64, "Unexpected size of the index cache header.");
+
+struct IndexCacheRecord
+{
+    uint64_t m_key;
+    uint64_t m_byteSize;
+    uint64_t m_numberOfSamples;
+};
+
+static_assert(sizeof(IndexCacheRecord) == 24, "Unexpected size of the index cache record.");
+
+// Updates the FNV-1a hash with the specified bytes.
+static uint64_t HashBytes(uint64_t hash, const char* data, size_t size)
+{
+    for (size_t i = 0; i < size; ++i)
+    {
+        hash ^= (unsigned char)data[i];
+        hash *= 1099511628211ULL;
+    }
+    return hash;
+}
+
+// Describes the input file in a cache header: size, modification time and
+// a hash of its first and last bytes. Restores the current position in the file.
+static IndexCacheHeader DescribeInputFile(FILE* file)
+{
+    IndexCacheHeader header = {};
+    memcpy(header.m_marker, IndexCacheMarker, sizeof(IndexCacheMarker));
+    header.m_version = IndexCacheVersion;
+
+#ifdef _WIN32
+    struct _stat64 status;
+    if (_fstat64(_fileno(file), &status) != 0)
+#else
+    struct stat status;
+    if (fstat(fileno(file), &status) != 0)
+#endif
+    {
+        RuntimeError("Could not retrieve the size and modification time of the input file.");
+    }
+
+    header.m_fileSize = status.st_size;
+    header.m_fileModificationTime = status.st_mtime;
+
+    int64_t position = _ftelli64(file);
+    if (position == -1L)
+    {
+        RuntimeError("Error retrieving current position in the input file.");
+    }
+
+    std::vector<char> buffer(IndexCacheHashedBytes);
+    uint64_t hash = 14695981039346656037ULL;
+    auto hashRange = [&](int64_t offset, size_t size)
+    {
+        if (_fseeki64(file, offset, SEEK_SET) != 0)
+        {
+            RuntimeError("Error seeking to position %" PRId64 " in the input file.", offset);
+        }
+
+        size_t bytesRead = fread(buffer.data(), 1, size, file);
+        if (bytesRead != size)
+        {
+            RuntimeError("Could not read from the input file.");
+        }
+
+        hash = HashBytes(hash, buffer.data(), size);
+    };
+
+    if (header.m_fileSize <= 2 * IndexCacheHashedBytes)
+    {
+        hashRange(0, header.m_fileSize);
+    }
+    else
+    {
+        hashRange(0, IndexCacheHashedBytes);
+        hashRange(header.m_fileSize - IndexCacheHashedBytes, IndexCacheHashedBytes);
+    }
+
+    header.m_contentHash = hash;
+
+    if (_fseeki64(file, position, SEEK_SET) != 0)
+    {
+        RuntimeError("Error seeking to position %" PRId64 " in the input file.", position);
+    }
+
+    return header;
+}
+
+// Writes the index cache while the input file is scanned. The cache is written to
+// a temporary file, which replaces the cache file only once the scan is complete.
+// Failures are reported as warnings, the index cache is only an optimization.
+class IndexCacheWriter
+{
+public:
+    IndexCacheWriter(const std::wstring& cacheFile, const IndexCacheHeader& header) :
+        m_cacheFile(cacheFile),
+        m_temporaryFile(cacheFile + L".tmp" + std::to_wstring(GetCurrentProcessId())),
+        m_file(nullptr),
+        m_header(header),
+        m_nextOffset(-1)
+    {
+        try
+        {
+            m_file = fopenOrDie(m_temporaryFile, L"wb");
+            fwriteOrDie(&m_header, sizeof(m_header), 1, m_file);
+        }
+        catch (const std::exception& e)
+        {
+            Discard(e);
+        }
+    }
+
+    ~IndexCacheWriter()
+    {
+        if (m_file != nullptr)
+        {
+            fclose(m_file);
+            _wunlink(m_temporaryFile.c_str());
+        }
+    }
+
+    // Records a sequence of the input file.
+    void Add(size_t key, const SequenceDescriptor& sd)
+    {
+        if (m_file == nullptr)
+        {
+            return;
+        }
+
+        if (m_nextOffset == -1)
+        {
+            m_header.m_firstSequenceOffset = sd.m_fileOffsetBytes;
+        }
+        else if (m_nextOffset != sd.m_fileOffsetBytes)
+        {
+            // The records only store the sizes of the sequences, which must be contiguous.
+            Discard(std::runtime_error("sequences are not contiguous"));
+            return;
+        }
+
+        m_nextOffset = sd.m_fileOffsetBytes + sd.m_byteSize;
+        m_records.push_back({ key, sd.m_byteSize, sd.m_numberOfSamples });
+        m_header.m_numberOfSequences++;
+        if (m_records.size() == RecordsPerWrite)
+        {
+            Flush();
+        }
+    }
+
+    // Completes the cache file, the input file has been scanned.
+    void Commit(bool hasSequenceIds)
+    {
+        if (m_file == nullptr)
+        {
+            return;
+        }
+
+        if (hasSequenceIds)
+        {
+            m_header.m_flags |= IndexCacheFlags::HasSequenceIds;
+        }
+
+        Flush();
+
+        try
+        {
+            if (_fseeki64(m_file, 0, SEEK_SET) != 0)
+            {
+                RuntimeError("error seeking in the index cache file");
+            }
+            fwriteOrDie(&m_header, sizeof(m_header), 1, m_file);
+            fflushOrDie(m_file);
+            fclose(m_file);
+            m_file = nullptr;
+            renameOrDie(m_temporaryFile, m_cacheFile);
+        }
+        catch (const std::exception& e)
+        {
+            Discard(e);
+        }
+    }
+
+private:
+    static const size_t RecordsPerWrite = 64 * 1024;
+
+    void Flush()
+    {
+        if (m_file == nullptr || m_records.empty())
+        {
+            return;
+        }
+
+        try
+        {
+            fwriteOrDie(m_records.data(), sizeof(IndexCacheRecord), m_records.size(), m_file);
+            m_records.clear();
+        }
+        catch (const std::exception& e)
+        {
+            Discard(e);
+        }
+    }
+
+    void Discard(const std::exception& e)
+    {
+        fprintf(stderr, "WARNING: Could not write the index cache file '%ls' (%s), the index is not cached.\n",
+            m_cacheFile.c_str(), e.what());
+
+        if (m_file != nullptr)
+        {
+            fclose(m_file);
+            m_file = nullptr;
+        }
+
+        _wunlink(m_temporaryFile.c_str());
+        m_records.clear();
+    }
+
+    std::wstring m_cacheFile;
+    std::wstring m_temporaryFile;
+    FILE* m_file;
+    IndexCacheHeader m_header;
+    int64_t m_nextOffset;
+    std::vector<IndexCacheRecord> m_records;
+
+    DISABLE_COPY_AND_MOVE(IndexCacheWriter);
+};
+
 Indexer::Indexer(FILE* file, bool isPrimary, bool skipSequenceIds, char streamPrefix, size_t chunkSize, size_t bufferSize) :
     m_streamPrefix(streamPrefix),
     m_bufferSize(bufferSize),
@@ -25,6 +285,7 @@ Indexer::Indexer(FILE* file, bool isPrimary, bool skipSequenceIds, char streamPr
     m_bufferEnd(nullptr),
     m_pos(nullptr),
     m_done(false),
+    m_fileOffsetLimit(std::numeric_limits<int64_t>::max()),
     m_hasSequenceIds(!skipSequenceIds),
     m_index(chunkSize, isPrimary)
 {
@@ -34,11 +295,16 @@ Indexer::Indexer(FILE* file, bool isPrimary, bool skipSequenceIds, char streamPr
     }
 }
 
+Indexer::~Indexer()
+{
+}
+
 void Indexer::RefillBuffer()
 {
     if (!m_done)
     {
-        size_t bytesRead = fread(m_buffer.get(), 1, m_bufferSize, m_file);
+        size_t bytesToRead = (size_t)std::min<int64_t>(m_bufferSize, m_fileOffsetLimit - m_fileOffsetEnd);
+        size_t bytesRead = bytesToRead > 0 ? fread(m_buffer.get(), 1, bytesToRead, m_file) : 0;
         if (bytesRead == (size_t)-1)
             RuntimeError("Could not read from the input file.");
         if (bytesRead == 0)
@@ -56,11 +322,11 @@ void Indexer::RefillBuffer()
     }
 }
 
-void Indexer::BuildFromLines(CorpusDescriptorPtr corpus)
+void Indexer::BuildFromLines(CorpusDescriptorPtr corpus, size_t firstLine)
 {
     assert(m_pos == m_bufferStart);
     m_hasSequenceIds = false;
-    size_t lines = 0;
+    size_t lines = firstLine;
     int64_t offset = GetFileOffset();
     while (!m_done)
     {
@@ -102,7 +368,147 @@ void Indexer::Build(CorpusDescriptorPtr corpus)
     }
 
     m_index.Reserve(filesize(m_file));
+    m_corpus = corpus;
 
+    if (m_cacheFile.empty())
+    {
+        BuildFromFile(corpus);
+    }
+    else
+    {
+        BuildWithCache(corpus);
+    }
+
+    m_index.Sort();
+}
+
+void Indexer::BuildWithCache(CorpusDescriptorPtr corpus)
+{
+    IndexCacheHeader header = DescribeInputFile(m_file);
+    header.m_streamPrefix = m_streamPrefix;
+    if (!m_hasSequenceIds)
+    {
+        header.m_flags |= IndexCacheFlags::SkipSequenceIds;
+    }
+
+    if (TryBuildFromCache(corpus, header))
+    {
+        // Leave the input file where a scan would have left it.
+        if (_fseeki64(m_file, 0, SEEK_END) != 0)
+        {
+            RuntimeError("Error seeking to the end of the input file.");
+        }
+        return;
+    }
+
+    m_cacheWriter = make_unique<IndexCacheWriter>(m_cacheFile, header);
+    BuildFromFile(corpus);
+    m_cacheWriter->Commit(m_hasSequenceIds);
+    m_cacheWriter.reset();
+}
+
+bool Indexer::TryBuildFromCache(CorpusDescriptorPtr corpus, const IndexCacheHeader& expected)
+{
+    if (!fexists(m_cacheFile))
+    {
+        return false;
+    }
+
+    FILE* cache = fopenOrDie(m_cacheFile, L"rbS");
+    auto closeCache = [](FILE* f) { fclose(f); };
+    std::unique_ptr<FILE, decltype(closeCache)> cacheGuard(cache, closeCache);
+
+    IndexCacheHeader header;
+    if (fread(&header, sizeof(header), 1, cache) != 1 ||
+        memcmp(header.m_marker, expected.m_marker, sizeof(header.m_marker)) != 0 ||
+        header.m_version != expected.m_version ||
+        header.m_fileSize != expected.m_fileSize ||
+        header.m_fileModificationTime != expected.m_fileModificationTime ||
+        header.m_contentHash != expected.m_contentHash ||
+        (header.m_flags & IndexCacheFlags::SkipSequenceIds) != (expected.m_flags & IndexCacheFlags::SkipSequenceIds) ||
+        header.m_streamPrefix != expected.m_streamPrefix ||
+        filesize(cache) != sizeof(header) + header.m_numberOfSequences * sizeof(IndexCacheRecord))
+    {
+        // Stale or invalid cache, it is rewritten after the input file is scanned.
+        return false;
+    }
+
+    std::vector<IndexCacheRecord> records(std::min<uint64_t>(header.m_numberOfSequences, 64 * 1024));
+    int64_t offset = header.m_firstSequenceOffset;
+    for (uint64_t remaining = header.m_numberOfSequences; remaining > 0;)
+    {
+        size_t count = (size_t)std::min<uint64_t>(remaining, records.size());
+        freadOrDie(records.data(), sizeof(IndexCacheRecord), count, cache);
+        for (size_t i = 0; i < count; ++i)
+        {
+            SequenceDescriptor sd = {};
+            sd.m_fileOffsetBytes = offset;
+            sd.m_byteSize = records[i].m_byteSize;
+            sd.m_numberOfSamples = (uint32_t)records[i].m_numberOfSamples;
+            AddSequenceIfIncluded(corpus, records[i].m_key, sd);
+            offset += records[i].m_byteSize;
+        }
+        remaining -= count;
+    }
+
+    if (offset != (int64_t)header.m_fileSize)
+    {
+        // The records do not cover the input file.
+        m_index.Clear();
+        m_index.Reserve(header.m_fileSize);
+        return false;
+    }
+
+    m_hasSequenceIds = (header.m_flags & IndexCacheFlags::HasSequenceIds) != 0;
+    return true;
+}
+
+void Indexer::ReadSequences(FILE* file, const ChunkDescriptor& chunk, std::vector<SequenceDescriptor>& result) const
+{
+    if (!m_index.m_compact)
+    {
+        result = chunk.m_sequences;
+        return;
+    }
+
+    result.clear();
+    if (chunk.m_numberOfSequences == 0)
+    {
+        return;
+    }
+
+    if (_fseeki64(file, chunk.m_fileOffsetBytes, SEEK_SET) != 0)
+    {
+        RuntimeError("Error seeking to position %" PRId64 " in the input file.", chunk.m_fileOffsetBytes);
+    }
+
+    // Scan the chunk the same way the whole input file was scanned, into a single chunk.
+    size_t chunkSize = chunk.m_fileEndOffsetBytes - chunk.m_fileOffsetBytes;
+    Indexer scanner(file, true, !m_hasSequenceIds, m_streamPrefix, SIZE_MAX, std::min(m_bufferSize, chunkSize));
+    scanner.m_fileOffsetStart = chunk.m_fileOffsetBytes;
+    scanner.m_fileOffsetEnd = chunk.m_fileOffsetBytes;
+    scanner.m_fileOffsetLimit = chunk.m_fileEndOffsetBytes;
+    scanner.m_index.Reserve(chunkSize);
+    scanner.BuildFromFile(m_corpus, chunk.m_firstSequenceId);
+
+    auto& sequences = scanner.m_index.m_chunks.front().m_sequences;
+    if (sequences.size() != chunk.m_numberOfSequences)
+    {
+        RuntimeError("Unexpected number of sequences in chunk %u (%" PRIu64 " instead of %" PRIu64 "), "
+            "the input file was modified after it was indexed.",
+            chunk.m_id, (uint64_t)sequences.size(), (uint64_t)chunk.m_numberOfSequences);
+    }
+
+    for (auto& sequence : sequences)
+    {
+        sequence.m_chunkId = chunk.m_id;
+    }
+
+    result = std::move(sequences);
+}
+
+void Indexer::BuildFromFile(CorpusDescriptorPtr corpus, size_t firstLine)
+{
     RefillBuffer(); // read the first block of data
     if (m_done)
     {
@@ -122,7 +528,7 @@ void Indexer::Build(CorpusDescriptorPtr corpus)
     if (!m_hasSequenceIds || m_bufferStart[0] == m_streamPrefix)
     {
         // skip sequence id parsing, treat lines as individual sequences
-        BuildFromLines(corpus);
+        BuildFromLines(corpus, firstLine);
         return;
     }
 
@@ -163,12 +569,21 @@ void Indexer::Build(CorpusDescriptorPtr corpus)
 
 void Indexer::AddSequenceIfIncluded(CorpusDescriptorPtr corpus, size_t sequenceId, SequenceDescriptor& sd)
 {
+    if (m_cacheWriter)
+    {
+        m_cacheWriter->Add(sequenceId, sd);
+    }
+
     auto key = std::to_string(sequenceId);
     if (corpus->IsIncluded(key))
     {
         sd.m_key.m_sequence = corpus->KeyToId(key);
         sd.m_key.m_sample = 0;
         m_index.AddSequence(sd);
+        if (sd.m_id == 0)
+        {
+            m_index.m_chunks.back().m_firstSequenceId = sequenceId;
+        }
     }
 }
 
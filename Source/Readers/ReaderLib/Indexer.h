@@ -7,6 +7,7 @@
 
 #include <stdint.h>
 #include <vector>
+#include <algorithm>
 #include "DataDeserializer.h"
 #include "CorpusDescriptor.h"
 
@@ -32,15 +33,30 @@ struct SequenceDescriptor : SequenceDescription
 // some user-specified size.
 struct ChunkDescriptor : ChunkDescription
 {
-    ChunkDescriptor() : ChunkDescription({}), m_byteSize(0) {}
-    // TODO: if we don't want to keep the whole index
-    // (metadata for all sequences in memory), we should not
-    // leave this empty when building a chunk index, and only
-    // fill it out when the chunk needs to be loaded
-    // (the indexer will have to do a second pass for this chunk).
+    ChunkDescriptor() : ChunkDescription({}), m_byteSize(0),
+        m_fileOffsetBytes(0), m_fileEndOffsetBytes(0), m_firstSequenceId(0)
+    {
+    }
+    // Sequences of the chunk. Empty in a compact index (see Index::m_compact), where
+    // the sequences are rebuilt from the input file when the chunk is needed
+    // (see Indexer::ReadSequences).
     std::vector<SequenceDescriptor> m_sequences;
 
     size_t m_byteSize; // size in bytes
+    int64_t m_fileOffsetBytes; // offset of the first sequence in the input file (in bytes)
+    int64_t m_fileEndOffsetBytes; // offset of the end of the last sequence in the input file (in bytes)
+    size_t m_firstSequenceId; // id (or line number) of the first sequence in the input file
+};
+
+// Location of a sequence in the index, used to look up sequences by key.
+struct SequenceLocation
+{
+    size_t m_key;
+    ChunkIdType m_chunkId;
+    uint32_t m_numberOfSamples;
+    size_t m_indexInChunk;
+
+    bool operator<(const SequenceLocation& other) const { return m_key < other.m_key; }
 };
 
 typedef shared_ptr<ChunkDescriptor> ChunkDescriptorPtr;
@@ -52,11 +68,12 @@ typedef shared_ptr<ChunkDescriptor> ChunkDescriptorPtr;
 struct Index
 {
     std::vector<ChunkDescriptor> m_chunks;                                  // chunks
-    std::map<size_t, std::pair<size_t, size_t>> m_keyToSequenceInChunk;     // sequence key -> sequence location in chunk
+    std::vector<SequenceLocation> m_keyToSequenceInChunk;                   // sequence locations, sorted by key (see Sort)
     const size_t m_maxChunkSize;                                            // maximum chunk size in bytes
     bool m_isPrimary;                                                       // index for primary deserializer
+    bool m_compact;                                                         // only chunk metadata is kept, no sequences
 
-    Index(size_t chunkSize, bool isPrimary) : m_maxChunkSize(chunkSize), m_isPrimary(isPrimary)
+    Index(size_t chunkSize, bool isPrimary, bool compact = false) : m_maxChunkSize(chunkSize), m_isPrimary(isPrimary), m_compact(compact)
     {}
 
     // Adds sequence (metadata) to the index. Additionally, it
@@ -80,18 +97,73 @@ struct Index
             }
         }
 
+        if (chunk->m_numberOfSequences == 0)
+        {
+            chunk->m_fileOffsetBytes = sd.m_fileOffsetBytes;
+        }
+
+        chunk->m_fileEndOffsetBytes = sd.m_fileOffsetBytes + sd.m_byteSize;
         chunk->m_byteSize += sd.m_byteSize;
+        sd.m_chunkId = chunk->m_id;
+        sd.m_id = chunk->m_numberOfSequences;
         chunk->m_numberOfSequences++;
         chunk->m_numberOfSamples += sd.m_numberOfSamples;
-        sd.m_chunkId = chunk->m_id;
-        sd.m_id = chunk->m_sequences.size();
         if (!m_isPrimary)
         {
-            auto location = std::make_pair(chunk->m_id, sd.m_id);
-            auto sequenceId = sd.m_key.m_sequence;
-            m_keyToSequenceInChunk.insert(std::make_pair(sequenceId, location));
+            m_keyToSequenceInChunk.push_back({ sd.m_key.m_sequence, sd.m_chunkId, sd.m_numberOfSamples, sd.m_id });
+        }
+
+        if (!m_compact)
+        {
+            chunk->m_sequences.push_back(sd);
         }
-        chunk->m_sequences.push_back(sd);
+    }
+
+    // Sorts the sequence locations by key, must be called once all sequences are added.
+    // If a key occurs more than once, the first sequence with this key is looked up.
+    void Sort()
+    {
+        std::stable_sort(m_keyToSequenceInChunk.begin(), m_keyToSequenceInChunk.end());
+        m_keyToSequenceInChunk.shrink_to_fit();
+    }
+
+    // Looks up the sequence with the specified key. In a compact index, only the
+    // fields of the SequenceDescription are filled in (not the file offset and size).
+    bool TryGetSequenceByKey(size_t key, SequenceDescriptor& result) const
+    {
+        SequenceLocation location = {};
+        location.m_key = key;
+        auto found = std::lower_bound(m_keyToSequenceInChunk.begin(), m_keyToSequenceInChunk.end(), location);
+        if (found == m_keyToSequenceInChunk.end() || found->m_key != key)
+        {
+            return false;
+        }
+
+        if (!m_compact)
+        {
+            result = m_chunks[found->m_chunkId].m_sequences[found->m_indexInChunk];
+            return true;
+        }
+
+        result = {};
+        result.m_id = found->m_indexInChunk;
+        result.m_numberOfSamples = found->m_numberOfSamples;
+        result.m_chunkId = found->m_chunkId;
+        result.m_key.m_sequence = key;
+        result.m_key.m_sample = 0;
+        return true;
+    }
+
+    // Returns an estimate of the memory used by the index (in bytes).
+    size_t GetMemorySize() const
+    {
+        size_t size = sizeof(*this) + m_chunks.capacity() * sizeof(ChunkDescriptor) +
+            m_keyToSequenceInChunk.capacity() * sizeof(SequenceLocation);
+        for (const auto& chunk : m_chunks)
+        {
+            size += chunk.m_sequences.capacity() * sizeof(SequenceDescriptor);
+        }
+        return size;
     }
 
     // Reserves inner structures for the specified number of bytes.
@@ -111,9 +183,19 @@ struct Index
         return m_chunks.empty();
     }
 
+    // Removes all chunks and sequences.
+    void Clear()
+    {
+        m_chunks.clear();
+        m_keyToSequenceInChunk.clear();
+    }
+
     DISABLE_COPY_AND_MOVE(Index);
 };
 
+struct IndexCacheHeader;
+class IndexCacheWriter;
+
 // A helper class that does a pass over the input file building up
 // an index consisting of sequence and chunk descriptors (which among 
 // others specify size and file offset of the respective structure).
@@ -124,10 +206,32 @@ class Indexer
 public:
     Indexer(FILE* file, bool isPrimary, bool skipSequenceIds = false, char streamPrefix = '|', size_t chunkSize = 32 * 1024 * 1024, size_t bufferSize = 2 * 1024 * 1024);
 
+    ~Indexer();
+
     // Reads the input file, building and index of chunks and corresponding
     // sequences.
     void Build(CorpusDescriptorPtr corpus);
 
+    // Enables a persistent cache of the index in the specified (sidecar) file.
+    // Build() then reuses the cached index if it matches the input file (size,
+    // modification time and a hash of its content), and otherwise scans the
+    // input file and writes the index to the cache file.
+    void SetCacheFile(const std::wstring& cacheFile) { m_cacheFile = cacheFile; }
+
+    // Returns the default index cache file of the specified input file.
+    static std::wstring GetDefaultCacheFile(const std::wstring& inputFile) { return inputFile + L".cntkidx"; }
+
+    // Enables the compact index, which only keeps chunk metadata in memory (plus the
+    // sequence locations needed to look up sequences by key in a secondary deserializer).
+    // The sequences of a chunk are then rebuilt when needed (see ReadSequences).
+    // Must be called before Build().
+    void SetCompact(bool compact) { m_index.m_compact = compact; }
+
+    // Retrieves the sequences of a chunk. In a compact index, the sequences are rebuilt
+    // by scanning the chunk in the specified input file (which may be a different
+    // handle of the input file than the one that was indexed). Moves the position in this file.
+    void ReadSequences(FILE* file, const ChunkDescriptor& chunk, std::vector<SequenceDescriptor>& result) const;
+
     // Returns input data index (chunk and sequence metadata)
     const Index& GetIndex() const { return m_index; }
 
@@ -150,6 +254,8 @@ private:
 
     bool m_done; // true, when all input was processed
 
+    int64_t m_fileOffsetLimit; // offset at which the scan stops (the end of the chunk when rebuilding its sequences)
+
     bool m_hasSequenceIds; // true, when input contains one sequence per line 
                            // or when sequence id column was ignored during indexing.
 
@@ -158,9 +264,29 @@ private:
 
     const char m_streamPrefix;
 
+    // index cache file, empty if the index is not cached.
+    std::wstring m_cacheFile;
+
+    // writes the index cache while the input file is scanned.
+    std::unique_ptr<IndexCacheWriter> m_cacheWriter;
+
+    // corpus the index was built for, kept to rebuild the sequences of chunks in a compact index.
+    CorpusDescriptorPtr m_corpus;
+
     // Same function as above but with check that the sequence is included in the corpus descriptor.
     void AddSequenceIfIncluded(CorpusDescriptorPtr corpus, size_t sequenceKey, SequenceDescriptor& sd);
 
+    // Builds the index from the cache file, or scans the input file and writes the cache file.
+    void BuildWithCache(CorpusDescriptorPtr corpus);
+
+    // Scans the input file, building the index. The first sequence
+    // gets the line number 'firstLine' if the input file has no sequence ids.
+    void BuildFromFile(CorpusDescriptorPtr corpus, size_t firstLine = 0);
+
+    // Builds the index from the cache file, if it exists and matches the input file
+    // (as described by the expected cache header). Returns false otherwise.
+    bool TryBuildFromCache(CorpusDescriptorPtr corpus, const IndexCacheHeader& expected);
+
     // fills up the buffer with data from file, all previously buffered data
     // will be overwritten.
     void RefillBuffer();
@@ -178,7 +304,7 @@ private:
     // Build a chunk/sequence index, treating each line as an individual sequence.
     // Does not do any sequence parsing, instead uses line number as 
     // the corresponding sequence id.
-    void BuildFromLines(CorpusDescriptorPtr corpus);
+    void BuildFromLines(CorpusDescriptorPtr corpus, size_t firstLine);
 
     // Returns current offset in the input file (in bytes). 
     int64_t GetFileOffset() const { return m_fileOffsetStart + (m_pos - m_bufferStart); }
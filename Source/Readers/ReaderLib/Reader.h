@@ -138,6 +138,12 @@ public:
     // Reads a minibatch that contains data across all streams.
     virtual Minibatch ReadMinibatch() = 0;
 
+    // Returns statistics of the reader (e.g. of its chunk cache), by name.
+    virtual std::map<std::wstring, size_t> GetStatistics()
+    {
+        return std::map<std::wstring, size_t>();
+    }
+
     virtual ~Reader() {};
 };
 
@@ -95,6 +95,12 @@ public:
 
     void SetConfiguration(const ReaderConfiguration& config, const std::map<std::wstring, int>& inputDescriptions);
 
+    // Returns statistics of the reader (e.g. of its chunk cache), by name.
+    std::map<std::wstring, size_t> GetStatistics()
+    {
+        return m_reader->GetStatistics();
+    }
+
     bool IsEndOfEpoch() const
     {
         return m_endOfEpoch;
@@ -0,0 +1,75 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+# Licensed under the MIT license. See LICENSE.md file in the project root
+# for full license information.
+# ==============================================================================
+
+import os, sys
+import gzip
+import struct
+import hashlib
+import numpy as np
+import pytest
+try:
+    from urllib.request import pathname2url
+except ImportError:
+    from urllib import pathname2url
+
+abs_path = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(os.path.join(abs_path, "..", "..", "..", "..", "Examples", "Image", "DataSets", "MNIST"))
+import mnist_utils
+from dataset_cache import DatasetCache
+
+NUM_IMAGES = 5
+
+def write_mnist_mirror(mirror):
+    images = np.random.randint(0, 256, (NUM_IMAGES, 28 * 28)).astype(np.uint8)
+    labels = np.random.randint(0, 10, (NUM_IMAGES, 1)).astype(np.uint8)
+    with gzip.open(os.path.join(mirror, 'images.gz'), 'wb') as f:
+        f.write(struct.pack('I', 0x3080000) + struct.pack('>III', NUM_IMAGES, 28, 28))
+        f.write(images.tobytes())
+    with gzip.open(os.path.join(mirror, 'labels.gz'), 'wb') as f:
+        f.write(struct.pack('I', 0x1080000) + struct.pack('>I', NUM_IMAGES))
+        f.write(labels.tobytes())
+    return np.hstack((images, labels))
+
+def test_dataset_cache_with_file_mirror(tmpdir):
+    mirror = str(tmpdir.mkdir('mirror'))
+    expected = write_mnist_mirror(mirror)
+    cache = DatasetCache(str(tmpdir.join('cache')), mirror='file:' + pathname2url(mirror))
+
+    # the original location is replaced by the mirror
+    images_url = 'http://example.com/mnist/images.gz'
+    labels_url = 'http://example.com/mnist/labels.gz'
+    data = mnist_utils.load(images_url, labels_url, NUM_IMAGES, cache)
+    assert np.array_equal(data, expected)
+
+    # archives are stored under their digest
+    with open(os.path.join(mirror, 'images.gz'), 'rb') as f:
+        digest = hashlib.sha256(f.read()).hexdigest()
+    assert os.path.isfile(cache.blobPath(digest))
+
+    # cached data is used without the mirror
+    os.remove(os.path.join(mirror, 'images.gz'))
+    os.remove(os.path.join(mirror, 'labels.gz'))
+    images = mnist_utils.loadData(images_url, NUM_IMAGES, cache)
+    assert isinstance(images, np.memmap)
+    assert np.array_equal(images, expected[:, :-1])
+
+    # invalid prepared data is rebuilt from the cached archive
+    prepared = str(tmpdir.join('cache', 'prepared'))
+    for name in os.listdir(prepared):
+        if name.endswith('-data.npy'):
+            with open(os.path.join(prepared, name), 'ab') as f:
+                f.write(b'garbage')
+    del images
+    assert np.array_equal(mnist_utils.loadData(images_url, NUM_IMAGES, cache), expected[:, :-1])
+
+def test_dataset_cache_checks_digest(tmpdir):
+    mirror = str(tmpdir.mkdir('mirror'))
+    write_mnist_mirror(mirror)
+    cache = DatasetCache(str(tmpdir.join('cache')), mirror='file:' + pathname2url(mirror))
+
+    with pytest.raises(Exception) as info:
+        cache.fetch('http://example.com/mnist/images.gz', sha256='0' * 64)
+    assert 'expected SHA-256' in str(info.value)
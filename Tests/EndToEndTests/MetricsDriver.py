@@ -6,7 +6,7 @@
 # This script extracts information (hardware used, final results) contained in the baselines files
 # and generates a markdown file (wiki page)
 
-import sys, os, re
+import sys, os, re, json
 import TestDriver as td
 
 try:
@@ -25,6 +25,7 @@ class Baseline:
     self.gpuInfo = ""
     self.testResult = testResult
     self.trainResult = trainResult
+    self.metricsPath = None
 
   # extracts results info. e.g.
   # Finished Epoch[ 5 of 5]: [Training] ce = 2.32253198 * 1000 err = 0.90000000 * 1000 totalSamplesSeen = 5000 learningRatePerSample = 2e-06 epochTime=0.175781
@@ -67,6 +68,30 @@ class Baseline:
     gpuInfo = [ device for device in gpuDevices ]
     self.gpuInfo = "\n".join(gpuInfo)
 
+  # extracts the train results from a metrics stream, i.e. the JSON lines written by
+  # cntk.utils.metrics_stream.MetricsWriter during training, instead of scraping the log. e.g.
+  # {"elapsed": 1.5, "kind": 1, "loss": 2.32, "lr": 0.001, "metric": 0.9, "samples": 5000, "step": 50, "throughput": 3300.0}
+  def extractMetricsStreamInfo(self, metricsPath):
+    checkpoints = []
+    with open(metricsPath, "r") as f:
+      for line in f:
+        try:
+          record = json.loads(line)
+        except ValueError:
+          continue
+        if record.get("kind") == 1:
+          checkpoints.append(record)
+    if checkpoints:
+      self.trainResult = Baseline.formatMetricsRecord(len(checkpoints), checkpoints[-1])
+
+  @staticmethod
+  def formatMetricsRecord(numCheckpoints, record):
+    lines = ["Finished Epoch[%d]: [Training]" % numCheckpoints]
+    for name in ["loss", "metric", "lr", "samples", "throughput"]:
+      if record.get(name) is not None:
+        lines.append("%s = %s" % (name, record[name]))
+    return "\n".join(lines)
+
   @staticmethod
   def formatLastTestResult(line):
     return line[0] + line[1] + "\n" + line[2].replace('; ', '\n').replace('    ','\n')
@@ -118,6 +143,9 @@ class Example:
           fullPath = td.cygpath(os.path.join(self.testDir, candidateName), relative=True)          
           if os.path.isfile(fullPath):
             baseline = Baseline(fullPath);
+            # structured metrics recorded next to the baseline, if any
+            metricsPath = fullPath[:-len(".txt")] + ".metrics.jsonl"
+            baseline.metricsPath = metricsPath if os.path.isfile(metricsPath) else None
             baselineFilesList.append(baseline)
 
     return baselineFilesList
@@ -141,6 +169,8 @@ def getExamplesMetrics():
         example.gitHash = gitHash.group(1) 
         baseline.extractHardwareInfo(baselineContent)
         baseline.extractResultsInfo(baselineContent)
+        if baseline.metricsPath:
+          baseline.extractMetricsStreamInfo(baseline.metricsPath)
       example.baselineList.append(baseline)    
         
 # creates a list with links to each example result
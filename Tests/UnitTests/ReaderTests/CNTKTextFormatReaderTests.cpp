@@ -13,6 +13,7 @@
 #define _fileno fileno
 #endif
 #include <cstdio>
+#include <chrono>
 #include <boost/scope_exit.hpp>
 #include "Common/ReaderTestHelper.h"
 #include "TextParser.h"
@@ -33,19 +34,42 @@ public:
     ChunkPtr m_chunk;
 
     CNTKTextFormatReaderTestRunner(const string& filename,
-        const vector<StreamDescriptor>& streams, unsigned int maxErrors) :
+        const vector<StreamDescriptor>& streams, unsigned int maxErrors,
+        size_t chunkSize = SIZE_MAX, bool compactIndex = false) :
         m_parser(std::make_shared<CorpusDescriptor>(true), wstring(filename.begin(), filename.end()), streams, true)
     {
         m_parser.SetMaxAllowedErrors(maxErrors);
         m_parser.SetTraceLevel(TextParser<ElemType>::TraceLevel::Info);
-        m_parser.SetChunkSize(SIZE_MAX);
+        m_parser.SetChunkSize(chunkSize);
+        m_parser.SetCompactIndex(compactIndex);
         m_parser.SetNumRetries(0);
         m_parser.Initialize();
     }
     // Retrieves a chunk of data.
-    void LoadChunk()
+    void LoadChunk(ChunkIdType chunkId = 0)
     {
-        m_chunk = m_parser.GetChunk(0);
+        m_chunk = m_parser.GetChunk(chunkId);
+    }
+
+    void SetTraceLevel(unsigned int traceLevel)
+    {
+        m_parser.SetTraceLevel(traceLevel);
+    }
+
+    ChunkDescriptions GetChunkDescriptions()
+    {
+        return m_parser.GetChunkDescriptions();
+    }
+
+    void GetSequencesForChunk(ChunkIdType chunkId, std::vector<SequenceDescription>& result)
+    {
+        m_parser.GetSequencesForChunk(chunkId, result);
+    }
+
+    // Returns an estimate of the memory used by the index (in bytes).
+    size_t GetIndexMemorySize()
+    {
+        return m_parser.m_indexer->GetIndex().GetMemorySize();
     }
 };
 
@@ -843,6 +867,175 @@ BOOST_AUTO_TEST_CASE(CNTKTextFormatReaderNoFirstMinibatchData)
         2);
 };
 
+BOOST_AUTO_TEST_CASE(CNTKTextFormatReader_cached_index)
+{
+    const string input = "cached_index_50x20_jagged_sequences_dense.txt";
+    const string cache = input + ".cntkidx";
+    boost::filesystem::copy_file("50x20_jagged_sequences_dense.txt", input, boost::filesystem::copy_option::overwrite_if_exists);
+    boost::filesystem::remove(cache);
+    BOOST_SCOPE_EXIT(&input, &cache)
+    {
+        boost::filesystem::remove(input);
+        boost::filesystem::remove(cache);
+    } BOOST_SCOPE_EXIT_END
+
+    auto buildIndex = [&input](bool useCache)
+    {
+        FILE* file = fopenOrDie(input, "rbS");
+        auto indexer = make_unique<Indexer>(file, false, false, '|', 1024);
+        if (useCache)
+        {
+            indexer->SetCacheFile(Indexer::GetDefaultCacheFile(wstring(input.begin(), input.end())));
+        }
+        indexer->Build(std::make_shared<CorpusDescriptor>(true));
+        BOOST_REQUIRE_EQUAL(_ftelli64(file), (int64_t)boost::filesystem::file_size(input));
+        fclose(file);
+        return indexer;
+    };
+
+    auto expected = buildIndex(false);
+    BOOST_REQUIRE(!boost::filesystem::exists(cache));
+
+    // The first build writes the cache, the second one reads it.
+    for (int i = 0; i < 2; ++i)
+    {
+        auto indexer = buildIndex(true);
+        BOOST_REQUIRE(boost::filesystem::exists(cache));
+
+        const auto& expectedIndex = expected->GetIndex();
+        const auto& index = indexer->GetIndex();
+        BOOST_REQUIRE_EQUAL(index.m_chunks.size(), expectedIndex.m_chunks.size());
+        BOOST_REQUIRE_EQUAL(index.m_keyToSequenceInChunk.size(), expectedIndex.m_keyToSequenceInChunk.size());
+        for (size_t c = 0; c < index.m_chunks.size(); ++c)
+        {
+            const auto& chunk = index.m_chunks[c];
+            const auto& expectedChunk = expectedIndex.m_chunks[c];
+            BOOST_REQUIRE_EQUAL(chunk.m_byteSize, expectedChunk.m_byteSize);
+            BOOST_REQUIRE_EQUAL(chunk.m_numberOfSamples, expectedChunk.m_numberOfSamples);
+            BOOST_REQUIRE_EQUAL(chunk.m_sequences.size(), expectedChunk.m_sequences.size());
+            for (size_t s = 0; s < chunk.m_sequences.size(); ++s)
+            {
+                BOOST_REQUIRE_EQUAL(chunk.m_sequences[s].m_key.m_sequence, expectedChunk.m_sequences[s].m_key.m_sequence);
+                BOOST_REQUIRE_EQUAL(chunk.m_sequences[s].m_fileOffsetBytes, expectedChunk.m_sequences[s].m_fileOffsetBytes);
+                BOOST_REQUIRE_EQUAL(chunk.m_sequences[s].m_byteSize, expectedChunk.m_sequences[s].m_byteSize);
+                BOOST_REQUIRE_EQUAL(chunk.m_sequences[s].m_numberOfSamples, expectedChunk.m_sequences[s].m_numberOfSamples);
+            }
+        }
+    }
+
+    // A cache that does not match the input file is rebuilt.
+    {
+        ofstream output(input, ios::app);
+        output << "50|F0 1 2 3\n";
+    }
+
+    auto indexer = buildIndex(true);
+    const auto& lastChunk = indexer->GetIndex().m_chunks.back();
+    BOOST_REQUIRE_EQUAL(lastChunk.m_sequences.back().m_key.m_sequence, (size_t)50);
+    BOOST_REQUIRE_EQUAL(buildIndex(true)->GetIndex().m_keyToSequenceInChunk.size(), indexer->GetIndex().m_keyToSequenceInChunk.size());
+};
+
+// Compares the compact index with the full one: the memory used by the index
+// and the time it takes to load the chunks (for the compact index including
+// the time to rebuild the sequences of the chunks).
+BOOST_AUTO_TEST_CASE(CNTKTextFormatReader_compact_index)
+{
+    const string input = "compact_index_jagged_sequences_dense.txt";
+    BOOST_SCOPE_EXIT(&input)
+    {
+        boost::filesystem::remove(input);
+    } BOOST_SCOPE_EXIT_END
+
+    const size_t numberOfSequences = 200000;
+    {
+        ofstream output(input);
+        for (size_t i = 0; i < numberOfSequences; ++i)
+        {
+            for (size_t j = 0; j <= i % 3; ++j)
+            {
+                output << i << "\t|x " << j << " " << i % 7 << "\n";
+            }
+        }
+    }
+
+    vector<StreamDescriptor> streams(1);
+    streams[0].m_alias = "x";
+    streams[0].m_name = L"x";
+    streams[0].m_storageType = StorageType::dense;
+    streams[0].m_sampleDimension = 2;
+
+    const size_t chunkSize = 64 * 1024;
+    auto start = std::chrono::steady_clock::now();
+    CNTKTextFormatReaderTestRunner<float> full(input, streams, 0, chunkSize, false);
+    auto fullIndexTime = std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count();
+
+    start = std::chrono::steady_clock::now();
+    CNTKTextFormatReaderTestRunner<float> compact(input, streams, 0, chunkSize, true);
+    auto compactIndexTime = std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count();
+
+    // Only report errors, not every loaded sequence.
+    full.SetTraceLevel(0);
+    compact.SetTraceLevel(0);
+
+    auto chunks = full.GetChunkDescriptions();
+    auto compactChunks = compact.GetChunkDescriptions();
+    BOOST_REQUIRE_EQUAL(chunks.size(), compactChunks.size());
+
+    double fullLoadTime = 0, compactLoadTime = 0;
+    size_t sequences = 0;
+    for (size_t i = 0; i < chunks.size(); ++i)
+    {
+        BOOST_REQUIRE_EQUAL(chunks[i]->m_numberOfSequences, compactChunks[i]->m_numberOfSequences);
+        BOOST_REQUIRE_EQUAL(chunks[i]->m_numberOfSamples, compactChunks[i]->m_numberOfSamples);
+
+        vector<SequenceDescription> expected, actual;
+        full.GetSequencesForChunk(chunks[i]->m_id, expected);
+        compact.GetSequencesForChunk(compactChunks[i]->m_id, actual);
+        BOOST_REQUIRE_EQUAL(expected.size(), actual.size());
+        for (size_t j = 0; j < expected.size(); ++j)
+        {
+            BOOST_REQUIRE_EQUAL(expected[j].m_id, actual[j].m_id);
+            BOOST_REQUIRE_EQUAL(expected[j].m_numberOfSamples, actual[j].m_numberOfSamples);
+            BOOST_REQUIRE_EQUAL(expected[j].m_chunkId, actual[j].m_chunkId);
+            BOOST_REQUIRE_EQUAL(expected[j].m_key.m_sequence, actual[j].m_key.m_sequence);
+        }
+
+        start = std::chrono::steady_clock::now();
+        full.LoadChunk(chunks[i]->m_id);
+        fullLoadTime += std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count();
+
+        start = std::chrono::steady_clock::now();
+        compact.LoadChunk(compactChunks[i]->m_id);
+        compactLoadTime += std::chrono::duration<double>(std::chrono::steady_clock::now() - start).count();
+
+        for (const auto& s : expected)
+        {
+            vector<SequenceDataPtr> expectedData, actualData;
+            full.m_chunk->GetSequence(s.m_id, expectedData);
+            compact.m_chunk->GetSequence(s.m_id, actualData);
+            BOOST_REQUIRE_EQUAL(expectedData.size(), actualData.size());
+            for (size_t j = 0; j < expectedData.size(); ++j)
+            {
+                auto size = expectedData[j]->m_numberOfSamples * streams[j].m_sampleDimension * sizeof(float);
+                BOOST_REQUIRE_EQUAL(expectedData[j]->m_numberOfSamples, actualData[j]->m_numberOfSamples);
+                BOOST_REQUIRE(memcmp(expectedData[j]->GetDataBuffer(), actualData[j]->GetDataBuffer(), size) == 0);
+            }
+        }
+        sequences += expected.size();
+    }
+
+    BOOST_REQUIRE_EQUAL(sequences, numberOfSequences);
+
+    auto fullMemory = full.GetIndexMemorySize();
+    auto compactMemory = compact.GetIndexMemorySize();
+    fprintf(stderr, "Index of %" PRIu64 " sequences in %" PRIu64 " chunks:\n", (uint64_t)numberOfSequences, (uint64_t)chunks.size());
+    fprintf(stderr, "  full:    %10" PRIu64 " bytes, indexed in %.3fs, chunks loaded in %.3fs\n", (uint64_t)fullMemory, fullIndexTime, fullLoadTime);
+    fprintf(stderr, "  compact: %10" PRIu64 " bytes, indexed in %.3fs, chunks loaded in %.3fs\n", (uint64_t)compactMemory, compactIndexTime, compactLoadTime);
+
+    // Only chunk descriptors are kept in the compact index.
+    BOOST_REQUIRE_LT(compactMemory * 10, fullMemory);
+};
+
 BOOST_AUTO_TEST_SUITE_END()
 
 } } } }
@@ -10,6 +10,7 @@
 #include "DataDeserializer.h"
 #include "BlockRandomizer.h"
 #include "CorpusDescriptor.h"
+#include "ChunkCache.h"
 #include "FramePacker.h"
 #include "SequencePacker.h"
 #include "CudaMemoryProvider.h"
@@ -987,6 +988,76 @@ BOOST_AUTO_TEST_CASE(CheckEpochBoundarySingleWorker)
     test(underTestNo);
 }
 
+BOOST_AUTO_TEST_CASE(ChunkCacheEviction)
+{
+    size_t chunkSizeInSamples = 10;
+    size_t sweepNumberOfSamples = 100;
+    uint32_t maxSequenceLength = 1;
+    auto deserializer = make_shared<SequentialDeserializer>(0, chunkSizeInSamples, sweepNumberOfSamples, maxSequenceLength);
+
+    // Each chunk has 10 float samples, the cache fits two of them.
+    ChunkCache cache(deserializer, 2 * chunkSizeInSamples * sizeof(float));
+    auto statistic = [&cache](const wstring& name) { return cache.GetStatistics().at(name); };
+
+    ChunkPtr chunk0 = cache.GetChunk(0);
+    cache.GetChunk(1);
+    BOOST_CHECK(cache.GetChunk(0) == chunk0);
+    BOOST_CHECK_EQUAL(statistic(L"chunkCacheHits"), 1);
+    BOOST_CHECK_EQUAL(statistic(L"chunkCacheMisses"), 2);
+    BOOST_CHECK_EQUAL(statistic(L"chunkCacheSizeInBytes"), 2 * chunkSizeInSamples * sizeof(float));
+
+    // Chunk 1 is the least recently used one.
+    cache.GetChunk(2);
+    BOOST_CHECK_EQUAL(statistic(L"chunkCacheEvictions"), 1);
+    BOOST_CHECK(cache.GetChunk(0) == chunk0);
+    BOOST_CHECK_EQUAL(statistic(L"chunkCacheHits"), 2);
+
+    // Chunk 2 is the least recently used one, but it is still in use.
+    chunk0.reset();
+    ChunkPtr chunk2 = cache.GetChunk(2);
+    cache.GetChunk(0);
+    cache.GetChunk(1);
+    BOOST_CHECK_EQUAL(statistic(L"chunkCacheEvictions"), 2);
+    BOOST_CHECK(cache.GetChunk(2) == chunk2);
+    BOOST_CHECK_EQUAL(statistic(L"chunkCacheHits"), 5);
+    BOOST_CHECK_EQUAL(statistic(L"chunkCacheMisses"), 4);
+    BOOST_CHECK_EQUAL(statistic(L"chunkCacheChunks"), 2);
+}
+
+BOOST_AUTO_TEST_CASE(ChunkCacheReportedSize)
+{
+    // A chunk that reports its size, and whose sequences must not be loaded by the cache.
+    struct SizedChunk : Chunk
+    {
+        size_t m_sizeInBytes;
+        SizedChunk(size_t sizeInBytes) : m_sizeInBytes(sizeInBytes) {}
+        void GetSequence(size_t, std::vector<SequenceDataPtr>&) override { throw logic_error("Not expected"); }
+        size_t SizeInBytes() const override { return m_sizeInBytes; }
+    };
+
+    struct SizedDeserializer : IDataDeserializer
+    {
+        IDataDeserializerPtr m_inner;
+        SizedDeserializer(IDataDeserializerPtr inner) : m_inner(inner) {}
+        std::vector<StreamDescriptionPtr> GetStreamDescriptions() const override { return m_inner->GetStreamDescriptions(); }
+        ChunkDescriptions GetChunkDescriptions() override { return m_inner->GetChunkDescriptions(); }
+        void GetSequencesForChunk(ChunkIdType chunkId, std::vector<SequenceDescription>& result) override { m_inner->GetSequencesForChunk(chunkId, result); }
+        bool GetSequenceDescription(const SequenceDescription& primary, SequenceDescription& result) override { return m_inner->GetSequenceDescription(primary, result); }
+        ChunkPtr GetChunk(ChunkIdType chunkId) override { return make_shared<SizedChunk>(100 * (chunkId + 1)); }
+    };
+
+    auto deserializer = make_shared<SequentialDeserializer>(0, 10, 100, 1);
+    ChunkCache cache(make_shared<SizedDeserializer>(deserializer), 500);
+    cache.GetChunk(0);
+    cache.GetChunk(1);
+    BOOST_CHECK_EQUAL(cache.GetStatistics().at(L"chunkCacheSizeInBytes"), 300);
+
+    // Chunk 2 (300 bytes) only fits after evicting chunk 0.
+    cache.GetChunk(2);
+    BOOST_CHECK_EQUAL(cache.GetStatistics().at(L"chunkCacheEvictions"), 1);
+    BOOST_CHECK_EQUAL(cache.GetStatistics().at(L"chunkCacheSizeInBytes"), 500);
+}
+
 BOOST_AUTO_TEST_SUITE_END()
 
 BOOST_AUTO_TEST_SUITE(PackerTests)
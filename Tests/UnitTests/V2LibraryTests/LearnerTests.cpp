@@ -222,6 +222,42 @@ void TestTrainingParametersSchedule()
     assert(schedule16[10999] == exp(-1.0 / 5.0));
     assert(schedule16[11000] == exp(-1.0 / 3.0));
     assert(schedule16[99999] == exp(-1.0 / 3.0));
+
+    LearningRatePerSampleSchedule schedule17(LearningRateSchedule::Form::Step, 1.0, 0.1, 10, 0.5, 2);
+    assert(schedule17.GetForm() == LearningRateSchedule::Form::Step);
+    assert(schedule17[0] == 0.5);
+    assert(schedule17[1] == 1.0);
+    assert(schedule17[11] == 1.0);
+    assert(schedule17[12] == 0.5);
+    assert(schedule17[22] == 0.25);
+    assert(schedule17[1000000000] == 0.1);
+
+    TrainingParameterSchedule<double> schedule18 = TrainingParameterSchedule<double>::Deserialize(schedule17.Serialize());
+    assert(schedule18.GetForm() == LearningRateSchedule::Form::Step);
+    assert(schedule18[0] == 0.5);
+    assert(schedule18[12] == 0.5);
+    assert(schedule18[1000000000] == 0.1);
+
+    MinibatchSizeSchedule schedule19(MinibatchSizeSchedule::Form::Polynomial, 32, 256, 1000, 1.0, 0);
+    assert(schedule19[0] == 32);
+    assert(schedule19[500] == 144);
+    assert(schedule19[1000000] == 256);
+
+    // A growing schedule without a final value is not bounded.
+    LearningRatePerSampleSchedule schedule20(LearningRateSchedule::Form::Exponential, 1.0, std::numeric_limits<double>::quiet_NaN(), 1, 2.0, 0);
+    assert(schedule20[0] == 1.0);
+    assert(schedule20[3] == 8.0);
+
+    // Rescaling keeps the shape of the schedule.
+    LearningRatePerMinibatchSchedule schedule21({ 0.4, 0.2 }, 10);
+    auto schedule22 = schedule21.Rescaled(0.25, LearningRateSchedule::UnitType::Sample);
+    assert(schedule22.Unit() == LearningRateSchedule::UnitType::Sample);
+    assert(schedule22[0] == 0.1);
+    assert(schedule22[10] == 0.05);
+
+    auto schedule23 = schedule20.Rescaled(0.5, LearningRateSchedule::UnitType::Sample);
+    assert(schedule23[0] == 0.5);
+    assert(schedule23[3] == 4.0);
 }
 
 void TestDefaultUnitGainGetterAndSetter()
@@ -415,6 +415,42 @@ void TestFunctionSerialization(const DeviceDescriptor& device)
     TestFunctionSaveAndLoad(BuildLSTMClassifierNet(inputVar, 5, device), device);
 }
 
+void TestMappableModelSaving(const DeviceDescriptor& device)
+{
+    auto file = L"TestMappableModelSaving.out";
+    auto inputVar = InputVariable({ 20 }, false, DataType::Float, L"features");
+    auto function = BuildFFClassifierNet(inputVar, 5, device);
+
+    function->SaveModel(file, /*mappable =*/ true);
+    auto reloadedFunction = Function::LoadModel(file, device);
+    if (!AreEqual(function, reloadedFunction))
+    {
+        throw std::runtime_error("TestMappableModelSaving: original and reloaded functions are not identical.");
+    }
+
+    // Parameters of a mapped model can be updated without modifying the file.
+    for (auto& parameter : reloadedFunction->Parameters())
+        parameter.Value()->SetValue(0.0f);
+
+    if (!AreEqual(function, Function::LoadModel(file, device)))
+    {
+        throw std::runtime_error("TestMappableModelSaving: updating a mapped model modified the model file.");
+    }
+
+    // Parameters of a model loaded for inference are read-only.
+    auto inferenceFunction = Function::LoadModel(file, device, /*forInference =*/ true);
+    if (!AreEqual(function, inferenceFunction))
+    {
+        throw std::runtime_error("TestMappableModelSaving: original and function loaded for inference are not identical.");
+    }
+
+    for (auto& parameter : inferenceFunction->Parameters())
+    {
+        if (!parameter.Value()->IsReadOnly())
+            throw std::runtime_error("TestMappableModelSaving: parameters loaded for inference are not read-only.");
+    }
+}
+
 TrainerPtr BuildTrainer(const FunctionPtr& function, const Variable& labels, 
                      LearningRateSchedule lr = LearningRatePerSampleSchedule(0.005), 
                      MomentumSchedule m = MomentumAsTimeConstantSchedule(0.0))
@@ -831,6 +867,7 @@ void SerializationTests()
 
     TestFunctionsForEquality(DeviceDescriptor::CPUDevice());
     TestFunctionSerialization(DeviceDescriptor::CPUDevice());
+    TestMappableModelSaving(DeviceDescriptor::CPUDevice());
     TestModelSerializationDuringTraining(DeviceDescriptor::CPUDevice());
     
     TestCheckpointing(DeviceDescriptor::CPUDevice());
@@ -843,6 +880,7 @@ void SerializationTests()
         TestLearnerSerialization<float>(5, DeviceDescriptor::GPUDevice(0));
         TestLearnerSerialization<double>(10, DeviceDescriptor::GPUDevice(0));
         TestFunctionSerialization(DeviceDescriptor::GPUDevice(0));
+        TestMappableModelSaving(DeviceDescriptor::GPUDevice(0));
         TestModelSerializationDuringTraining(DeviceDescriptor::GPUDevice(0));
         TestCheckpointing(DeviceDescriptor::GPUDevice(0));
         TestLegacyModelSaving(DeviceDescriptor::GPUDevice(0));
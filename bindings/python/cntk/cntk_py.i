@@ -241,6 +241,83 @@ def dynamic_axes(self):
     }
 }
 
+%fragment("NDArrayViewToNumPyView", "header")
+{
+    void ReleaseNDArrayViewCapsule(PyObject* capsule)
+    {
+        delete reinterpret_cast<CNTK::NDArrayViewPtr*>(PyCapsule_GetPointer(capsule, "CNTK::NDArrayViewPtr"));
+    }
+
+    //
+    // In contrast to NDArrayViewToNumPy() this does not copy the data, but
+    // returns a read-only NumPy array on top of the CPU buffer. The NumPy
+    // array keeps the NDArrayView alive through its base object. Data that
+    // is not on the CPU is copied once to a CPU NDArrayView first.
+    //
+    PyObject* NDArrayViewToNumPyView(const CNTK::NDArrayViewPtr& view) {
+        if (view->GetStorageFormat() != StorageFormat::Dense)
+            throw std::invalid_argument("only dense supported at the moment");
+
+        std::vector<size_t> dimensions_cntk = view->Shape().Dimensions();
+        std::vector<npy_intp> dimensions;
+
+        // CNTK uses column major, thus we reverse the shape
+        for (int i = static_cast<int>(dimensions_cntk.size()) - 1; i >= 0; i--)
+        {
+            dimensions.push_back(static_cast<npy_intp>(dimensions_cntk[i]));
+        }
+
+        CNTK::DataType cntk_type = view->GetDataType();
+
+        NDArrayViewPtr cpuView = view;
+        if (view->Device() != DeviceDescriptor::CPUDevice())
+        {
+            cpuView = std::make_shared<NDArrayView>(cntk_type, view->Shape(), DeviceDescriptor::CPUDevice());
+            cpuView->CopyFrom(*view);
+        }
+
+        NPY_TYPES numpy_type;
+        void* buffer;
+
+        if (cntk_type == CNTK::DataType::Float)
+        {
+            numpy_type = NPY_FLOAT;
+            buffer = (void*)cpuView->DataBuffer<float>();
+        }
+        else if (cntk_type == CNTK::DataType::Double)
+        {
+            numpy_type = NPY_DOUBLE;
+            buffer = (void*)cpuView->DataBuffer<double>();
+        }
+        else
+        {
+            throw std::invalid_argument("unknown CNTK data type");
+        }
+
+        PyObject* ndarray = PyArray_SimpleNewFromData(static_cast<int>(dimensions.size()), dimensions.data(), numpy_type, buffer);
+        if (ndarray == NULL)
+            return NULL;
+
+        PyArray_CLEARFLAGS((PyArrayObject*)ndarray, NPY_ARRAY_WRITEABLE);
+
+        PyObject* owner = PyCapsule_New(new NDArrayViewPtr(cpuView), "CNTK::NDArrayViewPtr", ReleaseNDArrayViewCapsule);
+        if (owner == NULL)
+        {
+            Py_DECREF(ndarray);
+            return NULL;
+        }
+
+        // steals the reference to owner
+        if (PyArray_SetBaseObject((PyArrayObject*)ndarray, owner) < 0)
+        {
+            Py_DECREF(ndarray);
+            return NULL;
+        }
+
+        return ndarray;
+    }
+}
+
 %fragment("pydict_insert", "header")
 {
      template<typename T> bool pydict_insert(PyObject* dictionary, const T& key, swig_type_info *swig_type, PyObject* item) {
@@ -508,6 +585,26 @@ fail:
     $result = container;
 }
 
+%typemap(out, fragment="DictionaryValueToPy") CNTK::Dictionary GetStatistics {
+    //out Dictionary GetStatistics()
+    PyObject* container = PyDict_New();
+    if (container == NULL)
+    {
+        SWIG_exception(SWIG_RuntimeError, "error passing a dictionary to Python");
+    }
+
+    const CNTK::Dictionary& statistics = $1;
+    for (auto it = statistics.begin(); it != statistics.end(); ++it)
+    {
+        PyObject *key = PyUnicode_FromWideChar(it->first.c_str(), it->first.length());
+        PyObject *val = DictionaryValueToPy(it->second);
+        PyDict_SetItem(container, key, val);
+        Py_DECREF(key);
+        Py_DECREF(val);
+    }
+    $result = container;
+}
+
 
 %define %eq_for(DATA_TYPE, EQ)
 %rename(EQ) operator==(const DATA_TYPE&, const DATA_TYPE&);
@@ -593,7 +690,6 @@ public:
 
 // Common directors
 %feature("director") CNTK::TrainingSession;
-%feature("nodirector") CNTK::TrainingSession::OnMinibatchStart;
 %feature("nodirector") CNTK::TrainingSession::OnCheckpointStart;
 %feature("nodirector") CNTK::TrainingSession::GetMinibatchSize;
 
@@ -1310,9 +1406,11 @@ std::unordered_map<CNTK::StreamInformation, std::pair<CNTK::NDArrayViewPtr, CNTK
 //
 // NDArrayView
 //
+%fragment("NDArrayViewToNumPyView");
+
 %extend CNTK::NDArrayView {
 
-    NDArrayView(PyObject* pyobj, const CNTK::DeviceDescriptor& device, bool readOnly)
+    NDArrayView(PyObject* pyobj, const CNTK::DeviceDescriptor& device, bool readOnly, bool borrow = false)
     {
         if (!PyArray_Check((PyArrayObject*)pyobj))
         {
@@ -1323,6 +1421,13 @@ std::unordered_map<CNTK::StreamInformation, std::pair<CNTK::NDArrayViewPtr, CNTK
 
         PyArrayObject* array = (PyArrayObject*)pyobj;
 
+        // A borrowed view directly uses the memory of the NumPy array, which
+        // therefore has to outlive the view.
+        if (borrow && device.Type() != DeviceKind::CPU)
+            throw std::logic_error("only NumPy arrays on the CPU can be borrowed");
+        if (borrow && !(PyArray_IS_C_CONTIGUOUS(array) && PyArray_ISALIGNED(array)))
+            throw std::logic_error("borrowed NumPy arrays have to be C contiguous and aligned");
+
         int rank = PyArray_NDIM(array); 
         
         npy_intp* np_shape = PyArray_SHAPE(array); 
@@ -1339,7 +1444,15 @@ std::unordered_map<CNTK::StreamInformation, std::pair<CNTK::NDArrayViewPtr, CNTK
         int typecode = PyArray_TYPE(array);
 
         NDArrayView* view;
-        if (typecode == NPY_FLOAT)
+        if (typecode == NPY_FLOAT && borrow)
+        {
+            view = new NDArrayView(NDShape(shape), (float*)PyArray_DATA(array), num_elements, DeviceDescriptor::CPUDevice(), readOnly);
+        }
+        else if (typecode == NPY_DOUBLE && borrow)
+        {
+            view = new NDArrayView(NDShape(shape), (double*)PyArray_DATA(array), num_elements, DeviceDescriptor::CPUDevice(), readOnly);
+        }
+        else if (typecode == NPY_FLOAT)
         {
             NDArrayView  tmp(NDShape(shape), (float*)PyArray_DATA(array), num_elements, DeviceDescriptor::CPUDevice(), readOnly);
             view = new NDArrayView(DataType::Float, tmp.Shape(), device);
@@ -1421,6 +1534,10 @@ std::unordered_map<CNTK::StreamInformation, std::pair<CNTK::NDArrayViewPtr, CNTK
         PyObject *NDArrayViewToNumPy(const CNTK::NDArrayView*);
         return NDArrayViewToNumPy(self);
     }
+
+    PyObject* to_ndarray_view() {
+        return NDArrayViewToNumPyView(self->shared_from_this());
+    }
 }
 
 // end of NDArrayView
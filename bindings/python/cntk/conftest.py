@@ -15,6 +15,18 @@ def pytest_addoption(parser):
                      help="list of device ids to pass to test functions")
     parser.addoption("--is1bitsgd", default="0",
                      help="whether 1-bit SGD is used")
+    parser.addoption("--benchmarks", action="store_true", default=False,
+                     help="run the benchmarks (tests marked with 'benchmark')")
+
+
+def pytest_collection_modifyitems(config, items):
+    # benchmarks measure wall-clock time and are only run on request
+    if config.getoption("--benchmarks"):
+        return
+    skip_benchmark = pytest.mark.skip(reason="benchmarks only run with --benchmarks")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip_benchmark)
 
 DEVICE_MAP = {
     'auto': 'auto',
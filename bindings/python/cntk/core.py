@@ -41,7 +41,7 @@ class NDArrayView(cntk_py.NDArrayView):
 
     @staticmethod
     @typemap
-    def from_dense(np_array, device=None, read_only=False):
+    def from_dense(np_array, device=None, read_only=False, borrow=False):
         '''
         Create a :class:`NDArrayView` instance from a NumPy array.
 
@@ -50,6 +50,9 @@ class NDArrayView(cntk_py.NDArrayView):
             device (:class:`~cntk.device.DeviceDescriptor`): device this value should be put
              on
             read_only (bool): whether the data can be modified or not
+            borrow (bool, default False): if True, the view uses the memory of the
+             C contiguous array `np_array` instead of a copy of it, i.e. changes
+             to the array are visible in the view. Only supported on the CPU.
 
         Returns:
             :class:`NDArrayView` instance
@@ -58,6 +61,19 @@ class NDArrayView(cntk_py.NDArrayView):
             raise TypeError('data must be of type numpy.ndarray'
                     ' and not %s'%type(np_array))
 
+        if borrow:
+            if device is None:
+                device = cpu()
+            if device.type() != cpu().type():
+                raise ValueError('only arrays on the CPU can be borrowed')
+            if not np_array.flags.c_contiguous:
+                raise ValueError('borrowed arrays need to be C contiguous')
+
+            view = cntk_py.NDArrayView(np_array, device, read_only, True)
+            # the view must not outlive the memory it refers to
+            view._borrowed_array = np_array
+            return view
+
         if not _is_c_contiguous(np_array):
             warnings.warn('data is not C contiguous; rearrange your data/computation to avoid this', RuntimeWarning)
 
@@ -186,6 +202,57 @@ class Value(cntk_py.Value):
 
         return sample
 
+    @staticmethod
+    def _batch_as_value_shape(var, data):
+        '''
+        Returns the shape ``(num_sequences, sequence_length) + var.shape``
+        that a dense rectangular minibatch ``data`` is laid out in, or `None`
+        if ``data`` cannot be passed to CNTK as one block (in which case it
+        has to go through the per-sequence path).
+        '''
+        if data.ndim == 0 or data.dtype == object:
+            return None
+
+        sample_shape = tuple(var.shape)
+        if data.shape[1:] == sample_shape:
+            # every sequence consists of exactly one sample
+            return (data.shape[0], 1) + sample_shape
+
+        if len(var.dynamic_axes) > 1 and data.ndim > 1 and \
+                data.shape[2:] == sample_shape:
+            # all sequences have the same length
+            return data.shape
+
+        return None
+
+    @staticmethod
+    def _create_dense_batch(var, data, device, read_only):
+        '''
+        Creates a :class:`~cntk.core.Value` for a dense rectangular minibatch
+        passed as a single NumPy array with one NDArrayView over the whole
+        array, instead of slicing it into one NDArrayView per sequence.
+
+        Returns:
+            :class:`~cntk.core.Value` or `None` if ``data`` does not qualify
+            for this path
+        '''
+        value_shape = Value._batch_as_value_shape(var, data)
+        if value_shape is None or 0 in value_shape[:2]:
+            return None
+
+        if np.issubdtype(data.dtype, int) or \
+                data.dtype in (np.float32, np.float64):
+            # cast and make it contiguous in one go (no copy if it already is)
+            data = np.ascontiguousarray(data, dtype=var.dtype)
+        else:
+            # let the regular path raise the proper error
+            return None
+
+        data = data.reshape(value_shape)
+        ndav = NDArrayView.from_dense(data, device, read_only)
+
+        return cntk_py.Value(ndav)
+
     @staticmethod
     @typemap
     def create(var, data, seq_starts=None, device=None, read_only=False):
@@ -232,7 +299,14 @@ class Value(cntk_py.Value):
                         'of sequences, you need to pass them as a pure-Python list '
                         'of NumPy arrays')
 
-            # FIXME if not seq_starts: directly pass it to Value constructor
+            if not seq_starts:
+                # Dense rectangular batches are passed as one block. This
+                # avoids the per-sequence NDArrayView creation below.
+                value = Value._create_dense_batch(var, data,
+                        device or use_default_device(), read_only)
+                if value is not None:
+                    return value
+
             data = list(np.atleast_1d(data))
 
         if not isinstance(data, list):
@@ -9,7 +9,15 @@ from ..tensor import ArrayMixin
 from ..utils import typemap, value_to_seq
 from cntk.device import use_default_device
 
+import threading
 import numpy as np
+from scipy import sparse
+
+try:
+    from queue import Queue, Full
+except ImportError:
+    # Python 2
+    from Queue import Queue, Full
 
 INFINITELY_REPEAT = cntk_py.MinibatchSource.infinitely_repeat
 FULL_DATA_SWEEP = cntk_py.MinibatchSource.full_data_sweep
@@ -94,8 +102,11 @@ class MinibatchSource(cntk_py.MinibatchSource):
         epoch_size (int): epoch size
         distributed_after (int): sample count after which minibatch source becomes distributed
         multithreaded_deserializer (bool): using multi threaded deserializer
+        chunk_cache_size (int, default None): if given, the loaded chunks of
+         the deserializers are kept in memory up to this many bytes, evicting
+         the least recently used chunks first
     '''
-    def __init__(self, deserializers=None, randomize=True, randomization_window=DEFAULT_RANDOMIZATION_WINDOW, epoch_size=INFINITELY_REPEAT, distributed_after=INFINITE_SAMPLES, multithreaded_deserializer=None):
+    def __init__(self, deserializers=None, randomize=True, randomization_window=DEFAULT_RANDOMIZATION_WINDOW, epoch_size=INFINITELY_REPEAT, distributed_after=INFINITE_SAMPLES, multithreaded_deserializer=None, chunk_cache_size=None):
         if not isinstance(deserializers, (list,tuple)):
             deserializers = [deserializers] # allow passing a single item or a list
         reader_config = ReaderConfig(
@@ -104,7 +115,8 @@ class MinibatchSource(cntk_py.MinibatchSource):
             randomization_window=randomization_window,
             epoch_size=epoch_size,
             distributed_after=distributed_after,
-            multithreaded_deserializer=multithreaded_deserializer)
+            multithreaded_deserializer=multithreaded_deserializer,
+            chunk_cache_size=chunk_cache_size)
         source = minibatch_source(reader_config)
         # transplant into this class instance
         self.__dict__ = source.__dict__
@@ -206,6 +218,20 @@ class MinibatchSource(cntk_py.MinibatchSource):
         '''
         super(MinibatchSource, self).restore_from_checkpoint(checkpoint)
 
+    def get_statistics(self):
+        '''
+        Gets the statistics of the MinibatchSource. If a chunk cache is used
+        (see ``chunk_cache_size``), they contain the number of
+        ``chunkCacheHits``, ``chunkCacheMisses`` and ``chunkCacheEvictions``
+        as well as the number of cached chunks (``chunkCacheChunks``) and
+        their size in bytes (``chunkCacheSizeInBytes``). The hit rate of the
+        cache is ``chunkCacheHits / (chunkCacheHits + chunkCacheMisses)``.
+
+        Returns:
+            `dict` that maps the names of the statistics to their values
+        '''
+        return super(MinibatchSource, self).get_statistics()
+
     @property
     def is_distributed(self):
         '''
@@ -213,6 +239,193 @@ class MinibatchSource(cntk_py.MinibatchSource):
         '''
         return super(MinibatchSource, self).is_distributed()
 
+class PrefetchingMinibatchSource(object):
+    '''
+    Wraps a :class:`MinibatchSource` and reads minibatches on a background
+    thread, so that reading the next minibatch overlaps with the computation
+    on the current one. Up to ``num_prefetch`` minibatches are read ahead.
+
+    The minibatches are read with the arguments of the most recent call to
+    :meth:`next_minibatch`. If those change (e.g. because of a minibatch size
+    schedule), the read-ahead minibatches are discarded and the wrapped
+    source is rewound to the position after the last returned minibatch.
+    The checkpoint state accounts for minibatches that have been read ahead
+    but not returned yet, i.e. restoring from it continues with the first
+    minibatch that has not been returned by :meth:`next_minibatch`.
+
+    Args:
+        source (:class:`MinibatchSource`): the minibatch source to read from.
+         It must not be used directly while it is wrapped.
+        num_prefetch (int, default 2): maximum number of minibatches that are
+         read ahead
+
+    Example:
+        >>> source = MinibatchSource(CTFDeserializer(path, streams)) # doctest: +SKIP
+        >>> source = PrefetchingMinibatchSource(source, num_prefetch=4) # doctest: +SKIP
+        >>> mb = source.next_minibatch(64) # doctest: +SKIP
+    '''
+    def __init__(self, source, num_prefetch=2):
+        if num_prefetch < 1:
+            raise ValueError('num_prefetch must be at least 1, not %i' %
+                    num_prefetch)
+
+        self.source = source
+        self.num_prefetch = num_prefetch
+        self.streams = getattr(source, 'streams', None)
+
+        self._queue = None
+        self._worker = None
+        self._stop = None
+        self._read_args = None
+        self._end_reached = False
+        # position of the first minibatch that has not been returned yet
+        self._state = source.get_checkpoint_state()
+
+    def stream_infos(self):
+        '''
+        Describes the stream that the wrapped source produces.
+        '''
+        return self.source.stream_infos()
+
+    def stream_info(self, name):
+        '''
+        Gets the description of the stream with given name.
+        '''
+        return self.source.stream_info(name)
+
+    def __getitem__(self, name):
+        return self.stream_info(name)
+
+    def _read(self, read_args, stop, queue):
+        size, device, num_data_partitions, partition_index = read_args
+        while not stop.is_set():
+            try:
+                mb = self.source.next_minibatch(size, device=device,
+                        num_data_partitions=num_data_partitions,
+                        partition_index=partition_index)
+                # The source reuses its buffers for the next minibatch, so we
+                # have to hold on to a copy.
+                mb = dict((si, MinibatchData(d.data.deep_clone(),
+                                             d.number_of_sequences,
+                                             d.number_of_samples,
+                                             d.sweep_end))
+                          for si, d in mb.items())
+                item = (mb, self.source.get_checkpoint_state(), None)
+            except Exception as e:
+                item = (None, None, e)
+
+            while not stop.is_set():
+                try:
+                    queue.put(item, timeout=0.1)
+                    break
+                except Full:
+                    pass
+
+            if not item[0]:
+                # end of data or error
+                return
+
+    def _start(self, read_args):
+        self._read_args = read_args
+        self._end_reached = False
+        self._stop = threading.Event()
+        self._queue = Queue(maxsize=self.num_prefetch)
+        self._worker = threading.Thread(target=self._read,
+                args=(read_args, self._stop, self._queue))
+        self._worker.daemon = True
+        self._worker.start()
+
+    def close(self):
+        '''
+        Stops reading ahead and discards all minibatches that have been read
+        ahead. The wrapped source is rewound to the position after the last
+        minibatch returned by :meth:`next_minibatch`.
+        '''
+        if self._worker is not None:
+            self._stop.set()
+            self._worker.join()
+            self._worker = None
+            self._queue = None
+            self._read_args = None
+            self.source.restore_from_checkpoint(self._state)
+
+    @typemap
+    def next_minibatch(self, minibatch_size_in_samples,
+            input_map=None, device=None, num_data_partitions=None, partition_index=None):
+        '''
+        Returns the next minibatch that has been read ahead. See
+        :meth:`MinibatchSource.next_minibatch` for the arguments and the
+        returned value.
+        '''
+        if device is None:
+            device = use_default_device()
+
+        read_args = (minibatch_size_in_samples, device,
+                num_data_partitions or 1, partition_index or 0)
+
+        if self._worker is None or self._read_args != read_args:
+            self.close()
+            self._start(read_args)
+
+        if self._end_reached:
+            return {}
+
+        mb, state, error = self._queue.get()
+        if error is not None:
+            self.close()
+            raise error
+
+        self._state = state
+        if not mb:
+            self._end_reached = True
+            return {}
+
+        if input_map:
+            return { key : mb[value] for (key, value) in input_map.items() }
+        else:
+            return mb
+
+    def get_checkpoint_state(self):
+        '''
+        Gets the checkpoint state of the wrapped source at the position after
+        the last minibatch returned by :meth:`next_minibatch`.
+
+        Returns:
+            :class:`~cntk_py.Dictionary`
+        '''
+        return self._state
+
+    def restore_from_checkpoint(self, checkpoint):
+        '''
+        Discards all minibatches that have been read ahead and restores the
+        wrapped source from the specified checkpoint.
+
+        Args:
+            checkpoint (:class:`~cntk_py.Dictionary`): checkpoint to restore from
+        '''
+        self.close()
+        self.source.restore_from_checkpoint(checkpoint)
+        self._state = self.source.get_checkpoint_state()
+        self._end_reached = False
+
+    def get_statistics(self):
+        '''
+        Gets the statistics of the wrapped source, see
+        :meth:`MinibatchSource.get_statistics`. They include the chunks that
+        have been read ahead.
+
+        Returns:
+            `dict` that maps the names of the statistics to their values
+        '''
+        return self.source.get_statistics()
+
+    @property
+    def is_distributed(self):
+        '''
+        Whether the wrapped source is running distributed
+        '''
+        return self.source.is_distributed
+
 def _py_dict_to_cntk_dict(py_dict):
     '''
     Converts a Python dictionary into a CNTK Dictionary whose values are CNTK DictionaryValue instances.
@@ -266,8 +479,11 @@ class ReaderConfig(dict):
         epoch_size (int): epoch size
         distributed_after (int): sample count after which reader becomes distributed
         multithreaded_deserializer (bool): using multi threaded deserializer
+        chunk_cache_size (int, default None): if given, the loaded chunks of
+         the deserializers are kept in memory up to this many bytes, evicting
+         the least recently used chunks first
     '''
-    def __init__(self, deserializers=None, randomize=True, randomization_window=DEFAULT_RANDOMIZATION_WINDOW, epoch_size=INFINITELY_REPEAT, distributed_after=INFINITE_SAMPLES, multithreaded_deserializer=None):
+    def __init__(self, deserializers=None, randomize=True, randomization_window=DEFAULT_RANDOMIZATION_WINDOW, epoch_size=INFINITELY_REPEAT, distributed_after=INFINITE_SAMPLES, multithreaded_deserializer=None, chunk_cache_size=None):
         self['epochSize'] = cntk_py.SizeTWrapper(epoch_size) # force to store in size_t
         if not isinstance(deserializers, (list, tuple)):
             deserializers = [deserializers]
@@ -277,6 +493,8 @@ class ReaderConfig(dict):
         self['distributedAfterSampleCount'] = cntk_py.SizeTWrapper(distributed_after)
         if multithreaded_deserializer != None:
             self['multiThreadedDeserialization'] = multithreaded_deserializer
+        if chunk_cache_size is not None:
+            self['chunkCacheSizeInBytes'] = cntk_py.SizeTWrapper(chunk_cache_size)
 
     @typemap
     def minibatch_source(self):
@@ -541,14 +759,30 @@ class CTFDeserializer(Deserializer):
 
     Args:
         filename (str): file name containing the text input
+        streams: any dictionary-like object that contains a mapping from stream
+         names to :class:`StreamDef` objects
+        cache_index (bool, default False): whether to cache the index of the
+         input file in a sidecar file (``filename + '.cntkidx'``). The cached
+         index is reused as long as the size, modification time and content
+         hash of the input file match, otherwise it is rebuilt. See also
+         :func:`build_ctf_index`.
+        compact_index (bool, default False): whether to only keep chunk
+         metadata in the index, instead of the offset, size and key of every
+         sequence. The sequences of a chunk are then located by scanning the
+         chunk when it is needed, which greatly reduces the memory used by
+         the index of a large input file at the cost of slower chunk loading.
 
     See also:
         `CNTKTextReader format <https://github.com/microsoft/cntk/wiki/CNTKTextFormat-Reader>`_
     '''
 
-    def __init__(self, filename, streams=None):
+    def __init__(self, filename, streams=None, cache_index=False, compact_index=False):
         super(CTFDeserializer, self).__init__('CNTKTextFormatDeserializer')
         self['file'] = filename
+        if cache_index:
+            self['cacheIndex'] = True
+        if compact_index:
+            self['compactIndex'] = True
         self['input'] = self.input = {}
         # connect all streams (: StreamDef) if given
         if streams is not None:
@@ -584,6 +818,27 @@ class CTFDeserializer(Deserializer):
         self.input[node] = dict(dim=dim, format=format, alias=alias)
 
 
+def build_ctf_index(filename):
+    '''
+    Builds the index of a text-encoded (CTF) input file ahead of time and
+    stores it in the sidecar file that is used by
+    ``CTFDeserializer(..., cache_index=True)``, so that the (potentially
+    long) scan of a large input file does not delay the start of training.
+
+    Args:
+        filename (str): file name containing the text input
+
+    Returns:
+        str: the name of the index cache file
+    '''
+    # The index does not depend on the inputs, any stream will do. The index
+    # is built when the minibatch source is created.
+    streams = StreamDefs(index=StreamDef(field='index', shape=1))
+    MinibatchSource(CTFDeserializer(filename, streams, cache_index=True),
+                    randomize=False)
+    return filename + '.cntkidx'
+
+
 # TODO: this should be a private class; use StreamDef instead
 class StreamConfiguration(cntk_py.StreamConfiguration):
     '''
@@ -732,3 +987,171 @@ def sequence_to_cntk_text_format(seq_idx, alias_tensor_map):
     return '\n'.join(lines)
 
 
+def _format_rows(rows, fmt, prefix):
+    '''
+    Formats the rows of a 2D array with a single string formatting operation
+    and returns the list of formatted rows.
+    '''
+    if len(rows) == 0:
+        return []
+    row_fmt = prefix + ' '.join([fmt] * rows.shape[1]) + '\n'
+    return ((row_fmt * len(rows)) % tuple(rows.ravel().tolist())).split('\n')[:-1]
+
+
+def _format_sparse_rows(rows, fmt, prefix):
+    '''
+    Formats the rows of a CSR matrix as `index:value` pairs and returns the
+    list of formatted rows. Rows without non-zero entries are `None`, so
+    that their alias is omitted like a missing sample.
+    '''
+    rows = rows.tocsr()
+    rows.sort_indices()
+    pairs = np.empty((rows.nnz, 2), dtype=object)
+    pairs[:, 0] = rows.indices.tolist()
+    pairs[:, 1] = rows.data.tolist()
+    entries = ((('%d:' + fmt + '\n') * rows.nnz) % tuple(pairs.ravel())).split('\n')
+    indptr = rows.indptr.tolist()
+    return [prefix + ' '.join(entries[start:end]) if start < end else None
+            for start, end in zip(indptr[:-1], indptr[1:])]
+
+
+def dataset_to_cntk_text_format(output, alias_data_map, seq_idx_start=0,
+                                value_format=None, lines_per_block=65536):
+    '''
+    Writes a whole dataset in the format that is readable by
+    :class:`~cntk.io.CTFDeserializer`. The lines are laid out like the ones
+    of :func:`sequence_to_cntk_text_format`, but they are formatted in
+    vectorized blocks of rows and every block is written with a single call,
+    which makes it suitable for exporting large datasets.
+
+    Every alias is mapped to the samples of all sequences, stacked along the
+    first axis, and the offsets of the sequences in them (like the `indptr`
+    of a CSR matrix, i.e. sequence `i` consists of the samples
+    ``offsets[i]:offsets[i+1]``). If no offsets are given, every sample is a
+    sequence of its own.
+
+    Example:
+        >>> import io
+        >>> from scipy import sparse
+        >>> out = io.StringIO()
+        >>> features = np.arange(6, dtype=np.float32).reshape(3, 2)
+        >>> labels = sparse.csr_matrix(np.eye(2, 4, dtype=np.float32))
+        >>> dataset_to_cntk_text_format(out, {'x': (features, [0, 2, 3]),
+        ...                                   'y': (labels, [0, 1, 2])})
+        2
+        >>> for line in out.getvalue().splitlines():
+        ...     print(line.split('\\t'))
+        ['0', '|x 0 1 |y 0:1']
+        ['0', '|x 2 3']
+        ['1', '|x 4 5 |y 1:1']
+
+    Args:
+        output (file): text stream to write to
+        alias_data_map (dict): maps alias (str) to either the samples or a
+         tuple (samples, offsets). Dense samples are NumPy arrays of shape
+         ``(number of samples,) + sample shape``, sparse samples
+         ``scipy.sparse`` matrices of shape ``(number of samples, dim)``.
+         All aliases need to have the same number of sequences.
+        seq_idx_start (int, default 0): index of the first sequence
+        value_format (str, default None): `%`-format of the values. `None`
+         uses ``'%d'`` for integer and ``'%.9g'`` for floating point data.
+        lines_per_block (int, default 65536): approximate number of lines
+         that are formatted and written at once
+
+    Returns:
+        the number of sequences written
+    '''
+    if not alias_data_map:
+        raise ValueError('alias_data_map must not be empty')
+
+    streams = []
+    num_sequences = None
+    for alias, data in sorted(alias_data_map.items()):
+        if isinstance(data, tuple):
+            data, offsets = data
+        else:
+            offsets = None
+
+        is_sparse = sparse.issparse(data)
+        if is_sparse:
+            data = data.tocsr()
+        else:
+            data = np.asarray(data)
+            if data.ndim == 0:
+                raise ValueError('data of alias "%s" needs to have at least '
+                                 'one dimension' % alias)
+            data = data.reshape(data.shape[0], int(np.prod(data.shape[1:])))
+
+        if offsets is None:
+            offsets = np.arange(data.shape[0] + 1)
+        offsets = np.asarray(offsets, dtype=np.int64)
+        if offsets[0] != 0 or offsets[-1] != data.shape[0] or \
+                np.any(np.diff(offsets) < 0):
+            raise ValueError('offsets of alias "%s" do not match its %i '
+                             'samples' % (alias, data.shape[0]))
+
+        if num_sequences is None:
+            num_sequences = len(offsets) - 1
+        elif num_sequences != len(offsets) - 1:
+            raise ValueError('alias "%s" has %i sequences, but expected %i' %
+                             (alias, len(offsets) - 1, num_sequences))
+
+        fmt = value_format
+        if fmt is None:
+            fmt = '%d' if np.issubdtype(data.dtype, np.integer) else '%.9g'
+
+        streams.append((alias, data, offsets, is_sparse, fmt))
+
+    lengths = np.stack([np.diff(s[2]) for s in streams])
+    lines_per_sequence = lengths.max(axis=0)
+    line_ends = np.cumsum(lines_per_sequence)
+
+    seq_begin = 0
+    while seq_begin < num_sequences:
+        # the sequences of this block, at least one
+        block_start = line_ends[seq_begin] - lines_per_sequence[seq_begin]
+        seq_end = int(np.searchsorted(line_ends, block_start + lines_per_block,
+                                      side='right'))
+        seq_end = max(seq_end, seq_begin + 1)
+
+        block_lengths = lengths[:, seq_begin:seq_end]
+        block_lines = lines_per_sequence[seq_begin:seq_end]
+        seq_ids = np.repeat(np.arange(seq_begin, seq_end) + seq_idx_start,
+                            block_lines)
+        prefixes = _format_rows(seq_ids.reshape(-1, 1), '%d', '')
+
+        columns = []
+        for alias, data, offsets, is_sparse, fmt in streams:
+            rows = data[offsets[seq_begin]:offsets[seq_end]]
+            if is_sparse:
+                columns.append(_format_sparse_rows(rows, fmt, alias + ' '))
+            else:
+                columns.append(_format_rows(rows, fmt, alias + ' '))
+
+        if np.all(block_lengths == block_lines):
+            # every alias has a sample in every line
+            lines = ['%s\t|%s\n' % (prefix, ' |'.join(p for p in parts
+                                                       if p is not None))
+                     for prefix, parts in zip(prefixes, zip(*columns))]
+        else:
+            positions = [0] * len(streams)
+            lines = []
+            for seq, num_lines in enumerate(block_lines):
+                for elem_idx in range(num_lines):
+                    parts = [columns[a][positions[a] + elem_idx]
+                             for a in range(len(streams))
+                             if elem_idx < block_lengths[a, seq] and
+                             columns[a][positions[a] + elem_idx] is not None]
+                    lines.append('%s\t|%s\n' % (prefixes[len(lines)],
+                                                ' |'.join(parts)))
+                for a in range(len(streams)):
+                    positions[a] += block_lengths[a, seq]
+
+        output.write(''.join(lines))
+        seq_begin = seq_end
+
+    return num_sequences
+
+
+
+from .user_deserializer import UserDeserializer, UserMinibatchSource
@@ -223,6 +223,92 @@ def test_full_sweep_minibatch(tmpdir):
             [[2, 1, 1],
              [2, 1, 0]])
 
+def test_ctf_index_cache(tmpdir):
+    mbdata = r'''0	|S0 0
+0	|S0 1
+1	|S0 2
+2	|S0 3
+2	|S0 4
+'''
+    tmpfile = str(tmpdir/'mbindex.txt')
+    with open(tmpfile, 'w') as f:
+        f.write(mbdata)
+
+    cache_file = build_ctf_index(tmpfile)
+    assert cache_file == tmpfile + '.cntkidx'
+    assert os.path.isfile(cache_file)
+
+    def read_sequences():
+        mb_source = MinibatchSource(CTFDeserializer(tmpfile, StreamDefs(
+            features = StreamDef(field='S0', shape=1)), cache_index=True),
+            randomize=False, epoch_size=FULL_DATA_SWEEP)
+        features_si = mb_source.stream_info('features')
+        mb = mb_source.next_minibatch(1000)
+        return [np.asarray(seq).flatten().tolist() for seq in mb[features_si].value]
+
+    assert read_sequences() == [[0, 1], [2], [3, 4]]
+
+    # a stale index is rebuilt
+    with open(tmpfile, 'a') as f:
+        f.write('3\t|S0 5\n')
+    assert read_sequences() == [[0, 1], [2], [3, 4], [5]]
+    assert os.path.isfile(cache_file)
+
+@pytest.mark.parametrize("randomize", [False, True])
+def test_ctf_compact_index(tmpdir, randomize):
+    tmpfile = str(tmpdir/'mbcompact.txt')
+    with open(tmpfile, 'w') as f:
+        for i in range(100):
+            for j in range(i % 3 + 1):
+                f.write('%d\t|S0 %d\n' % (i, i))
+
+    def read_sequences(compact_index):
+        ctf = CTFDeserializer(tmpfile, StreamDefs(
+            features = StreamDef(field='S0', shape=1)), compact_index=compact_index)
+        # small chunks, so that sequences are read from many chunks
+        ctf['chunkSizeInBytes'] = 100
+        mb_source = MinibatchSource(ctf, randomize=randomize, epoch_size=FULL_DATA_SWEEP)
+        features_si = mb_source.stream_info('features')
+        mb = mb_source.next_minibatch(1000)
+        return sorted(np.asarray(seq).flatten().tolist() for seq in mb[features_si].value)
+
+    expected = [[i] * (i % 3 + 1) for i in range(100)]
+    assert read_sequences(False) == expected
+    assert read_sequences(True) == expected
+
+def test_chunk_cache(tmpdir):
+    tmpfile = str(tmpdir/'mbcache.txt')
+    with open(tmpfile, 'w') as f:
+        for i in range(1000):
+            f.write('%d\t|S0 %d\n' % (i, i))
+
+    def read_statistics(chunk_cache_size):
+        ctf = CTFDeserializer(tmpfile, StreamDefs(
+            features = StreamDef(field='S0', shape=1)))
+        ctf['chunkSizeInBytes'] = 1000
+        mb_source = MinibatchSource(ctf, randomize=True,
+            randomization_window=1, chunk_cache_size=chunk_cache_size)
+        features_si = mb_source.stream_info('features')
+        for i in range(3):
+            mb = mb_source.next_minibatch(1000)
+            assert sorted(np.asarray(mb[features_si].value).flatten().tolist()) == list(range(1000))
+        return mb_source.get_statistics()
+
+    # without a cache there are no statistics
+    assert read_statistics(None) == {}
+
+    # a cache that holds all chunks only misses in the first sweep
+    stats = read_statistics(1 << 20)
+    assert stats['chunkCacheMisses'] == stats['chunkCacheChunks']
+    assert stats['chunkCacheHits'] > 0
+    assert stats['chunkCacheEvictions'] == 0
+    assert stats['chunkCacheSizeInBytes'] == 1000 * 4
+
+    # a small cache evicts chunks and stays within its budget
+    stats = read_statistics(500)
+    assert stats['chunkCacheEvictions'] > 0
+    assert stats['chunkCacheSizeInBytes'] <= 500
+
 def test_large_minibatch(tmpdir):
 
     mbdata = r'''0  |S0 0   |S1 0
@@ -306,3 +392,203 @@ def test_sequence_conversion_dense(idx, alias_tensor_map, expected):
 def test_is_tensor(data, expected):
     from cntk.io import _is_tensor
     assert _is_tensor(data) == expected
+
+def test_prefetching_minibatch_source(tmpdir):
+    mbdata = ''.join('%i\t|S0 %i\n' % (i, i) for i in range(20))
+
+    tmpfile = str(tmpdir/'mbprefetch.txt')
+    with open(tmpfile, 'w') as f:
+        f.write(mbdata)
+
+    def create_source():
+        return MinibatchSource(CTFDeserializer(tmpfile, StreamDefs(
+            features = StreamDef(field='S0', shape=1))),
+            randomize=False, epoch_size=FULL_DATA_SWEEP)
+
+    def read_all(source, mb_size):
+        si = source.stream_info('features')
+        values = []
+        while True:
+            mb = source.next_minibatch(mb_size)
+            if not mb:
+                break
+            values.extend(np.asarray(mb[si].value).ravel().tolist())
+        return values
+
+    expected = read_all(create_source(), 3)
+    assert expected == list(range(20))
+
+    source = PrefetchingMinibatchSource(create_source(), num_prefetch=3)
+    assert read_all(source, 3) == expected
+    assert source.next_minibatch(3) == {}
+
+    # the checkpoint must not include minibatches that were read ahead
+    source = PrefetchingMinibatchSource(create_source(), num_prefetch=3)
+    si = source.stream_info('features')
+    source.next_minibatch(4)
+    state = source.get_checkpoint_state()
+    third = np.asarray(source.next_minibatch(4)[si].value).ravel().tolist()
+    assert third == [4, 5, 6, 7]
+
+    source.restore_from_checkpoint(state)
+    assert np.asarray(source.next_minibatch(4)[si].value).ravel().tolist() == third
+
+    # changing the minibatch size continues after the last returned minibatch
+    assert np.asarray(source.next_minibatch(2)[si].value).ravel().tolist() == [8, 9]
+    source.close()
+
+
+class _SequenceDeserializer(UserDeserializer):
+    # chunk c holds the sequences 3*c, 3*c+1, 3*c+2 of length 1, 2, 3
+    def __init__(self, streams, dtype=np.float32):
+        super(_SequenceDeserializer, self).__init__(streams)
+        self.dtype = dtype
+
+    def num_chunks(self):
+        return 4
+
+    def get_chunk(self, chunk_id):
+        return [{'x': np.full((i+1, 2), 3*chunk_id + i, dtype=self.dtype),
+                 'y': np.full((1, 1), 3*chunk_id + i, dtype=self.dtype)}
+                for i in range(3)]
+
+def _read_ids(source, mb_size, **kwargs):
+    mb = source.next_minibatch(mb_size, **kwargs)
+    if not mb:
+        return None, False
+    y = mb[source.streams.y]
+    return sorted(int(v) for v in y.value.ravel()), y.end_of_sweep
+
+@pytest.mark.parametrize("num_workers", [0, 2])
+def test_user_minibatch_source(num_workers):
+    streams = StreamDefs(x=StreamDef(field='x', shape=2),
+                         y=StreamDef(field='y', shape=1))
+
+    source = UserMinibatchSource(_SequenceDeserializer(streams),
+            randomize=False, epoch_size=FULL_DATA_SWEEP,
+            num_workers=num_workers)
+    mb = source.next_minibatch(3)
+    x = mb[source.streams.x]
+    assert x.num_sequences == 2
+    assert x.num_samples == 3
+    assert np.allclose(mb[source.streams.y].value.ravel(), [0, 1])
+
+    ids = []
+    while True:
+        batch, sweep_end = _read_ids(source, 6)
+        if batch is None:
+            break
+        ids.extend(batch)
+    assert ids == list(range(2, 12))
+    assert sweep_end
+    source.close()
+
+    # randomized reading visits every sequence once per sweep and can be
+    # restored from a checkpoint
+    source = UserMinibatchSource(_SequenceDeserializer(streams),
+            randomization_window=2, num_workers=num_workers, seed=3)
+    ids, _ = _read_ids(source, 4)
+    state = source.get_checkpoint_state()
+    continuation = []
+    while len(ids) < 12:
+        batch, _ = _read_ids(source, 4)
+        continuation.append(batch)
+        ids.extend(batch)
+    assert sorted(ids) == list(range(12))
+
+    source.restore_from_checkpoint(state)
+    for batch in continuation:
+        assert _read_ids(source, 4)[0] == batch
+    source.close()
+
+    # partitions read disjoint chunks
+    ids = []
+    for index in range(2):
+        source = UserMinibatchSource(_SequenceDeserializer(streams),
+                epoch_size=FULL_DATA_SWEEP, num_workers=num_workers)
+        while True:
+            batch, _ = _read_ids(source, 6, num_data_partitions=2,
+                                 partition_index=index)
+            if batch is None:
+                break
+            ids.extend(batch)
+        assert source.is_distributed
+        source.close()
+    assert sorted(ids) == list(range(12))
+
+@pytest.mark.parametrize("num_workers", [0, 2])
+def test_user_minibatch_source_partition_change(num_workers):
+    streams = StreamDefs(x=StreamDef(field='x', shape=2),
+                         y=StreamDef(field='y', shape=1))
+
+    # one chunk per window and per minibatch of 6 samples
+    source = UserMinibatchSource(_SequenceDeserializer(streams),
+            randomize=False, randomization_window=1, num_workers=num_workers)
+    for chunk_id in range(3):
+        assert _read_ids(source, 6)[0] == [3*chunk_id, 3*chunk_id + 1, 3*chunk_id + 2]
+
+    # switching to distributed reading in the middle of the sweep restarts
+    # at the first window of the partition
+    assert _read_ids(source, 6, num_data_partitions=2, partition_index=1)[0] == [3, 4, 5]
+    assert _read_ids(source, 6, num_data_partitions=2, partition_index=1)[0] == [9, 10, 11]
+    source.close()
+
+@pytest.mark.parametrize("num_workers", [0, 2])
+def test_user_minibatch_source_precision(num_workers):
+    streams = StreamDefs(x=StreamDef(field='x', shape=2),
+                         y=StreamDef(field='y', shape=1))
+
+    for dtype in [np.float32, np.float64]:
+        source = UserMinibatchSource(_SequenceDeserializer(streams, dtype),
+                randomize=False, num_workers=num_workers)
+        mb = source.next_minibatch(3)
+        y = mb[source.streams.y].value
+        assert y.dtype == dtype
+        assert np.allclose(y.ravel(), [0, 1])
+        source.close()
+
+def test_dataset_to_cntk_text_format():
+    try:
+        from StringIO import StringIO
+    except ImportError:
+        from io import StringIO
+    from scipy import sparse
+
+    x = np.arange(30).reshape(10, 3)
+    x_offsets = [0, 3, 3, 7, 10]
+    y = sparse.csr_matrix(np.eye(6, 5, k=-1, dtype=np.int64))
+    y_offsets = [0, 1, 2, 4, 6]
+
+    # one block per sequence and a single block
+    for lines_per_block in [1, 100]:
+        output = StringIO()
+        assert dataset_to_cntk_text_format(output, {'x': (x, x_offsets), 'y': (y, y_offsets)},
+                seq_idx_start=2, lines_per_block=lines_per_block) == 4
+
+        expected = []
+        for i in range(4):
+            sparse_seq = [dict(zip(row.indices, row.data)) for row in
+                          y[y_offsets[i]:y_offsets[i+1]]]
+            expected.append(sequence_to_cntk_text_format(i + 2,
+                {'x': x[x_offsets[i]:x_offsets[i+1]], 'y': sparse_seq}))
+        # the alias of a sparse sample without non-zero entries is omitted
+        expected = '\n'.join(expected).replace(' |y \n', '\n')
+        assert output.getvalue() == expected + '\n'
+
+    output = StringIO()
+    y = sparse.csr_matrix(AA([[0, 2], [0, 0]], dtype=np.float32))
+    dataset_to_cntk_text_format(output, {'x': AA([[1], [3]]), 'y': y})
+    assert output.getvalue() == '0\t|x 1 |y 1:2\n1\t|x 3\n'
+
+    output = StringIO()
+    assert dataset_to_cntk_text_format(output, {'x': np.zeros((0, 3))}) == 0
+    assert output.getvalue() == ''
+
+    output = StringIO()
+    dataset_to_cntk_text_format(output, {'x': AA([[0.5], [1e-10]], dtype=np.float32)})
+    assert output.getvalue() == '0\t|x 0.5\n1\t|x 1.00000001e-10\n'
+
+    with pytest.raises(ValueError):
+        dataset_to_cntk_text_format(StringIO(), {'x': (x, [0, 3, 9])})
+    with pytest.raises(ValueError):
+        dataset_to_cntk_text_format(StringIO(), {'x': x, 'y': (y, y_offsets)})
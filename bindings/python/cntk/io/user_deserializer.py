@@ -0,0 +1,512 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+# Licensed under the MIT license. See LICENSE.md file in the project root
+# for full license information.
+# ==============================================================================
+
+'''
+Deserializers written in Python. The chunks of a :class:`UserDeserializer`
+are decoded in a pool of worker processes and read by a
+:class:`UserMinibatchSource`, which takes care of randomization, epoch sizes
+and distributed partitioning of the data.
+'''
+
+import os
+import tempfile
+import multiprocessing
+import numpy as np
+from scipy import sparse
+
+from .. import cntk_py
+from ..core import NDArrayView
+from ..device import use_default_device, cpu
+from ..utils import Record, sanitize_shape
+from . import MinibatchData, INFINITELY_REPEAT, FULL_DATA_SWEEP
+
+
+class UserDeserializer(object):
+    '''
+    Base class of deserializers that are implemented in Python. Data is
+    split into chunks, which are the unit of decoding and randomization.
+    Subclasses implement :meth:`num_chunks` and :meth:`get_chunk`.
+
+    The chunks are decoded in worker processes. Therefore, instances have to
+    be picklable. Expensive resources (e.g. open files) should be opened in
+    :meth:`get_chunk` rather than in the constructor.
+
+    Args:
+        streams (:class:`StreamDefs`): maps stream names to
+         :func:`StreamDef` instances describing the shape of a sample and
+         whether the stream is sparse. ``field`` is not used.
+
+    Example:
+        >>> from cntk.io import StreamDefs, StreamDef
+        >>> class RangeDeserializer(UserDeserializer):
+        ...     def num_chunks(self):
+        ...         return 3
+        ...     def get_chunk(self, chunk_id):
+        ...         return [{'x': np.full((2, 1), 2*chunk_id + i, dtype=np.float32)}
+        ...                 for i in range(2)]
+        >>> d = RangeDeserializer(StreamDefs(x=StreamDef(field='x', shape=1)))
+        >>> [seq['x'].ravel().tolist() for seq in d.get_chunk(1)]
+        [[2.0, 2.0], [3.0, 3.0]]
+    '''
+    def __init__(self, streams):
+        self.streams = streams
+
+    def num_chunks(self):
+        '''
+        Returns:
+            the number of chunks the data is split into
+        '''
+        raise NotImplementedError('num_chunks has to be overridden')
+
+    def get_chunk(self, chunk_id):
+        '''
+        Decodes a chunk. This is called in a worker process.
+
+        Args:
+            chunk_id (int): index of the chunk, between 0 and
+             :meth:`num_chunks` - 1
+
+        Returns:
+            list of sequences, each being a dict that maps the stream names
+            to a NumPy array of shape ``(sequence length,) + shape`` or, for
+            sparse streams, to a SciPy CSR matrix of shape ``(sequence
+            length, dim)``. Streams of ``np.float64`` data are read in
+            double precision, all others in single precision.
+        '''
+        raise NotImplementedError('get_chunk has to be overridden')
+
+
+class UserStreamInformation(object):
+    '''
+    Describes a stream produced by a :class:`UserMinibatchSource`. Instances
+    are the keys of the minibatches it returns.
+    '''
+    def __init__(self, name, id, shape, is_sparse):
+        self.m_name = name
+        self.m_id = id
+        self.shape = sanitize_shape(shape)
+        self.is_sparse = is_sparse
+
+    def __eq__(self, other):
+        return isinstance(other, UserStreamInformation) and \
+                self.m_name == other.m_name and self.m_id == other.m_id
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash((self.m_name, self.m_id))
+
+    def __repr__(self):
+        return 'UserStreamInformation(%s, %s)' % (self.m_name, self.shape)
+
+
+# The deserializer of the worker processes
+_worker_deserializer = None
+
+def _init_worker(deserializer):
+    global _worker_deserializer
+    _worker_deserializer = deserializer
+
+def _stream_dtype(dtype):
+    # Element type of a stream with data of the given type
+    return np.float64 if dtype == np.float64 else np.float32
+
+def _decode_chunk(args):
+    chunk_id, stream_names, shared_dir = args
+    return _pack_chunk(_worker_deserializer.get_chunk(chunk_id),
+                       stream_names, shared_dir)
+
+def _pack_chunk(sequences, stream_names, shared_dir):
+    '''
+    Packs the sequences of a chunk into one block per stream. Dense blocks
+    are handed back through a file in ``shared_dir`` (usually /dev/shm),
+    which the reading process maps into memory instead of receiving a pickled
+    copy through the pool's pipe.
+    '''
+    packed = {}
+    for name in stream_names:
+        seqs = [seq[name] for seq in sequences]
+        lengths = np.asarray([s.shape[0] for s in seqs], dtype=np.int64)
+
+        if seqs and sparse.issparse(seqs[0]):
+            packed[name] = ('sparse', sparse.vstack(seqs, format='csr'), lengths)
+            continue
+
+        dtype = _stream_dtype(np.result_type(*seqs)) if seqs else np.float32
+        data = np.concatenate([np.asarray(s, dtype=dtype) for s in seqs]) \
+                if seqs else np.empty((0,), dtype=dtype)
+
+        if shared_dir is None:
+            packed[name] = ('dense', data, lengths)
+        else:
+            fd, path = tempfile.mkstemp(suffix='.npy', dir=shared_dir)
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, data)
+            packed[name] = ('shared', path, lengths)
+
+    return packed
+
+def _unpack_chunk(packed, stream_names):
+    parts = {}
+    num_sequences = None
+    for name in stream_names:
+        kind, data, lengths = packed[name]
+        if kind == 'shared':
+            path = data
+            if os.name == 'nt':
+                # mapped files cannot be removed on Windows
+                data = np.load(path)
+            else:
+                data = np.load(path, mmap_mode='r')
+            os.remove(path)
+
+        offsets = np.cumsum(lengths)
+        parts[name] = [data[start:end] for start, end in
+                       zip(np.concatenate(([0], offsets[:-1])), offsets)]
+        num_sequences = len(lengths)
+
+    return [dict((name, parts[name][i]) for name in stream_names)
+            for i in range(num_sequences or 0)]
+
+def _discard_chunk(packed):
+    for kind, data, _ in packed.values():
+        if kind == 'shared' and os.path.exists(data):
+            os.remove(data)
+
+
+def _create_value(stream_info, sequences, device):
+    # Dense sequences of the same shape are passed as one block, like
+    # dense batches in Value.create, instead of one NDArrayView per sequence.
+    first = sequences[0]
+    if not any(sparse.issparse(data) for data in sequences) and \
+            first.ndim == len(stream_info.shape) + 1 and \
+            all(data.shape == first.shape for data in sequences):
+        dtype = _stream_dtype(np.result_type(*sequences))
+        batch = np.ascontiguousarray(np.stack(sequences), dtype=dtype)
+        return cntk_py.Value(NDArrayView.from_dense(batch, device))
+
+    cpu_dev = cpu()
+    ndavs = []
+    for data in sequences:
+        dtype = _stream_dtype(data.dtype)
+        if sparse.issparse(data):
+            data = data.astype(dtype).tocsr()
+        else:
+            data = np.ascontiguousarray(data, dtype=dtype)
+        ndavs.append(NDArrayView.from_data(data, cpu_dev))
+
+    return cntk_py.Value_create(stream_info.shape, ndavs, [], device, False)
+
+
+class UserMinibatchSource(object):
+    '''
+    Minibatch source reading from a :class:`UserDeserializer`. It has the
+    same interface as :class:`MinibatchSource` and can be used in its place
+    in Python training loops (also wrapped into a
+    :class:`PrefetchingMinibatchSource`).
+
+    Chunks are decoded by a pool of ``num_workers`` processes. While the
+    sequences of one randomization window are consumed, the chunks of the
+    next window are already being decoded.
+
+    If ``randomize`` is `True`, the order of the chunks is shuffled in every
+    sweep, and the sequences are shuffled within windows of
+    ``randomization_window`` consecutive chunks. The randomization only
+    depends on ``seed``, the sweep and the window, so that the state returned
+    by :meth:`get_checkpoint_state` is small and restoring from it does not
+    require to replay the data.
+
+    When reading distributed, the (shuffled) chunks of a sweep are assigned to
+    the partitions in a round-robin fashion.
+
+    Args:
+        deserializer (:class:`UserDeserializer`): the deserializer
+        randomize (bool, default True): randomize before every sweep
+        randomization_window (int, default 1): number of chunks within which
+         the sequences are shuffled, ignored if `randomize` is False
+        epoch_size (int): number of samples to read. If the data is read
+         distributed, every partition reads its share of it.
+         ``INFINITELY_REPEAT`` reads the data forever, ``FULL_DATA_SWEEP``
+         reads it once.
+        num_workers (int or None, default None): number of worker processes
+         decoding the chunks. `None` uses one per CPU, 0 decodes them in the
+         calling process.
+        seed (int, default 0): seed of the randomization
+        use_shared_memory (bool, default True): whether decoded dense data is
+         passed from the workers through files in /dev/shm (if available)
+         instead of being pickled
+    '''
+    def __init__(self, deserializer, randomize=True, randomization_window=1,
+                 epoch_size=INFINITELY_REPEAT, num_workers=None, seed=0,
+                 use_shared_memory=True):
+        if not isinstance(deserializer, UserDeserializer):
+            raise TypeError('deserializer must be a UserDeserializer, not %s' %
+                    type(deserializer))
+        if randomization_window < 1:
+            raise ValueError('randomization_window must be at least 1 chunk')
+
+        self.deserializer = deserializer
+        self.randomize = randomize
+        self.randomization_window = randomization_window if randomize else 1
+        self.epoch_size = epoch_size
+        self.seed = seed
+
+        infos = {}
+        for idx, name in enumerate(sorted(deserializer.streams.keys())):
+            s = deserializer.streams[name]
+            if 'dim' not in s:
+                raise ValueError('stream "%s" does not define a shape' % name)
+            infos[name] = UserStreamInformation(name, idx, s.dim, s.is_sparse)
+        self.streams = Record(**infos)
+        self._stream_names = sorted(infos.keys())
+
+        self._num_chunks = deserializer.num_chunks()
+        if self._num_chunks < 1:
+            raise ValueError('the deserializer does not provide any chunks')
+
+        if num_workers is None:
+            num_workers = multiprocessing.cpu_count()
+        self._pool = None
+        if num_workers > 0:
+            self._pool = multiprocessing.Pool(num_workers,
+                    initializer=_init_worker, initargs=(deserializer,))
+
+        self._shared_dir = None
+        if use_shared_memory and self._pool is not None:
+            self._shared_dir = '/dev/shm' if os.path.isdir('/dev/shm') \
+                    else tempfile.gettempdir()
+
+        self._partition = (1, 0)
+        self._window_key = None
+        self._window_sequences = None
+        self._pending = None
+        self._restore(dict(sweep=0, window=0, offset=0, samples=0))
+
+    def stream_infos(self):
+        '''
+        Describes the streams that this source produces.
+
+        Returns:
+            list of :class:`UserStreamInformation`
+        '''
+        return [self.streams[name] for name in self._stream_names]
+
+    def stream_info(self, name):
+        '''
+        Gets the description of the stream with given name.
+        '''
+        try:
+            return self.streams[name]
+        except KeyError:
+            raise ValueError('stream "%s" does not exist' % name)
+
+    def __getitem__(self, name):
+        return self.stream_info(name)
+
+    def _windows(self, sweep):
+        num_partitions, partition_index = self._partition
+        if self.randomize:
+            rng = np.random.RandomState([self.seed, sweep])
+            chunks = rng.permutation(self._num_chunks)
+        else:
+            chunks = np.arange(self._num_chunks)
+
+        chunks = chunks[partition_index::num_partitions]
+        if len(chunks) == 0:
+            raise ValueError('partition %i of %i does not have any chunks' %
+                    (partition_index, num_partitions))
+
+        w = self.randomization_window
+        return [chunks[i:i+w].tolist() for i in range(0, len(chunks), w)]
+
+    def _decode_async(self, key):
+        sweep, window = key[:2]
+        args = [(chunk_id, self._stream_names, self._shared_dir)
+                for chunk_id in self._windows(sweep)[window]]
+        return self._pool.map_async(_decode_chunk, args)
+
+    def _next_key(self, key):
+        sweep, window, partition = key
+        if window + 1 < len(self._windows(sweep)):
+            return (sweep, window + 1, partition)
+        return (sweep + 1, 0, partition)
+
+    def _discard_pending(self):
+        if self._pending is not None:
+            for packed in self._pending[1].get():
+                _discard_chunk(packed)
+            self._pending = None
+
+    def _load_window(self):
+        key = (self._sweep, self._window, self._partition)
+        if self._window_key == key:
+            return
+
+        if self._pool is None:
+            packed = [_pack_chunk(self.deserializer.get_chunk(chunk_id),
+                                  self._stream_names, None)
+                      for chunk_id in self._windows(self._sweep)[self._window]]
+        else:
+            if self._pending is not None and self._pending[0] == key:
+                packed = self._pending[1].get()
+                self._pending = None
+            else:
+                self._discard_pending()
+                packed = self._decode_async(key).get()
+
+            # decode the next window while this one is being consumed
+            next_key = self._next_key(key)
+            self._pending = (next_key, self._decode_async(next_key))
+
+        sequences = []
+        for p in packed:
+            sequences.extend(_unpack_chunk(p, self._stream_names))
+
+        if self.randomize:
+            rng = np.random.RandomState([self.seed, self._sweep, self._window])
+            sequences = [sequences[i] for i in rng.permutation(len(sequences))]
+
+        self._window_key = key
+        self._window_sequences = sequences
+
+    def _current_sequence(self):
+        '''
+        Returns the next sequence or `None` if the epoch is over.
+        '''
+        if self.epoch_size == FULL_DATA_SWEEP:
+            if self._sweep > 0:
+                return None
+        elif self.epoch_size != INFINITELY_REPEAT:
+            if self._samples >= self.epoch_size // self._partition[0]:
+                return None
+
+        while True:
+            self._load_window()
+            if self._offset < len(self._window_sequences):
+                return self._window_sequences[self._offset]
+            # empty chunks
+            self._advance(0)
+
+    def _advance(self, num_samples):
+        '''
+        Moves on to the next sequence.
+
+        Returns:
+            `True` if the end of a sweep was reached
+        '''
+        self._samples += num_samples
+        self._offset += 1
+        if self._offset < len(self._window_sequences):
+            return False
+
+        sweep, window, _ = self._next_key(self._window_key)
+        self._offset = 0
+        self._window = window
+        if sweep != self._sweep:
+            self._sweep = sweep
+            return True
+
+        return False
+
+    def next_minibatch(self, minibatch_size_in_samples,
+            input_map=None, device=None, num_data_partitions=None, partition_index=None):
+        '''
+        Reads a minibatch that contains data for all input streams. See
+        :meth:`MinibatchSource.next_minibatch` for the arguments and the
+        returned value. The returned mapping is keyed by
+        :class:`UserStreamInformation` instances.
+        '''
+        if minibatch_size_in_samples <= 0:
+            raise ValueError('minibatch size must be > 0')
+
+        if device is None:
+            device = use_default_device()
+
+        partition = (num_data_partitions or 1, partition_index or 0)
+        if partition != self._partition:
+            # the windows of the new partition differ, it is read from the
+            # beginning of the current sweep
+            self._discard_pending()
+            self._partition = partition
+            self._window_key = None
+            self._window = 0
+            self._offset = 0
+
+        sequences = []
+        num_samples = 0
+        sweep_end = False
+        while num_samples < minibatch_size_in_samples:
+            seq = self._current_sequence()
+            if seq is None:
+                break
+
+            length = max(s.shape[0] for s in seq.values())
+            if sequences and num_samples + length > minibatch_size_in_samples:
+                break
+
+            sequences.append(seq)
+            num_samples += length
+            if self._advance(length):
+                sweep_end = True
+                break
+
+        if not sequences:
+            return {}
+
+        mb = {}
+        for si in self.stream_infos():
+            value = _create_value(si, [seq[si.m_name] for seq in sequences], device)
+            mb[si] = MinibatchData(value, len(sequences),
+                    sum(seq[si.m_name].shape[0] for seq in sequences), sweep_end)
+
+        if input_map:
+            return { key : mb[value] for (key, value) in input_map.items() }
+        else:
+            return mb
+
+    def _restore(self, state):
+        self._sweep = state['sweep']
+        self._window = state['window']
+        self._offset = state['offset']
+        self._samples = state['samples']
+
+    def get_checkpoint_state(self):
+        '''
+        Gets the checkpoint state of this source.
+
+        Returns:
+            `dict` that can be passed to :meth:`restore_from_checkpoint` (and
+            as ``external_state`` to :meth:`~cntk.trainer.Trainer.save_checkpoint`)
+        '''
+        return dict(sweep=self._sweep, window=self._window,
+                    offset=self._offset, samples=self._samples)
+
+    def restore_from_checkpoint(self, checkpoint):
+        '''
+        Restores the state of this source from the specified checkpoint.
+
+        Args:
+            checkpoint (`dict`): state returned by :meth:`get_checkpoint_state`
+        '''
+        self._restore(dict((k, int(checkpoint[k])) for k in
+                           ('sweep', 'window', 'offset', 'samples')))
+
+    @property
+    def is_distributed(self):
+        '''
+        Whether the source is reading a partition of the data
+        '''
+        return self._partition[0] > 1
+
+    def close(self):
+        '''
+        Stops the worker processes.
+        '''
+        if self._pool is not None:
+            self._discard_pending()
+            self._pool.terminate()
+            self._pool = None
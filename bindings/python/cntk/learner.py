@@ -5,7 +5,8 @@
 
 import math
 from . import cntk_py, NDArrayView
-from .utils import typemap
+from .device import use_default_device, cpu
+from .utils import typemap, sanitize_dtype_numpy
 from enum import Enum, unique
 import numpy as np
 
@@ -90,6 +91,131 @@ def _verify_momentum_type(momentum):
                          'momentum_as_time_constant_schedule() function)'
                          % type(momentum))
 
+class ParameterLayout(object):
+    '''
+    Layout of the gradients of a list of parameters in one contiguous flat
+    buffer, as used by :meth:`Learner.update_from_buffer`. The gradient of
+    every parameter is stored in C order at its offset in the buffer.
+
+    The views on the buffer that are passed to the learner are created once
+    for a buffer and reused in all later updates from it, so that a training
+    loop that computes its gradients into the same buffer in every step does
+    not allocate or (on the CPU) copy any gradient data.
+
+    Example:
+        >>> w = C.parameter(shape=(2, 3), init=1)
+        >>> b = C.parameter(shape=(3,), init=0)
+        >>> layout = C.learner.ParameterLayout([w, b])
+        >>> layout.size, layout.offsets
+        (9, [0, 6])
+        >>> buffer = layout.new_buffer()
+        >>> w_grad, b_grad = layout.unflatten(buffer)
+        >>> w_grad.shape
+        (2, 3)
+
+    Args:
+        parameters (list): the parameters in the order of their gradients
+         in the buffer
+        dtype (`np.float32` or `np.float64`, default None): data type of the
+         buffer. None uses the data type of the parameters.
+        device (:class:`~cntk.device.DeviceDescriptor`, default None): device
+         of the parameters. None uses the default device.
+    '''
+
+    def __init__(self, parameters, dtype=None, device=None):
+        self.parameters = list(parameters)
+        if not self.parameters:
+            raise ValueError('the layout needs at least one parameter')
+
+        if dtype is None:
+            dtype = self.parameters[0].dtype
+        self.dtype = np.dtype(sanitize_dtype_numpy(dtype))
+        self.device = device if device is not None else use_default_device()
+
+        self.shapes = [tuple(p.shape) for p in self.parameters]
+        self.offsets = []
+        self.size = 0
+        for shape in self.shapes:
+            self.offsets.append(self.size)
+            self.size += int(np.prod(shape, dtype=np.int64))
+
+        self._buffer = None
+        self._gradients = None
+        self._copies = None
+
+    def new_buffer(self):
+        '''
+        Returns:
+            a new flat buffer, filled with zeros, for the gradients of the
+            parameters
+        '''
+        return np.zeros(self.size, dtype=self.dtype)
+
+    def unflatten(self, buffer):
+        '''
+        Returns the gradients of the parameters in the flat buffer as NumPy
+        views on it, e.g. for computing the gradients into the buffer.
+
+        Args:
+            buffer (`np.ndarray`): flat buffer of this layout
+
+        Returns:
+            list of NumPy arrays of the shapes of the parameters
+        '''
+        self._check(buffer)
+        return [buffer[offset:offset + int(np.prod(shape, dtype=np.int64))].reshape(shape)
+                for offset, shape in zip(self.offsets, self.shapes)]
+
+    def flatten(self, gradient_values, out=None):
+        '''
+        Copies the gradients of the parameters into a flat buffer.
+
+        Args:
+            gradient_values (dict): maps every parameter of the layout to its
+             gradient
+            out (`np.ndarray`, default None): the buffer to copy to. If None,
+             a new one is allocated.
+
+        Returns:
+            the flat buffer
+        '''
+        if out is None:
+            out = self.new_buffer()
+        for p, view in zip(self.parameters, self.unflatten(out)):
+            view[...] = np.reshape(gradient_values[p], view.shape)
+        return out
+
+    def _check(self, buffer):
+        if not isinstance(buffer, np.ndarray) or buffer.ndim != 1 or \
+                buffer.size != self.size or buffer.dtype != self.dtype or \
+                not buffer.flags.c_contiguous:
+            raise ValueError('the gradients need to be a C contiguous '
+                             'one-dimensional NumPy array of %i elements '
+                             'of type %s' % (self.size, self.dtype))
+
+    def _gradient_values(self, buffer):
+        # Returns the map from the parameters to their gradients in the buffer
+        # as NDArrayViews, which are created once per buffer.
+        if buffer is not self._buffer:
+            self._check(buffer)
+            host_views = [NDArrayView.from_dense(view, cpu(), read_only=True, borrow=True)
+                          for view in self.unflatten(buffer)]
+            if self.device.type() == cpu().type():
+                self._copies = []
+                gradients = host_views
+            else:
+                gradients = [NDArrayView(shape, self.dtype, self.device)
+                             for shape in self.shapes]
+                self._copies = list(zip(gradients, host_views))
+            self._gradients = dict(zip(self.parameters, gradients))
+            self._buffer = buffer
+
+        for device_view, host_view in self._copies:
+            device_view.copy_from(host_view)
+
+        return self._gradients
+
+
 class Learner(cntk_py.Learner):
     '''
     Abstraction for learning a subset of parameters of a learnable function using first order gradient values
@@ -116,6 +242,27 @@ class Learner(cntk_py.Learner):
 
         return super(Learner, self).update(var_nd_map, training_sample_count)
 
+    def update_from_buffer(self, gradients, layout, training_sample_count):
+        '''
+        Update the parameters associated with this learner from the
+        gradients of all of them in one flat buffer. Unlike :meth:`update`,
+        this does not allocate new gradient data when it is called with the
+        same buffer again, e.g. in a custom training loop that computes the
+        gradients into the buffer in every step.
+
+        Args:
+            gradients (`np.ndarray`): flat buffer with the gradients of the
+             parameters of the layout
+            layout (:class:`ParameterLayout`): layout of the gradients in the
+             buffer
+            training_sample_count (int): training sample count
+
+        Returns:
+            `False` to indicate that learning has stopped for all of the parameters associated with this learner
+        '''
+        return super(Learner, self).update(layout._gradient_values(gradients),
+                training_sample_count)
+
     @property
     @typemap
     def parameters(self):
@@ -141,6 +288,216 @@ class Learner(cntk_py.Learner):
         '''
         return super(Learner, self).learning_rate()
 
+    def convert_learning_rate_to_per_sample(self, minibatch_size):
+        '''
+        Converts a learning rate schedule per minibatch
+        (``UnitType.minibatch``) into the schedule per sample of the same
+        shape that yields the same updates for minibatches of
+        ``minibatch_size`` samples, e.g. before the minibatch size is
+        changed. A schedule per sample is left unchanged.
+
+        Args:
+            minibatch_size (int): number of samples of the minibatches the
+             per-minibatch learning rates were chosen for
+        '''
+        super(Learner, self).convert_learning_rate_to_per_sample(minibatch_size)
+
+class ParametricSchedule(object):
+    '''
+    Describes a schedule whose values are computed from the number of
+    samples seen instead of being listed, e.g. a cosine decay over millions
+    of samples. Evaluating it takes constant time and its size does not
+    depend on the length of training. Pass it as the schedule to
+    :func:`learning_rate_schedule`, :func:`momentum_schedule`,
+    :func:`training_parameter_schedule` or
+    :func:`~cntk.training_session.minibatch_size_schedule`.
+
+    Use one of :func:`linear_warmup`, :func:`cosine_decay`,
+    :func:`exponential_decay`, :func:`step_decay`, :func:`polynomial_decay`
+    or :func:`cyclic_schedule` to create it.
+    '''
+
+    # forms of parametric schedules, as in CNTK::TrainingParameterSchedule::Form
+    CONSTANT = 1
+    COSINE = 2
+    EXPONENTIAL = 3
+    STEP = 4
+    POLYNOMIAL = 5
+    CYCLIC = 6
+
+    def __init__(self, form, initial_value, final_value=0.0, duration=0,
+                 rate=1.0, warmup=0):
+        if duration < 0 or warmup < 0:
+            raise ValueError('duration and warmup must not be negative')
+        if form != ParametricSchedule.CONSTANT and duration == 0:
+            raise ValueError('duration must be positive')
+        if form in (ParametricSchedule.EXPONENTIAL, ParametricSchedule.STEP) \
+                and rate <= 0:
+            raise ValueError('rate must be positive')
+
+        self.form = form
+        self.initial_value = initial_value
+        self.final_value = final_value
+        self.duration = duration
+        self.rate = rate
+        self.warmup = warmup
+
+    def _args(self, epoch_size):
+        # a final value of None (no bound) is passed as NaN
+        final_value = float('nan') if self.final_value is None else float(self.final_value)
+        return [self.form, float(self.initial_value), final_value,
+                int(self.duration), float(self.rate), int(self.warmup),
+                1 if epoch_size is None else epoch_size]
+
+
+def linear_warmup(value, warmup):
+    '''
+    Schedule that increases linearly up to ``value`` during the first
+    ``warmup`` samples and keeps it afterwards.
+
+    Example:
+        >>> s = learning_rate_schedule(linear_warmup(0.1, 100), UnitType.sample)
+        >>> round(s[0], 6), round(s[49], 6), s[99], s[10**9]
+        (0.001, 0.05, 0.1, 0.1)
+
+    Args:
+        value (float): value after the warmup
+        warmup (int): number of samples of the warmup
+
+    Returns:
+        :class:`ParametricSchedule`
+    '''
+    return ParametricSchedule(ParametricSchedule.CONSTANT, value, warmup=warmup)
+
+
+def cosine_decay(initial_value, final_value, duration, warmup=0):
+    '''
+    Schedule that decreases from ``initial_value`` to ``final_value`` along
+    half a cosine over ``duration`` samples and keeps ``final_value``
+    afterwards.
+
+    Example:
+        >>> s = learning_rate_schedule(cosine_decay(0.1, 0.0, 1000), UnitType.sample)
+        >>> s[0], round(s[500], 6), s[1000], s[10**9]
+        (0.1, 0.05, 0.0, 0.0)
+
+    Args:
+        initial_value (float): value at the beginning of the decay
+        final_value (float): value at the end of the decay
+        duration (int): number of samples of the decay
+        warmup (int, default 0): number of samples of a linear warmup up to
+         ``initial_value`` before the decay
+
+    Returns:
+        :class:`ParametricSchedule`
+    '''
+    return ParametricSchedule(ParametricSchedule.COSINE, initial_value,
+                              final_value, duration, warmup=warmup)
+
+
+def exponential_decay(initial_value, rate, duration, final_value=None, warmup=0):
+    '''
+    Schedule whose value is multiplied by ``rate`` every ``duration``
+    samples, continuously, i.e. ``initial_value * rate ** (t / duration)``.
+
+    Example:
+        >>> s = learning_rate_schedule(exponential_decay(0.1, 0.5, 1000), UnitType.sample)
+        >>> s[0], s[1000], s[3000]
+        (0.1, 0.05, 0.0125)
+
+    Args:
+        initial_value (float): value at the beginning of the decay
+        rate (float): factor per ``duration`` samples
+        duration (int): number of samples per factor of ``rate``
+        final_value (float, default None): if given, the value does not go
+         past this one
+        warmup (int, default 0): number of samples of a linear warmup up to
+         ``initial_value`` before the decay
+
+    Returns:
+        :class:`ParametricSchedule`
+    '''
+    return ParametricSchedule(ParametricSchedule.EXPONENTIAL, initial_value,
+                              final_value, duration, rate, warmup)
+
+
+def step_decay(initial_value, rate, step_size, final_value=None, warmup=0):
+    '''
+    Schedule whose value is multiplied by ``rate`` after every
+    ``step_size`` samples.
+
+    Example:
+        >>> s = learning_rate_schedule(step_decay(0.1, 0.1, 1000, final_value=0.001), UnitType.sample)
+        >>> s[999], round(s[1000], 6), s[10**9]
+        (0.1, 0.01, 0.001)
+
+    Args:
+        initial_value (float): value of the first step
+        rate (float): factor per step
+        step_size (int): number of samples per step
+        final_value (float, default None): if given, the value does not go
+         past this one
+        warmup (int, default 0): number of samples of a linear warmup up to
+         ``initial_value`` before the first step
+
+    Returns:
+        :class:`ParametricSchedule`
+    '''
+    return ParametricSchedule(ParametricSchedule.STEP, initial_value,
+                              final_value, step_size, rate, warmup)
+
+
+def polynomial_decay(initial_value, final_value, duration, power=1.0, warmup=0):
+    '''
+    Schedule that decreases from ``initial_value`` to ``final_value`` over
+    ``duration`` samples along ``(1 - t / duration) ** power`` and keeps
+    ``final_value`` afterwards. A ``power`` of 1 is a linear decay.
+
+    Example:
+        >>> s = learning_rate_schedule(polynomial_decay(0.1, 0.0, 1000), UnitType.sample)
+        >>> s[0], round(s[500], 6), s[1000]
+        (0.1, 0.05, 0.0)
+
+    Args:
+        initial_value (float): value at the beginning of the decay
+        final_value (float): value at the end of the decay
+        duration (int): number of samples of the decay
+        power (float, default 1): power of the decay
+        warmup (int, default 0): number of samples of a linear warmup up to
+         ``initial_value`` before the decay
+
+    Returns:
+        :class:`ParametricSchedule`
+    '''
+    return ParametricSchedule(ParametricSchedule.POLYNOMIAL, initial_value,
+                              final_value, duration, power, warmup)
+
+
+def cyclic_schedule(initial_value, final_value, half_cycle, warmup=0):
+    '''
+    Schedule that goes linearly from ``initial_value`` to ``final_value``
+    within ``half_cycle`` samples and back within the next ones, repeatedly
+    (a triangular cyclic schedule).
+
+    Example:
+        >>> s = learning_rate_schedule(cyclic_schedule(0.01, 0.1, 1000), UnitType.sample)
+        >>> s[0], s[1000], s[2000], round(s[2500], 6)
+        (0.01, 0.1, 0.01, 0.055)
+
+    Args:
+        initial_value (float): value at the beginning of every cycle
+        final_value (float): value in the middle of every cycle
+        half_cycle (int): number of samples of half a cycle
+        warmup (int, default 0): number of samples of a linear warmup up to
+         ``initial_value`` before the first cycle
+
+    Returns:
+        :class:`ParametricSchedule`
+    '''
+    return ParametricSchedule(ParametricSchedule.CYCLIC, initial_value,
+                              final_value, half_cycle, warmup=warmup)
+
+
 @typemap
 def training_parameter_schedule(schedule, unit, epoch_size=None):
     '''
@@ -164,11 +521,17 @@ def training_parameter_schedule(schedule, unit, epoch_size=None):
         >>> s[0], s[1199], s[1200], s[2699], s[2700], s[5000]
         (0.1, 0.1, 0.01, 0.01, 0.001, 0.001)
 
+        >>> # Cosine decay from 0.1 to 0.001 over 10M samples after a warmup of 100k
+        >>> s = training_parameter_schedule(cosine_decay(0.1, 0.001, 10**7, warmup=10**5), UnitType.sample)
+        >>> s[10**5], s[10**8]
+        (0.1, 0.001)
+
     Args:
-        schedule (float or list): if float, is the parameter schedule to be used
+        schedule (float, list or :class:`ParametricSchedule`): if float, is the parameter schedule to be used
          for all samples. In case of list, the elements are used as the
          values for ``epoch_size`` samples. If list contains pair, the second element is
-         used as a value for (``epoch_size`` x first element) samples
+         used as a value for (``epoch_size`` x first element) samples. A
+         :class:`ParametricSchedule` computes the value for any number of samples.
         unit (:class:`UnitType`): one of two
           * ``sample``: the returned schedule contains per-sample values
           * ``minibatch``: the returned schedule contains per-minibatch values.
@@ -178,7 +541,9 @@ def training_parameter_schedule(schedule, unit, epoch_size=None):
          by the size of the full data sweep, in which case the scheduling unit is
          the entire data sweep (as indicated by the MinibatchSource) and parameters
          change their values on the sweep-by-sweep basis specified by the 
-         ``schedule``.
+         ``schedule``. For a :class:`ParametricSchedule`, its durations are
+         given in scheduling units, which are single samples if no
+         ``epoch_size`` is provided.
 
     Returns:
         training parameter schedule
@@ -202,15 +567,19 @@ def training_parameter_schedule(schedule, unit, epoch_size=None):
         else:
             return cntk_py.training_parameter_per_minibatch_schedule(schedule)
 
-    args = [schedule] if epoch_size is None else [schedule, epoch_size]
+    if isinstance(schedule, ParametricSchedule):
+        args = schedule._args(epoch_size)
+    else:
+        args = [schedule] if epoch_size is None else [schedule, epoch_size]
 
-    if isinstance(schedule, list):
+    if isinstance(schedule, (list, ParametricSchedule)):
         if UnitType(unit) is UnitType.sample:
             return cntk_py.training_parameter_per_sample_schedule(*args)
         else:
             return cntk_py.training_parameter_per_minibatch_schedule(*args)
 
-    raise ValueError('schedule must be either a float or a list, not %s'%type(schedule))
+    raise ValueError('schedule must be either a float, a list or a '
+            'ParametricSchedule, not %s'%type(schedule))
 
 @typemap
 def learning_rate_schedule(lr, unit, epoch_size=None):
@@ -219,7 +588,7 @@ def learning_rate_schedule(lr, unit, epoch_size=None):
     :func:`training_parameter_schedule`).
 
     Args:
-        lr (float or list): see parameter ``schedule`` in 
+        lr (float, list or :class:`ParametricSchedule`): see parameter ``schedule`` in 
          :func:`training_parameter_schedule`.
         unit (:class:`UnitType`): see parameter 
          ``unit`` in :func:`training_parameter_schedule`.
@@ -241,7 +610,7 @@ def momentum_schedule(momentum, epoch_size=None):
     :func:`training_parameter_schedule` with the `unit=UnitType.minibatch`).
 
     Args:
-        momentum (float or list): see parameter ``schedule`` in 
+        momentum (float, list or :class:`ParametricSchedule`): see parameter ``schedule`` in 
          :func:`training_parameter_schedule`.
         epoch_size (int): see parameter ``epoch_size`` in 
          :func:`training_parameter_schedule`.
@@ -1,6 +1,7 @@
 from cntk import cntk_py
 from cntk.device import DeviceDescriptor
-from cntk.utils import typemap, sanitize_var_map, sanitize_batch, variable_value_to_seq
+from cntk.utils import typemap, sanitize_var_map, sanitize_batch, \
+        variable_value_to_seq, variable_value_to_view, ArgumentLayout
 
 from cntk.utils.swig_helper import map_if_possible
 from cntk.ops.variables import Variable
@@ -8,6 +9,31 @@ from enum import Enum, unique
 import numpy as np
 
 
+# Incremented whenever the graph of a Function is modified in place through
+# the Python API (replace_placeholders), which invalidates cached argument
+# layouts of all Functions without querying their arguments on every call.
+_graph_version = 0
+
+def _graph_modified():
+    global _graph_version
+    _graph_version += 1
+
+def _cached_layout(cache, key, get_variables):
+    # Returns the ArgumentLayout stored in the dict 'cache' under 'key' if no
+    # graph has been modified since, or if it still has the same variables.
+    entry = cache.get(key)
+    if entry is not None and entry[0] == _graph_version:
+        return entry[1]
+
+    variables = get_variables()
+    if entry is not None and entry[1].matches(variables):
+        layout = entry[1]
+    else:
+        layout = ArgumentLayout(variables)
+    cache[key] = (_graph_version, layout)
+    return layout
+
+
 @unique
 class CloneMethod(Enum):
     '''
@@ -115,6 +141,30 @@ class Function(cntk_py.Function):
         return getattr(outputs[0], name)
 
 
+    def _layout(self, kind):
+        # The resolution of argument names is cached on this instance until a
+        # graph is modified through replace_placeholders (of any instance).
+        return _cached_layout(self.__dict__, '_%s_layout' % kind,
+                              lambda: getattr(self, kind))
+
+    def bind(self):
+        '''
+        Validates and resolves the arguments and outputs of this Function
+        once, for repeated calls of :meth:`~BoundFunction.eval` and
+        :meth:`~BoundFunction.forward` on the returned handle, e.g. in a
+        loop over many minibatches.
+
+        Example:
+            >>> v = C.input_variable(shape=(1,), name='v')
+            >>> f = C.square(v).bind()
+            >>> f.eval({'v': [[2]]})
+            array([[[ 4.]]], dtype=float32)
+
+        Returns:
+            :class:`BoundFunction`
+        '''
+        return BoundFunction(self)
+
     @property
     @typemap
     def arguments(self):
@@ -166,7 +216,7 @@ class Function(cntk_py.Function):
         '''
         return super(Function, self).constants()
 
-    def eval(self, arguments=None, device=None):
+    def eval(self, arguments=None, device=None, as_views=False):
         '''
         Evaluate the node using the specified ``arguments`` as input.
 
@@ -205,13 +255,15 @@ class Function(cntk_py.Function):
             device (:class:`~cntk.device.DeviceDescriptor`): the device descriptor that
              contains the type and id of the device on which the computation is
              to be performed.
+            as_views (bool, default `False`): see :meth:`forward`
 
         Returns:
            dict or NumPy Array: Dict with keys of ouput variable names and values of
            output variable. A single NumPy array if there is only one output value.
         '''
 
-        _, output_map = self.forward(arguments, self.outputs, device=device)
+        _, output_map = self.forward(arguments, self.outputs, device=device,
+                                     as_views=as_views)
 
         if len(output_map) > 1:
             return output_map
@@ -219,7 +271,8 @@ class Function(cntk_py.Function):
             return list(output_map.values())[0]
 
     @typemap
-    def forward(self, arguments, outputs, keep_for_backward=None, device=None):
+    def forward(self, arguments, outputs, keep_for_backward=None, device=None,
+                as_views=False):
         '''
         Computes the values of speficied variables in ``outputs``, using values
         provided in ``arguments`` that correspond to each input `Variable` of
@@ -275,24 +328,35 @@ class Function(cntk_py.Function):
             device (:class:`~cntk.device.DeviceDescriptor`, default `None`): the device
              descriptor that contains the type and id of the device on which the
              computation is. If `None`, the default device is used.
+            as_views (bool, default `False`): if `True`, the outputs are
+             returned as read-only NumPy arrays sharing the memory of the
+             computed values instead of copies. Outputs that have sequences of
+             varying lengths are then returned as a record of the padded data,
+             the mask, and the sequence lengths instead of a list of
+             sequences. See :func:`~cntk.utils.variable_value_to_view`.
 
         Returns:
              A tuple (BackPropState, map of outputs to NumPy arrays). The
              BackPropState is a handle taken by :func:`backward`.
         '''
+        return self._forward_with_layout(self._layout('arguments'), arguments,
+                outputs, keep_for_backward, device, as_views)
+
+    def _forward_with_layout(self, layout, arguments, outputs,
+                             keep_for_backward, device, as_views):
         if device is None:
             device = DeviceDescriptor.use_default_device()
 
-        in_var_map = sanitize_var_map(self.arguments, arguments,
-                                      None, device)
+        in_var_map = sanitize_var_map(layout, arguments, None, device)
         output_map = {v: None for v in outputs}
         keep_for_backward = set(keep_for_backward or {})
 
         state = super(Function, self)._forward(in_var_map, output_map, device,
                                              keep_for_backward)
 
+        value_to_output = variable_value_to_view if as_views else variable_value_to_seq
         for k in output_map:
-            output_map[k] = variable_value_to_seq(output_map[k], k)
+            output_map[k] = value_to_output(output_map[k], k)
 
         return state, output_map
 
@@ -329,7 +393,7 @@ class Function(cntk_py.Function):
             dict: mapping of ``variables`` to NumPy arrays
         '''
         device = state.device()
-        root_gradients = sanitize_var_map(self.outputs, root_gradients,
+        root_gradients = sanitize_var_map(self._layout('outputs'), root_gradients,
                                           None, device)
 
         var_gradients = dict((var, None) for var in variables)
@@ -528,6 +592,7 @@ class Function(cntk_py.Function):
         substitutions = substitutions or {}
         if not isinstance(substitutions, dict):
             raise TypeError("Variable substitution map must be a dictionary")
+        _graph_modified()
         return super(Function, self).replace_placeholders(substitutions)
 
     @typemap
@@ -545,6 +610,7 @@ class Function(cntk_py.Function):
 
         :raises ExceptionType: when the function has multiple placeholders.
         '''
+        _graph_modified()
         return super(Function, self).replace_placeholder(substitution)
 
     @typemap
@@ -614,15 +680,21 @@ class Function(cntk_py.Function):
         return graph.find_by_name(self, name)
 
     @typemap
-    def save_model(self, filename):
+    def save_model(self, filename, mappable=False):
         '''
         Save this function graph into a model file using protobuf-based
         serialization.
 
         Args:
             filename (str): model path
+            mappable (bool, default False): if True, the values of the
+             parameters and constants are stored as raw, aligned blobs next
+             to the graph. :func:`load_model` maps such a file into memory
+             and uses the values in place on the CPU instead of parsing and
+             copying them, so that processes that load the same model share
+             one copy of its weights through the page cache.
         '''
-        return super(Function, self).save_model(filename)
+        return super(Function, self).save_model(filename, mappable)
 
     @typemap
     def restore_model(self, filename):
@@ -638,6 +710,46 @@ class Function(cntk_py.Function):
         return super(Function, self).restore_model(filename)
 
 
+class BoundFunction(object):
+    '''
+    Handle returned by :meth:`Function.bind` that evaluates a Function with
+    the argument layout resolved when it was bound. The argument names of
+    each call are still looked up, but the arguments of the Function are
+    neither queried nor validated again. Modifying the graph afterwards
+    (e.g. with :meth:`~Function.replace_placeholders`) requires binding the
+    Function again.
+
+    Args:
+        function (:class:`Function`): the Function to evaluate
+    '''
+    def __init__(self, function):
+        self.function = function
+        self.arguments = function.arguments
+        self.outputs = function.outputs
+        self._layout = ArgumentLayout(self.arguments)
+
+    @typemap
+    def forward(self, arguments, outputs, keep_for_backward=None, device=None,
+                as_views=False):
+        '''
+        Same as :meth:`Function.forward`.
+        '''
+        return self.function._forward_with_layout(self._layout, arguments,
+                outputs, keep_for_backward, device, as_views)
+
+    def eval(self, arguments=None, device=None, as_views=False):
+        '''
+        Same as :meth:`Function.eval`.
+        '''
+        _, output_map = self.forward(arguments, self.outputs, device=device,
+                                     as_views=as_views)
+
+        if len(output_map) > 1:
+            return output_map
+        else:
+            return list(output_map.values())[0]
+
+
 class UserFunction(Function):
     '''
     Base class of all user extension functions.
@@ -759,19 +871,29 @@ class UserFunction(Function):
         return 'UserFunction'
 
 @typemap
-def load_model(filename, device=None):
+def load_model(filename, device=None, for_inference=False):
     '''
     Load the model in ``filename``, that has been saved using
-    :func:`~cntk.ops.functions.Function.save_model`.
+    :func:`~cntk.ops.functions.Function.save_model`. Models that have been
+    saved with ``mappable=True`` are mapped into memory; on the CPU their
+    weights are used in place (copy-on-write) rather than copied.
 
     Args:
         filename (str): filename to load the model from
         device (:class:`~cntk.device.DeviceDescriptor`, default is the default device):
          instance of DeviceDescriptor
+        for_inference (bool, default False): if True, a mappable model is
+         mapped read-only and the values of its parameters are read-only.
+         On the CPU, weights are then only read from the file when they are
+         first accessed, and all processes that load the model this way
+         (e.g. forked scoring workers, or processes loading a copy of the
+         file in shared memory such as ``/dev/shm``) share one copy of
+         them. Use ``clone(CloneMethod.clone)`` to get a private copy that
+         can be trained.
 
     Returns:
         root node
     '''
     if not device:
         device = DeviceDescriptor.use_default_device()
-    return cntk_py.Function.load_model(filename, device)
+    return cntk_py.Function.load_model(filename, device, for_inference)
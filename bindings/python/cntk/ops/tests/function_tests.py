@@ -289,4 +289,28 @@ def test_combine_duplicated_inputs():
         return True
 
     assert compare_var_names(duplicated_t_plus_b.outputs, [func_name, func_name])
-    
\ No newline at end of file
+    
+def test_eval_as_views():
+    i = input_variable(shape=(2,), name='i')
+    z = i * 2
+
+    data = AA([[1, 2], [3, 4]], dtype=np.float32)
+    result = z.eval({i: data}, as_views=True)
+    assert np.allclose(result, z.eval({i: data}))
+    assert not result.flags.writeable
+
+    with pytest.raises(ValueError):
+        result[0] = 0
+
+def test_eval_as_views_with_mask():
+    i = input_variable(shape=(1,), name='i')
+    z = i + 1
+
+    data = [AA([[1], [2], [3]], dtype=np.float32), AA([[4]], dtype=np.float32)]
+    result = z.eval({i: data}, as_views=True)
+
+    assert result.data.shape == (2, 3, 1)
+    assert np.all(result.lengths == [3, 1])
+    assert result.mask.shape == (2, 3)
+    for seq, length, expected in zip(result.data, result.lengths, z.eval({i: data})):
+        assert np.allclose(seq[:length], expected)
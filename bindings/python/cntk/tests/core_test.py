@@ -0,0 +1,67 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+# Licensed under the MIT license. See LICENSE.md file in the project root
+# for full license information.
+# ==============================================================================
+
+import timeit
+import numpy as np
+import pytest
+
+from ..core import Value
+from ..ops import input_variable
+from ..ops.tests.ops_test_utils import cntk_device
+from .test_utils import precision, PRECISION_TO_TYPE
+
+AA = np.asarray
+
+@pytest.mark.parametrize("shape, data_shape", [
+    ((2,), (3, 2)),      # one sample per sequence
+    ((2,), (3, 4, 2)),   # rectangular sequences
+    ((2, 3), (5, 2, 3)),
+    ((2, 3), (5, 1, 2, 3)),
+])
+def test_value_create_dense_batch(shape, data_shape, precision, device_id):
+    dt = PRECISION_TO_TYPE[precision]
+    dev = cntk_device(device_id)
+    var = input_variable(shape, dtype=dt)
+    data = np.arange(np.prod(data_shape)).reshape(data_shape)
+
+    fast = Value.create(var, data.astype(dt), device=dev)
+    # passing a list of sequences takes the per-sequence path
+    slow = Value.create(var, list(data.astype(dt)), device=dev)
+
+    assert fast.shape().dimensions() == slow.shape().dimensions()
+    assert np.allclose(np.asarray(fast), np.asarray(slow))
+
+    # integer data is cast once for the whole batch
+    from_int = Value.create(var, data, device=dev)
+    assert np.asarray(from_int).dtype == dt
+    assert np.allclose(np.asarray(from_int), np.asarray(slow))
+
+def test_value_create_dense_batch_fallback():
+    var = input_variable((2,))
+
+    # with sequence start flags the per-sequence path is taken
+    data = AA([[[1, 2], [3, 4]], [[5, 6], [7, 8]]], dtype=np.float32)
+    val = Value.create(var, data, seq_starts=[True, False])
+    assert np.allclose(np.asarray(val), data)
+
+    # non-rectangular shapes are not handled by the fast path
+    assert Value._batch_as_value_shape(var, AA([1, 2, 3])) is None
+
+    with pytest.raises(ValueError):
+        Value.create(var, AA([[1, 2]], dtype=np.complex64))
+
+@pytest.mark.benchmark
+def test_value_create_dense_batch_benchmark():
+    # run with --benchmarks (and -s to see the timings)
+    var = input_variable((256,))
+    data = np.random.rand(4096, 256).astype(np.float32)
+
+    number = 10
+    fast = timeit.timeit(lambda: Value.create(var, data), number=number)
+    slow = timeit.timeit(lambda: Value.create(var, list(data)), number=number)
+
+    print('Value.create of %s: %.2fms (dense batch) vs. %.2fms (per sequence)' %
+            (str(data.shape), fast*1000/number, slow*1000/number))
@@ -30,6 +30,41 @@ def test_learning_rate_schedule(params, expectation):
     l = learning_rate_schedule(*params)
     assert [l[i] for i in range(len(expectation))] == expectation
 
+PARAMETRIC_SCHEDULE_PARAMS = [
+        (linear_warmup(1.0, 4), [0.25, 0.5, 0.75, 1.0, 1.0, 1.0]),
+        (cosine_decay(1.0, 0.0, 2), [1.0, 0.5, 0.0, 0.0]),
+        (cosine_decay(1.0, 0.0, 2, warmup=2), [0.5, 1.0, 1.0, 0.5, 0.0]),
+        (exponential_decay(1.0, 0.5, 1), [1.0, 0.5, 0.25, 0.125]),
+        (exponential_decay(1.0, 0.5, 1, final_value=0.3), [1.0, 0.5, 0.3, 0.3]),
+        (exponential_decay(1.0, 2.0, 1), [1.0, 2.0, 4.0, 8.0]),
+        (step_decay(1.0, 0.5, 2), [1.0, 1.0, 0.5, 0.5, 0.25]),
+        (step_decay(1.0, 2.0, 1, final_value=3.0), [1.0, 2.0, 3.0, 3.0]),
+        (polynomial_decay(1.0, 0.0, 2, power=2), [1.0, 0.25, 0.0, 0.0]),
+        (cyclic_schedule(0.0, 1.0, 2), [0.0, 0.5, 1.0, 0.5, 0.0, 0.5]),
+        ]
+
+@pytest.mark.parametrize("schedule, expectation", PARAMETRIC_SCHEDULE_PARAMS)
+def test_parametric_schedule(schedule, expectation):
+    l = learning_rate_schedule(schedule, UnitType.sample)
+    assert np.allclose([l[i] for i in range(len(expectation))], expectation)
+
+    m = momentum_schedule(schedule)
+    assert np.allclose([m[i] for i in range(len(expectation))], expectation)
+
+def test_parametric_schedule_epoch_size():
+    l = learning_rate_schedule(step_decay(1.0, 0.5, 2), UnitType.sample, epoch_size=10)
+    assert [l[0], l[19], l[20], l[40]] == [1.0, 1.0, 0.5, 0.25]
+
+    # evaluating far into training needs no precomputed values
+    l = learning_rate_schedule(cosine_decay(0.1, 0.001, 10**7, warmup=10**5), UnitType.sample)
+    assert l[10**5] == 0.1
+    assert l[10**12] == 0.001
+
+    with pytest.raises(ValueError):
+        cosine_decay(0.1, 0.001, 0)
+    with pytest.raises(ValueError):
+        step_decay(0.1, 0.0, 10)
+
 def sweep_based_schedule_fails():
     with pytest.raises(Exception):
         learning_rate_schedule([1], unit=UnitType.sample, epoch_size=0)
@@ -119,6 +154,39 @@ def test_learner_update():
     assert learner.learning_rate() == 0.2
     assert w.value < w_init
 
+def test_learner_update_from_buffer():
+    w = parameter(shape=(2, 3), init=1)
+    b = parameter(shape=(3,), init=0)
+    w_ref = parameter(shape=(2, 3), init=1)
+    b_ref = parameter(shape=(3,), init=0)
+
+    lr = learning_rate_schedule(0.1, UnitType.sample)
+    learner = sgd([w, b], lr=lr)
+    learner_ref = sgd([w_ref, b_ref], lr=lr)
+
+    layout = ParameterLayout([w, b])
+    assert layout.size == 9
+    assert layout.offsets == [0, 6]
+
+    buffer = layout.new_buffer()
+    w_grad, b_grad = layout.unflatten(buffer)
+    for step in range(3):
+        # the gradients are written into the same buffer in every step
+        w_grad[...] = np.arange(6, dtype=np.float32).reshape(2, 3) * (step + 1)
+        b_grad[...] = -step
+        learner.update_from_buffer(buffer, layout, 1)
+        learner_ref.update({w_ref: w_grad.copy(), b_ref: b_grad.copy()}, 1)
+
+        assert np.allclose(w.value, w_ref.value)
+        assert np.allclose(b.value, b_ref.value)
+
+    assert np.array_equal(layout.flatten({w: w_grad, b: b_grad}), buffer)
+
+    with pytest.raises(ValueError):
+        learner.update_from_buffer(buffer[:-1].copy(), layout, 1)
+    with pytest.raises(ValueError):
+        learner.update_from_buffer(buffer.astype(np.float64), layout, 1)
+
 def test_training_parameter_schedule():
     training_parameter_schedule(0.01, unit='minibatch')
     training_parameter_schedule(0.01, unit='sample')
@@ -3,12 +3,15 @@
 # for full license information.
 # ==============================================================================
 
+import os
 import numpy as np
+import pytest
 
 from cntk.ops import *
 from cntk.ops import *
 from cntk.debug import save_as_legacy_model
-from cntk.ops.functions import load_model
+from cntk.ops.functions import load_model, CloneMethod
+from cntk.device import cpu
 
 
 def test_load_save_constant(tmpdir):
@@ -105,3 +108,67 @@ def test_load_save_unique_input(tmpdir):
     loaded_node = load_model(filename)
     loaded_result = loaded_node.eval(input1)
     assert np.allclose(loaded_result, expected)
+
+def test_load_save_mappable(tmpdir):
+    i1 = input_variable((2,), name='i1')
+    w = parameter(init=np.asarray([[1, 2], [3, 4]], dtype=np.float32))
+    c = constant(value=np.asarray([10, 20], dtype=np.float32))
+    root_node = times(i1, w) + c
+
+    input1 = np.asarray([[1, 1]], dtype=np.float32)
+    expected = root_node.eval({i1: input1})
+
+    filename = str(tmpdir / 'mappable.mod')
+    root_node.save_model(filename, mappable=True)
+
+    loaded_node = load_model(filename, device=cpu())
+    assert np.allclose(loaded_node.eval({loaded_node.arguments[0]: input1}), expected)
+
+    # parameters mapped from the file can be updated without changing it
+    loaded_w = loaded_node.parameters[0]
+    loaded_w.value = np.zeros((2, 2), dtype=np.float32)
+    assert np.allclose(load_model(filename, device=cpu()).parameters[0].value, w.value)
+
+    root_node.restore_model(filename)
+    assert np.allclose(root_node.eval({i1: input1}), expected)
+
+def test_load_mappable_for_inference(tmpdir):
+    i1 = input_variable((2,), name='i1')
+    w = parameter(init=np.asarray([[1, 2], [3, 4]], dtype=np.float32))
+    root_node = times(i1, w)
+
+    input1 = np.asarray([[1, 1]], dtype=np.float32)
+    expected = root_node.eval({i1: input1})
+
+    filename = str(tmpdir / 'shared.mod')
+    root_node.save_model(filename, mappable=True)
+
+    loaded_node = load_model(filename, device=cpu(), for_inference=True)
+    assert np.allclose(loaded_node.eval({loaded_node.arguments[0]: input1}), expected)
+
+    # the shared weights are read-only, a clone has its own copy
+    with pytest.raises(RuntimeError):
+        loaded_node.parameters[0].value = np.zeros((2, 2), dtype=np.float32)
+
+    private_node = loaded_node.clone(CloneMethod.clone)
+    private_node.parameters[0].value = np.zeros((2, 2), dtype=np.float32)
+    assert np.allclose(loaded_node.parameters[0].value, w.value)
+
+def test_save_mappable_over_mapped_model(tmpdir):
+    i1 = input_variable((2,), name='i1')
+    w = parameter(init=np.asarray([[1, 2], [3, 4]], dtype=np.float32))
+    root_node = times(i1, w)
+
+    input1 = np.asarray([[1, 1]], dtype=np.float32)
+    expected = root_node.eval({i1: input1})
+
+    filename = str(tmpdir / 'shared.mod')
+    root_node.save_model(filename, mappable=True)
+    loaded_node = load_model(filename, device=cpu(), for_inference=True)
+
+    # saving a new model replaces the file, the mapped model keeps its values
+    w.value = np.zeros((2, 2), dtype=np.float32)
+    root_node.save_model(filename, mappable=True)
+    assert np.allclose(loaded_node.eval({loaded_node.arguments[0]: input1}), expected)
+    assert np.allclose(load_model(filename, device=cpu()).parameters[0].value, 0)
+    assert not os.path.exists(filename + '.tmp')
@@ -52,6 +52,172 @@ def test_trainer(tmpdir, no_eval_function):
     assert trainer.model.__doc__
     assert isinstance(trainer.parameter_learners[0], Learner)
 
+def test_trainer_async_checkpoint(tmpdir):
+    in1 = input_variable(shape=(1,))
+    labels = input_variable(shape=(1,))
+    p = parameter(shape=(2,), init=10)
+    z = plus(in1, reduce_sum(p), name='z')
+    ce = cross_entropy_with_softmax(z, labels)
+    lr_per_sample = learning_rate_schedule(0.007, UnitType.sample)
+    trainer = Trainer(z, ce, None, [sgd(z.parameters, lr_per_sample)])
+    arguments = {in1: [[1], [2]], labels: [[0], [1]]}
+
+    checkpoint = str(tmpdir / 'checkpoint.dat')
+    values = []
+    for i in range(3):
+        trainer.train_minibatch(arguments)
+        values.append(p.value.copy())
+        trainer.save_checkpoint(checkpoint, {'index': i}, asynchronous=True,
+                                num_checkpoints_to_keep=2)
+    # training continues while the checkpoint is written
+    trainer.train_minibatch(arguments)
+    trainer.wait_for_pending_checkpoint()
+
+    # only the last two checkpoints are kept, the most recent one first
+    assert os.path.isfile(checkpoint) and os.path.isfile(checkpoint + '.1')
+    assert not os.path.exists(checkpoint + '.2')
+    assert not [f for f in os.listdir(str(tmpdir)) if f.endswith('.tmp')]
+
+    trainer.restore_from_checkpoint(checkpoint)
+    assert np.allclose(p.value, values[-1])
+    trainer.restore_from_checkpoint(checkpoint + '.1')
+    assert np.allclose(p.value, values[-2])
+
+def test_trainer_delta_checkpoint(tmpdir):
+    vocab_size = 100000
+    x = input_variable(shape=(vocab_size,), is_sparse=True)
+    labels = input_variable(shape=(2,))
+    embedding = Embedding(2)(x)
+    ce = cross_entropy_with_softmax(embedding, labels)
+    lr_per_sample = learning_rate_schedule(0.1, UnitType.sample)
+    trainer = Trainer(embedding, ce, None, [sgd(embedding.parameters, lr_per_sample)])
+    E = embedding.parameters[0]
+
+    def train(word):
+        features = csr(([1], [word], [0, 1]), shape=(1, vocab_size), dtype=np.float32)
+        trainer.train_minibatch({x: [features], labels: [[1, 0]]})
+
+    checkpoint = str(tmpdir / 'checkpoint.dat')
+    values = []
+    for i in range(5):
+        train(i)
+        values.append(E.value.copy())
+        trainer.save_delta_checkpoint(checkpoint, {'index': i}, full_checkpoint_frequency=4)
+
+    # a base was written for the first and the fifth checkpoint, the
+    # deltas of the previous base are gone
+    assert not os.path.exists(checkpoint + '.delta1')
+    for i in range(2):
+        train(10 + i)
+        values.append(E.value.copy())
+        trainer.save_delta_checkpoint(checkpoint, full_checkpoint_frequency=4)
+
+    # the deltas only contain the changed rows
+    assert os.path.getsize(checkpoint + '.delta2') < os.path.getsize(checkpoint) / 4
+
+    train(20)
+    trainer.restore_from_checkpoint(checkpoint)
+    assert np.allclose(E.value, values[-1])
+
+    # deltas that are left over from a previous base are ignored: after a
+    # restore the next checkpoint is a new base, and the first delta of the
+    # previous base (written after train(10)) would undo training the same
+    # word again
+    stale_delta = open(checkpoint + '.delta1', 'rb').read()
+    base = open(checkpoint + '.ckp', 'rb').read()
+    train(10)
+    values.append(E.value.copy())
+    assert not np.allclose(values[-1], values[5])
+    trainer.save_delta_checkpoint(checkpoint, full_checkpoint_frequency=4)
+    assert open(checkpoint + '.ckp', 'rb').read() != base
+    assert not os.path.exists(checkpoint + '.delta1')
+
+    with open(checkpoint + '.delta1', 'wb') as f:
+        f.write(stale_delta)
+    train(40)
+    trainer.restore_from_checkpoint(checkpoint)
+    assert np.allclose(E.value, values[-1])
+
+def test_trainer_gradient_accumulation():
+    features = np.asarray([[1, 0], [0, 1], [1, 1], [2, 0]], dtype=np.float32)
+    labels_value = np.asarray([[1, 0], [0, 1], [0, 1], [1, 0]], dtype=np.float32)
+
+    def create_trainer(gradient_accumulation_steps):
+        x = input_variable(shape=(2,))
+        y = input_variable(shape=(2,))
+        z = times(x, parameter(shape=(2, 2), init=0.5))
+        lr = learning_rate_schedule(0.1, UnitType.minibatch)
+        trainer = Trainer(z, cross_entropy_with_softmax(z, y), classification_error(z, y),
+                [sgd(z.parameters, lr)], gradient_accumulation_steps)
+        return trainer, x, y
+
+    reference, x, y = create_trainer(1)
+    reference.train_minibatch({x: features, y: labels_value})
+
+    trainer, x, y = create_trainer(2)
+    assert trainer.gradient_accumulation_steps == 2
+    trainer.train_minibatch({x: features[:2], y: labels_value[:2]})
+    assert trainer.previous_minibatch_sample_count == 2
+    # the parameters are only updated after the second minibatch
+    assert trainer.total_number_of_samples_seen == 0
+    assert np.allclose(trainer.model.parameters[0].value, 0.5)
+
+    trainer.train_minibatch({x: features[2:], y: labels_value[2:]})
+    assert trainer.previous_minibatch_sample_count == 2
+    assert trainer.total_number_of_samples_seen == 4
+    # the per-minibatch learning rate applies to the accumulated minibatch
+    assert np.allclose(trainer.model.parameters[0].value,
+                       reference.model.parameters[0].value)
+
+    # remaining gradients are applied at the end of the data
+    trainer.train_minibatch({x: features[:2], y: labels_value[:2]})
+    assert trainer.total_number_of_samples_seen == 4
+    assert not trainer.train_minibatch({})
+    assert trainer.total_number_of_samples_seen == 6
+
+    with pytest.raises(ValueError):
+        trainer.gradient_accumulation_steps = 0
+
+def test_trainer_gradient_accumulation_checkpoint(tmpdir):
+    features = np.asarray([[1, 0], [0, 1], [1, 1], [2, 0]], dtype=np.float32)
+    labels_value = np.asarray([[1, 0], [0, 1], [0, 1], [1, 0]], dtype=np.float32)
+
+    x = input_variable(shape=(2,))
+    y = input_variable(shape=(2,))
+    z = times(x, parameter(shape=(2, 2), init=0.5))
+    lr = learning_rate_schedule(0.1, UnitType.minibatch)
+    trainer = Trainer(z, cross_entropy_with_softmax(z, y), classification_error(z, y),
+            [sgd(z.parameters, lr)], 2)
+    w = z.parameters[0]
+
+    # pending gradients are applied before the checkpoint is saved
+    trainer.train_minibatch({x: features[:2], y: labels_value[:2]})
+    assert trainer.total_number_of_samples_seen == 0
+    file_path = str(tmpdir / 'checkpoint')
+    trainer.save_checkpoint(file_path)
+    assert trainer.total_number_of_samples_seen == 2
+    saved = w.value
+    assert not np.allclose(saved, 0.5)
+
+    # gradients accumulated after the checkpoint are discarded on restore
+    trainer.train_minibatch({x: features[2:], y: labels_value[2:]})
+    trainer.restore_from_checkpoint(file_path)
+    assert trainer.total_number_of_samples_seen == 2
+    assert np.allclose(w.value, saved)
+
+    # the next update only sums up the minibatches trained after the restore
+    trainer.train_minibatch({x: features[:2], y: labels_value[:2]})
+    assert np.allclose(w.value, saved)
+    trainer.train_minibatch({x: features[2:], y: labels_value[2:]})
+    assert trainer.total_number_of_samples_seen == 6
+    expected = w.value
+
+    w.value = saved
+    reference = Trainer(z, cross_entropy_with_softmax(z, y), classification_error(z, y),
+            [sgd(z.parameters, lr)])
+    reference.train_minibatch({x: features, y: labels_value})
+    assert np.allclose(w.value, expected)
+
 def test_output_to_retain():
     in1 = input_variable(shape=(1,))
     labels = input_variable(shape=(1,))
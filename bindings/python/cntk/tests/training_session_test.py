@@ -0,0 +1,205 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+# Licensed under the MIT license. See LICENSE.md file in the project root
+# for full license information.
+# ==============================================================================
+
+import os
+import numpy as np
+import pytest
+from .. import cross_entropy_with_softmax, classification_error, \
+        input_variable, parameter, times
+from ..io import MinibatchSource, CTFDeserializer, StreamDef, StreamDefs
+from ..learner import sgd, learning_rate_schedule, UnitType, linear_warmup
+from ..trainer import Trainer
+from ..training_session import training_session, minibatch_size_schedule, \
+        AdaptiveMinibatchSizeSchedule, CrossValidationConfig
+from ..utils.progress_print import ProgressPrinter
+from ..utils.metrics_stream import MetricsWriter, read_metrics, CHECKPOINT_RECORD
+
+ctf_data = '''\
+0	|x 1 0	|y 1 0
+1	|x 0 1	|y 0 1
+2	|x 1 0	|y 1 0
+3	|x 0 1	|y 0 1
+'''
+
+
+def create_trainer_and_source(tmpdir, max_samples):
+    data = str(tmpdir / 'data.txt')
+    with open(data, 'w') as f:
+        f.write(ctf_data)
+
+    mb_source = MinibatchSource(CTFDeserializer(data, StreamDefs(
+        features=StreamDef(field='x', shape=2, is_sparse=False),
+        labels=StreamDef(field='y', shape=2, is_sparse=False))),
+        randomize=False, epoch_size=max_samples)
+
+    x = input_variable(shape=(2,), name='features')
+    y = input_variable(shape=(2,), name='labels')
+    z = times(x, parameter(shape=(2, 2), init=0))
+    trainer = Trainer(z, cross_entropy_with_softmax(z, y), classification_error(z, y),
+                      [sgd(z.parameters, learning_rate_schedule(0.1, UnitType.sample))])
+    input_map = {x: mb_source.streams.features, y: mb_source.streams.labels}
+    return trainer, mb_source, input_map
+
+
+def test_training_session_metrics(tmpdir):
+    trainer, mb_source, input_map = create_trainer_and_source(tmpdir, max_samples=16)
+    metrics_file = str(tmpdir / 'metrics.jsonl')
+    writer = MetricsWriter(metrics_file)
+
+    training_session(mb_source, trainer, minibatch_size_schedule(2),
+                     model_inputs_to_mb_source_mapping=input_map,
+                     checkpoint_filename=str(tmpdir / 'checkpoint'),
+                     checkpoint_frequency=8,
+                     metrics_writer=writer).train()
+    writer.close()
+
+    metrics = read_metrics(metrics_file)
+    minibatches = metrics['kind'] != CHECKPOINT_RECORD
+    assert metrics['step'][minibatches].tolist() == list(range(1, 9))
+    assert metrics['samples'][minibatches].tolist() == list(range(2, 18, 2))
+    assert np.allclose(metrics['lr'][minibatches], 0.1)
+    assert np.all(np.diff(metrics['elapsed']) >= 0)
+
+    checkpoints = read_metrics(metrics_file, kind=CHECKPOINT_RECORD)
+    assert len(checkpoints['step']) >= 1
+    # checkpoints report the average loss of the minibatches since the previous one
+    first = metrics['samples'][minibatches] <= checkpoints['samples'][0]
+    assert np.isclose(checkpoints['loss'][0], metrics['loss'][minibatches][first].mean())
+
+
+def test_training_session_async_checkpoints(tmpdir):
+    trainer, mb_source, input_map = create_trainer_and_source(tmpdir, max_samples=16)
+    checkpoint = str(tmpdir / 'checkpoint')
+
+    training_session(mb_source, trainer, minibatch_size_schedule(2),
+                     model_inputs_to_mb_source_mapping=input_map,
+                     checkpoint_filename=checkpoint, checkpoint_frequency=4,
+                     async_checkpoints=True, num_checkpoints_to_keep=3).train()
+
+    # the last checkpoint is on disk when training returns
+    assert os.path.isfile(checkpoint) and os.path.isfile(checkpoint + '.ckp')
+    assert os.path.isfile(checkpoint + '.2') and os.path.isfile(checkpoint + '.2.ckp')
+    assert not os.path.exists(checkpoint + '.3')
+
+    value = trainer.model.parameters[0].value.copy()
+    trainer.restore_from_checkpoint(checkpoint)
+    assert np.allclose(trainer.model.parameters[0].value, value)
+
+
+def test_training_session_overlapped_validation(tmpdir):
+    trainer, mb_source, input_map = create_trainer_and_source(tmpdir, max_samples=16)
+    cv_source = MinibatchSource(CTFDeserializer(str(tmpdir / 'data.txt'), StreamDefs(
+        features=StreamDef(field='x', shape=2, is_sparse=False),
+        labels=StreamDef(field='y', shape=2, is_sparse=False))),
+        randomize=False)
+    # the inputs are named like the streams
+    cv_input_map = dict((v, cv_source[v.name]) for v in input_map)
+    log = str(tmpdir / 'log')
+
+    session = training_session(mb_source, trainer, minibatch_size_schedule(2),
+                               progress_printer=ProgressPrinter(log_to_file=log),
+                               model_inputs_to_mb_source_mapping=input_map,
+                               cv_config=CrossValidationConfig(cv_source, cv_input_map,
+                                                               mb_size=3, frequency=8))
+    session.train()
+
+    # one evaluation after 8 samples and one at the end of training,
+    # each over one sweep of the validation data
+    results = session.validation_results
+    assert [r.samples_trained for r in results] == [8, 16]
+    assert [r.samples for r in results] == [4, 4]
+    assert all(0 <= r.metric <= 1 for r in results)
+
+    lines = [l for l in open(log).read().splitlines() if l.startswith('Finished Evaluation')]
+    assert len(lines) == 2
+
+
+def test_training_session_validation_error(tmpdir):
+    trainer, mb_source, input_map = create_trainer_and_source(tmpdir, max_samples=16)
+    cv_source = MinibatchSource(CTFDeserializer(str(tmpdir / 'data.txt'), StreamDefs(
+        features=StreamDef(field='x', shape=2, is_sparse=False),
+        labels=StreamDef(field='y', shape=2, is_sparse=False))),
+        randomize=False)
+    # the labels are not mapped, so the evaluation fails
+    cv_input_map = {v: cv_source[v.name] for v in input_map if v.name == 'features'}
+
+    session = training_session(mb_source, trainer, minibatch_size_schedule(2),
+                               model_inputs_to_mb_source_mapping=input_map,
+                               cv_config=CrossValidationConfig(cv_source, cv_input_map,
+                                                               frequency=4))
+    # the error is raised once training has finished
+    with pytest.raises(Exception):
+        session.train()
+    assert trainer.total_number_of_samples_seen == 16
+    assert session.validation_results == []
+
+
+def test_parametric_minibatch_size_schedule():
+    s = minibatch_size_schedule(linear_warmup(64, 8))
+    # minibatch sizes are rounded and at least 1
+    assert [s[i] for i in range(0, 10, 2)] == [8, 24, 40, 56, 64]
+    assert s[10**12] == 64
+
+    s = minibatch_size_schedule(linear_warmup(2, 100))
+    assert s[0] == 1
+
+
+def test_adaptive_minibatch_size_schedule():
+    s = AdaptiveMinibatchSizeSchedule(initial_size=8, max_size=64, probe_minibatches=2)
+    # throughput grows with the size
+    for size in [8, 16, 32, 64]:
+        assert s.minibatch_size == size
+        for i in range(3):
+            s.record(size, 1.0)
+    assert s.locked and s.minibatch_size == 64
+    assert sorted(s.throughputs) == [8, 16, 32, 64]
+
+    # the memory use would exceed the limit for a size of 32
+    s = AdaptiveMinibatchSizeSchedule(initial_size=8, probe_minibatches=1,
+                                      memory_limit=1000,
+                                      memory_usage=lambda: 40 * s.minibatch_size)
+    for size in [8, 16]:
+        for i in range(2):
+            s.record(size, 1.0)
+    assert s.locked and s.minibatch_size == 16
+
+    # a larger size that is slower is not kept
+    s = AdaptiveMinibatchSizeSchedule(initial_size=8, probe_minibatches=1)
+    for size, seconds in [(8, 1.0), (16, 4.0)]:
+        for i in range(2):
+            s.record(size, seconds)
+    assert s.locked and s.minibatch_size == 8
+
+
+def test_training_session_adaptive_minibatch_size(tmpdir):
+    trainer, mb_source, input_map = create_trainer_and_source(tmpdir, max_samples=64)
+    schedule = AdaptiveMinibatchSizeSchedule(initial_size=1, max_size=4, probe_minibatches=1,
+                                             min_improvement=-1)
+
+    training_session(mb_source, trainer, schedule,
+                     model_inputs_to_mb_source_mapping=input_map).train()
+
+    assert schedule.locked
+    assert sorted(schedule.throughputs) == [1, 2, 4]
+    assert trainer.total_number_of_samples_seen == 64
+
+
+def test_training_session_adaptive_minibatch_size_rescale(tmpdir):
+    trainer, mb_source, input_map = create_trainer_and_source(tmpdir, max_samples=64)
+    learner = trainer.parameter_learners[0]
+    learner.reset_learning_rate(learning_rate_schedule([0.4, 0.2], UnitType.minibatch, 40))
+    schedule = AdaptiveMinibatchSizeSchedule(initial_size=4, max_size=8, probe_minibatches=1,
+                                             min_improvement=-1, rescale_learning_rate=True)
+
+    training_session(mb_source, trainer, schedule,
+                     model_inputs_to_mb_source_mapping=input_map).train()
+
+    # the per-minibatch rates of 4 samples are converted into per-sample
+    # rates of the same shape
+    assert schedule.locked and schedule.minibatch_size == 8
+    assert learner.learning_rate() == 0.05
+    learner.convert_learning_rate_to_per_sample(4)
+    assert learner.learning_rate() == 0.05
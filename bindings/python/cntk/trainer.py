@@ -6,8 +6,10 @@
 
 from . import cntk_py
 from .device import use_default_device
-from .utils import sanitize_var_map, sanitize_function, typemap, value_to_seq, variable_value_to_seq
+from .utils import sanitize_var_map, sanitize_function, typemap, value_to_seq, \
+        variable_value_to_seq, variable_value_to_view
 from .io import _py_dict_to_cntk_dict, MinibatchData
+from .ops.functions import _cached_layout
 
 __doc__= '''\
 A trainer encapsulates the overall training process and employs one or more
@@ -28,8 +30,12 @@ class Trainer(cntk_py.Trainer):
        loss_function (:class:`~cntk.ops.functions.Function`): loss function
        eval_function (:class:`~cntk.ops.functions.Function`): evaluation function
        parameter_learners (list): list of learners from :mod:`cntk.learner`
+       gradient_accumulation_steps (int, default 1): number of minibatches whose
+        gradients are summed up before the parameters are updated (see
+        :attr:`gradient_accumulation_steps`)
     '''
-    def __init__(self, model, loss_function, eval_function, parameter_learners):
+    def __init__(self, model, loss_function, eval_function, parameter_learners,
+                 gradient_accumulation_steps=1):
         # TODO sanitizing should be removed once Swig's typemaps are in place
         model = sanitize_function(model)
         loss_function = sanitize_function(loss_function)
@@ -42,7 +48,18 @@ class Trainer(cntk_py.Trainer):
         # transplant into this class instance
         self.__dict__ = trainer.__dict__
 
-    def train_minibatch(self, arguments, outputs=None, device=None):
+        if gradient_accumulation_steps != 1:
+            self.set_gradient_accumulation_steps(gradient_accumulation_steps)
+
+    def _model_arguments(self):
+        # Resolved names are cached, so that they are not resolved again for
+        # every minibatch, as long as no graph has been modified.
+        # Trainers can also be created by typemap upcasting, which is why
+        # this is not done in the constructor.
+        return _cached_layout(self.__dict__, '_model_arguments_layout',
+                              lambda: self.model.arguments)
+
+    def train_minibatch(self, arguments, outputs=None, device=None, as_views=False):
         '''
         Optimize model parameters using the specified 'arguments' minibatch of training samples.
 
@@ -66,6 +83,9 @@ class Trainer(cntk_py.Trainer):
             device (:class:`~cntk.device.DeviceDescriptor`): the device descriptor that
              contains the type and id of the device on which the computation is
              to be performed.
+            as_views (bool, default `False`): if `True`, the values of
+             ``outputs`` are returned as read-only NumPy views instead of
+             copies (see :meth:`~cntk.ops.functions.Function.forward`).
 
         Returns:
             `bool` or `tuple`:
@@ -79,7 +99,7 @@ class Trainer(cntk_py.Trainer):
             device = use_default_device()
 
         if arguments:
-            arguments = sanitize_var_map(self.model.arguments, arguments,
+            arguments = sanitize_var_map(self._model_arguments(), arguments,
                 extract_values_from_minibatch_data = False)
 
         contains_minibatch_data = False
@@ -97,8 +117,9 @@ class Trainer(cntk_py.Trainer):
                 updated = super(Trainer, self).train_minibatch(arguments,
                     output_map, device)
 
+            value_to_output = variable_value_to_view if as_views else variable_value_to_seq
             for k,v in output_map.items():
-                output_map[k] = variable_value_to_seq(v, k)
+                output_map[k] = value_to_output(v, k)
 
             return updated, output_map
         else:
@@ -143,20 +164,72 @@ class Trainer(cntk_py.Trainer):
         '''
         if not device:
             device = use_default_device()
-        arguments = sanitize_var_map(self.model.arguments, arguments)
+        arguments = sanitize_var_map(self._model_arguments(), arguments)
 
         return super(Trainer, self).test_minibatch(arguments, device)
 
-    def save_checkpoint(self, filename, external_state={}):
+    def save_checkpoint(self, filename, external_state={}, asynchronous=False,
+                        num_checkpoints_to_keep=1):
         '''
         Saves a checkpoint of the model and other Trainer state at the
         specified file location.
 
+        In asynchronous mode, this only blocks for copying the parameter
+        values and learner state into host memory. The copy is written,
+        flushed to disk and atomically renamed into place on a background
+        thread while training continues. Call
+        :meth:`wait_for_pending_checkpoint` to make sure it is on disk.
+
+        Args:
+            filename (str): filename to store the checkpoint.
+            external_state (dict, default {}): additional state to store
+            asynchronous (bool, default False): whether to write the
+             checkpoint in the background
+            num_checkpoints_to_keep (int, default 1): number of checkpoints
+             to keep. The previous ones are renamed to `filename.1`,
+             `filename.2`, ... (most recent first).
+        '''
+
+        super(Trainer, self).save_checkpoint(filename,
+                _py_dict_to_cntk_dict(external_state), asynchronous,
+                num_checkpoints_to_keep)
+
+    def save_delta_checkpoint(self, filename, external_state={},
+                              full_checkpoint_frequency=10, asynchronous=False):
+        '''
+        Saves a checkpoint of the model and other Trainer state
+        incrementally. Every ``full_checkpoint_frequency``-th call writes a
+        full checkpoint (the base) to `filename`. The other calls only write
+        the blocks of rows of the parameter values and learner state that
+        changed since the previous call, to `filename.delta1`,
+        `filename.delta2`, ... This makes checkpoints of large models of
+        which only a few rows are updated at a time, e.g. embeddings trained
+        with sparse gradients, much smaller.
+
+        :meth:`restore_from_checkpoint` with `filename` restores the base
+        and replays its deltas.
+
         Args:
             filename (str): filename to store the checkpoint.
+            external_state (dict, default {}): additional state to store
+            full_checkpoint_frequency (int, default 10): every how many
+             checkpoints a full one is written
+            asynchronous (bool, default False): whether to write the
+             checkpoint in the background, see :meth:`save_checkpoint`
         '''
 
-        super(Trainer, self).save_checkpoint(filename, _py_dict_to_cntk_dict(external_state))
+        super(Trainer, self).save_delta_checkpoint(filename,
+                _py_dict_to_cntk_dict(external_state),
+                full_checkpoint_frequency, asynchronous)
+
+    def wait_for_pending_checkpoint(self):
+        '''
+        Blocks until the checkpoint that is being written in the background
+        (if any) is on disk. Raises the error that occurred while writing
+        it, if any.
+        '''
+
+        super(Trainer, self).wait_for_pending_checkpoint()
 
     def restore_from_checkpoint(self, filename):
         '''
@@ -222,6 +295,31 @@ class Trainer(cntk_py.Trainer):
         '''
         return super(Trainer, self).previous_minibatch_sample_count()
 
+    @property
+    def gradient_accumulation_steps(self):
+        '''
+        Number of minibatches whose gradients are summed up before the
+        learners update the parameters once, with the sum of the gradients and
+        the total number of samples of these minibatches. This trains with
+        minibatches that are this many times larger than the ones passed to
+        :meth:`train_minibatch`, but only needs the memory for one of them.
+        Learning rates per sample keep their meaning, learning rates per
+        minibatch refer to the accumulated minibatch.
+
+        The accumulated gradients are also applied at the end of a sweep and
+        when training with an empty minibatch (end of data).
+        :attr:`previous_minibatch_sample_count` and the previous minibatch
+        averages keep referring to the last minibatch passed to
+        :meth:`train_minibatch`, while :attr:`total_number_of_samples_seen`
+        only increases with every update. Not supported with distributed
+        learners.
+        '''
+        return super(Trainer, self).gradient_accumulation_steps()
+
+    @gradient_accumulation_steps.setter
+    def gradient_accumulation_steps(self, num_minibatches):
+        super(Trainer, self).set_gradient_accumulation_steps(num_minibatches)
+
     @property
     def total_number_of_samples_seen(self):
         '''
@@ -3,15 +3,137 @@
 # for full license information.
 # ==============================================================================
 
+import time
+import threading
+from collections import namedtuple
+try:
+    from queue import Queue, Empty
+except ImportError:
+    from Queue import Queue, Empty
 from . import cntk_py
 from .device import use_default_device
 from .utils import sanitize_var_map, sanitize_function, typemap, value_to_seq
+from .utils.metrics_stream import MINIBATCH_RECORD, CHECKPOINT_RECORD
+from .utils.progress_print import peak_rss
+from .learner import ParametricSchedule
 from .io import _py_dict_to_cntk_dict
+from .ops.functions import CloneMethod
+
+# Timer for the elapsed time and throughput of the metrics records
+_timer = getattr(time, 'perf_counter', time.time)
 
 __doc__= '''\
 A training session encapsulates a typical training loop and binds together the minibatch source, the :doc:`trainer <cntk.trainer>` and checkpointing.
 '''
 
+class CrossValidationConfig(object):
+    '''
+    Configuration of the evaluation of the model on validation data during
+    a :func:`training_session`. A snapshot of the evaluation function (or of
+    the loss function if the trainer has none) is taken with
+    :attr:`~cntk.ops.functions.CloneMethod.freeze`, i.e. with the current
+    parameter values as constants, and evaluated on a separate thread while
+    training continues. The results are passed to
+    :meth:`~cntk.utils.progress_print.ProgressPrinter.validation_summary` of
+    the progress printer and collected in
+    :attr:`TrainingSession.validation_results`. If an evaluation fails, no
+    further evaluations are started, and its error is raised by
+    :meth:`TrainingSession.train` once training has finished.
+
+    Args:
+        source (:class:`~cntk.io.MinibatchSource`): source of the validation
+         data, used only by the evaluation. An evaluation reads it up to the
+         end of a sweep, or up to ``max_samples``.
+        model_inputs_to_streams (dict): maps the input variables of the
+         model to the streams of ``source``
+        mb_size (int, default 32): minibatch size of the evaluation
+        frequency (int, default None): number of training samples after which
+         the model is evaluated. None evaluates after every checkpoint.
+         The model is evaluated at the end of training in any case.
+        max_samples (int, default None): maximum number of validation samples
+         of an evaluation. None reads a whole sweep.
+    '''
+
+    def __init__(self, source, model_inputs_to_streams, mb_size=32,
+                 frequency=None, max_samples=None):
+        if mb_size < 1:
+            raise ValueError('mb_size must be positive')
+        if frequency is not None and frequency < 1:
+            raise ValueError('frequency must be positive')
+
+        self.source = source
+        self.model_inputs_to_streams = model_inputs_to_streams
+        self.mb_size = mb_size
+        self.frequency = frequency
+        self.max_samples = max_samples
+
+
+ValidationResult = namedtuple('ValidationResult',
+        ['metric', 'samples', 'samples_trained', 'duration'])
+ValidationResult.__doc__ = '''
+Result of an evaluation on validation data: the average ``metric`` per
+sample over ``samples`` validation samples, of the model trained on
+``samples_trained`` samples, which took ``duration`` seconds.
+'''
+
+
+class _OverlappedValidation(object):
+    # Evaluates snapshots of the model on a background thread, one at a time.
+
+    def __init__(self, config, device):
+        self.config = config
+        self.device = device
+        self.results = Queue()
+        self._thread = None
+
+    def start(self, snapshot, samples_trained):
+        # the previous evaluation has usually finished already
+        self.wait()
+        self._thread = threading.Thread(target=self._run,
+                                        args=(snapshot, samples_trained))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def wait(self):
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def _run(self, snapshot, samples_trained):
+        try:
+            self.results.put(self._evaluate(snapshot, samples_trained))
+        except Exception as e:
+            self.results.put(e)
+
+    def _evaluate(self, snapshot, samples_trained):
+        config = self.config
+        start = _timer()
+        total = 0.0
+        samples = 0
+        while config.max_samples is None or samples < config.max_samples:
+            mb_size = config.mb_size
+            if config.max_samples is not None:
+                mb_size = min(mb_size, config.max_samples - samples)
+            mb = config.source.next_minibatch(mb_size,
+                    input_map=config.model_inputs_to_streams, device=self.device)
+            if not mb:
+                break
+
+            values = snapshot.eval(mb, device=self.device)
+            if isinstance(values, list):
+                total += sum(float(v.sum()) for v in values)
+            else:
+                total += float(values.sum())
+            data = next(iter(mb.values()))
+            samples += data.num_samples
+
+            if any(d.end_of_sweep for d in mb.values()):
+                break
+
+        return ValidationResult(total / samples if samples else 0.0, samples,
+                                samples_trained, _timer() - start)
+
+
 class TrainingSession(cntk_py.TrainingSession):
     '''
     A training session is an abstraction that encapsulates a typical training loop given
@@ -19,10 +141,29 @@ class TrainingSession(cntk_py.TrainingSession):
     '''
     def __init__(self, training_minibatch_source, trainer, mb_size_schedule,
                  progress_printer, model_inputs_to_mb_source_mapping, 
-                 checkpoint_frequency, checkpoint_filename):
+                 checkpoint_frequency, checkpoint_filename, metrics_writer=None,
+                 async_checkpoints=False, num_checkpoints_to_keep=1, cv_config=None):
         self.progress_printer = progress_printer
         self.trainer=trainer
-        super(TrainingSession, self).__init__ (training_minibatch_source, trainer, model_inputs_to_mb_source_mapping, mb_size_schedule, checkpoint_frequency, checkpoint_filename)
+        self.metrics_writer = metrics_writer
+        self.adaptive_schedule = None
+        if isinstance(mb_size_schedule, AdaptiveMinibatchSizeSchedule):
+            self.adaptive_schedule = mb_size_schedule
+            mb_size_schedule = cntk_py.minibatch_size_schedule(mb_size_schedule.minibatch_size)
+        self._last_minibatch_end = None
+        self._start_time = None
+        self._last_record_time = None
+        self._steps = 0
+        self._checkpoint_start_time = None
+        self._checkpoint_totals = [0, 0.0, 0.0]
+        self.cv_config = cv_config
+        self.validation_results = []
+        self._validation = None
+        self._next_validation = None
+        self._last_validation = None
+        self._validation_error = None
+        super(TrainingSession, self).__init__ (training_minibatch_source, trainer, model_inputs_to_mb_source_mapping, mb_size_schedule, checkpoint_frequency, checkpoint_filename,
+                                               async_checkpoints, num_checkpoints_to_keep)
 
     @typemap
     def train(self, device=None):
@@ -33,15 +174,301 @@ class TrainingSession(cntk_py.TrainingSession):
         if not device:
             device = use_default_device()
 
+        if self.cv_config is not None:
+            self._validation = _OverlappedValidation(self.cv_config, device)
+            self._next_validation = self.cv_config.frequency
+
+        if self.adaptive_schedule is not None:
+            if self.adaptive_schedule.rescale_learning_rate:
+                # keep the per-sample learning rates of the initial size
+                # while the size is probed and after it is locked in
+                for learner in self.trainer.parameter_learners:
+                    learner.convert_learning_rate_to_per_sample(
+                            self.adaptive_schedule.initial_size)
+            self._last_minibatch_end = _timer()
+
         super(TrainingSession, self).train(device)
 
+        if self._validation is not None:
+            if self._last_validation != self.trainer.total_number_of_samples_seen:
+                self._start_validation()
+            self._validation.wait()
+            self._report_validation_results()
+            if self._validation_error is not None:
+                raise self._validation_error
+
+        if self.metrics_writer is not None:
+            self.metrics_writer.flush()
+
+    def on_minibatch_start(self):
+        if self.progress_printer:
+            self.progress_printer.start_minibatch()
+        if self._start_time is None:
+            self._start_time = self._last_record_time = _timer()
+            self._checkpoint_start_time = self._start_time
+
     def on_minibatch_end(self):
         if self.progress_printer and self.trainer.total_number_of_samples_seen != 0:
             self.progress_printer.update_with_trainer(self.trainer, with_metric=True)
+        if self.metrics_writer is not None:
+            self._write_minibatch_record()
+        if self.adaptive_schedule is not None:
+            self._update_adaptive_schedule()
+        if self._validation is not None:
+            self._report_validation_results()
+            if self._next_validation is not None and \
+                    self.trainer.total_number_of_samples_seen >= self._next_validation:
+                self._start_validation()
+                while self._next_validation <= self.trainer.total_number_of_samples_seen:
+                    self._next_validation += self.cv_config.frequency
 
     def on_checkpoint_end(self):
         if self.progress_printer:
             self.progress_printer.epoch_summary(with_metric=True)
+        if self.metrics_writer is not None:
+            self._write_checkpoint_record()
+        if self._validation is not None and self.cv_config.frequency is None:
+            self._start_validation()
+        if self.adaptive_schedule is not None:
+            # the time of the checkpoint is not measured
+            self._last_minibatch_end = _timer()
+
+    def _start_validation(self):
+        if self._validation_error is not None:
+            return
+        function = self.trainer.evaluation_function
+        if function is None:
+            function = self.trainer.loss_function
+        snapshot = function.clone(CloneMethod.freeze)
+        self._last_validation = self.trainer.total_number_of_samples_seen
+        self._validation.start(snapshot, self._last_validation)
+
+    def _report_validation_results(self):
+        # Called from the callbacks of the native training loop, so an error
+        # of the evaluation is kept and raised by train() instead of here.
+        while True:
+            try:
+                result = self._validation.results.get_nowait()
+            except Empty:
+                return
+            if isinstance(result, Exception):
+                if self._validation_error is None:
+                    self._validation_error = result
+                continue
+            self.validation_results.append(result)
+            if self.progress_printer:
+                self.progress_printer.validation_summary(result.metric,
+                        result.samples, result.samples_trained, result.duration)
+
+    def _update_adaptive_schedule(self):
+        # The minibatch size is read by the native session from its schedule,
+        # which is only replaced when the size changes. A minibatch takes the
+        # time since the end of the previous one (reading and training).
+        schedule = self.adaptive_schedule
+        now = _timer()
+        seconds = now - self._last_minibatch_end
+        self._last_minibatch_end = now
+        samples = self.trainer.previous_minibatch_sample_count
+        if schedule.locked or samples == 0:
+            return
+
+        if schedule.record(samples, seconds):
+            self.set_minibatch_size_schedule(
+                    cntk_py.minibatch_size_schedule(schedule.minibatch_size))
+            if self.progress_printer:
+                self.progress_printer.update_value('minibatch_size',
+                        schedule.minibatch_size, self.trainer.total_number_of_samples_seen)
+
+    def _learning_rate(self):
+        learners = self.trainer.parameter_learners
+        return learners[0].learning_rate() if learners else None
+
+    def _write_minibatch_record(self):
+        now = _timer()
+        if self._start_time is None:
+            self._start_time = self._last_record_time = now
+            self._checkpoint_start_time = now
+
+        samples = self.trainer.previous_minibatch_sample_count
+        if samples == 0:
+            return
+        loss = self.trainer.previous_minibatch_loss_average
+        metric = self.trainer.previous_minibatch_evaluation_average
+        self._steps += 1
+        totals = self._checkpoint_totals
+        totals[0] += samples
+        totals[1] += loss * samples
+        totals[2] += metric * samples
+
+        step_time = now - self._last_record_time
+        self._last_record_time = now
+        self.metrics_writer.write(
+            kind=MINIBATCH_RECORD, step=self._steps,
+            samples=self.trainer.total_number_of_samples_seen,
+            loss=loss, metric=metric, lr=self._learning_rate(),
+            elapsed=now - self._start_time,
+            throughput=samples / step_time if step_time > 0 else None)
+
+    def _write_checkpoint_record(self):
+        now = _timer()
+        samples, loss_sum, metric_sum = self._checkpoint_totals
+        if self._start_time is None:
+            self._start_time = self._checkpoint_start_time = now
+        duration = now - self._checkpoint_start_time
+
+        self.metrics_writer.write(
+            kind=CHECKPOINT_RECORD, step=self._steps,
+            samples=self.trainer.total_number_of_samples_seen,
+            loss=loss_sum / samples if samples else None,
+            metric=metric_sum / samples if samples else None,
+            lr=self._learning_rate(),
+            elapsed=now - self._start_time,
+            throughput=samples / duration if duration > 0 else None)
+        self.metrics_writer.flush()
+
+        self._checkpoint_start_time = now
+        self._checkpoint_totals = [0, 0.0, 0.0]
+
+class AdaptiveMinibatchSizeSchedule(object):
+    '''
+    Minibatch size schedule for :func:`training_session` that finds the
+    minibatch size with the highest throughput on the model and machine at
+    hand, instead of a fixed minibatch size schedule.
+
+    Training starts with ``initial_size``. Each size is used for
+    ``probe_minibatches`` minibatches, after one more minibatch that is not
+    measured because it includes one-time costs such as memory allocations.
+    The throughput in samples per second (reading the data and training)
+    is measured over these minibatches. The size is then multiplied by
+    ``growth_factor`` as long as the throughput improves by at least
+    ``min_improvement``, the memory headroom allows it and ``max_size`` is
+    not exceeded. After that, the size with the highest throughput is used
+    for the rest of training.
+
+    Example:
+        >>> s = AdaptiveMinibatchSizeSchedule(initial_size=32, probe_minibatches=2)
+        >>> for seconds in [1.0, 1.0, 1.0]: # 32 samples per second
+        ...     _ = s.record(32, seconds)
+        >>> s.minibatch_size
+        64
+        >>> for seconds in [1.0, 1.0, 1.0]: # 64 samples per second
+        ...     _ = s.record(64, seconds)
+        >>> for seconds in [2.0, 2.0, 2.0]: # 64 samples per second, saturated
+        ...     _ = s.record(128, seconds)
+        >>> s.locked, s.minibatch_size
+        (True, 64)
+
+    Args:
+        initial_size (int, default 32): minibatch size to start with
+        max_size (int, default 8192): largest minibatch size to try
+        growth_factor (float, default 2): factor by which the size grows
+        probe_minibatches (int, default 10): number of minibatches over
+         which the throughput of a size is measured
+        min_improvement (float, default 0.05): minimum relative improvement
+         of the throughput for which the next size is tried
+        memory_limit (int, default None): memory in bytes available to
+         training. If given, the size only grows if the memory use,
+         assumed to grow at most linearly with the minibatch size, stays
+         within it. None does not limit the size by memory use.
+        memory_usage (callable, default
+         :func:`~cntk.utils.progress_print.peak_rss`): returns the current
+         memory use in bytes (or None if unknown), e.g. a query of the GPU
+         memory when training on a GPU
+        rescale_learning_rate (bool, default False): for learning rates per
+         minibatch (``UnitType.minibatch``) chosen for ``initial_size``
+         samples: when training starts, the learning rate schedules of the
+         learners are converted into per-sample schedules of the same shape
+         (see :meth:`~cntk.learner.Learner.convert_learning_rate_to_per_sample`),
+         so that the per-sample rates do not change with the minibatch
+         size, neither while sizes are probed nor afterwards. Per-sample
+         learning rates do not depend on the minibatch size and are left
+         unchanged.
+
+    Note:
+        The throughput is measured independently on every worker, so this
+        schedule is meant for training on a single worker.
+    '''
+
+    def __init__(self, initial_size=32, max_size=8192, growth_factor=2.0,
+                 probe_minibatches=10, min_improvement=0.05,
+                 memory_limit=None, memory_usage=peak_rss,
+                 rescale_learning_rate=False):
+        if initial_size < 1 or max_size < initial_size:
+            raise ValueError('the minibatch sizes need to satisfy '
+                             '1 <= initial_size <= max_size')
+        if growth_factor <= 1:
+            raise ValueError('growth_factor must be larger than 1')
+        if probe_minibatches < 1:
+            raise ValueError('probe_minibatches must be positive')
+
+        self.initial_size = initial_size
+        self.max_size = max_size
+        self.growth_factor = growth_factor
+        self.probe_minibatches = probe_minibatches
+        self.min_improvement = min_improvement
+        self.memory_limit = memory_limit
+        self.memory_usage = memory_usage
+        self.rescale_learning_rate = rescale_learning_rate
+
+        self.minibatch_size = initial_size
+        self.locked = False
+        # measured throughput in samples per second by minibatch size
+        self.throughputs = {}
+        self._best_size = None
+        self._best_throughput = 0.0
+        self._probe(initial_size)
+
+    def _probe(self, size):
+        self.minibatch_size = size
+        self._minibatches = 0
+        self._samples = 0
+        self._seconds = 0.0
+
+    def _has_memory_for(self, size):
+        if self.memory_limit is None:
+            return True
+        usage = self.memory_usage()
+        if usage is None:
+            return True
+        return usage * size / self.minibatch_size <= self.memory_limit
+
+    def record(self, samples, seconds):
+        '''
+        Records a minibatch of the current size.
+
+        Args:
+            samples (int): number of samples in the minibatch
+            seconds (float): time it took to read and train the minibatch
+
+        Returns:
+            True if the minibatch size changed
+        '''
+        if self.locked:
+            return False
+
+        self._minibatches += 1
+        if self._minibatches == 1:
+            return False
+        self._samples += samples
+        self._seconds += seconds
+        if self._minibatches <= self.probe_minibatches:
+            return False
+
+        size = self.minibatch_size
+        throughput = self._samples / self._seconds if self._seconds > 0 else float('inf')
+        self.throughputs[size] = throughput
+
+        if throughput > self._best_throughput * (1 + self.min_improvement):
+            self._best_size, self._best_throughput = size, throughput
+            next_size = min(self.max_size, int(round(size * self.growth_factor)))
+            if next_size > size and self._has_memory_for(next_size):
+                self._probe(next_size)
+                return True
+
+        # the throughput saturated or the size cannot grow any further
+        self.locked = True
+        self.minibatch_size = self._best_size
+        return self.minibatch_size != size
 
 @typemap
 def minibatch_size_schedule(schedule, epoch_size=1):
@@ -65,10 +492,17 @@ def minibatch_size_schedule(schedule, epoch_size=1):
         >>> s[0], s[1199], s[1200], s[2699], s[2700], s[5000]
         (32, 32, 64, 64, 128, 128)
 
+        >>> # Grow the minibatches linearly from 32 to 256 within the first 10M samples
+        >>> from cntk.learner import polynomial_decay
+        >>> s = minibatch_size_schedule(polynomial_decay(32, 256, 10**7))
+        >>> s[0], s[5 * 10**6], s[10**8]
+        (32, 144, 256)
+
     Args:
-        schedule (integer or list): if integer, it this minibatch size will be used for the whole training.
+        schedule (integer, list or :class:`~cntk.learner.ParametricSchedule`): if integer, it this minibatch size will be used for the whole training.
          In case of list of integers, the elements are used as the values for ``epoch_size`` samples. 
-         If list contains pair, the second element is used as a value for (``epoch_size`` x first element) samples
+         If list contains pair, the second element is used as a value for (``epoch_size`` x first element) samples.
+         The values of a :class:`~cntk.learner.ParametricSchedule` are rounded to the nearest minibatch size.
         epoch_size (int): number of samples as a scheduling unit.
 
     Returns:
@@ -83,7 +517,11 @@ def minibatch_size_schedule(schedule, epoch_size=1):
     if isinstance(schedule, list):
         return cntk_py.minibatch_size_schedule(schedule, epoch_size)
 
-    raise ValueError('schedule must be either a float or a list, not %s'%type(schedule))
+    if isinstance(schedule, ParametricSchedule):
+        return cntk_py.minibatch_size_schedule(*schedule._args(epoch_size))
+
+    raise ValueError('schedule must be either a float, a list or a '
+            'ParametricSchedule, not %s'%type(schedule))
 
 @typemap
 def training_session(training_minibatch_source,
@@ -91,25 +529,41 @@ def training_session(training_minibatch_source,
                      progress_printer=None,
                      model_inputs_to_mb_source_mapping={},
                      checkpoint_filename=None,
-                     checkpoint_frequency=0):
+                     checkpoint_frequency=0,
+                     metrics_writer=None,
+                     async_checkpoints=False,
+                     num_checkpoints_to_keep=1,
+                     cv_config=None):
     '''
     Creates a basic training session.
 
     Args:
         training_minibatch_source: a minibatch source that will be used for training.
         trainer: a Trainer.
-        mb_size_schedule: a minibatch size schedule returned from :func:`minibatch_size_schedule`
+        mb_size_schedule: a minibatch size schedule returned from :func:`minibatch_size_schedule`,
+         or an :class:`AdaptiveMinibatchSizeSchedule` that chooses the size by the measured throughput
         progress_printer: a progress printer instance
         model_inputs_to_mb_source_mapping: mapping between the input node names of the model and the stream 
          names provided from the minibatch source. By default all streams are taken with their respective names.
         checkpoint_filename: a file name of the checkpoint file, if None, the checkpointing is disabled.
         checkpoint_frequency: an approximate number of global samples processed accross the workers 
          after which the checkpoint is taken. Should be positive number if the checkpoint file is specified.
+        metrics_writer: a :class:`~cntk.utils.metrics_stream.MetricsWriter` that receives a record
+         (step, samples, loss, metric, learning rate, elapsed time and throughput) after every
+         minibatch and a record with the averages since the previous checkpoint after every checkpoint.
+         Use :func:`~cntk.utils.metrics_stream.read_metrics` to load the records as NumPy arrays.
+        async_checkpoints: if True, training only blocks for copying the model and learner state into host
+         memory at a checkpoint; the checkpoint is written in the background (see :meth:`~cntk.trainer.Trainer.save_checkpoint`).
+        num_checkpoints_to_keep: number of checkpoints to keep, the previous ones are kept as
+         ``checkpoint_filename.1``, ``checkpoint_filename.2``, ... (most recent first).
+        cv_config: a :class:`CrossValidationConfig` to evaluate snapshots of the model on
+         validation data on a separate thread while training continues.
 
     Returns:
         Instance of a :class:`TrainingSession`
     '''
-    if not isinstance(mb_size_schedule, cntk_py.minibatch_size_schedule):
+    if not isinstance(mb_size_schedule, (cntk_py.minibatch_size_schedule,
+                                         AdaptiveMinibatchSizeSchedule)):
         raise ValueError('mb_size_schedule type (%s) not supported. '
                          'mb_size_schedule must be a schedule '
                          '(output of minibatch_size_schedule() function)' 
@@ -123,4 +577,8 @@ def training_session(training_minibatch_source,
                            mb_size_schedule, progress_printer, 
                            model_inputs_to_mb_source_mapping, 
                            checkpoint_frequency,
-                           checkpoint_filename)
+                           checkpoint_filename,
+                           metrics_writer,
+                           async_checkpoints,
+                           num_checkpoints_to_keep,
+                           cv_config)
@@ -308,6 +308,73 @@ def sanitize_function(arg):
 
     return arg
 
+class ArgumentLayout(object):
+    '''
+    Resolved layout of the arguments of a :class:`~cntk.ops.functions.Function`.
+    Looking up the names of the arguments requires a call into the core API
+    for every argument. :func:`sanitize_var_map` accepts an instance of this
+    class instead of a list of arguments, so that callers evaluating the same
+    Function repeatedly resolve argument names only once. Callers keeping a
+    layout have to check with :meth:`matches` that the arguments of the
+    Function have not changed since.
+
+    Args:
+        op_arguments (list of :class:`~cntk.ops.variables.Variable`): arguments
+         of the function, e.g. `op.arguments` or `op.outputs`
+    '''
+    def __init__(self, op_arguments):
+        self.arguments = list(op_arguments)
+        arg_names = [var.name for var in self.arguments]
+        self.name_counter = collections.Counter(arg_names)
+        self.var_name_map = dict(zip(arg_names, self.arguments))
+        self._resolved_names = {}
+
+    def __len__(self):
+        return len(self.arguments)
+
+    def __getitem__(self, index):
+        return self.arguments[index]
+
+    def matches(self, op_arguments):
+        '''
+        Whether this is the layout of the given arguments.
+
+        Args:
+            op_arguments (list of :class:`~cntk.ops.variables.Variable`):
+             current arguments of the function
+
+        Returns:
+            bool
+        '''
+        op_arguments = list(op_arguments)
+        return len(op_arguments) == len(self.arguments) and \
+            all(a == b for a, b in zip(op_arguments, self.arguments))
+
+    def resolve(self, name):
+        '''
+        Returns the argument with the given name.
+
+        Args:
+            name (str): name of the argument
+
+        Returns:
+            :class:`~cntk.ops.variables.Variable`
+        '''
+        try:
+            return self._resolved_names[name]
+        except KeyError:
+            pass
+
+        if self.name_counter[name] == 0:
+            raise ValueError('variable with name "%s" does not exist in the network. Available variable names: %s' % (
+                name, ", ".join(self.var_name_map)))
+        elif self.name_counter[name] > 1:
+            raise ValueError('node name "%s" is not unique' % name)
+
+        var = self._resolved_names[name] = self.var_name_map[name]
+        return var
+
+
 def sanitize_var_map(op_arguments, arguments, precision=None,
                      device=None, extract_values_from_minibatch_data=True):
     '''
@@ -321,7 +388,8 @@ def sanitize_var_map(op_arguments, arguments, precision=None,
         op_arguments (:class:`~cntk.ops.functions.Function`): arguments of the root function. In
          :meth:`~cntk.ops.functions.Function.forward` pass it is typically
          `op.arguments`, in :meth:`~cntk.ops.functions.Function.backward` pass it is
-         `op.outputs`
+         `op.outputs`. Can also be an :class:`ArgumentLayout` of those, which
+         avoids resolving them again on every call.
         arguments: maps variables to their input data. The interpretation depends on
          the input type:
 
@@ -386,14 +454,10 @@ def sanitize_var_map(op_arguments, arguments, precision=None,
                         (len(op_arguments), len(arguments)))
 
     if isinstance(arguments, dict):
-        arg_names = [var.name for var in op_arguments]
-        name_counter = collections.Counter(arg_names)
-
-        var_name_map = dict((var.name, var) for var in op_arguments)
+        layout = op_arguments
     else:
         if len(op_arguments) == 1:
-            name_counter = collections.Counter([op_arguments[0].name])
-            var_name_map = dict([(op_arguments[0].name, op_arguments[0])])
+            layout = op_arguments
             arguments = dict([(op_arguments[0], arguments)])
         else:
             raise ValueError('non-dict argument (%s) is not supported for nodes with more than one input' % type(arguments).__name__)
@@ -404,17 +468,10 @@ def sanitize_var_map(op_arguments, arguments, precision=None,
     var_map = {}
     for var, batch in arguments.items():
         if isinstance(var, str):
-            if name_counter[var] == 0:
-                raise ValueError('variable with name "%s" does not exist in the network. Available variable names: %s' % (
-                    var, ", ".join(var_name_map)))
-            elif name_counter[var] > 1:
-                raise ValueError('node name "%s" is not unique' % var)
-
-            try:
-                var = var_name_map[var]
-            except KeyError:
-                raise KeyError("no input with the name '%s' was found.  Available: %s" % (
-                    var, ", ".join(var_name_map.keys())))
+            if not isinstance(layout, ArgumentLayout):
+                # names are resolved lazily, only if they are used as keys
+                layout = ArgumentLayout(layout)
+            var = layout.resolve(var)
 
         if isinstance(batch, tuple):
             if seq_starts is not None:
@@ -589,6 +646,44 @@ def variable_value_to_seq(value, variable):
         return np.asarray(value)
 
 
+def variable_value_to_view(value, variable):
+    '''
+    Convert a Value to a read-only NumPy array that shares the memory of the
+    Value's CPU buffer (if the Value lives on another device, it is copied to
+    the CPU once).
+
+    In contrast to :func:`variable_value_to_seq` masked entries are not
+    removed. If the Value has a mask, a record with the padded data, the mask
+    and the sequence lengths is returned instead of a list of sequences.
+
+    Args:
+        value (:class:`~cntk.core.Value`): Value as it is returned by Swig
+        variable (:class:`~cntk.ops.variables.Variable`): variable the value
+         belongs to
+
+    Returns:
+        a read-only NumPy array of shape ``(#sequences, max. sequence length)
+        + variable.shape`` for values without a mask, or a record with the
+        members ``data`` (that array), ``mask`` (see
+        :attr:`~cntk.core.Value.mask`) and ``lengths`` (number of valid
+        elements per sequence). Sparse values are returned as by
+        :func:`variable_value_to_seq`.
+    '''
+    if value.is_sparse():
+        return variable_value_to_seq(value, variable)
+
+    data = value.data().to_ndarray_view()
+
+    mask = value.mask()
+    if not mask:
+        return data
+
+    mask = np.asarray(mask.to_ndarray())
+    lengths = np.count_nonzero(mask != cntk_py.MaskKind_Invalid, axis=1)
+
+    return Record(data=data, mask=mask, lengths=lengths)
+
+
 def eval(op, arguments=None, precision=None, device=None, backward_pass=False, expected_backward=None):
     '''
     It evaluates ``op`` on the data provided by the reader. This is useful
@@ -0,0 +1,248 @@
+# ==============================================================================
+# Copyright (c) Microsoft. All rights reserved.
+# Licensed under the MIT license. See LICENSE.md file in the project root
+# for full license information.
+# ==============================================================================
+'''
+Machine-readable stream of training metrics.
+
+A :class:`MetricsWriter` appends one typed record per minibatch (and per
+checkpoint) to a file, either as JSON lines or in a binary columnar format.
+:func:`read_metrics` loads such a file into NumPy arrays, one per field, e.g.
+for plotting a run or comparing it against a baseline.
+'''
+
+import json
+import struct
+import numpy as np
+
+__all__ = ['MetricsWriter', 'read_metrics', 'METRICS_FIELDS',
+           'MINIBATCH_RECORD', 'CHECKPOINT_RECORD']
+
+# Kinds of records
+MINIBATCH_RECORD = 0
+CHECKPOINT_RECORD = 1
+
+# Name and (little-endian) type of the fields of every record, in file order
+METRICS_FIELDS = (
+    ('kind', '<i4'),
+    ('step', '<i8'),
+    ('samples', '<i8'),
+    ('loss', '<f8'),
+    ('metric', '<f8'),
+    ('lr', '<f8'),
+    ('elapsed', '<f8'),
+    ('throughput', '<f8'),
+)
+
+_MAGIC = b'CNTKMTRC'
+_VERSION = 1
+_FORMATS = ('jsonl', 'columnar')
+
+
+def _missing(dtype):
+    # Value of fields that are not given in a record
+    return np.nan if np.dtype(dtype).kind == 'f' else -1
+
+
+class MetricsWriter(object):
+    '''
+    Writes training metrics records to a file. Every record has the fields
+    given by ``METRICS_FIELDS``: the kind of the record (``MINIBATCH_RECORD``
+    or ``CHECKPOINT_RECORD``), the step (number of minibatches), the total
+    number of samples seen, loss, evaluation metric, learning rate, elapsed
+    seconds and throughput in samples per second. Fields that are not given
+    are stored as NaN (or -1 for integer fields).
+
+    Records are buffered and written block-wise, so that writing a record
+    only costs a constant amount of work:
+
+    * ``'jsonl'``: one JSON object per line.
+    * ``'columnar'``: a small header followed by blocks of records, in which
+      the values of every field are stored contiguously. An incomplete block
+      at the end of the file (e.g. after a crash) is ignored when reading.
+
+    Example:
+        >>> import os, tempfile
+        >>> filename = os.path.join(tempfile.mkdtemp(), 'metrics.bin')
+        >>> with MetricsWriter(filename, format='columnar') as writer:
+        ...     writer.write(step=1, samples=64, loss=0.5)
+        ...     writer.write(step=2, samples=128, loss=0.25)
+        >>> read_metrics(filename)['loss'].tolist()
+        [0.5, 0.25]
+
+    Args:
+        filename (str): file to write the records to. An existing file is
+         overwritten.
+        format (str, default 'jsonl'): ``'jsonl'`` or ``'columnar'``
+        block_size (int, default 1024): number of records that are buffered
+         before they are written
+    '''
+
+    def __init__(self, filename, format='jsonl', block_size=1024):
+        if format not in _FORMATS:
+            raise ValueError('format must be one of %s, not "%s"' %
+                             (', '.join(_FORMATS), format))
+        if block_size < 1:
+            raise ValueError('block_size must be positive')
+
+        self.filename = filename
+        self.format = format
+        self.block_size = block_size
+        self._columns = [[] for _ in METRICS_FIELDS]
+        self._defaults = [_missing(dtype) for _, dtype in METRICS_FIELDS]
+        self._index = dict((name, i) for i, (name, _) in enumerate(METRICS_FIELDS))
+
+        self._file = open(filename, 'wb')
+        if format == 'columnar':
+            header = json.dumps({'fields': [list(f) for f in METRICS_FIELDS]})
+            header = header.encode('utf-8')
+            self._file.write(_MAGIC + struct.pack('<II', _VERSION, len(header)))
+            self._file.write(header)
+
+    def __len__(self):
+        # number of buffered records
+        return len(self._columns[0])
+
+    def write(self, **fields):
+        '''
+        Appends a record.
+
+        Args:
+            fields: values of the record, keyed by the names of
+             ``METRICS_FIELDS``. ``kind`` defaults to ``MINIBATCH_RECORD``.
+        '''
+        if self._file is None:
+            raise ValueError('cannot write to a closed MetricsWriter')
+
+        values = list(self._defaults)
+        values[0] = MINIBATCH_RECORD
+        for name, value in fields.items():
+            if name not in self._index:
+                raise ValueError('unknown metrics field "%s"' % name)
+            if value is not None:
+                values[self._index[name]] = value
+
+        for column, value in zip(self._columns, values):
+            column.append(value)
+
+        if len(self) >= self.block_size:
+            self._write_block()
+
+    def _write_block(self):
+        if not len(self):
+            return
+
+        if self.format == 'columnar':
+            data = [struct.pack('<I', len(self))]
+            for (_, dtype), column in zip(METRICS_FIELDS, self._columns):
+                data.append(np.asarray(column, dtype=dtype).tobytes())
+        else:
+            types = [(name, float if np.dtype(dtype).kind == 'f' else int)
+                     for name, dtype in METRICS_FIELDS]
+            data = []
+            for values in zip(*self._columns):
+                # NaN is not valid JSON, missing values are written as null
+                record = dict((name, None if value != value else to_type(value))
+                              for (name, to_type), value in zip(types, values))
+                data.append(json.dumps(record, sort_keys=True) + '\n')
+            data = [''.join(data).encode('utf-8')]
+
+        self._file.write(b''.join(data))
+        self._columns = [[] for _ in METRICS_FIELDS]
+
+    def flush(self):
+        '''
+        Writes the buffered records to the file.
+        '''
+        if self._file is not None:
+            self._write_block()
+            self._file.flush()
+
+    def close(self):
+        '''
+        Writes the buffered records and closes the file.
+        '''
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+
+def _read_columnar(f):
+    version, header_size = struct.unpack('<II', f.read(8))
+    if version != _VERSION:
+        raise ValueError('unsupported metrics file version %i' % version)
+    fields = [(str(name), np.dtype(str(dtype))) for name, dtype in
+              json.loads(f.read(header_size).decode('utf-8'))['fields']]
+    record_size = sum(dtype.itemsize for _, dtype in fields)
+
+    blocks = [[] for _ in fields]
+    while True:
+        count = f.read(4)
+        if len(count) < 4:
+            break
+        count = struct.unpack('<I', count)[0]
+        data = f.read(count * record_size)
+        if len(data) < count * record_size:
+            # incomplete block
+            break
+        offset = 0
+        for block, (_, dtype) in zip(blocks, fields):
+            block.append(np.frombuffer(data, dtype=dtype, count=count, offset=offset))
+            offset += count * dtype.itemsize
+
+    return dict((name, np.concatenate(block) if block else np.empty(0, dtype))
+                for block, (name, dtype) in zip(blocks, fields))
+
+
+def _read_jsonl(f):
+    columns = dict((name, []) for name, _ in METRICS_FIELDS)
+    for line in f:
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            record = json.loads(line.decode('utf-8'))
+        except ValueError:
+            # incomplete last line
+            break
+        for name, dtype in METRICS_FIELDS:
+            value = record.get(name)
+            columns[name].append(_missing(dtype) if value is None else value)
+
+    return dict((name, np.asarray(columns[name], dtype=dtype))
+                for name, dtype in METRICS_FIELDS)
+
+
+def read_metrics(filename, kind=None):
+    '''
+    Loads the records written by a :class:`MetricsWriter`. The format of
+    the file is detected automatically.
+
+    Args:
+        filename (str): the metrics file
+        kind (int, default None): if given, only records of this kind (e.g.
+         ``CHECKPOINT_RECORD``) are returned
+
+    Returns:
+        `dict` that maps the names of ``METRICS_FIELDS`` to NumPy arrays with
+        one element per record
+    '''
+    with open(filename, 'rb') as f:
+        if f.read(len(_MAGIC)) == _MAGIC:
+            columns = _read_columnar(f)
+        else:
+            f.seek(0)
+            columns = _read_jsonl(f)
+
+    if kind is not None:
+        selected = columns['kind'] == kind
+        columns = dict((name, values[selected]) for name, values in columns.items())
+    return columns
@@ -5,10 +5,292 @@
 # ==============================================================================
 from __future__ import print_function
 import os
+import sys
+import json
 import time
+import atexit
+import weakref
+import threading
+from collections import deque
+
+try:
+    from queue import Queue, Empty
+except ImportError:
+    from Queue import Queue, Empty
 
 from cntk.cntk_py import TensorBoardFileWriter
 
+try:
+    import resource
+except ImportError:
+    # not available on Windows
+    resource = None
+
+# Timer for the minibatch timings
+_timer = getattr(time, 'perf_counter', time.time)
+
+
+def peak_rss():
+    '''
+    Returns: the peak resident set size of this process in bytes, or `None`
+    if it cannot be determined on this platform
+    '''
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+class StepStatistics(object):
+    '''
+    Timings of the last ``window`` minibatches, as recorded by
+    :class:`ProgressPrinter`.
+
+    Args:
+        window (int): number of minibatches to keep
+    '''
+
+    def __init__(self, window):
+        self.step_times = deque(maxlen=window)
+        self.data_times = deque(maxlen=window)
+        self.samples = deque(maxlen=window)
+
+    def add(self, step_time, samples, data_time=None):
+        '''
+        Records a minibatch.
+
+        Args:
+            step_time (float): wall-clock time in seconds of the minibatch,
+             including reading its data
+            samples (int): number of samples in the minibatch
+            data_time (float or None): time in seconds spent waiting for the data
+        '''
+        self.step_times.append(step_time)
+        self.data_times.append(data_time)
+        self.samples.append(samples)
+
+    def __len__(self):
+        return len(self.step_times)
+
+    def percentile(self, q):
+        '''
+        Returns: the ``q``-th percentile (nearest rank) of the step times in
+        seconds
+        '''
+        times = sorted(self.step_times)
+        rank = int(round(q / 100.0 * (len(times) - 1)))
+        return times[min(max(rank, 0), len(times) - 1)]
+
+    def samples_per_second(self):
+        '''
+        Returns: the throughput over the window
+        '''
+        total_time = sum(self.step_times)
+        return sum(self.samples) / total_time if total_time > 0 else 0.0
+
+    def data_wait_fraction(self):
+        '''
+        Returns: the fraction of the time spent waiting for data, over the
+        minibatches of the window for which it was recorded, or `None`
+        '''
+        timed = [(d, s) for d, s in zip(self.data_times, self.step_times) if d is not None]
+        total_time = sum(s for _, s in timed)
+        if not timed or total_time <= 0:
+            return None
+        return sum(d for d, _ in timed) / total_time
+
+
+# Sinks that buffer lines, flushed when the interpreter exits
+_buffering_sinks = weakref.WeakSet()
+
+@atexit.register
+def _flush_buffering_sinks():
+    for sink in list(_buffering_sinks):
+        sink.flush()
+
+
+class LogSink(object):
+    '''
+    Base class of the destinations of the log lines of a
+    :class:`ProgressPrinter`.
+    '''
+
+    def write(self, line):
+        '''
+        Writes a log line (without the trailing newline).
+        '''
+        raise NotImplementedError
+
+    def flush(self):
+        '''
+        Flushes the lines written so far to the destination.
+        '''
+        pass
+
+    def close(self):
+        '''
+        Flushes the sink and releases its resources. Writing to it afterwards
+        reopens them.
+        '''
+        self.flush()
+
+
+class StdoutSink(LogSink):
+    '''
+    Prints the log lines to stdout.
+    '''
+
+    def write(self, line):
+        print(line)
+
+    def flush(self):
+        sys.stdout.flush()
+
+
+class FileSink(LogSink):
+    '''
+    Writes the log lines to a file through a persistent handle. By default,
+    every line is written and flushed immediately. With ``flush_lines`` > 1,
+    lines are buffered and written once ``flush_lines`` lines are pending or
+    ``flush_interval`` seconds have passed since the last write to the file.
+    Buffered lines are lost if the process crashes.
+
+    Args:
+        filename (str): path of the log file
+        mode (str, default 'a'): mode in which the file is opened initially
+         ('w' or 'a'). It is reopened in append mode after :meth:`close`.
+        flush_lines (int, default 1): maximum number of pending lines
+        flush_interval (float, default 5): maximum time in seconds that lines
+         are kept pending, checked whenever a line is written
+    '''
+
+    def __init__(self, filename, mode='a', flush_lines=1, flush_interval=5):
+        self.filename = filename
+        self.mode = mode
+        self.flush_lines = flush_lines
+        self.flush_interval = flush_interval
+        self._file = None
+        self._pending = []
+        self._last_flush = time.time()
+        _buffering_sinks.add(self)
+
+    def _format(self, line):
+        return line + '\n'
+
+    def write(self, line):
+        self._pending.append(self._format(line))
+        if len(self._pending) >= self.flush_lines or \
+                time.time() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        if self._pending:
+            if self._file is None:
+                self._file = open(self.filename, self.mode)
+                self.mode = 'a'
+            self._file.write(''.join(self._pending))
+            self._pending = []
+        if self._file is not None:
+            self._file.flush()
+        self._last_flush = time.time()
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class JsonLinesSink(FileSink):
+    '''
+    Writes the log lines to a file as JSON objects, one per line, with the
+    keys ``time`` (seconds since the epoch), ``tag``, ``rank`` and
+    ``message``. Buffering is the same as for :class:`FileSink`.
+
+    Args:
+        filename (str): path of the log file
+        tag (str, default None): value of the ``tag`` key
+        rank (int, default None): value of the ``rank`` key
+        kwargs: see :class:`FileSink`
+    '''
+
+    def __init__(self, filename, tag=None, rank=None, **kwargs):
+        super(JsonLinesSink, self).__init__(filename, **kwargs)
+        self.tag = tag
+        self.rank = rank
+
+    def _format(self, line):
+        return json.dumps({'time': time.time(), 'tag': self.tag,
+                           'rank': self.rank, 'message': line}) + '\n'
+
+
+class AsyncSink(LogSink):
+    '''
+    Forwards the log lines to other sinks from a background thread, so that
+    formatting and I/O happen off the training thread. Pending lines of the
+    sinks are flushed by the thread when no line was logged for
+    ``flush_interval`` seconds.
+
+    Args:
+        sinks (list of :class:`LogSink`): sinks to forward the lines to
+        flush_interval (float, default 5): idle time in seconds after which
+         the sinks are flushed
+    '''
+
+    _FLUSH = object()
+
+    def __init__(self, sinks, flush_interval=5):
+        self.sinks = list(sinks)
+        self.flush_interval = flush_interval
+        self._queue = Queue()
+        self._thread = None
+        _buffering_sinks.add(self)
+
+    def _run(self):
+        while True:
+            try:
+                item = self._queue.get(timeout=self.flush_interval)
+            except Empty:
+                for sink in self.sinks:
+                    sink.flush()
+                continue
+
+            try:
+                if item is None:
+                    return
+                elif item is AsyncSink._FLUSH:
+                    for sink in self.sinks:
+                        sink.flush()
+                else:
+                    for sink in self.sinks:
+                        sink.write(item)
+            finally:
+                self._queue.task_done()
+
+    def write(self, line):
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run)
+            self._thread.daemon = True
+            self._thread.start()
+        self._queue.put(line)
+
+    def flush(self):
+        '''
+        Waits until the pending lines are written and the sinks are flushed.
+        '''
+        if self._thread is not None:
+            self._queue.put(AsyncSink._FLUSH)
+            self._queue.join()
+
+    def close(self):
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        for sink in self.sinks:
+            sink.close()
+
 
 # TODO: Let's switch to import logging in the future instead of print. [ebarsoum]
 class ProgressPrinter(object):
@@ -31,10 +313,16 @@ class ProgressPrinter(object):
         num_epochs (int, default 300): The total number of epochs to be trained.  Used for some metadata.  This parameter is optional.
         tensorboard_log_dir (string or None, default None): if a string is passed, logs statistics to the TensorBoard events file in the given directory.
         model (:class:`~cntk.ops.Function` or None, default None): if a Function is passed and ``tensorboard_log_dir`` is not None, records model graph to a TensorBoard events file.
+        log_sinks (list of :class:`LogSink` or None, default None): additional destinations of the log lines, e.g. a :class:`JsonLinesSink`.
+        async_log (bool, default False): if True, the log lines are written by a background thread (see :class:`AsyncSink`).
+        log_flush_lines (int, default 1): if greater than 1, the lines for ``log_to_file`` are buffered and written in blocks of this many lines (see :class:`FileSink`).
+        log_timing (bool, default False): if True, every minibatch log line is followed by the step time percentiles, the data wait fraction, the throughput and the peak RSS. They are passed to :meth:`update_value` in any case.
+        timing_window (int, default 100): number of minibatches over which the timings are aggregated.
     '''
 
     def __init__(self, freq=None, first=0, tag='', log_to_file=None, rank=None, gen_heartbeat=False, num_epochs=300,
-                 tensorboard_log_dir=None, model=None):
+                 tensorboard_log_dir=None, model=None, log_sinks=None, async_log=False,
+                 log_timing=False, timing_window=100, log_flush_lines=1):
         '''
         Constructor. The optional ``freq`` parameter determines how often
         printing will occur. The value of 0 means an geometric
@@ -56,6 +344,7 @@ class ProgressPrinter(object):
         self.samples_since_last = 0
         self.total_updates = 0
         self.epochs = 0
+        self.validations = 0
         self.freq = freq
         self.first = first
         self.tag = '' if not tag else "[{}] ".format(tag)
@@ -65,6 +354,10 @@ class ProgressPrinter(object):
         self.rank = rank
         self.gen_heartbeat = gen_heartbeat
         self.num_epochs =  num_epochs
+        self.log_timing = log_timing
+        self.step_statistics = StepStatistics(timing_window)
+        self.last_update_time = None
+        self.minibatch_start_time = None
 
         # Create TensorBoardFileWriter if the path to a log directory was provided.
         self.tensorboard_writer = None
@@ -78,7 +371,10 @@ class ProgressPrinter(object):
             self.tensorboard_writer = TensorBoardFileWriter(tensorboard_log_dir, model)
 
         self.logfilename = None
-        if self.log_to_file is not None:
+        if self.log_to_file is None:
+            # to stdout.  if distributed, all ranks merge output into stdout
+            sinks = [StdoutSink()]
+        else:
             self.logfilename = self.log_to_file
 
             if self.rank != None:
@@ -87,9 +383,13 @@ class ProgressPrinter(object):
             # print to stdout
             print("Redirecting log to file " + self.logfilename)
 
-            with open(self.logfilename, "w") as logfile:
-                logfile.write(self.logfilename + "\n")
+            # to named file.  if distributed, one file per rank
+            sinks = [FileSink(self.logfilename, mode='w', flush_lines=log_flush_lines)]
+            sinks[0].write(self.logfilename)
+        sinks.extend(log_sinks or [])
+        self.log_sinks = [AsyncSink(sinks)] if async_log else sinks
 
+        if self.log_to_file is not None:
             self.___logprint('CNTKCommandTrainInfo: train : ' + str(num_epochs))
             self.___logprint('CNTKCommandTrainInfo: CNTKNoMoreCommands_Total : ' + str(num_epochs))
             self.___logprint('CNTKCommandTrainBegin: train')
@@ -103,10 +403,14 @@ class ProgressPrinter(object):
         self.___logprint('CNTKCommandTrainEnd: train')
         if msg != "" and self.log_to_file is not None:
             self.___logprint(msg)
+        for sink in self.log_sinks:
+            sink.close()
         if self.tensorboard_writer is not None:
             self.tensorboard_writer.close()
 
     def flush(self):
+        for sink in self.log_sinks:
+            sink.flush()
         if self.tensorboard_writer is not None:
             self.tensorboard_writer.flush()
 
@@ -160,14 +464,9 @@ class ProgressPrinter(object):
         return ret
 
     def ___logprint(self, logline):
-        if self.log_to_file == None:
-            # to stdout.  if distributed, all ranks merge output into stdout
-            print(logline)
-        else:
-            # to named file.  if distributed, one file per rank
-            with open(self.logfilename, "a") as logfile:
-                logfile.write(logline + "\n")
-        
+        for sink in self.log_sinks:
+            sink.write(logline)
+
     def epoch_summary(self, with_metric=False):
         '''
         If on an arithmetic schedule print an epoch summary using the 'start' accumulators.
@@ -177,6 +476,8 @@ class ProgressPrinter(object):
             with_metric (`bool`): if `False` it only prints the loss, otherwise it prints both the loss and the metric
         '''
         self.epochs += 1
+        # do not count the time between epochs (e.g. for checkpointing) as a step
+        self.last_update_time = None
         if self.freq > 0:
             epoch_end_time = time.time()
             time_delta = epoch_end_time - self.epoch_start_time
@@ -199,6 +500,29 @@ class ProgressPrinter(object):
 
             return avg_loss, avg_metric, samples  # BUGBUG: for freq=0, we don't return anything here
 
+    def validation_summary(self, metric, samples, samples_trained=None, duration=None):
+        '''
+        Prints the result of an evaluation on validation data, e.g. of a
+        snapshot of the model that was evaluated while training continued.
+
+        Args:
+            metric (`float`): average evaluation metric per sample
+            samples (`int`): number of validation samples
+            samples_trained (`int` or `None`): number of samples the evaluated
+             model was trained on
+            duration (`float` or `None`): seconds the evaluation took
+        '''
+        self.validations += 1
+        line = "Finished Evaluation [{}]: {}metric = {:0.1f}% * {}".format(
+            self.validations, self.tag, metric * 100.0, samples)
+        if samples_trained is not None:
+            line += ", trained on {} samples".format(samples_trained)
+        if duration is not None:
+            line += " {:0.3f}s ({:5.1f} samples per second)".format(
+                duration, samples / duration if duration > 0 else 0)
+        self.___logprint(line + ";")
+        self.update_value('validation_metric', metric * 100.0, self.validations)
+
     def ___gererate_progress_heartbeat(self):
         timer_delta = time.time() - self.progress_timer_time
         
@@ -212,12 +536,25 @@ class ProgressPrinter(object):
         '''
         Updates the accumulators using the loss, the minibatch_size and the optional metric.
 
+        The time since the previous call is recorded as the step time of the
+        minibatch. If :meth:`start_minibatch` was called in between, the time
+        before that call is recorded as data wait time.
+
         Args:
             loss (`float`): the value with which to update the loss accumulators
             minibatch_size (`int`): the value with which to update the samples accumulator
             metric (`float` or `None`): if `None` do not update the metric
              accumulators, otherwise update with the given value
         '''
+        now = _timer()
+        if self.last_update_time is not None:
+            data_time = None
+            if self.minibatch_start_time is not None:
+                data_time = self.minibatch_start_time - self.last_update_time
+            self.step_statistics.add(now - self.last_update_time, minibatch_size, data_time)
+        self.last_update_time = now
+        self.minibatch_start_time = None
+
         self.samples_since_start += minibatch_size
         self.samples_since_last  += minibatch_size
         self.loss_since_start    += loss * minibatch_size
@@ -245,6 +582,7 @@ class ProgressPrinter(object):
                 self.___logprint(' {:8.3g}   {:8.3g}   {:8s}   {:8s}    {:10d}'.format(
                     self.avg_loss_since_start(), avg_loss,
                     '', '', self.samples_since_start))
+            self.___report_timing()
         elif self.freq > 0 and (self.updates_since_start % self.freq == 0 or self.updates_since_start <= self.first):
             avg_loss, avg_metric, samples = self.reset_last()
 
@@ -265,6 +603,43 @@ class ProgressPrinter(object):
                 self.update_value('mb_avg_loss', avg_loss, self.total_updates)
                 if metric is not None:
                     self.update_value('mb_avg_metric', avg_metric * 100.0, self.total_updates)
+            self.___report_timing()
+
+    def start_minibatch(self):
+        '''
+        Marks the point at which the data of the current minibatch is
+        available and training on it starts. The time between the previous
+        :meth:`update` and this call is recorded as data wait time.
+        '''
+        self.minibatch_start_time = _timer()
+
+    def ___report_timing(self):
+        stats = self.step_statistics
+        if len(stats) == 0:
+            return
+
+        p50, p95, p99 = (stats.percentile(q) for q in (50, 95, 99))
+        speed = stats.samples_per_second()
+        data_wait = stats.data_wait_fraction()
+        rss = peak_rss()
+
+        self.update_value('mb_step_time_p50', p50, self.total_updates)
+        self.update_value('mb_step_time_p95', p95, self.total_updates)
+        self.update_value('mb_step_time_p99', p99, self.total_updates)
+        self.update_value('mb_samples_per_second', speed, self.total_updates)
+        if data_wait is not None:
+            self.update_value('mb_data_wait_fraction', data_wait, self.total_updates)
+        if rss is not None:
+            self.update_value('peak_rss_mb', rss / 1e6, self.total_updates)
+
+        if self.log_timing:
+            line = ' Timing: step p50 = {:0.2f}ms, p95 = {:0.2f}ms, p99 = {:0.2f}ms, {:0.1f} samples per second'.format(
+                p50 * 1000.0, p95 * 1000.0, p99 * 1000.0, speed)
+            if data_wait is not None:
+                line += ', data wait = {:0.1f}%'.format(data_wait * 100.0)
+            if rss is not None:
+                line += ', peak RSS = {:0.1f}MB'.format(rss / 1e6)
+            self.___logprint(line + ';')
 
     def update_with_trainer(self, trainer, with_metric=False):
         '''
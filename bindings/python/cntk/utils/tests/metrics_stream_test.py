@@ -0,0 +1,70 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+# Licensed under the MIT license. See LICENSE.md file in the project root
+# for full license information.
+# ==============================================================================
+
+import json
+import numpy as np
+import pytest
+
+from cntk.utils.metrics_stream import *
+
+
+@pytest.mark.parametrize("format", ['jsonl', 'columnar'])
+def test_metrics_round_trip(tmpdir, format):
+    filename = str(tmpdir / 'metrics')
+    writer = MetricsWriter(filename, format=format, block_size=3)
+    for step in range(1, 8):
+        writer.write(step=step, samples=10 * step, loss=1.0 / step,
+                     metric=0.5, lr=0.01, elapsed=0.1 * step, throughput=100.0)
+    writer.write(kind=CHECKPOINT_RECORD, step=7, samples=70, loss=0.25)
+    # blocks are written when they are full
+    assert len(writer) == 2
+    writer.close()
+
+    metrics = read_metrics(filename)
+    assert sorted(metrics.keys()) == sorted(name for name, _ in METRICS_FIELDS)
+    assert metrics['step'].tolist() == list(range(1, 8)) + [7]
+    assert metrics['samples'].dtype == np.int64
+    assert np.allclose(metrics['loss'][:7], 1.0 / np.arange(1, 8))
+    # fields that are not given are missing
+    assert np.isnan(metrics['metric'][-1]) and np.isnan(metrics['lr'][-1])
+
+    checkpoints = read_metrics(filename, kind=CHECKPOINT_RECORD)
+    assert checkpoints['samples'].tolist() == [70]
+    assert checkpoints['loss'].tolist() == [0.25]
+
+
+def test_metrics_jsonl_records(tmpdir):
+    filename = str(tmpdir / 'metrics.jsonl')
+    with MetricsWriter(filename) as writer:
+        writer.write(step=np.int64(1), samples=16, loss=np.float32(0.5))
+
+    record = json.loads(open(filename).read())
+    assert record['kind'] == MINIBATCH_RECORD
+    assert record['step'] == 1 and record['loss'] == 0.5
+    assert record['metric'] is None
+
+    with pytest.raises(ValueError):
+        writer.write(step=2)
+    with pytest.raises(ValueError):
+        MetricsWriter(str(tmpdir / 'other'), format='csv')
+
+
+@pytest.mark.parametrize("format", ['jsonl', 'columnar'])
+def test_metrics_incomplete_file(tmpdir, format):
+    filename = str(tmpdir / 'metrics')
+    with MetricsWriter(filename, format=format, block_size=2) as writer:
+        for step in range(4):
+            writer.write(step=step)
+        with pytest.raises(ValueError):
+            writer.write(accuracy=1.0)
+
+    # e.g. the training process was killed while writing
+    with open(filename, 'rb+') as f:
+        f.truncate(len(f.read()) - 5)
+
+    # the incomplete record, or block of records, is dropped
+    expected = [0, 1, 2] if format == 'jsonl' else [0, 1]
+    assert read_metrics(filename)['step'].tolist() == expected
@@ -0,0 +1,113 @@
+# Copyright (c) Microsoft. All rights reserved.
+
+# Licensed under the MIT license. See LICENSE.md file in the project root
+# for full license information.
+# ==============================================================================
+
+import json
+import pytest
+
+from cntk.utils.progress_print import *
+
+
+class ListSink(LogSink):
+    def __init__(self):
+        self.lines = []
+        self.flushes = 0
+
+    def write(self, line):
+        self.lines.append(line)
+
+    def flush(self):
+        self.flushes += 1
+
+
+def test_file_sink_buffers_lines(tmpdir):
+    filename = str(tmpdir / 'log.txt')
+    sink = FileSink(filename, mode='w', flush_lines=3, flush_interval=1000)
+    sink.write('a')
+    sink.write('b')
+    assert not tmpdir.join('log.txt').check()
+
+    sink.write('c')
+    assert open(filename).read() == 'a\nb\nc\n'
+
+    sink.write('d')
+    sink.close()
+    assert open(filename).read() == 'a\nb\nc\nd\n'
+
+    # writing after close appends
+    sink.write('e')
+    sink.close()
+    assert open(filename).read() == 'a\nb\nc\nd\ne\n'
+
+
+def test_file_sink_unbuffered_by_default(tmpdir):
+    filename = str(tmpdir / 'log.txt')
+    sink = FileSink(filename, mode='w')
+    sink.write('a')
+    assert open(filename).read() == 'a\n'
+    sink.close()
+
+
+@pytest.mark.parametrize("async_log", [False, True])
+def test_progress_printer_sinks(tmpdir, async_log):
+    filename = str(tmpdir / 'log')
+    jsonl = str(tmpdir / 'log.jsonl')
+    extra = ListSink()
+    pp = ProgressPrinter(freq=2, log_to_file=filename, rank=0, async_log=async_log,
+                         log_sinks=[extra, JsonLinesSink(jsonl, tag='test', rank=0)])
+    for i in range(4):
+        pp.update(0.5, 10, 0.25)
+    pp.flush()
+
+    lines = open(filename + 'rank0').read().splitlines()
+    assert lines[0] == filename + 'rank0'
+    assert lines[-1] == ' Minibatch[   3-   4]: loss = 0.500000 * 20, metric = 25.0% * 20;'
+    # the file name header only goes to the log file
+    assert extra.lines == lines[1:]
+    assert extra.flushes > 0
+
+    pp.epoch_summary(with_metric=True)
+    pp.end_progress_print()
+
+    records = [json.loads(line) for line in open(jsonl)]
+    assert [r['message'] for r in records] == extra.lines
+    assert records[-1]['message'] == 'CNTKCommandTrainEnd: train'
+    assert all(r['tag'] == 'test' and r['rank'] == 0 for r in records)
+
+
+def test_step_statistics():
+    stats = StepStatistics(window=4)
+    for t in [0.5, 0.1, 0.2, 0.3, 0.4]:
+        stats.add(t, 10, data_time=t / 2)
+
+    # the first step dropped out of the window
+    assert len(stats) == 4
+    assert stats.percentile(50) == 0.3
+    assert stats.percentile(99) == 0.4
+    assert abs(stats.samples_per_second() - 40 / 1.0) < 1e-9
+    assert abs(stats.data_wait_fraction() - 0.5) < 1e-9
+
+    stats.add(0.1, 10)
+    assert abs(stats.data_wait_fraction() - 0.5) < 1e-9
+
+    assert StepStatistics(window=1).data_wait_fraction() is None
+
+
+def test_progress_printer_timing():
+    extra = ListSink()
+    pp = ProgressPrinter(freq=2, log_sinks=[extra], log_timing=True)
+    values = []
+    pp.update_value = lambda name, value, step: values.append(name)
+
+    for i in range(4):
+        pp.start_minibatch()
+        pp.update(0.5, 10)
+
+    timing = [line for line in extra.lines if line.startswith(' Timing:')]
+    # no step time is recorded for the first update
+    assert len(timing) == 2
+    assert 'samples per second' in timing[-1] and 'data wait' in timing[-1]
+    assert 'mb_step_time_p95' in values
+    assert 'mb_data_wait_fraction' in values
@@ -9,6 +9,7 @@ import scipy.sparse as sparse
 csr = sparse.csr_matrix
 import pytest
 
+from cntk import cntk_py
 from cntk.device import default
 from cntk.tests.test_utils import precision, PRECISION_TO_TYPE
 from cntk.ops import *
@@ -125,3 +126,61 @@ def test_sanitize_batch_contiguity():
     b = sanitize_batch(var, batch)
     assert b.shape == (2,1,2,2)
 
+
+def test_sanitize_var_map_with_layout():
+    a = input_variable(shape=(1,), name='a')
+    b = input_variable(shape=(1,), name='b')
+    z = plus(a, b)
+
+    layout = ArgumentLayout(z.arguments)
+    assert len(layout) == 2
+
+    for _ in range(2):
+        var_map = sanitize_var_map(layout, {'a': AA([[1]], dtype=np.float32),
+                                            b: AA([[2]], dtype=np.float32)})
+        assert set(var_map.keys()) == set([a, b])
+
+    with pytest.raises(ValueError):
+        sanitize_var_map(layout, {'c': [[1]], b: [[2]]})
+
+    single = ArgumentLayout([a])
+    var_map = sanitize_var_map(single, AA([[1]], dtype=np.float32))
+    assert list(var_map.keys()) == [a]
+
+def test_forward_layout_reset():
+    p = placeholder_variable(shape=(1,))
+    i = input_variable(shape=(1,), name='i')
+    z = plus(p, i)
+    # placeholders are arguments, too
+    layout = z._layout('arguments')
+    assert len(layout) == 2
+    assert z._layout('arguments') is layout
+
+    j = input_variable(shape=(1,), name='j')
+    z.replace_placeholders({p: j})
+    assert np.allclose(z.eval({'i': [[1]], 'j': [[2]]}), [[3]])
+    assert z._layout('arguments') is not layout
+
+    # changes through another instance wrapping the same Function as well
+    q = placeholder_variable(shape=(1,))
+    z = plus(q, i)
+    layout = z._layout('arguments')
+    k = input_variable(shape=(1,), name='k')
+    z.output.owner.replace_placeholders({q: k})
+    assert z._layout('arguments') is not layout
+    assert np.allclose(z.eval({'i': [[1]], 'k': [[3]]}), [[4]])
+
+def test_bind():
+    p = placeholder_variable(shape=(1,))
+    i = input_variable(shape=(1,), name='i')
+    z = plus(p, i)
+    z.replace_placeholders({p: input_variable(shape=(1,), name='j')})
+
+    bound = z.bind()
+    assert len(bound.arguments) == 2
+    assert np.allclose(bound.eval({'i': [[1]], 'j': [[2]]}), [[3]])
+    _, outputs = bound.forward({'i': [[1]], 'j': [[3]]}, bound.outputs)
+    assert np.allclose(list(outputs.values())[0], [[4]])
+
+    with pytest.raises(ValueError):
+        bound.eval({'i': [[1]], 'x': [[2]]})